@@ -8,10 +8,23 @@ import streamlit as st
 import json
 import re
 import os
-from typing import Dict, List, Any, Optional
+import zipfile
+from typing import Dict, Any, Optional
 import pandas as pd
 from datetime import datetime
 
+from conversion_profiler import ConversionProfiler
+from dfm_incremental import LiveDfm
+from form_engine import FormGeneratorAI
+from lookup_service import get_lookup_service_from_env
+from doc_retrieval import format_answer, load_index
+from program_templates import get_default_registry
+from upload_batch import UploadBatchJob, is_archive, pair_uploads
+
+# Upload d'un dossier entier (accept_multiple_files="directory") apparu avec Streamlit 1.49;
+# pyproject.toml accepte 1.46, où le paramètre n'est qu'un booléen
+FOLDER_UPLOAD = tuple(int(part) for part in re.findall(r'\d+', st.__version__)[:2]) >= (1, 49)
+
 # Configuration de la page
 st.set_page_config(
     page_title="FormBuilder AI Assistant",
@@ -20,390 +33,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-class FormGeneratorAI:
-    """Intelligence artificielle pour la génération de formulaires"""
-    
-    def __init__(self):
-        self.component_mappings = {
-            'TDBEdit': 'TEXT',
-            'TDBComboBox': 'SELECT',
-            'TDBDateTimePicker': 'DATEPICKER',
-            'TDBCheckBox': 'CHECKBOX',
-            'TDBRadioGroup': 'RADIO',
-            'TDBMemo': 'TEXTAREA',
-            'TDBSpinEdit': 'NUMERIC',
-            'TDBLookupComboBox': 'LSTLKP',
-            'TDBGrid': 'GRIDLKP',
-            'TPanel': 'GROUP',
-            'TGroupBox': 'GROUP',
-            'TButton': 'BUTTON',
-            'TLabel': 'LABEL'
-        }
-        
-        self.validation_operators = {
-            'required': 'ISNN',
-            'not_null': 'ISNN',
-            'is_null': 'ISN',
-            'equal': 'EQ',
-            'not_equal': 'NE',
-            'greater_than': 'GT',
-            'less_than': 'LT',
-            'greater_equal': 'GE',
-            'less_equal': 'LE'
-        }
-
-    def parse_dfm_content(self, content: str) -> Dict[str, Any]:
-        """Parse le contenu d'un fichier DFM et extrait les composants"""
-        try:
-            components = []
-            form_properties = {}
-            
-            # Extraction du nom du formulaire
-            form_match = re.search(r'object\s+(\w+):\s*TForm', content, re.IGNORECASE)
-            if form_match:
-                form_properties['name'] = form_match.group(1)
-            
-            # Extraction des propriétés du formulaire
-            caption_match = re.search(r'Caption\s*=\s*[\'"]([^\'"]+)[\'"]', content)
-            if caption_match:
-                form_properties['caption'] = caption_match.group(1)
-            
-            # Extraction de la largeur
-            width_match = re.search(r'Width\s*=\s*(\d+)', content)
-            if width_match:
-                form_properties['width'] = f"{width_match.group(1)}px"
-            
-            # Extraction des composants
-            component_pattern = r'object\s+(\w+):\s*(\w+).*?end'
-            matches = re.finditer(component_pattern, content, re.DOTALL | re.IGNORECASE)
-            
-            for match in matches:
-                component_name = match.group(1)
-                component_type = match.group(2)
-                component_block = match.group(0)
-                
-                # Skip le formulaire principal
-                if component_type.lower() in ['tform', 'form']:
-                    continue
-                
-                component = self._parse_component_properties(component_name, component_type, component_block)
-                if component:
-                    components.append(component)
-            
-            return {
-                'form_properties': form_properties,
-                'components': components
-            }
-            
-        except Exception as e:
-            st.error(f"Erreur lors du parsing DFM: {str(e)}")
-            return {'form_properties': {}, 'components': []}
-
-    def _parse_component_properties(self, name: str, comp_type: str, block: str) -> Dict[str, Any]:
-        """Parse les propriétés d'un composant individuel"""
-        component = {
-            'name': name,
-            'delphi_type': comp_type,
-            'json_type': self.component_mappings.get(comp_type, 'TEXT'),
-            'properties': {}
-        }
-        
-        # Extraction des propriétés communes
-        properties_to_extract = [
-            ('Caption', r'Caption\s*=\s*[\'"]([^\'"]+)[\'"]'),
-            ('Text', r'Text\s*=\s*[\'"]([^\'"]+)[\'"]'),
-            ('Enabled', r'Enabled\s*=\s*(\w+)'),
-            ('Visible', r'Visible\s*=\s*(\w+)'),
-            ('Required', r'Required\s*=\s*(\w+)'),
-            ('Left', r'Left\s*=\s*(\d+)'),
-            ('Top', r'Top\s*=\s*(\d+)'),
-            ('Width', r'Width\s*=\s*(\d+)'),
-            ('Height', r'Height\s*=\s*(\d+)'),
-            ('TabOrder', r'TabOrder\s*=\s*(\d+)')
-        ]
-        
-        for prop_name, pattern in properties_to_extract:
-            match = re.search(pattern, block, re.IGNORECASE)
-            if match:
-                value = match.group(1)
-                # Conversion des valeurs boolean
-                if value.lower() in ['true', 'false']:
-                    component['properties'][prop_name] = value.lower() == 'true'
-                elif value.isdigit():
-                    component['properties'][prop_name] = int(value)
-                else:
-                    component['properties'][prop_name] = value
-        
-        return component
-
-    def parse_info_content(self, content: str) -> Dict[str, Any]:
-        """Parse le contenu du fichier Info pour extraire les métadonnées"""
-        try:
-            info_data = {
-                'fields': [],
-                'validations': [],
-                'entities': [],
-                'endpoints': []
-            }
-            
-            lines = content.split('\n')
-            current_section = None
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                
-                # Détection des sections
-                if line.startswith('[') and line.endswith(']'):
-                    current_section = line[1:-1].lower()
-                    continue
-                
-                # Parse selon la section
-                if current_section == 'fields':
-                    field_info = self._parse_field_info(line)
-                    if field_info:
-                        info_data['fields'].append(field_info)
-                        
-                elif current_section == 'validations':
-                    validation_info = self._parse_validation_info(line)
-                    if validation_info:
-                        info_data['validations'].append(validation_info)
-                        
-                elif current_section == 'entities':
-                    entity_info = self._parse_entity_info(line)
-                    if entity_info:
-                        info_data['entities'].append(entity_info)
-            
-            return info_data
-            
-        except Exception as e:
-            st.error(f"Erreur lors du parsing Info: {str(e)}")
-            return {'fields': [], 'validations': [], 'entities': [], 'endpoints': []}
-
-    def _parse_field_info(self, line: str) -> Optional[Dict[str, Any]]:
-        """Parse une ligne d'information de champ"""
-        try:
-            # Format: FieldName|Type|Required|Entity|Description
-            parts = line.split('|')
-            if len(parts) >= 3:
-                return {
-                    'name': parts[0].strip(),
-                    'type': parts[1].strip(),
-                    'required': parts[2].strip().lower() == 'true',
-                    'entity': parts[3].strip() if len(parts) > 3 else None,
-                    'description': parts[4].strip() if len(parts) > 4 else None
-                }
-        except:
-            pass
-        return None
-
-    def _parse_validation_info(self, line: str) -> Optional[Dict[str, Any]]:
-        """Parse une ligne d'information de validation"""
-        try:
-            # Format: FieldName|Operator|Value|Message|Type
-            parts = line.split('|')
-            if len(parts) >= 4:
-                return {
-                    'field': parts[0].strip(),
-                    'operator': parts[1].strip(),
-                    'value': parts[2].strip(),
-                    'message': parts[3].strip(),
-                    'type': parts[4].strip() if len(parts) > 4 else 'ERROR'
-                }
-        except:
-            pass
-        return None
-
-    def _parse_entity_info(self, line: str) -> Optional[Dict[str, Any]]:
-        """Parse une ligne d'information d'entité"""
-        try:
-            # Format: EntityName|KeyField|Endpoint|Columns
-            parts = line.split('|')
-            if len(parts) >= 2:
-                return {
-                    'name': parts[0].strip(),
-                    'key_field': parts[1].strip(),
-                    'endpoint': parts[2].strip() if len(parts) > 2 else None,
-                    'columns': parts[3].strip().split(',') if len(parts) > 3 else []
-                }
-        except:
-            pass
-        return None
-
-    def generate_form_json(self, dfm_data: Dict[str, Any], info_data: Dict[str, Any], form_id: str) -> Dict[str, Any]:
-        """Génère la configuration JSON finale du formulaire"""
-        
-        form_props = dfm_data.get('form_properties', {})
-        components = dfm_data.get('components', [])
-        
-        # Structure de base du formulaire
-        form_json = {
-            "MenuID": form_id.upper(),
-            "Label": form_props.get('caption', form_id.upper()),
-            "FormWidth": form_props.get('width', '700px'),
-            "Layout": "PROCESS",
-            "Fields": [],
-            "Actions": [
-                {
-                    "ID": "PROCESS",
-                    "Label": "PROCESS",
-                    "MethodToInvoke": f"Execute{form_id.title()}"
-                }
-            ],
-            "Validations": []
-        }
-        
-        # Génération des champs
-        for component in components:
-            if component['json_type'] in ['LABEL', 'BUTTON']:
-                continue  # Skip les labels et boutons pour les champs
-                
-            field = self._generate_field_json(component, info_data)
-            if field:
-                form_json["Fields"].append(field)
-        
-        # Génération des validations
-        validations = self._generate_validations(components, info_data)
-        form_json["Validations"] = validations
-        
-        return form_json
-
-    def _generate_field_json(self, component: Dict[str, Any], info_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Génère la configuration JSON d'un champ"""
-        
-        field = {
-            "Id": component['name'],
-            "label": component['properties'].get('Caption', component['name']).upper(),
-            "type": component['json_type'],
-            "required": component['properties'].get('Required', False)
-        }
-        
-        # Ajout de propriétés spécifiques selon le type
-        if component['json_type'] in ['GRIDLKP', 'LSTLKP']:
-            entity_info = self._find_entity_info(component['name'], info_data)
-            if entity_info:
-                field.update({
-                    "EntitykeyField": entity_info['key_field'],
-                    "Entity": entity_info['name'],
-                    "endpoint": entity_info.get('endpoint'),
-                    "ColumnDefinitions": self._generate_column_definitions(entity_info)
-                })
-        
-        elif component['json_type'] == 'SELECT':
-            # Recherche des options dans info_data
-            options = self._find_field_options(component['name'], info_data)
-            if options:
-                field["Options"] = options
-        
-        elif component['json_type'] == 'NUMERIC':
-            field["DataType"] = "NUMERIC"
-        
-        elif component['json_type'] == 'DATEPICKER':
-            field["DataType"] = "DATE"
-        
-        # Propriétés de visibilité et activation
-        if not component['properties'].get('Enabled', True):
-            field["EnabledWhen"] = {
-                "Conditions": [
-                    {
-                        "RightField": "AlwaysFalse",
-                        "Operator": "IST"
-                    }
-                ]
-            }
-        
-        if not component['properties'].get('Visible', True):
-            field["VisibleWhen"] = {
-                "Conditions": [
-                    {
-                        "RightField": "AlwaysFalse",
-                        "Operator": "IST"
-                    }
-                ]
-            }
-        
-        return field
-
-    def _find_entity_info(self, field_name: str, info_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Trouve les informations d'entité pour un champ"""
-        for field_info in info_data.get('fields', []):
-            if field_info['name'].lower() == field_name.lower() and field_info.get('entity'):
-                for entity in info_data.get('entities', []):
-                    if entity['name'].lower() == field_info['entity'].lower():
-                        return entity
-        return None
-
-    def _generate_column_definitions(self, entity_info: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Génère les définitions de colonnes pour une entité"""
-        columns = []
-        for col in entity_info.get('columns', []):
-            columns.append({
-                "DataField": col.strip(),
-                "Caption": col.strip().replace('_', ' ').title(),
-                "DataType": "STRING"
-            })
-        return columns
-
-    def _find_field_options(self, field_name: str, info_data: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
-        """Trouve les options pour un champ SELECT"""
-        # Cette méthode peut être étendue pour parser des options spécifiques
-        return None
-
-    def _generate_validations(self, components: List[Dict[str, Any]], info_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Génère les validations du formulaire"""
-        validations = []
-        validation_id = 1
-        
-        # Validations basées sur les propriétés des composants
-        for component in components:
-            if component['properties'].get('Required', False):
-                validations.append({
-                    "Id": str(validation_id),
-                    "Type": "ERROR",
-                    "Message": f"{component['properties'].get('Caption', component['name'])} is required",
-                    "CondExpression": {
-                        "Conditions": [
-                            {
-                                "RightField": component['name'],
-                                "Operator": "ISN"
-                            }
-                        ]
-                    }
-                })
-                validation_id += 1
-        
-        # Validations basées sur les informations du fichier Info
-        for validation_info in info_data.get('validations', []):
-            validations.append({
-                "Id": str(validation_id),
-                "Type": validation_info.get('type', 'ERROR'),
-                "Message": validation_info['message'],
-                "CondExpression": {
-                    "Conditions": [
-                        {
-                            "RightField": validation_info['field'],
-                            "Operator": self.validation_operators.get(validation_info['operator'], validation_info['operator']),
-                            "Value": validation_info['value'] if validation_info['value'] != 'NULL' else None,
-                            "ValueType": self._detect_value_type(validation_info['value'])
-                        }
-                    ]
-                }
-            })
-            validation_id += 1
-        
-        return validations
-
-    def _detect_value_type(self, value: str) -> str:
-        """Détecte le type de valeur pour les validations"""
-        if value.upper() in ['TRUE', 'FALSE']:
-            return "BOOL"
-        elif value.replace('.', '').replace('-', '').isdigit():
-            return "NUMERIC"
-        elif value.upper() in ['SYSDATE', 'NOW()']:
-            return "DATE"
-        else:
-            return "STRING"
 
 def main():
     """Interface principale Streamlit"""
@@ -429,9 +58,28 @@ def main():
         dfm_file = st.file_uploader("Fichier DFM/Delphi", type=['dfm', 'txt'], help="Fichier de définition Delphi")
         info_file = st.file_uploader("Fichier Info", type=['txt', 'info'], help="Fichier d'informations complémentaires")
         
+        st.markdown("### 📦 Conversion par lots")
+        batch_files = st.file_uploader("Fichiers DFM et Info ou projets ZIP", type=['dfm', 'info', 'txt', 'zip'],
+                                       accept_multiple_files=True, key="batch_files",
+                                       help="Associés par nom: ACCADJ.dfm + ACCADJ.info; les ZIP sont lus sans extraction")
+        batch_folder = None
+        if FOLDER_UPLOAD:
+            batch_folder = st.file_uploader("Dossier", type=['dfm', 'info', 'txt'], accept_multiple_files="directory",
+                                            key="batch_folder", help="Tous les DFM/Info du dossier et de ses sous-dossiers")
+        uploads = list(batch_files or []) + list(batch_folder or [])
+        batch_job = st.session_state.get('batch_job')
+        if st.button("⚙️ Convertir le lot", use_container_width=True,
+                     disabled=not uploads or (batch_job is not None and batch_job.running)):
+            start_batch_job(uploads)
+        
         st.markdown("### 🎯 Actions rapides")
-        if st.button("🔥 Générer BUYTYP", use_container_width=True):
-            st.session_state.generate_buytyp = True
+        program = st.selectbox("Programme standard", get_default_registry().programs(),
+                               index=None, placeholder="BUYTYP, ACCADJ...")
+        if st.button("🔥 Générer le programme", use_container_width=True, disabled=program is None):
+            st.session_state.generate_program = program
+        
+        st.markdown("### 🐞 Debug")
+        debug_profile = st.checkbox("Profiler la génération", help="cProfile + tracemalloc, piles repliées pour flamegraph")
     
     # Interface principale à deux colonnes
     col1, col2 = st.columns([1, 1])
@@ -467,132 +115,211 @@ def main():
     with col2:
         st.markdown("### 🔧 Génération de formulaire")
         
-        # Génération automatique BUYTYP
-        if st.session_state.get('generate_buytyp', False):
-            generate_buytyp_form()
-            st.session_state.generate_buytyp = False
+        # Génération d'un programme standard depuis son template
+        if st.session_state.get('generate_program'):
+            generate_program_form(st.session_state.generate_program, form_id)
+            st.session_state.generate_program = None
         
         # Traitement des fichiers uploadés
         if dfm_file is not None or info_file is not None:
-            process_uploaded_files(dfm_file, info_file, form_id)
+            process_uploaded_files(dfm_file, info_file, form_id, debug_profile)
+        
+        # Lot en cours ou terminé (conversion dans un thread de fond)
+        if st.session_state.get('batch_job') is not None:
+            job = st.session_state.batch_job
+            st.fragment(render_batch_job, run_every=1.0 if job.running else None)()
+        
+        # Aperçu des données de lookup (si FORMBUILDER_LOOKUP_DATA est configuré)
+        lookup_service = load_lookup_service()
+        if lookup_service is not None and lookup_service.indexes:
+            render_lookup_preview(lookup_service)
+
+@st.cache_resource
+def load_lookup_service():
+    """Charge une seule fois les index de lookup locaux"""
+    return get_lookup_service_from_env()
+
+def render_lookup_preview(lookup_service):
+    """Recherche type-ahead dans les données locales d'un lookup"""
+    with st.expander("🔎 Aperçu des lookups"):
+        entity = st.selectbox("Entité", sorted(index.definition.entity for index in lookup_service.indexes.values()))
+        query = st.text_input("Recherche (clé ou description)", key="lookup_query")
+        page = st.number_input("Page", min_value=0, value=0, step=1, key="lookup_page")
+        
+        result = lookup_service.search(entity, query, page=int(page))
+        total_label = result['total'] if result['total_exact'] else f"≤ {result['total']}"
+        st.caption(f"{total_label} résultat(s)")
+        st.dataframe(pd.DataFrame(result['rows']), use_container_width=True)
 
 def generate_ai_response(prompt: str, dfm_file, info_file, form_id: str) -> str:
     """Génère une réponse IA contextuelle"""
     
     form_generator = st.session_state.form_generator
     
-    if dfm_file is not None and info_file is not None:
-        if 'field' in prompt.lower() or 'champ' in prompt.lower():
-            return f"Votre formulaire {form_id} contient plusieurs champs avec des composants de lookup et des validations. Je peux analyser la structure détaillée si vous le souhaitez."
-        elif 'validation' in prompt.lower():
-            return "Le formulaire inclut des règles de validation avec des opérateurs logiques et des conditions. Je peux générer les validations appropriées."
-        elif 'génér' in prompt.lower() or 'crée' in prompt.lower():
-            return "Je vais analyser vos fichiers et générer la configuration JSON complète. Veuillez patienter..."
-        else:
-            return "Je peux vous aider à comprendre la structure du formulaire, analyser les composants, ou générer la configuration JSON. Que souhaitez-vous faire ?"
+    # Programme standard cité dans la question: réponse directe depuis le registre de templates
+    registry = get_default_registry()
+    program = next((name for name in registry.programs() if re.search(rf'\b{name}\b', prompt, re.IGNORECASE)), None)
+    if program is not None:
+        program_json = json.dumps(registry.get(program), indent=2, ensure_ascii=False)
+        return f"Voici la configuration complète du programme {program} :\n\n```json\n{program_json}\n```"
+    
+    # Fichiers chargés: une question sur le formulaire porte sur eux, pas sur la documentation
+    has_files = dfm_file is not None and info_file is not None
+    if has_files:
+        reply = form_question_reply(prompt, form_id)
+        if reply is not None:
+            return reply
+    
+    # Question couverte par la documentation ou les exemples: réponse fondée sur les passages trouvés
+    answer = format_answer(load_document_index().search(prompt))
+    if answer is not None:
+        return answer
+    
+    if has_files:
+        return "Je peux vous aider à comprendre la structure du formulaire, analyser les composants, ou générer la configuration JSON. Que souhaitez-vous faire ?"
     else:
         return "Veuillez d'abord uploader vos fichiers DFM et Info pour que je puisse vous fournir une assistance personnalisée sur votre formulaire."
 
-def generate_buytyp_form():
-    """Génère le formulaire BUYTYP basé sur le fichier attaché"""
+def form_question_reply(prompt: str, form_id: str) -> Optional[str]:
+    """Réponse aux questions sur le formulaire chargé (champs, validations, génération), sinon None"""
+    lowered = prompt.lower()
+    if any(word in lowered for word in ('field', 'champ')):
+        return f"Votre formulaire {form_id} contient plusieurs champs avec des composants de lookup et des validations. Je peux analyser la structure détaillée si vous le souhaitez."
+    elif 'validation' in lowered:
+        return "Le formulaire inclut des règles de validation avec des opérateurs logiques et des conditions. Je peux générer les validations appropriées."
+    elif any(word in lowered for word in ('génér', 'génè', 'gener', 'crée', 'creat', 'convert', 'analy')):
+        return "Je vais analyser vos fichiers et générer la configuration JSON complète. Veuillez patienter..."
+    return None
+
+def generate_program_form(program: str, form_id: str):
+    """Génère la configuration d'un programme standard à partir du registre de templates"""
     
-    buytyp_config = {
-        "MenuID": "BUYTYP",
-        "Label": "BUYTYP",
-        "FormWidth": "600px",
-        "Layout": "PROCESS",
-        "Fields": [
-            {
-                "Id": "FundID",
-                "label": "FUND",
-                "type": "GRIDLKP",
-                "required": True,
-                "showAliasBox": True,
-                "EntitykeyField": "fund",
-                "Entity": "Fndmas",
-                "EndpointOnchange": True,
-                "ColumnDefinitions": [
-                    {"DataField": "fund", "Caption": "Fund ID", "DataType": "STRING"},
-                    {"DataField": "acnam1", "Caption": "Fund Name", "DataType": "STRING"},
-                    {"DataField": "inactive", "ExcludeFromGrid": True, "DataType": "STRING"}
-                ]
-            },
-            {
-                "Id": "Ticker",
-                "label": "TKR",
-                "type": "GRIDLKP",
-                "required": True,
-                "EntitykeyField": "tkr",
-                "Entity": "Secrty",
-                "EndpointOnchange": True,
-                "ColumnDefinitions": [
-                    {"DataField": "tkr", "Caption": "Ticker", "DataType": "STRING"},
-                    {"DataField": "tkr_DESC", "Caption": "Ticker Desc", "DataType": "STRING"}
-                ]
-            },
-            {
-                "Id": "TradeDate",
-                "label": "TRADEDATE",
-                "type": "DATEPKR",
-                "required": True
-            },
-            {
-                "Id": "Broker",
-                "label": "BROKER",
-                "type": "GRIDLKP",
-                "required": True,
-                "EntitykeyField": "broker",
-                "Entity": "Broker"
-            },
-            {
-                "Id": "Quantity",
-                "label": "QUANTITY",
-                "type": "NUMERIC",
-                "required": True
-            }
-        ],
-        "Actions": [
-            {
-                "ID": "PROCESS",
-                "Label": "PROCESS",
-                "MethodToInvoke": "ExecuteBuyTyp"
-            }
-        ],
-        "Validations": [
-            {
-                "Id": "1",
-                "Type": "ERROR",
-                "Message": "Fund is required",
-                "CondExpression": {
-                    "Conditions": [{"RightField": "FundID", "Operator": "ISN"}]
-                }
-            },
-            {
-                "Id": "2",
-                "Type": "ERROR",
-                "Message": "Ticker is required",
-                "CondExpression": {
-                    "Conditions": [{"RightField": "Ticker", "Operator": "ISN"}]
-                }
-            }
-        ]
-    }
+    registry = get_default_registry()
+    # L'ID saisi ne remplace le MenuID que s'il a été personnalisé
+    menu_id = form_id if form_id and form_id != "NEWFORM" else None
+    program_config = registry.instantiate(program, menu_id=menu_id)
     
-    st.success("✅ Configuration BUYTYP générée avec succès !")
+    st.success(f"✅ Configuration {program} générée avec succès !")
     
     # Affichage du JSON
-    st.json(buytyp_config)
+    st.json(program_config)
     
     # Bouton de téléchargement
-    json_str = json.dumps(buytyp_config, indent=2, ensure_ascii=False)
+    json_str = json.dumps(program_config, indent=2, ensure_ascii=False)
     st.download_button(
-        label="📥 Télécharger BUYTYP.json",
+        label=f"📥 Télécharger {program_config['MenuID']}.json",
         data=json_str,
-        file_name="buytyp_form.json",
+        file_name=f"{program_config['MenuID'].lower()}_form.json",
         mime="application/json"
     )
 
-def process_uploaded_files(dfm_file, info_file, form_id: str):
+@st.cache_resource
+def load_document_index():
+    """Index de recherche partagé par les sessions (persisté, reconstruit si une source change)"""
+    return load_index()
+
+@st.cache_resource
+def load_profiler():
+    """Profileur partagé par les sessions (une capture à la fois)"""
+    return ConversionProfiler()
+
+def render_profile_capture(capture):
+    """Affiche le résumé d'une capture de profilage"""
+    if capture is None:
+        st.warning("Une autre capture est en cours, génération exécutée sans profilage")
+        return
+    with st.expander(f"🐞 Profil {capture.form_id}: {capture.duration * 1000:.1f} ms, pic mémoire {capture.peak_memory_kb:.0f} Ko"):
+        st.markdown("**Piles les plus coûteuses (temps propre)**")
+        st.dataframe(pd.DataFrame(
+            [{"Pile": " → ".join(stack.split(";")[-3:]), "µs": micros} for stack, micros in capture.top_stacks]
+        ), use_container_width=True)
+        st.markdown("**Principaux sites d'allocation**")
+        st.dataframe(pd.DataFrame(
+            [{"Fichier": f"{site['file']}:{site['line']}", "Ko": site['size_kb'], "Blocs": site['count']}
+             for site in capture.allocations]
+        ), use_container_width=True)
+        if capture.collapsed_path is not None:
+            st.download_button(
+                label="📥 Piles repliées (flamegraph)",
+                data=capture.collapsed_path.read_text(encoding='utf-8'),
+                file_name=capture.collapsed_path.name,
+                mime="text/plain"
+            )
+
+def start_batch_job(uploads):
+    """Associe les fichiers uploadés et lance leur conversion en arrière-plan"""
+    archives = [upload for upload in uploads if is_archive(upload.name)]
+    pairs, ignored = pair_uploads((upload.name, upload.getvalue()) for upload in uploads if not is_archive(upload.name))
+    if ignored:
+        st.warning(f"{len(ignored)} fichier(s) ignoré(s): "
+                   + ', '.join(f"{name} ({reason})" for name, reason in ignored))
+    try:
+        job = UploadBatchJob(pairs, archives=archives)
+    except zipfile.BadZipFile as e:
+        st.error(f"Archive ZIP invalide: {e}")
+        return
+    if not job.total:
+        st.error("Aucun fichier DFM ou Info dans la sélection")
+        return
+    st.session_state.batch_job = job.start()
+    st.session_state.batch_job_settled = False
+
+def render_batch_job():
+    """Avancement, tableau des résultats et archive du lot; relu périodiquement tant qu'il tourne"""
+    job = st.session_state.batch_job
+    done, total = job.progress()
+    st.markdown("### 📦 Lot en cours" if job.running else "### 📦 Lot terminé")
+    st.progress(done / total if total else 1.0, text=f"{done}/{total} formulaire(s) — {job.elapsed:.1f} s")
+    if job.failure:
+        st.error(f"Le lot s'est interrompu: {job.failure}")
+    
+    rows = job.rows()
+    if rows:
+        # Le tri se fait en cliquant sur l'en-tête d'une colonne
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    
+    if job.running:
+        if st.button("⏹️ Arrêter le lot"):
+            job.cancel()
+        return
+    if not st.session_state.get('batch_job_settled'):
+        # Dernier rafraîchissement: la page complète est relancée sans run_every
+        st.session_state.batch_job_settled = True
+        st.rerun()
+    st.download_button(
+        label=f"📥 Télécharger le lot ({len(rows)} formulaire(s), ZIP)",
+        data=job.archive(),
+        file_name="formulaires.zip",
+        mime="application/zip"
+    )
+
+def render_live_editor(form_generator, file_name: str, dfm_content: str, info_data: Dict[str, Any], form_id: str):
+    """Édition du DFM avec aperçu en direct: seul le bloc object ... end modifié est reparsé (dfm_incremental)"""
+    with st.expander("✏️ Édition du DFM avec aperçu en direct"):
+        live = st.session_state.get('live_dfm')
+        if live is None or st.session_state.get('live_dfm_source') != (file_name, dfm_content):
+            # Nouveau fichier uploadé: l'arbre est reconstruit une fois, puis mis à jour par bloc
+            live = LiveDfm(form_generator, dfm_content, info_data, form_id)
+            st.session_state.live_dfm = live
+            st.session_state.live_dfm_source = (file_name, dfm_content)
+        elif live.info_data != info_data or live.form_id != form_id:
+            live.set_info(info_data, form_id)
+        
+        edited = st.text_area("Contenu DFM", value=dfm_content, height=400, key=f"live_dfm_{file_name}")
+        started = datetime.now()
+        update = live.update(edited)
+        form_json = live.form_json()
+        elapsed = (datetime.now() - started).total_seconds() * 1000
+        if update.full:
+            st.caption(f"Reparse complet: {update.lines} lignes en {elapsed:.1f} ms")
+        elif update.components:
+            st.caption(f"Bloc {update.components[0]} reparsé ({update.lines} lignes, "
+                       f"{len(update.components)} composant(s)) en {elapsed:.1f} ms")
+        for error in form_generator.pop_errors():
+            st.error(error)
+        st.json(form_json, expanded=False)
+
+def process_uploaded_files(dfm_file, info_file, form_id: str, debug_profile: bool = False):
     """Traite les fichiers uploadés et génère le formulaire"""
     
     form_generator = st.session_state.form_generator
@@ -600,6 +327,8 @@ def process_uploaded_files(dfm_file, info_file, form_id: str):
     try:
         dfm_data = {}
         info_data = {}
+        dfm_content = None
+        info_content = None
         
         if dfm_file is not None:
             dfm_content = dfm_file.read().decode('utf-8')
@@ -611,16 +340,28 @@ def process_uploaded_files(dfm_file, info_file, form_id: str):
             info_data = form_generator.parse_info_content(info_content)
             st.success(f"✅ Fichier Info analysé: {len(info_data.get('fields', []))} champs, {len(info_data.get('validations', []))} validations")
         
+        for error in form_generator.pop_errors():
+            st.error(error)
+        
+        if dfm_content is not None:
+            render_live_editor(form_generator, dfm_file.name, dfm_content, info_data, form_id)
+        
         if dfm_data or info_data:
             if st.button("🚀 Générer configuration JSON", use_container_width=True):
                 with st.spinner("Génération en cours..."):
-                    form_json = form_generator.generate_form_json(dfm_data, info_data, form_id)
+                    if debug_profile:
+                        # Pipeline complet sous profilage, parsing compris
+                        with load_profiler().capture(form_id) as capture:
+                            form_json = form_generator.convert(dfm_content, info_content, form_id).form_json
+                        render_profile_capture(capture)
+                    else:
+                        form_json = form_generator.generate_form_json(dfm_data, info_data, form_id)
                     
                     st.success("✅ Configuration JSON générée avec succès !")
                     st.json(form_json)
                     
                     # Téléchargement
-                    json_str = json.dumps(form_json, indent=2, ensure_ascii=False)
+                    json_str = form_generator.serialize_form(form_json)
                     st.download_button(
                         label=f"📥 Télécharger {form_id.lower()}_form.json",
                         data=json_str,
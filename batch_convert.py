@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Conversion batch DFM/Info -> JSON pour FormBuilder Pro
+Associe les fichiers par nom (ACCADJ.dfm + ACCADJ.info), écrit un JSON par formulaire
+et peut produire un résumé JSON des métriques du pipeline. Par défaut chaque fichier est
+converti dans un processus de travail sous budget de temps et de mémoire; les fichiers hors
+budget sont mis en quarantaine sans bloquer le batch. Les archives ZIP de projets sont lues
+membre à membre, sans extraction (zip_ingest). Avec --store, chaque formulaire converti est
+aussi enregistré avec sa provenance dans une base SQLite indexée (form_store). Avec
+--reuse-store, un DFM quasi identique à une conversion déjà stockée est produit en patchant
+celle-ci (form_fingerprint), ce qui conserve ses corrections manuelles
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+from pathlib import Path, PurePath
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple
+
+from bounded_conversion import BoundedConverter, ConversionTask, DEFAULT_MEMORY_BUDGET_MB, DEFAULT_TIME_BUDGET
+from conversion_metrics import get_default_metrics
+from conversion_profiler import ConversionProfiler, DEFAULT_PROFILE_DIR
+from form_engine import FormGeneratorAI, StreamedConversion
+from form_fingerprint import DEFAULT_THRESHOLD, ConversionReuseStore
+from form_store import FormStore, source_metadata
+
+DFM_SUFFIXES = ('.dfm',)
+INFO_SUFFIXES = ('.info', '.txt')
+# Suffixes Info aussi portés par d'autres fichiers (README.txt, notes): dans un projet ou un dossier
+# uploadé, ils ne comptent que s'ils accompagnent un DFM de même nom sans .info dédié
+GENERIC_INFO_SUFFIXES = ('.txt',)
+
+
+def decode_source(data: bytes) -> str:
+    """Décode un fichier source; les DFM Delphi anciens sont souvent en Windows-1252"""
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+def read_text(path: Path) -> str:
+    return decode_source(path.read_bytes())
+
+
+def group_by_stem(sources: Iterable[Tuple[str, Any]]) -> Dict[str, Tuple[List[Any], List[Any]]]:
+    """
+    Regroupe des sources (nom de fichier, objet) en form_id -> ([DFM], [Info]), selon la règle
+    commune aux dossiers, archives et uploads: un .txt n'est l'Info d'un formulaire que si un DFM
+    porte son nom et qu'aucun .info ne le fait. Plusieurs éléments dans une liste signalent un nom
+    de base porté par plusieurs fichiers (répertoires différents)
+    """
+    groups: Dict[str, List[List[Any]]] = {}  # form_id -> [DFM, .info, .txt]
+    for name, source in sources:
+        path = PurePath(name)
+        suffix = path.suffix.lower()
+        if suffix in DFM_SUFFIXES:
+            slot = 0
+        elif suffix in GENERIC_INFO_SUFFIXES:
+            slot = 2
+        elif suffix in INFO_SUFFIXES:
+            slot = 1
+        else:
+            continue
+        groups.setdefault(path.stem.upper(), [[], [], []])[slot].append(source)
+
+    grouped = {}
+    for form_id, (dfms, infos, texts) in sorted(groups.items()):
+        if not infos and dfms:
+            infos = texts
+        if dfms or infos:  # Sinon README.txt, notes...
+            grouped[form_id] = (dfms, infos)
+    return grouped
+
+
+def duplicate_error(form_id: str, dfms: List[Any], infos: List[Any],
+                    name: Callable[[Any], str] = str) -> Optional[Dict[str, Any]]:
+    """Entrée de rapport (statut 'error') d'un nom de base porté par plusieurs DFM ou Info, sinon None"""
+    duplicates = [name(source) for group in (dfms, infos) if len(group) > 1 for source in group]
+    if not duplicates:
+        return None
+    return {'form_id': form_id, 'status': 'error',
+            'errors': ["Nom de formulaire porté par plusieurs fichiers: " + ', '.join(duplicates)]}
+
+
+def pair_input_files(paths: List[Path]) -> Tuple[Dict[str, Tuple[Optional[Path], Optional[Path]]],
+                                                  List[Dict[str, Any]]]:
+    """
+    Regroupe les fichiers DFM et Info par nom de base (insensible à la casse); renvoie les paires
+    et une entrée de rapport par formulaire écarté (nom porté par plusieurs fichiers)
+    """
+    candidates: Dict[Path, Path] = {}  # Un fichier nommé et aussi trouvé dans un répertoire compte une fois
+    for path in paths:
+        for candidate in (sorted(path.rglob('*')) if path.is_dir() else [path]):
+            if candidate.is_file():
+                candidates.setdefault(candidate.resolve(), candidate)
+
+    pairs = {}
+    rejected = []
+    for form_id, (dfms, infos) in group_by_stem((path.name, path) for path in candidates.values()).items():
+        error = duplicate_error(form_id, dfms, infos)
+        if error is not None:
+            rejected.append(error)
+            continue
+        pairs[form_id] = (dfms[0] if dfms else None, infos[0] if infos else None)
+    return pairs, rejected
+
+
+def _convert_one(generator: FormGeneratorAI, form_id: str, dfm_content: Optional[str],
+                 info_content: Optional[str], output_path: Optional[Path]) -> StreamedConversion:
+    """Conversion d'un formulaire, écrite en flux dans output_path s'il est fourni"""
+    if output_path is None:
+        with open(os.devnull, 'wb') as sink:
+            return generator.convert_to_stream(dfm_content, info_content, form_id, sink)
+    with output_path.open('wb') as stream:
+        return generator.convert_to_stream(dfm_content, info_content, form_id, stream)
+
+
+def _convert_kept(generator: FormGeneratorAI, form_id: str, dfm_content: Optional[str],
+                  info_content: Optional[str], output_path: Optional[Path]) -> Tuple[StreamedConversion, bytes]:
+    """Comme _convert_one, le JSON étant aussi renvoyé pour la base (--store)"""
+    if output_path is None:
+        buffer = io.BytesIO()
+        return generator.convert_to_stream(dfm_content, info_content, form_id, buffer), buffer.getvalue()
+    result = _convert_one(generator, form_id, dfm_content, info_content, output_path)
+    return result, output_path.read_bytes()
+
+
+def store_form(store: FormStore, json_data: Any, metadata: Dict[str, Any], status: str):
+    """Enregistre un JSON produit (texte ou octets) dans la base form_store, avec sa provenance"""
+    store.add(json.loads(json_data), metadata, status)
+
+
+def convert_pairs(pairs: Dict[str, Tuple[Optional[Path], Optional[Path]]], output_dir: Optional[Path],
+                  generator: FormGeneratorAI, profiler: Optional[ConversionProfiler] = None,
+                  profile_all: bool = False, store: Optional[FormStore] = None) -> List[Dict[str, object]]:
+    """Convertit chaque paire et renvoie un rapport par formulaire (enregistré dans store s'il est fourni)"""
+    report = []
+    for form_id, (dfm_path, info_path) in pairs.items():
+        entry = {'form_id': form_id, 'dfm': str(dfm_path) if dfm_path else None,
+                 'info': str(info_path) if info_path else None}
+        try:
+            dfm_content = read_text(dfm_path) if dfm_path else None
+            info_content = read_text(info_path) if info_path else None
+            output_path = output_dir / f'{form_id.lower()}_form.json' if output_dir is not None else None
+            convert = _convert_kept if store is not None else _convert_one
+            if profiler is not None:
+                with profiler.maybe_capture(form_id, forced=profile_all) as capture:
+                    result = convert(generator, form_id, dfm_content, info_content, output_path)
+                if capture is not None:
+                    entry['profile'] = capture.to_dict()
+            else:
+                result = convert(generator, form_id, dfm_content, info_content, output_path)
+            if store is not None:
+                result, json_data = result
+                store_form(store, json_data, source_metadata(dfm_content, info_content, entry['dfm'], entry['info']),
+                           'success' if result.success else 'partial')
+        except Exception as e:
+            logging.exception("Échec de la conversion de %s", form_id)
+            entry.update(status='error', errors=[str(e)])
+            report.append(entry)
+            continue
+
+        if output_path is not None:
+            entry['output'] = str(output_path)
+        entry.update(status='success' if result.success else 'partial', errors=result.errors,
+                     fields=result.fields, validations=result.validations)
+        report.append(entry)
+    return report
+
+
+def convert_pairs_reused(pairs: Dict[str, Tuple[Optional[Path], Optional[Path]]], output_dir: Optional[Path],
+                         reuse: ConversionReuseStore, store: Optional[FormStore] = None) -> List[Dict[str, object]]:
+    """
+    Comme convert_pairs, en passant par reuse: un formulaire proche d'une conversion stockée est
+    produit en patchant celle-ci ('reused_from' dans le rapport), chaque résultat y est mémorisé
+    """
+    generator = reuse.generator
+    report = []
+    for form_id, (dfm_path, info_path) in pairs.items():
+        entry = {'form_id': form_id, 'dfm': str(dfm_path) if dfm_path else None,
+                 'info': str(info_path) if info_path else None}
+        try:
+            dfm_content = read_text(dfm_path) if dfm_path else None
+            info_content = read_text(info_path) if info_path else None
+            generator.pop_errors()
+            result = reuse.convert(dfm_content, info_content, form_id)
+            errors = generator.pop_errors()
+            json_text = generator.serialize_form(result.form_json)
+            if output_dir is not None:
+                output_path = output_dir / f'{form_id.lower()}_form.json'
+                output_path.write_text(json_text, encoding='utf-8')
+                entry['output'] = str(output_path)
+            if store is not None:
+                store_form(store, json_text, source_metadata(dfm_content, info_content, entry['dfm'], entry['info']),
+                           'success' if not errors else 'partial')
+        except Exception as e:
+            logging.exception("Échec de la conversion de %s", form_id)
+            entry.update(status='error', errors=[str(e)])
+            report.append(entry)
+            continue
+
+        if result.reused:
+            entry.update(reused_from=result.source, similarity=round(result.similarity, 4))
+        entry.update(status='success' if not errors else 'partial', errors=errors,
+                     fields=len(result.form_json.get('Fields') or ()),
+                     validations=len(result.form_json.get('Validations') or ()))
+        report.append(entry)
+    return report
+
+
+def _read_tasks(pairs: Dict[str, Tuple[Optional[Path], Optional[Path]]], unreadable: List[Dict[str, object]]):
+    """Tâches du pool borné; les fichiers illisibles sont signalés sans être soumis"""
+    for form_id, (dfm_path, info_path) in pairs.items():
+        try:
+            yield form_id, read_text(dfm_path) if dfm_path else None, read_text(info_path) if info_path else None
+        except OSError as e:
+            unreadable.append({'form_id': form_id, 'status': 'error', 'errors': [str(e)]})
+
+
+def _with_metadata(tasks: Iterable[ConversionTask], sources: Dict[str, Tuple[Optional[str], Optional[str]]],
+                   metadata: Dict[str, Dict[str, Any]]) -> Iterable[ConversionTask]:
+    """Provenance calculée à la distribution de chaque tâche, tant que son résultat est attendu"""
+    for form_id, dfm_content, info_content in tasks:
+        metadata[form_id] = source_metadata(dfm_content, info_content, *sources[form_id])
+        yield form_id, dfm_content, info_content
+
+
+def collect_bounded(tasks: Iterable[ConversionTask], sources: Dict[str, Tuple[Optional[str], Optional[str]]],
+                    converter: BoundedConverter, report: List[Dict[str, object]],
+                    store: Optional[FormStore] = None) -> List[Dict[str, object]]:
+    """
+    Exécute les tâches dans le pool borné et ajoute une entrée par formulaire (sources: DFM, Info);
+    les formulaires convertis sont enregistrés dans store s'il est fourni
+    """
+    metadata: Dict[str, Dict[str, Any]] = {}
+    if store is not None:
+        tasks = _with_metadata(tasks, sources, metadata)
+    for result in converter.run(tasks):
+        dfm_source, info_source = sources[result.form_id]
+        form_metadata = metadata.pop(result.form_id, None)
+        entry = {'form_id': result.form_id, 'dfm': dfm_source, 'info': info_source, 'status': result.status,
+                 'errors': result.errors, 'elapsed': round(result.elapsed, 4)}
+        if result.status in ('success', 'partial'):
+            if result.output is not None:
+                entry['output'] = result.output
+            entry.update(components=result.components, fields=result.fields, validations=result.validations)
+            if store is not None:
+                json_data = result.json_text if result.json_text is not None else Path(result.output).read_bytes()
+                store_form(store, json_data, form_metadata, result.status)
+        report.append(entry)
+    return report
+
+
+def convert_pairs_bounded(pairs: Dict[str, Tuple[Optional[Path], Optional[Path]]],
+                          converter: BoundedConverter, store: Optional[FormStore] = None) -> List[Dict[str, object]]:
+    """
+    Comme convert_pairs, dans des processus de travail sous budget (rapport trié par formulaire);
+    les JSON sont écrits par les processus dans converter.output_dir
+    """
+    sources = {form_id: (str(dfm_path) if dfm_path else None, str(info_path) if info_path else None)
+               for form_id, (dfm_path, info_path) in pairs.items()}
+    report: List[Dict[str, object]] = []
+    collect_bounded(_read_tasks(pairs, report), sources, converter, report, store)
+    return sorted(report, key=lambda entry: entry['form_id'])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Conversion batch de fichiers DFM/Info en formulaires JSON")
+    parser.add_argument('inputs', nargs='+', type=Path, help="Fichiers ou répertoires DFM/Info, archives ZIP")
+    parser.add_argument('-o', '--output-dir', type=Path, help="Répertoire des JSON générés")
+    parser.add_argument('--metrics-json', type=Path, help="Écrit le résumé des métriques ('-' pour la sortie standard)")
+    parser.add_argument('--report-json', type=Path, help="Écrit le rapport par formulaire")
+    parser.add_argument('--profile', action='store_true', help="Profile chaque conversion (cProfile + tracemalloc)")
+    parser.add_argument('--profile-sample', type=float, default=0.0, metavar='RATE',
+                        help="Profile une fraction des conversions (0 à 1)")
+    parser.add_argument('--profile-dir', type=Path, default=DEFAULT_PROFILE_DIR, help="Répertoire des profils")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de travail")
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET, metavar='SECONDS',
+                        help="Durée maximale de conversion d'un fichier")
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET_MB, metavar='MB',
+                        help="Mémoire maximale de conversion d'un fichier")
+    parser.add_argument('--quarantine-json', type=Path, help="Écrit le rapport des fichiers mis en quarantaine")
+    parser.add_argument('--in-process', action='store_true',
+                        help="Convertit dans le processus courant, sans budget (implicite avec le profilage)")
+    parser.add_argument('--store', type=Path, help="Enregistre les formulaires dans cette base SQLite (form_store)")
+    parser.add_argument('--reuse-store', type=Path, metavar='DIR',
+                        help="Réutilise et mémorise les conversions de ce répertoire (form_fingerprint, "
+                             "dans le processus courant)")
+    parser.add_argument('--reuse-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Similarité minimale d'un quasi-doublon réutilisé")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    # Import local: zip_ingest s'appuie sur les suffixes et le décodage de ce module
+    from zip_ingest import ZIP_SUFFIXES, convert_archive, convert_archive_bounded
+
+    archives = [path for path in args.inputs if path.is_file() and path.suffix.lower() in ZIP_SUFFIXES]
+    pairs, rejected = pair_input_files([path for path in args.inputs if path not in archives])
+    if not pairs and not rejected and not archives:
+        print("❌ Aucun fichier DFM/Info trouvé", file=sys.stderr)
+        return 1
+    if args.output_dir is not None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    metrics = get_default_metrics()
+    profiler = None
+    if args.profile or args.profile_sample > 0:
+        profiler = ConversionProfiler(args.profile_dir, sample_rate=args.profile_sample)
+    quarantine = []
+    store = FormStore(args.store) if args.store is not None else None
+    try:
+        if args.reuse_store is not None:
+            # Index des conversions partagé et mis à jour formulaire par formulaire: pas de pool
+            reuse = ConversionReuseStore(args.reuse_store, FormGeneratorAI(metrics), args.reuse_threshold)
+            report = convert_pairs_reused(pairs, args.output_dir, reuse, store)
+            for archive in archives:
+                report.extend(convert_archive(archive, args.output_dir, reuse.generator, store=store))
+            reuse.save()
+        elif args.in_process or profiler is not None:
+            generator = FormGeneratorAI(metrics)
+            report = convert_pairs(pairs, args.output_dir, generator, profiler, profile_all=args.profile, store=store)
+            for archive in archives:
+                report.extend(convert_archive(archive, args.output_dir, generator, store=store))
+        else:
+            with BoundedConverter(args.workers, args.time_budget, args.memory_budget, metrics,
+                                  output_dir=args.output_dir) as converter:
+                report = convert_pairs_bounded(pairs, converter, store)
+                for archive in archives:
+                    report.extend(convert_archive_bounded(archive, converter, store=store))
+                quarantine = [entry.to_dict() for entry in converter.quarantine]
+        if store is not None:
+            store.flush()
+    finally:
+        if store is not None:
+            store.close()
+
+    report = rejected + report
+    failed = sum(1 for entry in report if entry['status'] in ('error', 'quarantined'))
+    print(f"✅ {len(report) - failed}/{len(report)} formulaire(s) converti(s)", file=sys.stderr)
+    reused = sum(1 for entry in report if 'reused_from' in entry)
+    if reused:
+        print(f"♻️  {reused} formulaire(s) produit(s) par réutilisation d'une conversion stockée", file=sys.stderr)
+    if quarantine:
+        print(f"⚠️  {len(quarantine)} formulaire(s) en quarantaine: "
+              f"{', '.join(entry['form_id'] + ' (' + entry['reason'] + ')' for entry in quarantine)}", file=sys.stderr)
+    if args.quarantine_json is not None:
+        args.quarantine_json.write_text(json.dumps(quarantine, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if args.report_json is not None:
+        args.report_json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    if args.metrics_json is not None:
+        summary = json.dumps(metrics.summary(), indent=2, ensure_ascii=False)
+        if str(args.metrics_json) == '-':
+            print(summary)
+        else:
+            args.metrics_json.write_text(summary, encoding='utf-8')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Benchmarks et corpus synthétiques du moteur de conversion FormBuilder Pro"""
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Générateur de corpus DFM/Info synthétiques pour les benchmarks FormBuilder Pro
+Corpus reproductible (graine) faisant varier le nombre de composants, la profondeur
+d'imbrication, la densité de propriétés, l'encodage des chaînes Delphi et la part de lookups
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Iterator, Optional, Tuple
+
+# (entité, clé, endpoint, colonne description, préfixes de contrôles usuels)
+LOOKUP_ENTITIES = [
+    ('Fndmas', 'fund', 'AllFunds', 'acnam1', ('Fnd', 'Fund')),
+    ('Secrty', 'tkr', 'AllTickers', 'tkr_DESC', ('Tkr', 'Ticker', 'Sec')),
+    ('Ae', 'broker', 'AllBrokers', 'name', ('Brk', 'Broker')),
+    ('Reason', 'reason', 'AllReasons', 'descr', ('Rsn', 'Reason')),
+    ('Exchng', 'exch', 'AllExchanges', 'exchange', ('Exch', 'Exchange')),
+    ('Seccat', 'seccat', 'AllSecCat', 'descr', ('SecCat', 'Cat')),
+    ('Secgrp', 'secgrp', 'AllSecGrp', 'desc1', ('SecGrp', 'Grp')),
+    ('Psrc', 'pSource', 'AllSources', 'descr', ('Src', 'Source')),
+    ('Custod', 'entity', 'AllSubunits', 'name', ('Sub', 'Subunit')),
+]
+
+# Type de saisie -> suffixe usuel du nom de contrôle
+INPUT_TYPES = {'TDBEdit': 'Edt', 'TDBComboBox': 'Cbo', 'TDBDateTimePicker': 'Dtp', 'TDBCheckBox': 'Chk',
+               'TDBRadioGroup': 'Rgp', 'TDBMemo': 'Mem', 'TDBSpinEdit': 'Spn'}
+LOOKUP_TYPES = ['TDBLookupComboBox', 'TDBGrid']
+CONTAINER_TYPES = ['TPanel', 'TGroupBox']
+FIELD_WORDS = ['Trade', 'Settle', 'Amount', 'Quantity', 'Price', 'Rate', 'Date', 'Cost', 'Yield',
+               'Accrual', 'Factor', 'Comment', 'Status', 'Type', 'Currency', 'Option', 'Days']
+ACCENTED_WORDS = ['Échéance', 'Clôture', 'Intérêts', 'Période', 'Dénomination', 'Coût']
+OPERATORS = ['required', 'not_null', 'equal', 'not_equal', 'greater_than', 'less_than', 'greater_equal']
+
+
+@dataclass
+class CorpusSpec:
+    """Paramètres du corpus; chaque formulaire tire ses valeurs dans ces bornes"""
+    forms: int = 100
+    min_components: int = 5
+    max_components: int = 120
+    max_depth: int = 4
+    property_density: float = 0.6      # Part des propriétés optionnelles présentes
+    encoded_string_ratio: float = 0.2  # Chaînes écrites avec les codes #nnn des caractères non ASCII
+    lookup_ratio: float = 0.25         # Part des composants de saisie qui sont des lookups
+    entity_ratio: float = 0.5          # Part des lookups déclarés dans la section [entities] du fichier Info
+    validations_per_form: int = 6
+    seed: int = 42
+
+
+def delphi_string(text: str, rng: random.Random, encoded_ratio: float) -> str:
+    """Littéral Delphi: '...' simple, ou mélange '#nnn' pour les caractères non ASCII et '' pour les apostrophes"""
+    if rng.random() >= encoded_ratio:
+        return "'" + text.replace("'", "''") + "'"
+    parts, literal = [], ''
+    for char in text:
+        if ord(char) > 127:
+            if literal:
+                parts.append("'" + literal + "'")
+                literal = ''
+            parts.append(f'#{ord(char)}')
+        else:
+            literal += "''" if char == "'" else char
+    if literal:
+        parts.append("'" + literal + "'")
+    return ''.join(parts)
+
+
+def _caption(rng: random.Random) -> str:
+    words = rng.sample(FIELD_WORDS, rng.randint(1, 3))
+    if rng.random() < 0.3:
+        words.append(rng.choice(ACCENTED_WORDS))
+    if rng.random() < 0.05:
+        words.append("d'origine")
+    return ' '.join(words)
+
+
+class _FormBuilder:
+    """Construit un formulaire DFM et son fichier Info"""
+
+    def __init__(self, spec: CorpusSpec, rng: random.Random, form_id: str):
+        self.spec = spec
+        self.rng = rng
+        self.form_id = form_id
+        self.lines: List[str] = []
+        self.used_names: Dict[str, int] = {}
+        self.fields: List[Tuple[str, str, bool, Optional[str]]] = []
+        self.lookup_entities: Dict[str, Tuple[str, str, str, str]] = {}
+        self.remaining = rng.randint(spec.min_components, spec.max_components)
+
+    def _name(self, base: str) -> str:
+        count = self.used_names.get(base, 0) + 1
+        self.used_names[base] = count
+        return f'{base}{count}'
+
+    def _properties(self, indent: str, top: int, caption: Optional[str], extra: List[str]):
+        rng, density = self.rng, self.spec.property_density
+        self.lines.append(f'{indent}Left = {rng.randint(4, 600)}')
+        self.lines.append(f'{indent}Top = {top}')
+        if rng.random() < density:
+            self.lines.append(f'{indent}Width = {rng.choice([65, 120, 145, 200, 320])}')
+            self.lines.append(f'{indent}Height = {rng.choice([21, 24, 25, 150])}')
+        if caption is not None:
+            self.lines.append(f'{indent}Caption = {delphi_string(caption, rng, self.spec.encoded_string_ratio)}')
+        if rng.random() < density:
+            self.lines.append(f'{indent}TabOrder = {rng.randint(0, 60)}')
+        if rng.random() < density * 0.3:
+            self.lines.append(f"{indent}Hint = {delphi_string(_caption(rng), rng, self.spec.encoded_string_ratio)}")
+        if rng.random() < density * 0.15:
+            self.lines.append(f'{indent}Enabled = False')
+        if rng.random() < density * 0.1:
+            self.lines.append(f'{indent}Visible = False')
+        if rng.random() < density * 0.5:
+            self.lines.append(f"{indent}Font.Name = 'Tahoma'")
+            self.lines.append(f'{indent}Font.Style = [fsBold]')
+        self.lines.extend(indent + line for line in extra)
+
+    def _input_component(self, indent: str, top: int):
+        rng, spec = self.rng, self.spec
+        extra: List[str] = []
+        if rng.random() < spec.lookup_ratio:
+            entity = rng.choice(LOOKUP_ENTITIES)
+            comp_type = rng.choice(LOOKUP_TYPES)
+            name = self._name(rng.choice(entity[4]) + ('Lkup' if comp_type == 'TDBLookupComboBox' else 'Grid'))
+            if comp_type == 'TDBGrid':
+                # Collection de colonnes: les 'end' d'items sont imbriqués dans l'objet
+                extra.append('Columns = <')
+                for column in (entity[1], entity[3]):
+                    extra.extend(['  item', f"    FieldName = '{column}'", f"    Title.Caption = '{column.upper()}'", '  end'])
+                extra[-1] += '>'
+            else:
+                extra.append(f"KeyField = '{entity[1]}'")
+                extra.append(f"ListField = '{entity[3]}'")
+            if rng.random() < spec.entity_ratio:
+                self.lookup_entities[name] = entity[:4]
+            self.fields.append((name, 'LOOKUP', rng.random() < 0.5, entity[0] if name in self.lookup_entities else None))
+        else:
+            comp_type = rng.choice(list(INPUT_TYPES))
+            name = self._name(rng.choice(FIELD_WORDS) + INPUT_TYPES[comp_type])
+            if comp_type == 'TDBComboBox' or comp_type == 'TDBRadioGroup':
+                extra.append('Items.Strings = (')
+                extra.extend(f"  {delphi_string(_caption(rng), rng, spec.encoded_string_ratio)}"
+                             for _ in range(rng.randint(2, 6)))
+                extra[-1] += ')'
+            if rng.random() < spec.property_density * 0.4:
+                extra.append(f'Required = {rng.choice(["True", "False"])}')
+            if rng.random() < spec.property_density * 0.3:
+                extra.append(f'OnChange = {name}Change')
+            self.fields.append((name, comp_type[3:].upper(), rng.random() < 0.3, None))
+
+        self.lines.append(f'{indent}object {name}: {comp_type}')
+        self._properties(indent + '  ', top, _caption(rng), extra)
+        self.lines.append(f'{indent}end')
+        self.remaining -= 1
+
+    def _label(self, indent: str, top: int):
+        self.lines.append(f'{indent}object {self._name("Label")}: TLabel')
+        self._properties(indent + '  ', top, _caption(self.rng), [])
+        self.lines.append(f'{indent}end')
+        self.remaining -= 1
+
+    def _container(self, indent: str, depth: int):
+        rng = self.rng
+        comp_type = rng.choice(CONTAINER_TYPES)
+        self.lines.append(f'{indent}object {self._name(comp_type[1:])}: {comp_type}')
+        self._properties(indent + '  ', rng.randint(0, 400), _caption(rng) if comp_type == 'TGroupBox' else None, [])
+        self.remaining -= 1
+        self._children(indent + '  ', depth + 1, rng.randint(2, 12))
+        self.lines.append(f'{indent}end')
+
+    def _children(self, indent: str, depth: int, count: int):
+        top = 8
+        for _ in range(count):
+            if self.remaining <= 0:
+                return
+            roll = self.rng.random()
+            if depth < self.spec.max_depth and roll < 0.12:
+                self._container(indent, depth)
+            elif roll < 0.3:
+                self._label(indent, top)
+            else:
+                self._input_component(indent, top)
+            top += 28
+
+    def dfm(self) -> str:
+        rng = self.rng
+        self.lines = [f'object Frm{self.form_id}: TFrm{self.form_id}']
+        self._properties('  ', 0, f'{self.form_id} {_caption(rng)}', [
+            'ClientHeight = 480', 'ClientWidth = 640', 'Color = clBtnFace', 'OldCreateOrder = False',
+        ])
+        while self.remaining > 0:
+            self._children('  ', 1, self.remaining)
+        self.lines.append('end')
+        return '\n'.join(self.lines) + '\n'
+
+    def info(self) -> str:
+        rng = self.rng
+        lines = [f'# Informations {self.form_id}', '[fields]']
+        for name, field_type, required, entity in self.fields:
+            lines.append(f"{name}|{field_type}|{'true' if required else 'false'}|{entity or ''}|{_caption(rng)}")
+        lines.append('')
+        lines.append('[validations]')
+        for _ in range(min(self.spec.validations_per_form, len(self.fields))):
+            name = rng.choice(self.fields)[0]
+            operator = rng.choice(OPERATORS)
+            value = rng.choice(['NULL', '0', '100', 'TRUE', 'SYSDATE', 'ABC'])
+            lines.append(f'{name}|{operator}|{value}|{name} {operator.replace("_", " ")}|{rng.choice(["ERROR", "WARNING"])}')
+        lines.append('')
+        lines.append('[entities]')
+        for entity, key, endpoint, description in sorted(set(self.lookup_entities.values())):
+            lines.append(f'{entity}|{key}|{endpoint}|{key},{description}')
+        return '\n'.join(lines) + '\n'
+
+
+def generate_corpus(spec: CorpusSpec) -> Iterator[Tuple[str, str, str]]:
+    """Produit (form_id, contenu DFM, contenu Info) pour chaque formulaire, de façon déterministe"""
+    for index in range(spec.forms):
+        rng = random.Random(f'{spec.seed}:{index}')
+        form_id = f'SYN{index:04d}'
+        builder = _FormBuilder(spec, rng, form_id)
+        dfm = builder.dfm()
+        yield form_id, dfm, builder.info()
+
+
+def write_corpus(spec: CorpusSpec, output_dir: Path, encoding: str = 'utf-8') -> List[Tuple[Path, Path]]:
+    """Écrit le corpus sur disque (FORM.dfm + FORM.info)"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for form_id, dfm, info in generate_corpus(spec):
+        dfm_path, info_path = output_dir / f'{form_id}.dfm', output_dir / f'{form_id}.info'
+        dfm_path.write_text(dfm, encoding=encoding)
+        info_path.write_text(info, encoding=encoding)
+        written.append((dfm_path, info_path))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère un corpus DFM/Info synthétique")
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--forms', type=int, default=CorpusSpec.forms)
+    parser.add_argument('--seed', type=int, default=CorpusSpec.seed)
+    parser.add_argument('--max-components', type=int, default=CorpusSpec.max_components)
+    parser.add_argument('--max-depth', type=int, default=CorpusSpec.max_depth)
+    parser.add_argument('--lookup-ratio', type=float, default=CorpusSpec.lookup_ratio)
+    parser.add_argument('--encoding', default='utf-8', help="cp1252 pour reproduire les DFM Delphi anciens")
+    args = parser.parse_args()
+
+    spec = CorpusSpec(forms=args.forms, seed=args.seed, max_components=args.max_components,
+                      max_depth=args.max_depth, lookup_ratio=args.lookup_ratio)
+    written = write_corpus(spec, args.output_dir, args.encoding)
+    print(f"✅ {len(written)} formulaire(s) écrit(s) dans {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Benchmarks du moteur de conversion FormBuilder Pro
+Mesure débit et pic mémoire de chaque étape (parse DFM, parse Info, génération,
+sérialisation, génération écrite en flux) et du batch de bout en bout sur 1 et N processus, puis compare aux
+références de benchmarks/baselines.json: une régression au-delà de la tolérance fait échouer
+
+    python -m benchmarks.run_benchmarks                  # compare aux références
+    python -m benchmarks.run_benchmarks --update-baselines
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+
+from benchmarks.corpus_generator import CorpusSpec, generate_corpus, write_corpus
+from conversion_metrics import ConversionMetrics
+from form_engine import FormGeneratorAI
+from form_writer import JsonStreamWriter
+
+BASELINES_PATH = Path(__file__).resolve().parent / 'baselines.json'
+# Tolérances par défaut: le débit dépend de la machine et du bruit, la mémoire beaucoup moins
+THROUGHPUT_TOLERANCE = 0.30
+MEMORY_TOLERANCE = 0.20
+MIN_SAMPLE_SECONDS = 0.2
+
+
+def _best_time(function: Callable[[], Any], repeat: int) -> float:
+    """Meilleur temps d'un appel; les étapes très courtes sont répétées pour durer MIN_SAMPLE_SECONDS"""
+    start = time.perf_counter()
+    function()
+    loops = max(1, int(MIN_SAMPLE_SECONDS / max(time.perf_counter() - start, 1e-9)))
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def _peak_per_item(function: Callable[[Any], Any], items: Sequence[Any]) -> float:
+    """Pic mémoire maximal (Ko) d'un appel, tracemalloc actif uniquement pendant cette mesure"""
+    tracemalloc.start()
+    peak = 0
+    try:
+        for item in items:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            result = function(item)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+            del result
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+class _NullSink:
+    """Flux binaire qui ignore les données (mesure de l'écriture en flux sans disque)"""
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+def bench_stages(corpus: List[Tuple[str, str, str]], repeat: int) -> Dict[str, float]:
+    """Débit (formulaires/s et Mo/s d'entrée) et pic mémoire par étape"""
+    generator = FormGeneratorAI(ConversionMetrics())
+    dfm_chars = sum(len(dfm) for _, dfm, _ in corpus)
+    info_chars = sum(len(info) for _, _, info in corpus)
+
+    parsed = [(form_id, generator.parse_dfm_content(dfm), generator.parse_info_content(info))
+              for form_id, dfm, info in corpus]
+    forms = [generator.generate_form_json(dfm_data, info_data, form_id) for form_id, dfm_data, info_data in parsed]
+
+    stages = {
+        'parse_dfm': (lambda item: generator.parse_dfm_content(item[1]), corpus, dfm_chars),
+        'parse_info': (lambda item: generator.parse_info_content(item[2]), corpus, info_chars),
+        'generate': (lambda item: generator.generate_form_json(item[1], item[2], item[0]), parsed, None),
+        'serialize': (lambda form: generator.serialize_form(form), forms, None),
+        # Génération + sérialisation champ par champ: le pic reste celui d'un champ
+        'stream': (lambda item: generator.write_form(item[1], item[2], item[0], JsonStreamWriter(_NullSink())),
+                   parsed, None),
+    }
+
+    results = {}
+    for stage, (function, items, chars) in stages.items():
+        elapsed = _best_time(lambda: [function(item) for item in items], repeat)
+        results[f'stage.{stage}.forms_per_s'] = round(len(items) / elapsed, 1)
+        if chars:
+            results[f'stage.{stage}.mb_per_s'] = round(chars / elapsed / 1e6, 2)
+        results[f'stage.{stage}.peak_kb'] = _peak_per_item(function, items)
+    return results
+
+
+def _retained_kb(build: Callable[[], Any]) -> Tuple[Any, float]:
+    """Mémoire (Ko) encore allouée par le résultat de build() une fois construit"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return result, round(retained / 1024, 1)
+
+
+def bench_model_memory(corpus: List[Tuple[str, str, str]]) -> Dict[str, float]:
+    """Mémoire retenue par le corpus analysé et généré: modèle compact contre forme dict publique"""
+    generator = FormGeneratorAI(ConversionMetrics())
+
+    def build_compact():
+        parsed = [(form_id, generator.parse_dfm_content(dfm), generator.parse_info_content(info))
+                  for form_id, dfm, info in corpus]
+        return [(dfm_data, generator.build_form(dfm_data, info_data, form_id)) for form_id, dfm_data, info_data in parsed]
+
+    def build_dicts():
+        # Même contenu dans la forme dict publique (ancienne représentation interne)
+        return [(dfm_data.to_dict(), form.to_dict()) for dfm_data, form in build_compact()]
+
+    compact, compact_kb = _retained_kb(build_compact)
+    del compact
+    _, dict_kb = _retained_kb(build_dicts)
+    return {
+        'model.compact_kb': compact_kb,
+        'model.dict_kb': dict_kb,
+        'model.reduction_pct': round((1 - compact_kb / dict_kb) * 100, 1) if dict_kb else 0.0,
+    }
+
+
+def _convert_chunk(pairs: List[Tuple[str, str, str]]) -> Tuple[int, int]:
+    """Travailleur batch: convertit des fichiers et renvoie (nombre, RSS max en Ko)"""
+    generator = FormGeneratorAI(ConversionMetrics())
+    for form_id, dfm_path, info_path in pairs:
+        dfm = Path(dfm_path).read_text(encoding='utf-8')
+        info = Path(info_path).read_text(encoding='utf-8')
+        generator.convert(dfm, info, form_id)
+    return len(pairs), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_batch(spec: CorpusSpec, processes: Sequence[int], repeat: int) -> Dict[str, Any]:
+    """Batch de bout en bout depuis le disque (lecture, conversion, sérialisation), par nombre de processus"""
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix='formbuilder-bench-') as directory:
+        written = write_corpus(spec, Path(directory))
+        pairs = [(dfm.stem, str(dfm), str(info)) for dfm, info in written]
+        for count in processes:
+            chunks = [pairs[index::count] for index in range(count)]
+            best, rss = float('inf'), 0
+            for _ in range(repeat):
+                # Démarrage du pool inclus: c'est le coût réel d'un lancement batch
+                start = time.perf_counter()
+                with ProcessPoolExecutor(max_workers=count) as pool:
+                    outcomes = list(pool.map(_convert_chunk, chunks))
+                best = min(best, time.perf_counter() - start)
+                rss = max(rss, max(outcome[1] for outcome in outcomes))
+            label = '1p' if count == 1 else 'np'
+            results[f'batch.{label}.forms_per_s'] = round(len(pairs) / best, 1)
+            results[f'batch.{label}.worker_rss_kb'] = rss
+            if count != 1:
+                results['batch.np.processes'] = count
+    return results
+
+
+def compare(results: Dict[str, Any], baselines: Dict[str, Any]) -> List[str]:
+    """Liste des régressions: débit en baisse ou mémoire en hausse au-delà des tolérances"""
+    tolerances = baselines.get('tolerances', {})
+    throughput_tolerance = tolerances.get('throughput', THROUGHPUT_TOLERANCE)
+    memory_tolerance = tolerances.get('memory', MEMORY_TOLERANCE)
+    regressions = []
+    for metric, reference in sorted(baselines.get('results', {}).items()):
+        current = results.get(metric)
+        if current is None or not isinstance(reference, (int, float)) or not reference:
+            continue
+        if metric.endswith('_per_s') and current < reference * (1 - throughput_tolerance):
+            regressions.append(f"{metric}: {current} < {reference} (-{(1 - current / reference) * 100:.0f} %)")
+        elif metric.endswith('_kb') and metric != 'model.dict_kb' and current > reference * (1 + memory_tolerance):
+            regressions.append(f"{metric}: {current} > {reference} (+{(current / reference - 1) * 100:.0f} %)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks du moteur de conversion DFM/Info -> JSON")
+    parser.add_argument('--forms', type=int, default=CorpusSpec.forms)
+    parser.add_argument('--seed', type=int, default=CorpusSpec.seed)
+    parser.add_argument('--repeat', type=int, default=5, help="Meilleur temps sur N passes")
+    parser.add_argument('--processes', type=int, default=min(os.cpu_count() or 1, 8),
+                        help="Nombre de processus du batch parallèle (comparé à 1 processus)")
+    parser.add_argument('--skip-batch', action='store_true')
+    parser.add_argument('--baselines', type=Path, default=BASELINES_PATH)
+    parser.add_argument('--update-baselines', action='store_true', help="Enregistre ces résultats comme références")
+    parser.add_argument('--output', type=Path, help="Écrit les résultats en JSON")
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(forms=args.forms, seed=args.seed)
+    corpus = list(generate_corpus(spec))
+    FormGeneratorAI(ConversionMetrics()).convert(corpus[0][1], corpus[0][2], corpus[0][0])  # Caches et catalogue chargés
+
+    results = bench_stages(corpus, args.repeat)
+    results.update(bench_model_memory(corpus))
+    if not args.skip_batch:
+        results.update(bench_batch(spec, sorted({1, max(1, args.processes)}), args.repeat))
+
+    width = max(len(metric) for metric in results)
+    for metric, value in sorted(results.items()):
+        print(f"{metric:<{width}}  {value}")
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+    if args.update_baselines:
+        previous = json.loads(args.baselines.read_text(encoding='utf-8')) if args.baselines.exists() else {}
+        baselines = {
+            'corpus': {'forms': spec.forms, 'seed': spec.seed},
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+            'tolerances': previous.get('tolerances', {'throughput': THROUGHPUT_TOLERANCE, 'memory': MEMORY_TOLERANCE}),
+            'results': results,
+        }
+        args.baselines.write_text(json.dumps(baselines, indent=2) + '\n', encoding='utf-8')
+        print(f"✅ Références mises à jour: {args.baselines}")
+        return 0
+
+    if not args.baselines.exists():
+        print(f"⚠️  Pas de références ({args.baselines}), lancez avec --update-baselines")
+        return 0
+    baselines = json.loads(args.baselines.read_text(encoding='utf-8'))
+    if baselines.get('corpus') != {'forms': spec.forms, 'seed': spec.seed}:
+        print(f"⚠️  Corpus différent des références {baselines.get('corpus')}: comparaison indicative")
+    regressions = compare(results, baselines)
+    if regressions:
+        print("\n❌ RÉGRESSIONS DE PERFORMANCE:", file=sys.stderr)
+        for regression in regressions:
+            print(f"   {regression}", file=sys.stderr)
+        return 1
+    print("\n✅ Aucune régression par rapport aux références")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Conversion sous budget de temps et de mémoire pour FormBuilder Pro
+Chaque fichier est converti dans un processus de travail tuable. Un chien de garde surveille
+l'échéance et la mémoire de chaque conversion: au-delà du budget, le processus est tué et
+remplacé, le formulaire part en quarantaine avec un diagnostic (taille, structure, pile Python
+au moment du dépassement) et le pool continue. Un DFM pathologique (retour arrière des
+expressions régulières, imbrication aberrante) coûte donc au plus le budget, jamais le batch
+"""
+
+import faulthandler
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import tempfile
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+from conversion_metrics import ConversionMetrics, get_default_metrics
+
+DEFAULT_TIME_BUDGET = float(os.getenv('FORMBUILDER_TIME_BUDGET', '10'))
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv('FORMBUILDER_MEMORY_BUDGET_MB', '512'))
+# Fréquence du chien de garde (échéances et mémoire des processus occupés)
+WATCHDOG_INTERVAL = 0.05
+# La pile Python est écrite un peu avant l'échéance pour être disponible au moment du kill
+TRACEBACK_AT = 0.8
+STARTUP_TIMEOUT = 60.0
+# Jamais 'fork': copier un processus multi-thread (Streamlit, serveur) peut figer l'enfant sur un
+# verrou tenu par un autre thread. forkserver part d'un serveur mono-thread, spawn à défaut
+START_METHOD = os.getenv('FORMBUILDER_START_METHOD') or (
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+MAX_TRACEBACK_CHARS = 4000
+# Fiche de chauffe: le lookup sans entité déclarée construit le catalogue d'inférence d'entités
+WARMUP_DFM = "object Form1: TForm1\n  object dblFund: TDBLookupComboBox\n  end\nend\n"
+
+logger = logging.getLogger(__name__)
+
+_OBJECT_LINE = re.compile(r'^\s*(?:object|inherited|inline)\s+\w+', re.MULTILINE | re.IGNORECASE)
+_END_LINE = re.compile(r'^\s*end\s*$', re.MULTILINE | re.IGNORECASE)
+
+# (form_id, contenu DFM, contenu Info)
+ConversionTask = Tuple[str, Optional[str], Optional[str]]
+
+
+@dataclass
+class QuarantineEntry:
+    """Formulaire écarté: budget dépassé, processus mort ou mémoire épuisée"""
+    form_id: str
+    reason: str  # 'timeout', 'memory' ou 'crashed'
+    elapsed: float
+    detail: str
+    diagnostics: Dict[str, Any] = field(default_factory=dict)
+    traceback: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'form_id': self.form_id,
+            'reason': self.reason,
+            'elapsed': round(self.elapsed, 3),
+            'detail': self.detail,
+            'diagnostics': self.diagnostics,
+            'traceback': self.traceback,
+        }
+
+
+@dataclass
+class BoundedResult:
+    """Résultat d'une conversion exécutée dans un processus de travail"""
+    form_id: str
+    status: str  # 'success', 'partial', 'error' ou 'quarantined'
+    elapsed: float
+    json_text: Optional[str] = None
+    errors: List[str] = field(default_factory=list)
+    fields: int = 0
+    validations: int = 0
+    quarantine: Optional[QuarantineEntry] = None
+    output: Optional[str] = None  # Fichier écrit en flux par le processus de travail (output_dir)
+    components: int = 0
+
+
+def input_diagnostics(dfm_content: Optional[str], info_content: Optional[str]) -> Dict[str, Any]:
+    """Indices structurels d'une entrée suspecte (calculés hors du processus de travail)"""
+    diagnostics: Dict[str, Any] = {}
+    if dfm_content is not None:
+        lines = dfm_content.splitlines()
+        objects = len(_OBJECT_LINE.findall(dfm_content))
+        ends = len(_END_LINE.findall(dfm_content))
+        diagnostics['dfm'] = {
+            'chars': len(dfm_content),
+            'lines': len(lines),
+            'longest_line': max((len(line) for line in lines), default=0),
+            'objects': objects,
+            'ends': ends,
+            'unbalanced_objects': objects - ends,
+            'odd_quote_lines': sum(1 for line in lines if line.count("'") % 2),
+            # DFM binaire (en-tête TPF0) ou octets nuls: le format texte est attendu
+            'binary': dfm_content.startswith('TPF0') or '\x00' in dfm_content,
+        }
+    if info_content is not None:
+        lines = info_content.splitlines()
+        diagnostics['info'] = {
+            'chars': len(info_content),
+            'lines': len(lines),
+            'longest_line': max((len(line) for line in lines), default=0),
+        }
+    return diagnostics
+
+
+def _address_space_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm', 'r') as handle:
+            return int(handle.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _resident_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _limit_memory(budget_bytes: int):
+    """Plafonne l'espace d'adressage du processus: les allocations au-delà lèvent MemoryError"""
+    current = _address_space_bytes()
+    if current is None or not hasattr(resource, 'RLIMIT_AS'):
+        return  # Plateforme sans /proc ni RLIMIT_AS: le chien de garde surveille le RSS
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = current + budget_bytes
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        logger.warning("Impossible de plafonner la mémoire du processus de travail")
+
+
+def _partial_path(output_path: str) -> str:
+    return output_path + '.part'
+
+
+def _stream_to_file(generator: Any, form_id: str, dfm_content: Optional[str], info_content: Optional[str],
+                    output_path: str) -> Dict[str, Any]:
+    """Écrit le JSON en flux dans un fichier temporaire renommé une fois complet"""
+    partial = _partial_path(output_path)
+    try:
+        with open(partial, 'wb') as stream:
+            result = generator.convert_to_stream(dfm_content, info_content, form_id, stream)
+        os.replace(partial, output_path)
+    except BaseException:
+        Path(partial).unlink(missing_ok=True)
+        raise
+    return {'json_text': None, 'output': output_path, 'errors': result.errors, 'success': result.success,
+            'fields': result.fields, 'validations': result.validations}
+
+
+def _worker_main(connection: Connection, memory_budget: int, time_budget: float, traceback_path: str):
+    """Boucle d'un processus de travail: une tâche à la fois, résultat et métriques renvoyés"""
+    from form_engine import FormGeneratorAI
+
+    metrics = ConversionMetrics()
+    generator = FormGeneratorAI(metrics)
+    # Catalogue d'entités et caches chargés avant la première échéance
+    generator.convert(WARMUP_DFM, None, 'WARMUP')
+    metrics.reset()
+    _limit_memory(memory_budget)
+    connection.send(('ready', None))
+
+    with open(traceback_path, 'w', encoding='utf-8') as dump:
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            form_id, dfm_content, info_content, output_path = task
+            dump.seek(0)
+            dump.truncate()
+            faulthandler.dump_traceback_later(time_budget * TRACEBACK_AT, file=dump)
+            start = time.perf_counter()
+            try:
+                if output_path is not None:
+                    payload = _stream_to_file(generator, form_id, dfm_content, info_content, output_path)
+                else:
+                    result = generator.convert(dfm_content, info_content, form_id)
+                    payload = {
+                        'json_text': result.json_text,
+                        'errors': result.errors,
+                        'success': result.success,
+                        'fields': len(result.form_json['Fields']),
+                        'validations': len(result.form_json['Validations']),
+                    }
+                # Métriques remises à zéro après chaque tâche: compteur propre à ce formulaire
+                payload['components'] = int(metrics.elements.value(('component',)))
+                message = ('ok', payload)
+            except MemoryError:
+                message = ('memory', "MemoryError: budget mémoire dépassé")
+            except Exception as e:
+                message = ('error', f"{type(e).__name__}: {e}")
+            finally:
+                faulthandler.cancel_dump_traceback_later()
+            elapsed = time.perf_counter() - start
+            connection.send((message[0], message[1], elapsed, metrics.export()))
+            metrics.reset()
+            if message[0] == 'memory':
+                break  # Tas fragmenté près du plafond: le processus est remplacé
+
+
+class _Worker:
+    """Processus de travail, sa connexion et la tâche en cours"""
+
+    def __init__(self, context: Any, memory_budget: int, time_budget: float, dump_dir: str, number: int):
+        self.connection, child = context.Pipe()
+        self.traceback_path = os.path.join(dump_dir, f'worker-{number}.traceback')
+        self.process = context.Process(target=_worker_main, name=f'formbuilder-worker-{number}',
+                                       args=(child, memory_budget, time_budget, self.traceback_path), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+        self.baseline_rss = 0
+        self.started = time.monotonic()
+        self.task: Optional[ConversionTask] = None
+
+    def read_traceback(self) -> Optional[str]:
+        try:
+            text = Path(self.traceback_path).read_text(encoding='utf-8', errors='replace').strip()
+        except OSError:
+            return None
+        return text[-MAX_TRACEBACK_CHARS:] or None
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.connection.close()
+
+
+class BoundedConverter:
+    """
+    Pool de processus de travail soumis à un budget par fichier.
+        with BoundedConverter(workers=4, time_budget=5) as converter:
+            for result in converter.run(tasks): ...
+    Les résultats arrivent dans l'ordre de fin des conversions
+    """
+
+    def __init__(self, workers: Optional[int] = None, time_budget: float = DEFAULT_TIME_BUDGET,
+                 memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB, metrics: Optional[ConversionMetrics] = None,
+                 output_dir: Optional[Path] = None):
+        if time_budget <= 0:
+            raise ValueError("Le budget de temps doit être positif")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        # Avec output_dir, chaque processus écrit lui-même <form_id>_form.json en flux
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.quarantine: List[QuarantineEntry] = []
+        self._context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == 'forkserver':
+            # Le serveur importe le moteur une fois; chaque processus de travail en hérite
+            self._context.set_forkserver_preload(['bounded_conversion', 'form_engine'])
+        self._dump_dir = tempfile.mkdtemp(prefix='formbuilder-watchdog-')
+        self._pool: List[_Worker] = []
+        self._spawned = 0
+
+    def __enter__(self) -> 'BoundedConverter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _spawn(self) -> _Worker:
+        self._spawned += 1
+        worker = _Worker(self._context, self.memory_budget, self.time_budget, self._dump_dir, self._spawned)
+        self._pool.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        self._pool.remove(worker)
+        self._spawn()
+
+    def close(self):
+        for worker in self._pool:
+            try:
+                if worker.process.is_alive():
+                    worker.connection.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._pool:
+            worker.process.join(1)
+            worker.kill()
+        self._pool.clear()
+        for path in Path(self._dump_dir).glob('*'):
+            path.unlink(missing_ok=True)
+        try:
+            os.rmdir(self._dump_dir)
+        except OSError:
+            pass
+
+    def output_path(self, form_id: str) -> Optional[str]:
+        if self.output_dir is None:
+            return None
+        return str(self.output_dir / f'{form_id.lower()}_form.json')
+
+    def _quarantine(self, worker: _Worker, reason: str, detail: str, elapsed: float) -> BoundedResult:
+        form_id, dfm_content, info_content = worker.task
+        output_path = self.output_path(form_id)
+        if output_path is not None:  # Écriture interrompue par le kill
+            Path(_partial_path(output_path)).unlink(missing_ok=True)
+        entry = QuarantineEntry(form_id, reason, elapsed, detail,
+                                input_diagnostics(dfm_content, info_content), worker.read_traceback())
+        self.quarantine.append(entry)
+        self.metrics.record_conversion('quarantined')
+        self.metrics.stage_errors.inc(labels=('budget', reason))
+        self.metrics.observe_stage('bounded_total', elapsed)
+        logger.warning("Formulaire %s en quarantaine (%s): %s", form_id, reason, detail)
+        return BoundedResult(form_id, 'quarantined', elapsed, errors=[detail], quarantine=entry)
+
+    def _receive(self, worker: _Worker) -> BoundedResult:
+        kind, payload, elapsed, exported = worker.connection.recv()
+        self.metrics.merge(exported)
+        form_id = worker.task[0]
+        if kind == 'memory':
+            result = self._quarantine(worker, 'memory', payload, elapsed)
+            self._replace(worker)
+            return result
+        worker.task = None
+        self.metrics.observe_stage('bounded_total', elapsed)
+        if kind == 'error':
+            return BoundedResult(form_id, 'error', elapsed, errors=[payload])
+        return BoundedResult(form_id, 'success' if payload['success'] else 'partial', elapsed,
+                             payload['json_text'], payload['errors'], payload['fields'], payload['validations'],
+                             output=payload.get('output'), components=payload.get('components', 0))
+
+    def run(self, tasks: Iterable[ConversionTask]) -> Iterator[BoundedResult]:
+        """Distribue les tâches; le chien de garde tue toute conversion hors budget"""
+        pending = iter(tasks)
+        exhausted = False
+        while len(self._pool) < self.workers:
+            self._spawn()
+
+        while True:
+            now = time.monotonic()
+            for worker in list(self._pool):
+                if not worker.ready or worker.task is not None or exhausted:
+                    continue
+                task = next(pending, None)
+                if task is None:
+                    exhausted = True
+                    break
+                worker.task = task
+                worker.started = now
+                worker.connection.send(tuple(task) + (self.output_path(task[0]),))
+
+            busy = [worker for worker in self._pool if worker.task is not None or not worker.ready]
+            if exhausted and not any(worker.task is not None for worker in busy):
+                return
+
+            watched = {}
+            for worker in busy:
+                watched[worker.connection] = worker
+                watched[worker.process.sentinel] = worker
+            ready = wait(list(watched), timeout=WATCHDOG_INTERVAL)
+
+            handled = set()
+            for handle in ready:
+                worker = watched[handle]
+                if id(worker) in handled:
+                    continue
+                handled.add(id(worker))
+                if worker.connection.poll():
+                    try:
+                        if not worker.ready:
+                            worker.connection.recv()
+                            worker.ready = True
+                            worker.baseline_rss = _resident_bytes(worker.process.pid) or 0
+                            continue
+                        yield self._receive(worker)
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                # Processus mort sans réponse: OOM killer, segfault d'une extension...
+                exitcode = worker.process.exitcode
+                if worker.task is not None:
+                    yield self._quarantine(worker, 'crashed', f"Processus de travail terminé (code {exitcode})",
+                                           time.monotonic() - worker.started)
+                elif not worker.ready:
+                    raise RuntimeError(f"Le processus de travail n'a pas démarré (code {exitcode})")
+                self._replace(worker)
+
+            now = time.monotonic()
+            for worker in list(self._pool):
+                if id(worker) in handled:
+                    continue
+                if not worker.ready:
+                    if now - worker.started > STARTUP_TIMEOUT:
+                        raise RuntimeError("Le processus de travail n'a pas démarré dans le délai imparti")
+                    continue
+                if worker.task is None:
+                    continue
+                elapsed = now - worker.started
+                if elapsed > self.time_budget:
+                    yield self._quarantine(worker, 'timeout', f"Budget de temps dépassé ({self.time_budget:g} s)", elapsed)
+                    self._replace(worker)
+                    continue
+                # Filet de sécurité quand RLIMIT_AS n'est pas disponible
+                resident = _resident_bytes(worker.process.pid)
+                if resident is not None and resident - worker.baseline_rss > self.memory_budget:
+                    yield self._quarantine(worker, 'memory',
+                                           f"Mémoire résidente {resident // (1024 * 1024)} Mo hors budget", elapsed)
+                    self._replace(worker)
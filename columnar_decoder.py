@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Décodage colonnaire des réponses d'entités larges (Secrty, Fund...) pour FormBuilder Pro
+Lit un tableau JSON en flux et remplit des tableaux structurés NumPy préalloués pour
+une projection de colonnes, sans construire de dict par ligne
+"""
+
+import io
+import json
+import re
+from functools import lru_cache
+from json.decoder import JSONDecodeError
+from json.scanner import make_scanner
+from pathlib import Path
+from typing import Dict, List, Any, IO, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from entity_inference import GRAPHQL_SCHEMA_PATH, load_entity_catalog, parse_graphql_schema
+
+CHUNK_SIZE = 1 << 16
+FLUSH_ROWS = 4096
+INITIAL_CAPACITY = 1024
+
+# Types scalaires GraphQL -> dtype NumPy (les types nullables gardent une valeur manquante)
+GRAPHQL_DTYPES = {
+    'String': np.dtype(object),
+    'Int!': np.dtype(np.int64),
+    'Int': np.dtype(np.float64),
+    'Decimal': np.dtype(np.float64),
+    'Float': np.dtype(np.float64),
+    'DateTime': np.dtype('datetime64[ms]'),
+    'Boolean': np.dtype(np.bool_)
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING_SKIP = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR_SKIP = re.compile(r'[^,}\]\s]+')
+# Contenu d'objet sans objet imbriqué, reconnu en un seul appel (quantificateurs possessifs: pas de retour arrière)
+_FLAT_OBJECT_BODY = re.compile(r'\{(?:[^{}"]++|"(?:[^"\\]++|\\.)*+")*+')
+_TIMEZONE_SUFFIX = re.compile(r'(Z|[+-]\d{2}:?\d{2})$')
+_scan_value = make_scanner(json.JSONDecoder())
+
+
+class _NeedMoreData(Exception):
+    """Le tampon s'arrête au milieu d'une valeur: lire le bloc suivant"""
+
+
+@lru_cache(maxsize=4)
+def _schema(schema_path: Path = GRAPHQL_SCHEMA_PATH) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+    return parse_graphql_schema(Path(schema_path))
+
+
+def graphql_dtype(gql_type: str, string_width: Optional[int] = None) -> np.dtype:
+    """dtype NumPy d'un type GraphQL scalaire (String!, Decimal, DateTime...)"""
+    base = gql_type.rstrip('!')
+    if base == 'String':
+        return np.dtype(f'U{string_width}') if string_width else GRAPHQL_DTYPES['String']
+    if base == 'Int' and gql_type.endswith('!'):
+        return GRAPHQL_DTYPES['Int!']
+    return GRAPHQL_DTYPES.get(base, np.dtype(object))
+
+
+def _convert_column(values: List[Any], dtype: np.dtype) -> np.ndarray:
+    """Convertit une liste de valeurs JSON en tableau du dtype cible"""
+    if dtype.kind == 'M':
+        values = [None if value is None else _TIMEZONE_SUFFIX.sub('', value) for value in values]
+    elif dtype.kind == 'U':
+        values = ['' if value is None else value for value in values]
+    elif dtype.kind == 'b':
+        values = [bool(value) for value in values]
+    elif dtype.kind == 'i':
+        values = [0 if value is None else value for value in values]
+    return np.array(values, dtype=dtype)
+
+
+class ColumnarDecoder:
+    """Décodeur en flux d'un tableau JSON d'objets vers un tableau structuré projeté"""
+
+    def __init__(self, columns: Dict[str, np.dtype], array_key: Optional[str] = None):
+        self.columns = dict(columns)
+        self.array_key = array_key
+        self.dtype = np.dtype([(name, dtype) for name, dtype in self.columns.items()])
+        # Hors chaîne, une clé apparaît telle quelle entre guillemets (ils sont échappés dans les valeurs)
+        self._quoted_keys = [(name, json.dumps(name)) for name in self.columns]
+
+    @classmethod
+    def from_schema(cls, type_name: str, columns: Sequence[str], array_key: Optional[str] = None,
+                    string_widths: Optional[Dict[str, int]] = None,
+                    schema_path: Path = GRAPHQL_SCHEMA_PATH) -> 'ColumnarDecoder':
+        """Décodeur généré depuis schema.graphql pour une projection de colonnes d'un type"""
+        types, list_queries = _schema(schema_path)
+        if type_name not in types:
+            raise KeyError(f"Type GraphQL inconnu: {type_name}")
+
+        fields = types[type_name]
+        by_lower = {name.lower(): name for name in fields}
+        projection = {}
+        for column in columns:
+            name = column if column in fields else by_lower.get(column.lower())
+            if name is None:
+                raise KeyError(f"Colonne {column} absente du type {type_name}")
+            projection[name] = graphql_dtype(fields[name], (string_widths or {}).get(column))
+        return cls(projection, array_key or list_queries.get(type_name))
+
+    @classmethod
+    def for_query(cls, query_name: str, columns: Sequence[str], **kwargs) -> 'ColumnarDecoder':
+        """Décodeur pour une requête de liste (AllTickers -> Secrty)"""
+        types, list_queries = _schema(kwargs.get('schema_path', GRAPHQL_SCHEMA_PATH))
+        for type_name, query in list_queries.items():
+            if query == query_name:
+                return cls.from_schema(type_name, columns, array_key=query_name, **kwargs)
+        raise KeyError(f"Requête GraphQL inconnue: {query_name}")
+
+    @classmethod
+    def for_entity(cls, entity: str, columns: Sequence[str], **kwargs) -> 'ColumnarDecoder':
+        """Décodeur pour une entité MfactModels ou son type GraphQL (Fndmas -> Fund)"""
+        types, _ = _schema(kwargs.get('schema_path', GRAPHQL_SCHEMA_PATH))
+        candidates = [entity]
+        for definition in load_entity_catalog():
+            if definition.name.lower() == entity.lower():
+                candidates.extend(definition.aliases)
+        for candidate in candidates:
+            for type_name in types:
+                if type_name.lower() == candidate.lower():
+                    return cls.from_schema(type_name, columns, **kwargs)
+        raise KeyError(f"Aucun type GraphQL pour l'entité {entity}")
+
+    # Lecture en flux
+
+    def _iter_buffers(self, source: Union[str, bytes, IO]):
+        """Normalise la source en lecteur de blocs texte"""
+        if isinstance(source, bytes):
+            source = source.decode('utf-8')
+        if isinstance(source, str):
+            source = io.StringIO(source)
+        read = source.read
+
+        def read_chunk() -> str:
+            chunk = read(CHUNK_SIZE)
+            return chunk.decode('utf-8', errors='strict') if isinstance(chunk, bytes) else chunk
+
+        return read_chunk
+
+    def decode(self, source: Union[str, bytes, IO], expected_rows: Optional[int] = None) -> np.ndarray:
+        """Décode le tableau d'objets de la source en tableau structuré NumPy"""
+        read_chunk = self._iter_buffers(source)
+        wanted = self.columns
+        capacity = expected_rows or INITIAL_CAPACITY
+        result = np.empty(capacity, dtype=self.dtype)
+        row_count = 0
+        pending = {name: [] for name in wanted}
+        pending_rows = 0
+
+        buffer = ''
+        exhausted = False
+        position = 0
+
+        def refill(keep_from: int) -> int:
+            """Ajoute un bloc au tampon en abandonnant ce qui précède keep_from"""
+            nonlocal buffer, exhausted
+            chunk = read_chunk()
+            if not chunk:
+                exhausted = True
+            buffer = buffer[keep_from:] + chunk
+            return keep_from
+
+        # Recherche du début du tableau (réponse GraphQL complète ou tableau nu)
+        array_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(self.array_key) if self.array_key else r'\[')
+        while True:
+            stripped = _WHITESPACE.match(buffer, 0).end()
+            if stripped < len(buffer) and buffer[stripped] == '[':
+                position = stripped + 1
+                break
+            match = array_pattern.search(buffer)
+            if match:
+                position = match.end()
+                break
+            if exhausted:
+                raise ValueError("Aucun tableau d'entités trouvé dans la réponse")
+            refill(0)
+
+        def flush_pending():
+            nonlocal result, row_count, pending_rows
+            if not pending_rows:
+                return
+            needed = row_count + pending_rows
+            if needed > len(result):
+                grown = np.empty(max(needed, 2 * len(result)), dtype=self.dtype)
+                grown[:row_count] = result[:row_count]
+                result = grown
+            for name, dtype in wanted.items():
+                result[name][row_count:needed] = _convert_column(pending[name], dtype)
+                pending[name] = []
+            row_count = needed
+            pending_rows = 0
+
+        while True:
+            object_start = position
+            try:
+                position, values = self._parse_object(buffer, position, exhausted)
+            except (_NeedMoreData, ValueError) as e:
+                # Une erreur de syntaxe avant la fin du flux peut venir d'un nombre coupé ("1." | "5")
+                if exhausted:
+                    if isinstance(e, ValueError):
+                        raise
+                    raise ValueError(f"Réponse JSON tronquée après {row_count + pending_rows} lignes")
+                refill(object_start)
+                position = 0
+                continue
+            if values is None:
+                break
+
+            for name in wanted:
+                pending[name].append(values.get(name))
+            pending_rows += 1
+            if pending_rows >= FLUSH_ROWS:
+                flush_pending()
+
+            # Libère le début du tampon déjà consommé
+            if position > CHUNK_SIZE:
+                buffer = buffer[position:]
+                position = 0
+
+        flush_pending()
+        return result[:row_count]
+
+    def _project_flat_object(self, buffer: str, start: int, stop: int) -> Dict[str, Any]:
+        """Décode les seules clés projetées d'un objet plat délimité par [start, stop]"""
+        values = {}
+        for name, quoted in self._quoted_keys:
+            index = buffer.find(quoted, start, stop)
+            while index != -1:
+                after = _WHITESPACE.match(buffer, index + len(quoted)).end()
+                # Une clé est suivie de ':'; la même chaîne en position de valeur ne l'est jamais
+                if buffer[after] == ':' and buffer[index - 1] != '\\':
+                    value_start = _WHITESPACE.match(buffer, after + 1).end()
+                    values[name] = _scan_value(buffer, value_start)[0]
+                    break
+                index = buffer.find(quoted, after, stop)
+        return values
+
+    def _parse_object(self, buffer: str, position: int, exhausted: bool) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Parse l'objet suivant; renvoie (position, valeurs projetées) ou (position, None) en fin de tableau"""
+        wanted = self.columns
+        end = len(buffer)
+
+        def skip_ws(index: int) -> int:
+            index = _WHITESPACE.match(buffer, index).end()
+            if index >= end:
+                raise _NeedMoreData()
+            return index
+
+        position = skip_ws(position)
+        if buffer[position] == ',':
+            position = skip_ws(position + 1)
+        if buffer[position] == ']':
+            return position + 1, None
+        if buffer[position] != '{':
+            raise ValueError(f"Objet JSON attendu à la position {position}")
+
+        # Voie rapide: objet plat complet dans le tampon, seules les clés projetées sont décodées.
+        # Sans '{' ni guillemet échappé avant la première '}', une parité paire de guillemets suffit à la valider
+        close = buffer.find('}', position)
+        if (close != -1 and buffer.find('{', position + 1, close) == -1
+                and buffer.find('\\"', position, close) == -1 and buffer.count('"', position, close) % 2 == 0):
+            body_end = close
+        else:
+            body_end = _FLAT_OBJECT_BODY.match(buffer, position).end()
+        stop = buffer[body_end] if body_end < end else None
+        if stop == '}':
+            return body_end + 1, self._project_flat_object(buffer, position, body_end)
+        if stop != '{' and not exhausted:
+            raise _NeedMoreData()  # Objet ou chaîne coupé par la fin du bloc
+
+        values = {}
+        position = skip_ws(position + 1)
+        if buffer[position] == '}':
+            return position + 1, values
+
+        while True:
+            if buffer[position] != '"':
+                raise ValueError(f"Clé JSON attendue à la position {position}")
+            key_match = _STRING_SKIP.match(buffer, position)
+            if key_match is None:
+                raise _NeedMoreData()
+            key = key_match.group(0)[1:-1]
+            if '\\' in key:
+                key = json.loads(key_match.group(0))
+            position = skip_ws(key_match.end())
+            if buffer[position] != ':':
+                raise ValueError(f"':' attendu à la position {position}")
+            position = skip_ws(position + 1)
+
+            first = buffer[position]
+            if key in wanted:
+                try:
+                    value, value_end = _scan_value(buffer, position)
+                except (StopIteration, JSONDecodeError):
+                    raise _NeedMoreData()
+                values[key] = value
+            elif first == '"':
+                skipped = _STRING_SKIP.match(buffer, position)
+                if skipped is None:
+                    raise _NeedMoreData()
+                value_end = skipped.end()
+            elif first in '{[':
+                # Valeur imbriquée non demandée (rare sur ces entités): décodée puis ignorée
+                try:
+                    _, value_end = _scan_value(buffer, position)
+                except (StopIteration, JSONDecodeError):
+                    raise _NeedMoreData()
+            else:
+                value_end = _SCALAR_SKIP.match(buffer, position).end()
+
+            # Un scalaire qui touche la fin du tampon peut être coupé: relire avec le bloc suivant
+            if value_end >= end and not exhausted:
+                raise _NeedMoreData()
+
+            position = skip_ws(value_end)
+            if buffer[position] == ',':
+                position = skip_ws(position + 1)
+                continue
+            if buffer[position] == '}':
+                return position + 1, values
+            raise ValueError(f"',' ou '}}' attendu à la position {position}")
+
+    def decode_file(self, path: str, expected_rows: Optional[int] = None) -> np.ndarray:
+        """Décode un fichier JSON sans le charger entièrement"""
+        with open(path, 'r', encoding='utf-8') as handle:
+            return self.decode(handle, expected_rows)
+
+    def decode_frame(self, source: Union[str, bytes, IO], expected_rows: Optional[int] = None):
+        """Décode vers un DataFrame pandas (colonnes projetées uniquement)"""
+        import pandas as pd
+        array = self.decode(source, expected_rows)
+        return pd.DataFrame({name: array[name] for name in self.columns})
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Métriques du pipeline de conversion DFM/Info -> JSON pour FormBuilder Pro
+Histogrammes de latence par étape, compteurs d'éléments générés, tailles d'entrée,
+taux de succès des caches et erreurs par étape; rendu texte Prometheus ou résumé JSON
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterator, Optional, Sequence, Tuple
+
+# Bornes supérieures des seaux (la borne +Inf est implicite)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+METRIC_PREFIX = 'formbuilder'
+
+Labels = Tuple[str, ...]
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Compteur monotone, éventuellement étiqueté"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, labels: Labels = ()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[Tuple[Labels, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in self.samples()]
+
+    def summary(self) -> Dict[str, float]:
+        return {','.join(labels) or 'total': value for labels, value in self.samples()}
+
+    def merge_samples(self, samples: Sequence[Tuple[Labels, float]]):
+        """Ajoute les valeurs d'un autre compteur (samples() d'un processus de travail)"""
+        with self._lock:
+            for labels, value in samples:
+                labels = tuple(labels)
+                self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Histogramme à seaux fixes: une recherche dichotomique et trois additions par observation"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # Par jeu d'étiquettes: [compte par seau (non cumulé) + seau +Inf, somme, nombre]
+        self._series: Dict[Labels, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Labels = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def quantile(self, q: float, labels: Labels = ()) -> Optional[float]:
+        """Estimation d'un quantile par interpolation linéaire dans le seau (comme histogram_quantile)"""
+        series = self._series.get(labels)
+        if not series or not series[2]:
+            return None
+        rank = q * series[2]
+        cumulative = 0
+        for index, count in enumerate(series[0]):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # Au-delà de la dernière borne
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self) -> List[Tuple[Labels, List[Any]]]:
+        with self._lock:
+            return sorted((labels, [list(series[0]), series[1], series[2]]) for labels, series in self._series.items())
+
+    def merge_samples(self, samples: Sequence[Tuple[Labels, List[Any]]]):
+        """Ajoute les séries d'un autre histogramme aux mêmes seaux"""
+        with self._lock:
+            for labels, (counts, total, count) in samples:
+                labels = tuple(labels)
+                series = self._series.get(labels)
+                if series is None:
+                    series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                series[0] = [current + added for current, added in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self.samples():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for labels, (_, total, count) in self.samples():
+            result[','.join(labels) or 'total'] = {
+                'count': count,
+                'sum': total,
+                'mean': total / count if count else None,
+                'p50': self.quantile(0.5, labels),
+                'p95': self.quantile(0.95, labels),
+                'p99': self.quantile(0.99, labels),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class ConversionMetrics:
+    """Ensemble des métriques du pipeline de conversion"""
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self.stage_duration = Histogram(
+            f'{prefix}_stage_duration_seconds', 'Durée de chaque étape du pipeline de conversion',
+            LATENCY_BUCKETS, ('stage',))
+        self.stage_errors = Counter(
+            f'{prefix}_stage_errors_total', 'Erreurs par étape et par type d\'exception', ('stage', 'error'))
+        self.conversions = Counter(
+            f'{prefix}_conversions_total', 'Conversions terminées par statut', ('status',))
+        self.elements = Counter(
+            f'{prefix}_elements_total', 'Composants, champs et validations produits', ('kind',))
+        self.elements_per_form = Histogram(
+            f'{prefix}_elements_per_form', 'Nombre d\'éléments par formulaire', COUNT_BUCKETS, ('kind',))
+        self.input_chars = Histogram(
+            f'{prefix}_input_chars', 'Taille des fichiers d\'entrée (caractères)', SIZE_BUCKETS, ('input',))
+        self.output_chars = Histogram(
+            f'{prefix}_output_chars', 'Taille du JSON produit (caractères)', SIZE_BUCKETS)
+        self.cache_hits = Counter(f'{prefix}_cache_hits_total', 'Succès de cache', ('cache',))
+        self.cache_misses = Counter(f'{prefix}_cache_misses_total', 'Échecs de cache', ('cache',))
+
+        self._metrics = [self.stage_duration, self.stage_errors, self.conversions, self.elements,
+                         self.elements_per_form, self.input_chars, self.output_chars]
+        # Caches externes lus au moment du rendu: nom -> fonction renvoyant (succès, échecs)
+        self._cache_collectors: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        self.started_at = time.time()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Chronomètre une étape; une exception est comptée puis propagée"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.stage_errors.inc(labels=(name, type(e).__name__))
+            raise
+        finally:
+            self.stage_duration.observe(time.perf_counter() - start, (name,))
+
+    def observe_stage(self, name: str, seconds: float):
+        self.stage_duration.observe(seconds, (name,))
+
+    def record_error(self, stage: str, error: BaseException):
+        """Erreur interceptée par l'appelant (donc non propagée par stage())"""
+        self.stage_errors.inc(labels=(stage, type(error).__name__))
+
+    def observe_input(self, kind: str, size: int):
+        self.input_chars.observe(size, (kind,))
+
+    def observe_output(self, size: int):
+        self.output_chars.observe(size)
+
+    def count_elements(self, kind: str, count: int):
+        self.elements.inc(count, (kind,))
+        self.elements_per_form.observe(count, (kind,))
+
+    def record_conversion(self, status: str):
+        self.conversions.inc(labels=(status,))
+
+    def record_cache(self, cache: str, hit: bool):
+        (self.cache_hits if hit else self.cache_misses).inc(labels=(cache,))
+
+    def register_cache(self, cache: str, collector: Callable[[], Tuple[int, int]]):
+        """Expose un cache tenant ses propres compteurs (lru_cache.cache_info, TTLCache...)"""
+        self._cache_collectors[cache] = collector
+
+    def _cache_totals(self) -> Dict[str, Tuple[float, float]]:
+        totals = {}
+        for labels, hits in self.cache_hits.samples():
+            totals[labels[0]] = (hits, 0.0)
+        for labels, misses in self.cache_misses.samples():
+            totals[labels[0]] = (totals.get(labels[0], (0.0, 0.0))[0], misses)
+        for cache, collector in self._cache_collectors.items():
+            try:
+                hits, misses = collector()
+            except Exception:
+                continue
+            previous = totals.get(cache, (0.0, 0.0))
+            totals[cache] = (previous[0] + hits, previous[1] + misses)
+        return totals
+
+    def render_prometheus(self) -> str:
+        """Format d'exposition texte Prometheus (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+
+        caches = sorted(self._cache_totals().items())
+        for suffix, position, documentation in (('hits', 0, 'Succès de cache'), ('misses', 1, 'Échecs de cache')):
+            name = f'{self.prefix}_cache_{suffix}_total'
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{{cache="{_escape_label(cache)}"}} {_format_value(values[position])}'
+                         for cache, values in caches)
+
+        name = f'{self.prefix}_uptime_seconds'
+        lines.append(f'# HELP {name} Durée depuis la création des métriques')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {_format_value(round(time.time() - self.started_at, 3))}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict[str, Any]:
+        """Résumé JSON (CLI batch, tests de performance)"""
+        caches = {}
+        for cache, (hits, misses) in sorted(self._cache_totals().items()):
+            lookups = hits + misses
+            caches[cache] = {'hits': hits, 'misses': misses, 'hit_ratio': hits / lookups if lookups else None}
+        return {
+            'stages': self.stage_duration.summary(),
+            'errors': self.stage_errors.summary(),
+            'conversions': self.conversions.summary(),
+            'elements': self.elements.summary(),
+            'elements_per_form': self.elements_per_form.summary(),
+            'input_chars': self.input_chars.summary(),
+            'output_chars': self.output_chars.summary().get('total'),
+            'caches': caches,
+            'uptime_seconds': time.time() - self.started_at,
+        }
+
+    def export(self) -> Dict[str, List[Any]]:
+        """Échantillons bruts sérialisables, à fusionner avec merge() dans un autre processus"""
+        return {metric.name: metric.samples() for metric in self._metrics + [self.cache_hits, self.cache_misses]}
+
+    def merge(self, exported: Dict[str, List[Any]]):
+        """Fusionne l'export d'un processus de travail (batch borné, pool de conversion)"""
+        for metric in self._metrics + [self.cache_hits, self.cache_misses]:
+            if metric.name in exported:
+                metric.merge_samples(exported[metric.name])
+
+    def reset(self):
+        for metric in self._metrics + [self.cache_hits, self.cache_misses]:
+            metric.reset()
+        self.started_at = time.time()
+
+
+_default_metrics: Optional[ConversionMetrics] = None
+_default_lock = threading.Lock()
+
+
+def get_default_metrics() -> ConversionMetrics:
+    """Métriques partagées par le processus (service HTTP, CLI, interface)"""
+    global _default_metrics
+    if _default_metrics is None:
+        with _default_lock:
+            if _default_metrics is None:
+                _default_metrics = ConversionMetrics()
+    return _default_metrics
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Profilage à la demande des conversions FormBuilder Pro
+Exécute une conversion (ou une fraction échantillonnée du trafic) sous cProfile et
+tracemalloc; écrit des piles repliées lisibles par flamegraph.pl / speedscope et les
+principaux sites d'allocation étiquetés avec l'ID du formulaire
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+DEFAULT_PROFILE_DIR = Path(os.getenv('FORMBUILDER_PROFILE_DIR', 'profiles'))
+DEFAULT_SAMPLE_RATE = float(os.getenv('FORMBUILDER_PROFILE_SAMPLE_RATE', '0'))
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+MAX_STACK_DEPTH = 64
+
+logger = logging.getLogger(__name__)
+
+FunctionKey = Tuple[str, int, str]
+
+
+def _frame_label(function: FunctionKey) -> str:
+    """Libellé d'une fonction dans une pile repliée (sans ';' ni espace)"""
+    filename, line, name = function
+    if filename == '~':
+        label = name.strip('<>')  # Fonctions natives: <built-in method re.match>...
+    else:
+        path = Path(filename)
+        module = path.parent.name if path.stem == '__init__' else path.stem
+        label = f'{module}.{name}:{line}'
+    return re.sub(r'[;\s]+', '_', label)
+
+
+def collapse_stats(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    Reconstitue des piles repliées (microsecondes de temps propre par pile) à partir du
+    graphe d'appels de cProfile. Le temps d'une fonction appelée depuis plusieurs endroits
+    est réparti au prorata du temps cumulé de chaque arc appelant -> appelé.
+    """
+    raw = stats.stats
+    callees: Dict[FunctionKey, List[Tuple[FunctionKey, float]]] = {}
+    for function, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    roots = [function for function, entry in raw.items() if not entry[4]]
+    stacks: Dict[str, int] = {}
+
+    def walk(function: FunctionKey, share: float, path: List[str], visiting: set):
+        _, _, own_time, cumulative, _ = raw[function]
+        path.append(_frame_label(function))
+        self_us = int(own_time * share * 1e6)
+        if self_us > 0:
+            key = ';'.join(path)
+            stacks[key] = stacks.get(key, 0) + self_us
+        if len(path) < MAX_STACK_DEPTH:
+            visiting.add(function)
+            for callee, edge_time in callees.get(function, ()):
+                callee_cumulative = raw[callee][3]
+                if callee in visiting or not callee_cumulative:
+                    continue
+                # Part du temps de l'appelé attribuable à ce chemin
+                walk(callee, min(1.0, edge_time * share / callee_cumulative), path, visiting)
+            visiting.discard(function)
+        path.pop()
+
+    for root in roots:
+        walk(root, 1.0, [], set())
+    return stacks
+
+
+def top_allocation_sites(snapshot: tracemalloc.Snapshot, form_id: str, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    """Principaux sites d'allocation encore vivants en fin de conversion"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ))
+    sites = []
+    for statistic in snapshot.statistics('traceback')[:limit]:
+        frame = statistic.traceback[-1] if len(statistic.traceback) else None
+        sites.append({
+            'form_id': form_id,
+            'file': frame.filename if frame else None,
+            'line': frame.lineno if frame else None,
+            'size_kb': round(statistic.size / 1024, 1),
+            'count': statistic.count,
+            'traceback': [f'{item.filename}:{item.lineno}' for item in statistic.traceback],
+        })
+    return sites
+
+
+@dataclass
+class ProfileCapture:
+    """Résultats d'une capture: chemins écrits et résumé"""
+    form_id: str
+    started_at: float
+    duration: float = 0.0
+    peak_memory_kb: float = 0.0
+    collapsed_path: Optional[Path] = None
+    pstats_path: Optional[Path] = None
+    allocations_path: Optional[Path] = None
+    top_stacks: List[Tuple[str, int]] = field(default_factory=list)
+    allocations: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'form_id': self.form_id,
+            'duration': self.duration,
+            'peak_memory_kb': self.peak_memory_kb,
+            'collapsed': str(self.collapsed_path) if self.collapsed_path else None,
+            'pstats': str(self.pstats_path) if self.pstats_path else None,
+            'allocations': str(self.allocations_path) if self.allocations_path else None,
+        }
+
+
+class ConversionProfiler:
+    """Capture cProfile + tracemalloc d'une conversion, forcée ou échantillonnée"""
+
+    def __init__(self, output_dir: Path = DEFAULT_PROFILE_DIR, sample_rate: float = DEFAULT_SAMPLE_RATE,
+                 top_allocations: int = TOP_ALLOCATIONS, tracemalloc_frames: int = TRACEMALLOC_FRAMES):
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.top_allocations = top_allocations
+        self.tracemalloc_frames = tracemalloc_frames
+        # tracemalloc est global au processus: une seule capture à la fois
+        self._lock = threading.Lock()
+
+    def should_profile(self, forced: bool = False) -> bool:
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def capture(self, form_id: str) -> Iterator[Optional[ProfileCapture]]:
+        """
+        Profile le bloc; produit None (bloc exécuté sans profilage) si une autre capture
+        est déjà en cours dans le processus
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.info("Capture déjà en cours, %s exécuté sans profilage", form_id)
+            yield None
+            return
+
+        capture = ProfileCapture(form_id, time.time())
+        started_tracing = not tracemalloc.is_tracing()
+        profiler = cProfile.Profile()
+        try:
+            if started_tracing:
+                tracemalloc.start(self.tracemalloc_frames)
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                yield capture
+            finally:
+                profiler.disable()
+                capture.duration = time.perf_counter() - start
+                capture.peak_memory_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                snapshot = tracemalloc.take_snapshot()
+                self._write(capture, profiler, snapshot)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._lock.release()
+
+    def _write(self, capture: ProfileCapture, profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot):
+        """Écrit piles repliées, pstats binaires et allocations"""
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            safe_id = re.sub(r'[^\w.-]+', '_', capture.form_id) or 'form'
+            timestamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(capture.started_at))
+            stem = f"{safe_id}-{timestamp}{int(capture.started_at * 1000) % 1000:03d}-{os.getpid()}"
+
+            stats = pstats.Stats(profiler)
+            capture.pstats_path = self.output_dir / f'{stem}.prof'
+            stats.dump_stats(str(capture.pstats_path))
+
+            stacks = collapse_stats(stats)
+            capture.collapsed_path = self.output_dir / f'{stem}.collapsed'
+            with open(capture.collapsed_path, 'w', encoding='utf-8') as handle:
+                for stack, micros in sorted(stacks.items()):
+                    handle.write(f'{stack} {micros}\n')
+            capture.top_stacks = sorted(stacks.items(), key=lambda item: item[1], reverse=True)[:20]
+
+            capture.allocations = top_allocation_sites(snapshot, capture.form_id, self.top_allocations)
+            capture.allocations_path = self.output_dir / f'{stem}.alloc.json'
+            with open(capture.allocations_path, 'w', encoding='utf-8') as handle:
+                json.dump({'form_id': capture.form_id, 'duration': capture.duration,
+                           'peak_memory_kb': capture.peak_memory_kb, 'sites': capture.allocations},
+                          handle, indent=2, ensure_ascii=False)
+            logger.info("Profil de %s écrit dans %s/%s.*", capture.form_id, self.output_dir, stem)
+        except Exception:
+            # Le profilage ne doit jamais faire échouer la conversion elle-même
+            logger.exception("Impossible d'écrire le profil de %s", capture.form_id)
+
+    @contextmanager
+    def maybe_capture(self, form_id: str, forced: bool = False) -> Iterator[Optional[ProfileCapture]]:
+        """capture() si la requête est forcée ou tirée par l'échantillonnage, sinon bloc nu"""
+        if self.should_profile(forced):
+            with self.capture(form_id) as capture:
+                yield capture
+        else:
+            yield None
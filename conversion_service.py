@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Service HTTP de conversion pour FormBuilder Pro
+POST /api/generate (contrat décrit dans Integration_Python_Streamlit_API.md), sa variante
+POST /api/generate/stream dont la réponse est écrite au fil de la génération,
+POST /api/generate/zip qui convertit un projet zippé (corps application/zip),
+POST /api/fewshot qui renvoie les exemples à insérer dans un prompt de conversion par modèle,
+GET /metrics au format texte Prometheus et GET /health
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, BinaryIO, Optional, Tuple
+
+from bounded_conversion import BoundedConverter
+from conversion_metrics import ConversionMetrics, get_default_metrics
+from conversion_profiler import ConversionProfiler
+from fewshot_selector import FewShotSelector, format_examples, get_default_index
+from form_diff import diff_forms, form_delta
+from form_engine import FormGeneratorAI
+from form_writer import JsonStreamWriter
+from llm_conversion import LLMConverter, default_client
+from program_templates import get_default_registry
+from zip_ingest import iter_zip_tasks, pair_zip_members
+
+DEFAULT_HOST = os.getenv('FORMBUILDER_SERVICE_HOST', '0.0.0.0')
+DEFAULT_PORT = int(os.getenv('FORMBUILDER_SERVICE_PORT', '8502'))
+MAX_REQUEST_BYTES = 32 * 1024 * 1024
+MAX_ARCHIVE_BYTES = int(os.getenv('FORMBUILDER_MAX_ARCHIVE_MB', '1024')) * 1024 * 1024
+# Corps d'archive gardé en mémoire jusqu'à cette taille, puis déversé dans un fichier temporaire
+ARCHIVE_SPOOL_BYTES = 8 * 1024 * 1024
+ARCHIVE_WORKERS = int(os.getenv('FORMBUILDER_ARCHIVE_WORKERS', '0')) or None
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Valeurs de "mode" d'une requête de génération; les deux dernières passent par le modèle
+CONVERSION_MODES = ('deterministic', 'hybrid', 'llm')
+# Champs d'une requête de génération qui sont du texte (ou null)
+TEXT_INPUTS = ('dfm_content', 'info_content', 'form_id', 'program_type')
+
+logger = logging.getLogger(__name__)
+
+
+def check_request(payload: Any):
+    """Lève ValueError si le corps n'est pas un objet JSON dont les champs texte sont des chaînes ou null"""
+    if not isinstance(payload, dict):
+        raise ValueError("Objet JSON attendu")
+    for key in TEXT_INPUTS:
+        if payload.get(key) is not None and not isinstance(payload[key], str):
+            raise ValueError(f"'{key}' doit être une chaîne ou null, pas {type(payload[key]).__name__}")
+
+
+def _request_inputs(payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
+    """(dfm_content, info_content, program_type, form_id) d'une requête de génération"""
+    program_type = (payload.get('program_type') or '').upper() or None
+    return (payload.get('dfm_content'), payload.get('info_content'), program_type,
+            payload.get('form_id') or program_type or 'NEWFORM')
+
+
+def handle_generate(payload: Dict[str, Any], metrics: ConversionMetrics, profiler: Optional[ConversionProfiler] = None,
+                    force_profile: bool = False) -> Tuple[int, Dict[str, Any]]:
+    """Traite une requête /api/generate; renvoie (statut HTTP, corps JSON)"""
+    dfm_content, info_content, program_type, form_id = _request_inputs(payload)
+
+    # Sans fichiers, un programme standard est servi directement depuis le registre de templates
+    if not dfm_content and not info_content:
+        registry = get_default_registry()
+        if program_type is None or program_type not in registry:
+            return 400, {'success': False, 'error': "dfm_content, info_content ou program_type connu requis"}
+        with metrics.stage('template'):
+            form_json = registry.instantiate(program_type, menu_id=payload.get('form_id'))
+        metrics.record_conversion('template')
+        return 200, _with_delta(payload, {'success': True, 'form_id': form_json['MenuID'], 'form': form_json, 'errors': []},
+                                metrics)
+
+    mode = payload.get('mode') or 'deterministic'
+    if mode not in CONVERSION_MODES:
+        return 400, {'success': False, 'error': f"Mode inconnu: {mode} ({', '.join(CONVERSION_MODES)})"}
+    if mode != 'deterministic':
+        return generate_with_model(payload, mode, metrics)
+
+    generator = FormGeneratorAI(metrics)
+    capture = None
+    if profiler is not None:
+        with profiler.maybe_capture(form_id, forced=force_profile) as capture:
+            result = generator.convert(dfm_content, info_content, form_id)
+    else:
+        result = generator.convert(dfm_content, info_content, form_id)
+
+    body = {'success': result.success, 'form_id': result.form_id, 'form': result.form_json, 'errors': result.errors}
+    if capture is not None:
+        body['profile'] = capture.to_dict()
+    return 200, _with_delta(payload, body, metrics)
+
+
+@lru_cache(maxsize=1)
+def _model_client():
+    """Client du modèle partagé par les requêtes (Anthropic, ou rejeu de FORMBUILDER_LLM_REPLAY_DIR)"""
+    return default_client()
+
+
+def _fewshot_selector() -> FewShotSelector:
+    # Index partagé; le sélecteur (et son générateur) est propre à la requête
+    return FewShotSelector(get_default_index())
+
+
+def generate_with_model(payload: Dict[str, Any], mode: str, metrics: ConversionMetrics) -> Tuple[int, Dict[str, Any]]:
+    """
+    Conversion 'llm' (le prompt reçoit les exemples few-shot les plus proches, dans leur budget de
+    tokens) ou 'hybrid' (déterministe, le modèle ne résout que les lookups sans entité)
+    """
+    dfm_content, info_content, _, form_id = _request_inputs(payload)
+    try:
+        client = _model_client()
+    except RuntimeError as e:
+        return 503, {'success': False, 'error': str(e)}
+    converter = LLMConverter(client, metrics, _fewshot_selector())
+    if mode == 'llm':
+        result = converter.convert_llm(dfm_content, info_content, form_id)
+    else:
+        result = converter.convert_hybrid(dfm_content, info_content, form_id)
+    body = {'success': result.success, 'form_id': result.form_id, 'form': result.form_json, 'errors': result.errors,
+            'usage': {'input_tokens': result.input_tokens, 'output_tokens': result.output_tokens,
+                      'cost': round(result.cost, 6), 'simulated': result.simulated}}
+    return 200, _with_delta(payload, body, metrics)
+
+
+def handle_fewshot(payload: Dict[str, Any], metrics: ConversionMetrics) -> Tuple[int, Dict[str, Any]]:
+    """
+    Traite /api/fewshot: exemples retenus pour le DFM de la requête et section de prompt prête à
+    insérer (serveur Node: convertDFMToJSON)
+    """
+    dfm_content, info_content, _, form_id = _request_inputs(payload)
+    if not dfm_content and not info_content:
+        return 400, {'success': False, 'error': "dfm_content ou info_content requis"}
+    with metrics.stage('fewshot_select'):
+        examples = _fewshot_selector().select(dfm_content, info_content, form_id)
+    return 200, {'success': True, 'form_id': form_id, 'context': format_examples(examples),
+                 'examples': [{'menu_id': example.menu_id, 'similarity': round(example.similarity, 4),
+                               'tokens': example.tokens} for example in examples]}
+
+
+def _with_delta(payload: Dict[str, Any], body: Dict[str, Any], metrics: ConversionMetrics) -> Dict[str, Any]:
+    """
+    Avec previous_form (version déjà affichée par le client), la réponse porte la différence
+    au lieu du formulaire entier: 'patch' (JSON Patch RFC 6902, défaut) ou 'delta' (compact)
+    """
+    previous = payload.get('previous_form')
+    if not isinstance(previous, dict):
+        return body
+    form_json = body.pop('form')
+    with metrics.stage('diff'):
+        if payload.get('delta_format') == 'compact':
+            body['delta'] = form_delta(previous, form_json)
+        else:
+            body['patch'] = diff_forms(previous, form_json)
+    return body
+
+
+def stream_generate(payload: Dict[str, Any], metrics: ConversionMetrics, writer: JsonStreamWriter):
+    """
+    Écrit la réponse de /api/generate/stream: {"form_id", "form", "errors", "success"}. Le formulaire
+    est écrit champ par champ; une erreur en cours de génération ferme proprement le JSON
+    ("success": false) puisque le statut HTTP est déjà parti
+    """
+    dfm_content, info_content, _, form_id = _request_inputs(payload)
+    generator = FormGeneratorAI(metrics)
+    writer.begin_object()
+    writer.key('form_id')
+    writer.value(form_id)
+    writer.key('form')
+    depth = writer.depth
+    try:
+        result = generator.convert_to_stream(dfm_content, info_content, form_id, writer)
+        errors, success = result.errors, result.success
+    except OSError:
+        raise  # Client déconnecté
+    except Exception as e:
+        logger.exception("Échec de /api/generate/stream")
+        writer.close_all(depth)
+        errors, success = generator.pop_errors() + [str(e)], False
+    writer.key('errors')
+    writer.value(errors)
+    writer.key('success')
+    writer.value(success)
+    writer.end_object()
+    writer.flush()
+
+
+def stream_archive(archive_file: BinaryIO, metrics: ConversionMetrics, writer: JsonStreamWriter,
+                   workers: Optional[int] = ARCHIVE_WORKERS):
+    """
+    Écrit la réponse de /api/generate/zip: {"forms": [...], "converted", "failed"}. Chaque
+    formulaire est écrit dès que son processus de travail a terminé, dans l'ordre de fin
+    """
+    writer.begin_object()
+    writer.key('forms')
+    writer.begin_array()
+    converted = failed = 0
+    try:
+        with zipfile.ZipFile(archive_file) as archive, BoundedConverter(workers, metrics=metrics) as converter:
+            pairs, skipped = pair_zip_members(archive)
+            for result in converter.run(iter_zip_tasks(archive, pairs, skipped)):
+                writer.begin_object()
+                for key, value in (('form_id', result.form_id), ('status', result.status), ('errors', result.errors)):
+                    writer.key(key)
+                    writer.value(value)
+                if result.json_text is not None:
+                    writer.key('form')
+                    writer.value(json.loads(result.json_text))
+                    converted += 1
+                else:
+                    failed += 1
+                writer.end_object()
+            writer.items(skipped)
+            failed += len(skipped)
+    except zipfile.BadZipFile as e:
+        writer.end_array()
+        writer.key('error')
+        writer.value(f"Archive ZIP invalide: {e}")
+    else:
+        writer.end_array()
+    writer.key('converted')
+    writer.value(converted)
+    writer.key('failed')
+    writer.value(failed)
+    writer.end_object()
+    writer.flush()
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    """Routes du service de conversion"""
+
+    server_version = 'FormBuilderConversion/1.0'
+    metrics: ConversionMetrics = None
+    profiler: ConversionProfiler = None
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            self._send(200, self.metrics.render_prometheus().encode('utf-8'), PROMETHEUS_CONTENT_TYPE)
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'success': False, 'error': f"Route inconnue: {path}"})
+
+    def _send_stream(self, payload: Dict[str, Any]):
+        # Réponse sans Content-Length, fermée en fin de flux (HTTP/1.0)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.end_headers()
+        try:
+            stream_generate(payload, self.metrics, JsonStreamWriter(self.wfile, indent=None))
+        except OSError as e:
+            logger.warning("Client déconnecté pendant /api/generate/stream: %s", e)
+
+    def _receive_archive(self, length: int) -> BinaryIO:
+        """Corps de la requête copié par blocs: l'archive se lit par son répertoire central, en fin de fichier"""
+        spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            spool.write(chunk)
+            remaining -= len(chunk)
+        spool.seek(0)
+        return spool
+
+    def _handle_archive(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            self._send_json(400, {'success': False, 'error': "Archive ZIP attendue dans le corps de la requête"})
+            return
+        if length > MAX_ARCHIVE_BYTES:
+            self._send_json(413, {'success': False, 'error': "Archive trop volumineuse"})
+            return
+        with self._receive_archive(length) as archive_file:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.end_headers()
+            try:
+                stream_archive(archive_file, self.metrics, JsonStreamWriter(self.wfile, indent=None))
+            except OSError as e:
+                logger.warning("Client déconnecté pendant /api/generate/zip: %s", e)
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/api/generate/zip':
+            self._handle_archive()
+            return
+        if path not in ('/api/generate', '/api/generate/stream', '/api/fewshot'):
+            self._send_json(404, {'success': False, 'error': f"Route inconnue: {path}"})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {'success': False, 'error': "Requête trop volumineuse"})
+            return
+        try:
+            with self.metrics.stage('request_decode'):
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            check_request(payload)
+        except ValueError as e:
+            self._send_json(400, {'success': False, 'error': f"JSON invalide: {e}"})
+            return
+
+        # Les programmes standard (sans fichiers) et les conversions par modèle (réponse entière du
+        # modèle) ne gagnent rien au flux: réponse classique
+        if (path == '/api/generate/stream' and (payload.get('dfm_content') or payload.get('info_content'))
+                and (payload.get('mode') or 'deterministic') == 'deterministic'):
+            self._send_stream(payload)
+            return
+
+        try:
+            if path == '/api/fewshot':
+                self._send_json(*handle_fewshot(payload, self.metrics))
+                return
+            # X-Profile: 1 force la capture de cette requête (en plus de l'échantillonnage)
+            force_profile = (self.headers.get('X-Profile') or '').lower() in ('1', 'true', 'yes')
+            status, body = handle_generate(payload, self.metrics, self.profiler, force_profile)
+        except Exception as e:
+            logger.exception("Échec de /api/generate")
+            self.metrics.record_conversion('error')
+            status, body = 500, {'success': False, 'error': str(e)}
+        self._send_json(status, body)
+
+    def log_message(self, format: str, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def create_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  metrics: Optional[ConversionMetrics] = None,
+                  profiler: Optional[ConversionProfiler] = None) -> ThreadingHTTPServer:
+    """Serveur multi-thread prêt à servir (serve_forever)"""
+    handler = type('BoundConversionRequestHandler', (ConversionRequestHandler,), {
+        'metrics': metrics if metrics is not None else get_default_metrics(),
+        'profiler': profiler if profiler is not None else ConversionProfiler(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP de conversion DFM/Info -> JSON")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--profile-sample', type=float, default=None, metavar='RATE',
+                        help="Fraction des requêtes profilées (défaut: FORMBUILDER_PROFILE_SAMPLE_RATE)")
+    parser.add_argument('--profile-dir', type=Path, default=None, help="Répertoire des profils")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    profiler = ConversionProfiler()
+    if args.profile_sample is not None:
+        profiler.sample_rate = args.profile_sample
+    if args.profile_dir is not None:
+        profiler.output_dir = args.profile_dir
+    server = create_server(args.host, args.port, profiler=profiler)
+    print(f"📡 Service de conversion disponible sur: http://{args.host}:{args.port}/api/generate")
+    print(f"📈 Métriques Prometheus: http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Service arrêté par l'utilisateur")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Conversion d'un projet Delphi complet (.dpr / .dproj) pour FormBuilder Pro
+Un DFM hérité ('inherited', héritage visuel) ne liste que ses différences avec sa fiche de
+base, et un frame incorporé ('inline') n'y figure que par ses surcharges. Le mode projet lit
+la liste des unités, déduit le graphe d'héritage des déclarations de classes des .pas, puis
+reconstruit chaque fiche en fusionnant les propriétés de sa base et le contenu de ses frames.
+Chaque fiche résolue est mémorisée par classe: une base partagée par 300 descendants est
+parsée et fusionnée une seule fois
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass
+from pathlib import Path, PureWindowsPath
+from typing import Dict, List, Any, Iterable, Optional, Set
+
+from batch_convert import INFO_SUFFIXES, read_text
+from form_engine import FormGeneratorAI
+from form_model import DfmComponent, ParsedDfm
+from pascal_events import PascalIndex, apply_event_rules
+
+# Unit1 in 'src\Unit1.pas' {Form1}   /   Frame1 in 'Frame1.pas' {Frame1: TFrame}
+_DPR_UNIT = re.compile(r"([\w.]+)\s+in\s+'([^']+)'\s*(?:\{\s*(\w+)\s*(?::\s*(\w+))?\s*\})?", re.IGNORECASE)
+# TForm2 = class(TForm1)
+_CLASS_DECLARATION = re.compile(r'^\s*(\w+)\s*=\s*class\s*\(\s*([\w.]+)', re.IGNORECASE | re.MULTILINE)
+_MSBUILD_NAMESPACE = re.compile(r'^\{[^}]*\}')
+
+# Fiches sans interface à convertir (conteneurs non visuels ou frames incorporés ailleurs)
+NON_FORM_CLASSES = ('tdatamodule', 'tframe')
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectError(ValueError):
+    """Projet illisible ou graphe d'héritage incohérent (cycle)"""
+
+
+@dataclass
+class ProjectUnit:
+    """Unité du projet associée à une fiche (DFM à côté du .pas)"""
+    name: str
+    path: Path
+    form_name: Optional[str] = None
+    design_class: Optional[str] = None  # TFrame, TDataModule... (aucune pour une fiche)
+
+    @property
+    def dfm_path(self) -> Optional[Path]:
+        return _sibling(self.path, ('.dfm',))
+
+    @property
+    def info_path(self) -> Optional[Path]:
+        return _sibling(self.path, INFO_SUFFIXES)
+
+    @property
+    def is_form(self) -> bool:
+        return (self.design_class or '').lower() not in NON_FORM_CLASSES
+
+
+def _sibling(path: Path, suffixes) -> Optional[Path]:
+    """Fichier voisin de même nom, extension insensible à la casse (projets issus de Windows)"""
+    for suffix in suffixes:
+        candidate = path.with_suffix(suffix)
+        if candidate.exists():
+            return candidate
+    if path.parent.is_dir():
+        stem = path.stem.lower()
+        for candidate in path.parent.iterdir():
+            if candidate.stem.lower() == stem and candidate.suffix.lower() in suffixes:
+                return candidate
+    return None
+
+
+def _unit_path(project_dir: Path, include: str) -> Path:
+    return project_dir / Path(*PureWindowsPath(include).parts)
+
+
+def read_dpr(path: Path) -> List[ProjectUnit]:
+    """Unités de la clause uses d'un .dpr (seules celles déclarées avec 'in' sont locales)"""
+    content = read_text(path)
+    uses = re.search(r'\buses\b(.*?);', content, re.IGNORECASE | re.DOTALL)
+    if uses is None:
+        return []
+    return [ProjectUnit(match.group(1), _unit_path(path.parent, match.group(2)), match.group(3), match.group(4))
+            for match in _DPR_UNIT.finditer(uses.group(1))]
+
+
+def read_dproj(path: Path) -> List[ProjectUnit]:
+    """Unités DCCReference d'un .dproj (MSBuild), avec leur fiche et leur classe de conception"""
+    try:
+        root = ElementTree.parse(path).getroot()
+    except ElementTree.ParseError as e:
+        raise ProjectError(f"{path}: {e}") from None
+    units = []
+    for element in root.iter():
+        if _MSBUILD_NAMESPACE.sub('', element.tag) != 'DCCReference':
+            continue
+        include = element.get('Include') or ''
+        if not include.lower().endswith('.pas'):
+            continue
+        children = {_MSBUILD_NAMESPACE.sub('', child.tag): (child.text or '').strip() for child in element}
+        unit_path = _unit_path(path.parent, include)
+        units.append(ProjectUnit(unit_path.stem, unit_path, children.get('Form') or None,
+                                 children.get('DesignClass') or None))
+    return units
+
+
+def load_project(path: Path) -> List[ProjectUnit]:
+    """Unités d'un projet .dpr ou .dproj ayant un DFM"""
+    suffix = path.suffix.lower()
+    if suffix == '.dproj':
+        units = read_dproj(path)
+    elif suffix == '.dpr':
+        units = read_dpr(path)
+    else:
+        raise ProjectError(f"Projet .dpr ou .dproj attendu: {path}")
+    return [unit for unit in units if unit.dfm_path is not None]
+
+
+def class_bases(pas_content: str) -> Dict[str, str]:
+    """Classe -> classe de base, en minuscules, d'après les déclarations 'TX = class(TBase)'"""
+    return {match.group(1).lower(): match.group(2).split('.')[-1].lower()
+            for match in _CLASS_DECLARATION.finditer(pas_content)}
+
+
+def _copy(component: DfmComponent, **changes: Any) -> DfmComponent:
+    values = {slot: getattr(component, slot) for slot in DfmComponent.__slots__}
+    values.update(changes)
+    copy = DfmComponent(values['name'], values['delphi_type'], values['json_type'], dict(values['properties']),
+                        values['parent'], values['start_line'], values['end_line'], values['kind'])
+    copy.freeze()
+    return copy
+
+
+def _merged_properties(base: Any, overrides: Any) -> Dict[str, Any]:
+    properties = dict(base)
+    properties.update(overrides)
+    return properties
+
+
+def merge_inherited(base: ParsedDfm, child: ParsedDfm) -> ParsedDfm:
+    """
+    Fiche héritée complète: composants de la base (dans leur ordre) dont les propriétés sont
+    surchargées par les blocs 'inherited' du descendant, puis les composants ajoutés par celui-ci
+    """
+    components: List[DfmComponent] = []
+    positions: Dict[str, int] = {}
+    renamed_root = base.form_name != child.form_name
+    for component in base.components:
+        if renamed_root and component.parent == base.form_name:
+            component = _copy(component, parent=child.form_name)
+        positions[component.name.lower()] = len(components)
+        components.append(component)
+
+    for component in child.components:
+        position = positions.get(component.name.lower()) if component.kind != 'object' else None
+        if position is None:
+            positions[component.name.lower()] = len(components)
+            components.append(component)
+            continue
+        inherited = components[position]
+        components[position] = _copy(inherited, properties=_merged_properties(inherited.properties, component.properties),
+                                     parent=component.parent, start_line=component.start_line,
+                                     end_line=component.end_line)
+    return ParsedDfm(child.form_name, child.form_type, _merged_properties(base.properties, child.properties),
+                     components, child.end_line)
+
+
+class ProjectResolver:
+    """
+    Résolution des fiches d'un projet, mémorisée par classe (parsing et fusion faits une fois).
+        resolver = ProjectResolver(load_project(Path('App.dproj')))
+        parsed = resolver.resolve(unit)
+    """
+
+    def __init__(self, units: List[ProjectUnit], generator: Optional[FormGeneratorAI] = None):
+        self.units = units
+        self.generator = generator or FormGeneratorAI()
+        self._parsed: Dict[str, ParsedDfm] = {}  # Chemin de l'unité -> fiche telle qu'écrite
+        self._resolved: Dict[str, ParsedDfm] = {}  # Classe -> fiche résolue
+        self._resolving: Set[str] = set()
+        self._class_units: Optional[Dict[str, ProjectUnit]] = None
+        self._bases: Dict[str, str] = {}
+        self._unit_bases: Dict[str, Dict[str, str]] = {}  # Chemin de l'unité -> bases déclarées dans son .pas
+        self.stats = {'parsed': 0, 'merged': 0, 'frames': 0, 'memo_hits': 0}
+
+    def parsed(self, unit: ProjectUnit) -> ParsedDfm:
+        key = str(unit.path)
+        parsed = self._parsed.get(key)
+        if parsed is None:
+            parsed = self.generator.parse_dfm_content(read_text(unit.dfm_path))
+            self._parsed[key] = parsed
+            self.stats['parsed'] += 1
+        return parsed
+
+    def _index_classes(self) -> Dict[str, ProjectUnit]:
+        """Classe de la fiche racine de chaque DFM -> unité, et bases déclarées dans les .pas"""
+        if self._class_units is None:
+            self._class_units = {}
+            self._bases = {}
+            for unit in self.units:
+                form_type = self.parsed(unit).form_type
+                if form_type:
+                    self._class_units[form_type.lower()] = unit
+                self._bases.update(self._declared_bases(unit))
+        return self._class_units
+
+    def _declared_bases(self, unit: ProjectUnit) -> Dict[str, str]:
+        key = str(unit.path)
+        bases = self._unit_bases.get(key)
+        if bases is None:
+            bases = class_bases(read_text(unit.path)) if unit.path.exists() else {}
+            self._unit_bases[key] = bases
+        return bases
+
+    def invalidate(self, units: Iterable[ProjectUnit]):
+        """
+        Oublie le DFM parsé et les déclarations de classes d'unités modifiées, ajoutées ou retirées
+        de self.units (mode surveillance). Les fiches résolues sont recalculées à la demande; les
+        autres unités ne sont ni relues ni reparsées
+        """
+        for unit in units:
+            self._parsed.pop(str(unit.path), None)
+            self._unit_bases.pop(str(unit.path), None)
+        self._resolved.clear()
+        self._class_units = None
+
+    def dependencies(self, unit: ProjectUnit) -> List[ProjectUnit]:
+        """Unités dont dépend la fiche résolue: elle-même, ses bases et ses frames, récursivement"""
+        classes = self._index_classes()
+        found: Dict[str, ProjectUnit] = {}
+        pending = [unit]
+        while pending:
+            current = pending.pop()
+            if str(current.path) in found:
+                continue
+            found[str(current.path)] = current
+            parsed = self.parsed(current)
+            pending.extend(classes[component.delphi_type.lower()] for component in parsed.components
+                           if component.kind == 'inline' and component.delphi_type.lower() in classes)
+            base = self.base_unit(current)
+            if base is not None:
+                pending.append(base)
+        return list(found.values())
+
+    def base_unit(self, unit: ProjectUnit) -> Optional[ProjectUnit]:
+        """Unité de la fiche de base d'une fiche héritée (None si absente du projet)"""
+        parsed = self.parsed(unit)
+        if parsed.form_kind != 'inherited':
+            return None
+        classes = self._index_classes()
+        return classes.get(self._bases.get((parsed.form_type or '').lower(), ''))
+
+    def resolve_class(self, class_name: str) -> Optional[ParsedDfm]:
+        """Fiche résolue d'une classe du projet (None pour une classe de la VCL)"""
+        key = class_name.lower()
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            self.stats['memo_hits'] += 1
+            return resolved
+        unit = self._index_classes().get(key)
+        if unit is None:
+            return None
+        if key in self._resolving:
+            raise ProjectError(f"Héritage cyclique autour de {class_name}")
+        self._resolving.add(key)
+        try:
+            resolved = self._resolve_unit(unit, key)
+        finally:
+            self._resolving.discard(key)
+        self._resolved[key] = resolved
+        return resolved
+
+    def resolve(self, unit: ProjectUnit) -> ParsedDfm:
+        form_type = self.parsed(unit).form_type
+        if form_type:
+            resolved = self.resolve_class(form_type)
+            if resolved is not None:
+                return resolved
+        return self._resolve_unit(unit, None)
+
+    def _resolve_unit(self, unit: ProjectUnit, key: Optional[str]) -> ParsedDfm:
+        parsed = self.parsed(unit)
+        base = None
+        if parsed.form_kind == 'inherited':
+            base_class = self._bases.get(key or '')
+            base = self.resolve_class(base_class) if base_class else None
+            if base is None:
+                logger.warning("Base de %s introuvable dans le projet: fiche convertie seule", unit.dfm_path)
+        inherited_names = {component.name.lower() for component in base.components} if base is not None else set()
+        parsed = self._expand_frames(parsed, inherited_names)
+        if base is None:
+            return parsed
+        self.stats['merged'] += 1
+        return merge_inherited(base, parsed)
+
+    def _expand_frames(self, parsed: ParsedDfm, inherited_names: Set[str]) -> ParsedDfm:
+        """
+        Remplace chaque frame 'inline' par un groupe contenant les composants du frame résolu;
+        les blocs 'inherited' imbriqués surchargent ces composants. Un frame déjà présent dans
+        la base (inherited_names) est une surcharge, fusionnée ensuite par merge_inherited
+        """
+        if not any(component.kind == 'inline' for component in parsed.components):
+            return parsed
+        components: List[DfmComponent] = []
+        # Les blocs 'inherited' désignent des composants de la base ou des frames, pas de nouveaux noms
+        used = {component.name.lower() for component in parsed.components if component.kind != 'inherited'}
+        used |= inherited_names
+        # (plage de lignes du bloc inline, nom d'origine -> position dans components, renommages)
+        frames = []
+        for component in parsed.components:
+            enclosing = next((frame for frame in reversed(frames)
+                              if frame[0] <= component.start_line <= frame[1]), None)
+            if enclosing is not None:
+                renames = enclosing[3]
+                if component.parent in renames:
+                    component = _copy(component, parent=renames[component.parent])
+                position = enclosing[2].get(component.name.lower())
+                if position is not None and component.kind != 'object':
+                    frame_component = components[position]
+                    components[position] = _copy(frame_component, properties=_merged_properties(
+                        frame_component.properties, component.properties))
+                    continue
+
+            frame = self.resolve_class(component.delphi_type) \
+                if component.kind == 'inline' and component.name.lower() not in inherited_names else None
+            if frame is None:
+                components.append(component)
+                continue
+
+            self.stats['frames'] += 1
+            components.append(_copy(component, json_type='GROUP',
+                                    properties=_merged_properties(frame.properties, component.properties)))
+            positions: Dict[str, int] = {}
+            renames = {frame.form_name: component.name}
+            for frame_component in frame.components:
+                name = frame_component.name
+                if name.lower() in used:  # Deux instances du même frame: noms préfixés
+                    name = f'{component.name}_{name}'
+                used.add(name.lower())
+                renames[frame_component.name] = name
+                positions[frame_component.name.lower()] = len(components)
+                components.append(_copy(frame_component, name=name,
+                                        parent=renames.get(frame_component.parent, frame_component.parent)))
+            frames.append((component.start_line, component.end_line, positions, renames))
+        return ParsedDfm(parsed.form_name, parsed.form_type, parsed.properties, components, parsed.end_line,
+                         parsed.form_kind)
+
+
+def convert_project(project_path: Path, output_dir: Optional[Path] = None, include_frames: bool = False,
+                    generator: Optional[FormGeneratorAI] = None, events: bool = False) -> Dict[str, Any]:
+    """
+    Convertit chaque fiche résolue du projet; renvoie le rapport et les statistiques de résolution.
+    events: règles EnabledWhen/VisibleWhen déduites des gestionnaires des unités (pascal_events),
+    les gestionnaires non traduits étant listés par fiche sous 'events'
+    """
+    generator = generator or FormGeneratorAI()
+    units = load_project(project_path)
+    resolver = ProjectResolver(units, generator)
+    pascal_index = PascalIndex.from_paths(unit.path for unit in units if unit.path.exists()) if events else None
+    report = []
+    unresolved: Dict[str, Any] = {}
+    for unit in units:
+        if not unit.is_form and not include_frames:
+            continue
+        form_id = unit.dfm_path.stem.upper()
+        entry: Dict[str, Any] = {'form_id': form_id, 'dfm': str(unit.dfm_path)}
+        try:
+            parsed = resolver.resolve(unit)
+            if pascal_index is not None:
+                form_events = apply_event_rules(parsed, pascal_index)
+                entry.update(event_rules=len(form_events.rules), unresolved_handlers=len(form_events.unresolved))
+                if form_events.unresolved:
+                    unresolved[form_id] = [handler.to_dict() for handler in form_events.unresolved]
+            info_path = unit.info_path
+            info_data = generator.parse_info_content(read_text(info_path)) if info_path else {}
+            form_json = generator.generate_form_json(parsed, info_data, form_id)
+        except (OSError, ProjectError) as e:
+            entry.update(status='error', errors=[str(e)])
+            report.append(entry)
+            continue
+        errors = generator.pop_errors()
+        if output_dir is not None:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            output_path = output_dir / f'{form_id.lower()}_form.json'
+            partial = output_path.with_name(output_path.name + '.part')
+            partial.write_text(generator.serialize_form(form_json), encoding='utf-8')
+            os.replace(partial, output_path)
+            entry['output'] = str(output_path)
+        entry.update(status='partial' if errors else 'success', errors=errors, components=len(parsed.components),
+                     fields=len(form_json['Fields']), validations=len(form_json['Validations']))
+        report.append(entry)
+    result = {'forms': report, 'resolution': resolver.stats}
+    if pascal_index is not None:
+        result['events'] = unresolved
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Conversion d'un projet Delphi (héritage visuel et frames résolus)")
+    parser.add_argument('project', type=Path, help="Fichier .dpr ou .dproj")
+    parser.add_argument('-o', '--output-dir', type=Path, help="Répertoire des JSON générés")
+    parser.add_argument('--include-frames', action='store_true', help="Convertit aussi les frames et data modules")
+    parser.add_argument('--events', action='store_true',
+                        help="Déduit EnabledWhen/VisibleWhen des gestionnaires d'événements des .pas")
+    parser.add_argument('--report-json', type=Path, help="Écrit le rapport par fiche")
+    args = parser.parse_args(argv)
+
+    try:
+        result = convert_project(args.project, args.output_dir, args.include_frames, events=args.events)
+    except (OSError, ProjectError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    forms, stats = result['forms'], result['resolution']
+    failed = sum(1 for entry in forms if entry['status'] == 'error')
+    print(f"✅ {len(forms) - failed}/{len(forms)} fiche(s) convertie(s): {stats['parsed']} DFM parsé(s), "
+          f"{stats['merged']} fusion(s) d'héritage, {stats['frames']} frame(s) incorporé(s)", file=sys.stderr)
+    if 'events' in result:
+        rules = sum(entry.get('event_rules', 0) for entry in forms)
+        handlers = sum(len(entries) for entries in result['events'].values())
+        print(f"⚙️ {rules} règle(s) déduite(s) des gestionnaires, {handlers} gestionnaire(s) à confier au modèle",
+              file=sys.stderr)
+    for entry in forms:
+        if entry['status'] == 'error':
+            print(f"❌ {entry['form_id']}: {'; '.join(entry['errors'])}", file=sys.stderr)
+    if args.report_json is not None:
+        args.report_json.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Reparse incrémental d'un DFM en cours d'édition, pour l'aperçu en direct (FormBuilder Pro)
+Le texte précédent et son arbre sont conservés avec la plage de lignes de chaque composant.
+À chaque modification, les lignes changées sont délimitées par les préfixe et suffixe communs.
+Seul le plus petit bloc object ... end qui les contient (en-tête et 'end' intacts) est reparsé.
+Il remplace l'ancien sous-arbre, et seuls les champs de ce sous-arbre sont regénérés: le coût
+d'une frappe dépend de la taille du composant édité, pas de celle de la fiche. Une modification
+hors de tout composant, ou qui déséquilibre les object/end, entraîne un reparse complet
+"""
+
+import io
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+from form_engine import FormGeneratorAI
+from form_model import DfmComponent, ParsedDfm
+
+
+@dataclass
+class LiveUpdate:
+    """Effet d'une modification: reparse complet ou partiel, lignes reparsées, champs regénérés"""
+    full: bool
+    lines: int = 0
+    components: List[str] = field(default_factory=list)
+
+
+def _split_lines(content: str) -> List[str]:
+    # Mêmes fins de ligne que DfmScanner (\n, \r\n, \r)
+    return io.StringIO(content, newline=None).readlines()
+
+
+def _changed_range(old: List[str], new: List[str]) -> Tuple[int, int, int]:
+    """(début, fin dans old, fin dans new) des lignes modifiées, indices 0-based et fins exclues"""
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    suffix = 0
+    while suffix < limit - start and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return start, len(old) - suffix, len(new) - suffix
+
+
+class LiveDfm:
+    """
+    DFM édité en direct et formulaire généré correspondant.
+        live = LiveDfm(generator, content, info_data, 'ACCADJ')
+        live.update(edited_content)
+        live.form_json()
+    """
+
+    def __init__(self, generator: Optional[FormGeneratorAI] = None, content: str = '',
+                 info_data: Optional[Dict[str, Any]] = None, form_id: str = 'NEWFORM'):
+        self.generator = generator or FormGeneratorAI()
+        self.info_data = info_data or {}
+        self.form_id = form_id
+        self.stats = {'full': 0, 'partial': 0, 'reparsed_lines': 0}
+        self._lines: List[str] = []
+        self.parsed = ParsedDfm()
+        # Champs et validations Required sérialisés, alignés sur self.parsed.components
+        self._field_dicts: List[Optional[Dict[str, Any]]] = []
+        self._validation_dicts: List[Optional[Dict[str, Any]]] = []
+        self._info_validations: List[Dict[str, Any]] = []
+        self._reparse(content)
+
+    def _reparse(self, content: str) -> LiveUpdate:
+        self._lines = _split_lines(content)
+        self.parsed = self.generator.parse_dfm_content(content)
+        self._regenerate()
+        self.stats['full'] += 1
+        self.stats['reparsed_lines'] += len(self._lines)
+        return LiveUpdate(True, len(self._lines), [component.name for component in self.parsed.components])
+
+    def _regenerate(self):
+        self._field_dicts, self._validation_dicts = self._generate(self.parsed.components)
+        self._info_validations = [rule.to_dict() for rule in self.generator.build_validations([], self.info_data)]
+
+    def _generate(self, components: List[DfmComponent]) -> Tuple[List[Any], List[Any]]:
+        """Champ sérialisé et validation Required (numérotée dans form_json) de chaque composant"""
+        fields = self.generator.build_fields(components, self.info_data, self.parsed.rules)
+        validations = []
+        for component in components:
+            rules = self.generator.build_validations([component], {})
+            validations.append(rules[0].to_dict() if rules else None)
+        return [field.to_dict() if field is not None else None for field in fields], validations
+
+    def set_info(self, info_data: Optional[Dict[str, Any]], form_id: Optional[str] = None):
+        """Nouveau fichier Info (entités, options): tous les champs sont regénérés, sans reparse"""
+        self.info_data = info_data or {}
+        if form_id is not None:
+            self.form_id = form_id
+        self._regenerate()
+
+    def _enclosing(self, start: int, old_end: int) -> Optional[int]:
+        """
+        Position du plus petit composant dont les lignes modifiées [start, old_end) (0-based) sont
+        strictement intérieures: en-tête avant start, 'end' à old_end ou après
+        """
+        components = self.parsed.components
+        position = bisect_right(components, start, key=lambda component: component.start_line) - 1
+        # Les blocs sont imbriqués: le premier englobant en remontant est le plus petit
+        while position >= 0:
+            component = components[position]
+            if component.end_line > old_end:
+                return position
+            position -= 1
+        return None
+
+    def update(self, content: str) -> LiveUpdate:
+        """Applique le nouveau texte du DFM; seul le sous-arbre modifié est reparsé et regénéré"""
+        lines = _split_lines(content)
+        start, old_end, new_end = _changed_range(self._lines, lines)
+        if start == old_end == new_end:
+            return LiveUpdate(False)
+        position = self._enclosing(start, old_end)
+        if position is None:
+            return self._reparse(content)
+
+        components = self.parsed.components
+        enclosing = components[position]
+        delta = new_end - old_end
+        first_line, last_line = enclosing.start_line, enclosing.end_line + delta
+        replaced = self.generator.parse_dfm_subtree(''.join(lines[first_line - 1:last_line]), first_line,
+                                                    enclosing.parent)
+        if replaced is None:
+            return self._reparse(content)  # object/end déséquilibrés: structure à relire entièrement
+
+        stop = position + 1
+        while stop < len(components) and components[stop].start_line <= enclosing.end_line:
+            stop += 1
+        if delta:
+            for component in components[:position]:
+                if component.end_line >= enclosing.end_line:  # Ancêtres du bloc
+                    component.end_line += delta
+            for component in components[stop:]:
+                component.start_line += delta
+                component.end_line += delta
+            self.parsed.end_line += delta
+        field_dicts, validation_dicts = self._generate(replaced)
+        components[position:stop] = replaced
+        self._field_dicts[position:stop] = field_dicts
+        self._validation_dicts[position:stop] = validation_dicts
+        self._lines = lines
+        self.stats['partial'] += 1
+        self.stats['reparsed_lines'] += last_line - first_line + 1
+        return LiveUpdate(False, last_line - first_line + 1, [component.name for component in replaced])
+
+    @property
+    def components(self) -> List[DfmComponent]:
+        return self.parsed.components
+
+    def form_json(self) -> Dict[str, Any]:
+        """Formulaire JSON courant; les champs et validations non modifiés sont repris tels quels"""
+        form_json = self.generator.form_header(self.parsed, self.form_id).to_dict()
+        form_json['Fields'] = [field for field in self._field_dicts if field is not None]
+        validations = [validation for validation in self._validation_dicts if validation is not None]
+        form_json['Validations'] = [{**validation, 'Id': str(number)}
+                                    for number, validation in enumerate(validations + self._info_validations, 1)]
+        return form_json
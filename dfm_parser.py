@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Analyseur de DFM texte pour FormBuilder Pro
+Lecture ligne à ligne avec une pile d'imbrication, en temps linéaire (aucune expression
+régulière à retour arrière sur le fichier entier): chaque objet connaît son parent et sa
+plage de lignes, seules ses propriétés propres lui sont attribuées. Les valeurs Delphi sont
+décodées: chaînes 'It''s'#13#10 concaténées par +, ensembles [a, b], listes (...),
+collections <item ... end>; les données binaires {...} sont ignorées
+"""
+
+import io
+import re
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from form_model import DfmComponent, ParsedDfm, intern, intern_short
+
+_OBJECT_HEADER = re.compile(r'(object|inherited|inline)\s+(?:(\w*)\s*:\s*)?([\w.]+)(?:\s*\[\s*\d+\s*\])?\s*$', re.IGNORECASE)
+_PROPERTY = re.compile(r'([\w.]+)\s*=\s*(.*)$')
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$')
+
+
+def decode_string(text: str) -> str:
+    """Décode une chaîne Delphi: segments 'quotés' ('' = apostrophe), #nnn et #$hh, joints par +"""
+    parts = []
+    position, length = 0, len(text)
+    while position < length:
+        char = text[position]
+        if char == "'":
+            position += 1
+            while position < length:
+                end = text.find("'", position)
+                if end == -1:  # Chaîne non terminée: on garde le reste
+                    parts.append(text[position:])
+                    position = length
+                    break
+                parts.append(text[position:end])
+                if end + 1 < length and text[end + 1] == "'":
+                    parts.append("'")
+                    position = end + 2
+                else:
+                    position = end + 1
+                    break
+        elif char == '#':
+            position += 1
+            start = position
+            if position < length and text[position] == '$':
+                position += 1
+                while position < length and text[position] in '0123456789abcdefABCDEF':
+                    position += 1
+                code = int(text[start + 1:position] or '0', 16)
+            else:
+                while position < length and text[position].isdigit():
+                    position += 1
+                code = int(text[start:position] or '0')
+            parts.append(chr(code))
+        else:
+            position += 1  # Espaces et opérateurs de concaténation
+    return ''.join(parts)
+
+
+def decode_value(text: str) -> Any:
+    """Valeur scalaire d'une propriété DFM (chaîne, booléen, nombre, ensemble ou identifiant interné)"""
+    text = text.strip()
+    if not text:
+        return ''
+    first = text[0]
+    if first in "'#":
+        return intern_short(decode_string(text))
+    if first == '[':
+        return [intern(item.strip()) for item in text.strip('[]').split(',') if item.strip()]
+    lowered = text.lower()
+    if lowered == 'true':
+        return True
+    if lowered == 'false':
+        return False
+    if _NUMBER.match(text):
+        return int(text) if '.' not in text and 'e' not in lowered else float(text)
+    if first == '$':
+        try:
+            return int(text[1:], 16)
+        except ValueError:
+            pass
+    return intern(text)
+
+
+class DfmScanner:
+    """
+    Parcours d'un DFM texte. La pile contient les objets ouverts; 'end' ferme le plus récent.
+    Les objets non fermés en fin de fichier sont fermés sur la dernière ligne
+    """
+
+    def __init__(self, content: str, type_mapper: Optional[Callable[[str], str]] = None):
+        # Lecture en flux: pas de liste de toutes les lignes en mémoire
+        self._stream = io.StringIO(content, newline=None)
+        self.position = 0  # Numéro (1-based) de la dernière ligne lue
+        self.unclosed = 0  # Objets sans 'end' en fin de fichier
+        self.type_mapper = type_mapper or (lambda delphi_type: 'TEXT')
+
+    def _next_line(self) -> Optional[str]:
+        line = self._stream.readline()
+        if not line:
+            return None
+        self.position += 1
+        return line.strip()
+
+    def _read_continued(self, first: str) -> str:
+        """Valeur sur plusieurs lignes: 'chaîne' + / valeur absente après '='"""
+        parts = [first]
+        text = first
+        while not text or text.endswith('+'):
+            text = self._next_line()
+            if text is None:
+                break
+            parts.append(text)
+        return ' '.join(parts)
+
+    def _read_list(self, first: str) -> List[Any]:
+        """Liste ( ... ) éventuellement sur plusieurs lignes: un élément par ligne ou séparés par des espaces"""
+        body = [first[1:]]
+        while not body[-1].rstrip().endswith(')'):
+            line = self._next_line()
+            if line is None:
+                break
+            body.append(line)
+        body[-1] = body[-1].rstrip()[:-1] if body[-1].rstrip().endswith(')') else body[-1]
+        items = []
+        for line in body:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] in "'#":
+                items.append(decode_string(line))
+            else:
+                items.extend(decode_value(token) for token in line.split())
+        return items
+
+    def _skip_binary(self, first: str):
+        text = first
+        while text is not None and not text.rstrip().endswith('}'):
+            text = self._next_line()
+
+    def _read_collection(self, first: str) -> List[Dict[str, Any]]:
+        """Collection < item ... end item ... end>: une liste de dicts de propriétés"""
+        items: List[Dict[str, Any]] = []
+        rest = first[1:].strip()
+        if rest.endswith('>') and not rest[:-1].strip():
+            return items
+        current: Optional[Dict[str, Any]] = None
+        line = rest or self._next_line()
+        while line is not None:
+            closing = line.endswith('>')
+            keyword = line[:-1].strip().lower() if closing else line.lower()
+            if keyword == 'item':
+                current = {}
+                items.append(current)
+            elif keyword == 'end':
+                current = None
+            elif current is not None:
+                match = _PROPERTY.match(line)
+                if match:
+                    current[intern(match.group(1))] = self._read_value(match.group(2))
+            if closing and keyword in ('end', ''):
+                break
+            line = self._next_line()
+        return items
+
+    def _read_value(self, text: str) -> Any:
+        text = text.strip()
+        if not text or text.endswith('+'):
+            return decode_value(self._read_continued(text))
+        first = text[0]
+        if first == '(':
+            return self._read_list(text)
+        if first == '<':
+            return self._read_collection(text)
+        if first == '{':
+            self._skip_binary(text)
+            return None
+        return decode_value(text)
+
+    def scan(self) -> ParsedDfm:
+        parsed = ParsedDfm()
+        # Pile: (composant ou None pour la racine, nom)
+        stack: List[Tuple[Optional[DfmComponent], str]] = []
+        properties: Optional[Dict[str, Any]] = None
+
+        while True:
+            line = self._next_line()
+            if line is None:
+                break
+            if not line:
+                continue
+            line_number = self.position
+
+            header = _OBJECT_HEADER.match(line)
+            if header:
+                kind, name, delphi_type = header.group(1).lower(), header.group(2) or '', header.group(3)
+                if not stack and parsed.form_type is None:
+                    parsed.form_name = intern(name) if name else None
+                    parsed.form_type = intern(delphi_type)
+                    parsed.form_kind = kind
+                    properties = parsed.properties
+                    stack.append((None, name))
+                    continue
+                component = DfmComponent(name, delphi_type, self.type_mapper(delphi_type), {},
+                                         stack[-1][1] if stack else parsed.form_name, line_number, kind=kind)
+                parsed.components.append(component)
+                properties = component.properties
+                stack.append((component, name))
+                continue
+
+            if line.lower() == 'end':
+                if stack:
+                    component, _ = stack.pop()
+                    if component is not None:
+                        component.end_line = line_number
+                        component.freeze()
+                    else:
+                        parsed.end_line = line_number
+                # Les propriétés suivantes appartiennent au parent (rare mais valide)
+                properties = None
+                if stack:
+                    parent = stack[-1][0]
+                    properties = parent.properties if parent is not None else parsed.properties
+                continue
+
+            match = _PROPERTY.match(line)
+            if match and properties is not None:
+                value = self._read_value(match.group(2))
+                if value is not None:
+                    properties[intern(match.group(1))] = value
+
+        last_line = self.position
+        self.unclosed = len(stack)
+        while stack:
+            component, _ = stack.pop()
+            if component is not None:
+                component.end_line = last_line
+                component.freeze()
+            else:
+                parsed.end_line = last_line
+        return parsed
+
+
+def parse_dfm(content: str, type_mapper: Optional[Callable[[str], str]] = None) -> ParsedDfm:
+    """Parse un DFM texte; type_mapper associe un type Delphi à un type de champ JSON"""
+    return DfmScanner(content, type_mapper).scan()
+
+
+def parse_dfm_subtree(content: str, first_line: int, parent: Optional[str],
+                      type_mapper: Optional[Callable[[str], str]] = None) -> Optional[List[DfmComponent]]:
+    """
+    Parse un bloc object ... end extrait d'un DFM (ligne first_line du fichier, contenu par
+    parent): le composant du bloc puis ses descendants, numérotés comme dans le fichier.
+    None si le bloc n'est pas exactement un objet équilibré (end manquant ou en trop)
+    """
+    scanner = DfmScanner(content, type_mapper)
+    parsed = scanner.scan()
+    if parsed.form_type is None or scanner.unclosed or parsed.end_line != scanner.position:
+        return None
+    offset = first_line - 1
+    root = DfmComponent(parsed.form_name or '', parsed.form_type, scanner.type_mapper(parsed.form_type),
+                        parsed.properties, parent, first_line, parsed.end_line + offset, kind=parsed.form_kind)
+    root.freeze()
+    for component in parsed.components:
+        component.start_line += offset
+        component.end_line += offset
+    return [root] + parsed.components
+
+
+def component_types(content: str) -> Dict[str, str]:
+    """Type Delphi de chaque objet du DFM, par nom en minuscules (en-têtes seuls, sans parser les propriétés)"""
+    types = {}
+    for line in io.StringIO(content, newline=None):
+        header = _OBJECT_HEADER.match(line.strip())
+        if header and header.group(2):
+            types.setdefault(header.group(2).lower(), header.group(3))
+    return types
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Recherche locale dans la documentation pour l'assistant FormBuilder Pro
+Les guides et FAQ Markdown du dépôt sont découpés par section, les exemples de
+training_examples.json forment un passage chacun. Un index BM25 creux (NumPy, une colonne
+par terme) est construit une fois, persisté en .npz et reconstruit seulement si une source
+change; chaque question est scorée par un bincount vectorisé, sans appel au modèle
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent
+TRAINING_EXAMPLES_PATH = ROOT_DIR / 'training_examples.json'
+DEFAULT_INDEX_PATH = Path(os.getenv('FORMBUILDER_RETRIEVAL_INDEX', ROOT_DIR / '.cache' / 'doc_retrieval.npz'))
+# Documents de gestion du dépôt, sans contenu utile à l'assistant
+EXCLUDED_DOCUMENTS = ('GITHUB_', 'READY_FOR_GITHUB')
+
+# Paramètres BM25 et découpage; INDEX_VERSION invalide les index persistés à chaque changement
+BM25_K1 = 1.5
+BM25_B = 0.75
+MAX_CHUNK_WORDS = 220
+MIN_CHUNK_WORDS = 5
+INDEX_VERSION = 1
+# Seuils de pertinence, indépendants de la longueur de la question: score BM25 rapporté au meilleur
+# score atteignable par ses termes, et part (pondérée par l'idf) de ses termes présents dans le passage
+MIN_RELEVANCE = 0.45
+MIN_COVERAGE = 0.6
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_TOKEN = re.compile(r'\w+')
+STOPWORDS = frozenset('''
+    a an and are as at be by can comment de des du do does en est et for from how i il in is it
+    je la le les mon ma mes ne on ou par pas pour que quel quelle quels qui se sur the this to
+    un une vos votre what when where which with you your r q
+'''.split())
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text: str) -> List[str]:
+    """Minuscules sans accents, mots vides retirés, pluriel en -s réduit (champs -> champ)"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+@dataclass
+class Passage:
+    """Passage indexé: source (fichier), titre (chemin de sections) et texte"""
+    source: str
+    title: str
+    text: str
+
+
+@dataclass
+class SearchHit:
+    """Passage trouvé: score BM25, score relatif (0 à 1) et couverture des termes de la question"""
+    score: float
+    relevance: float
+    coverage: float
+    passage: Passage
+
+    @property
+    def relevant(self) -> bool:
+        return self.relevance >= MIN_RELEVANCE and self.coverage >= MIN_COVERAGE
+
+
+def _split_words(text: str) -> Iterator[str]:
+    """Section longue découpée aux lignes vides en blocs d'au plus MAX_CHUNK_WORDS mots"""
+    block: List[str] = []
+    words = 0
+    for paragraph in re.split(r'\n\s*\n', text):
+        count = len(paragraph.split())
+        if block and words + count > MAX_CHUNK_WORDS:
+            yield '\n\n'.join(block)
+            block, words = [], 0
+        block.append(paragraph.strip())
+        words += count
+    if block:
+        yield '\n\n'.join(block)
+
+
+def chunk_markdown(text: str, source: str) -> List[Passage]:
+    """Un passage par section (titres hors blocs de code), titre = chemin des titres parents"""
+    passages = []
+    headings: List[Tuple[int, str]] = []
+    lines: List[str] = []
+    in_code = False
+
+    def flush():
+        body = '\n'.join(lines).strip()
+        lines.clear()
+        if not body:
+            return
+        title = ' › '.join(heading for _, heading in headings)
+        for part in _split_words(body):
+            if len(part.split()) >= MIN_CHUNK_WORDS:
+                passages.append(Passage(source, title, part))
+
+    for line in text.splitlines():
+        if line.lstrip().startswith('```'):
+            in_code = not in_code
+        match = None if in_code else _HEADING.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, match.group(2)))
+        else:
+            lines.append(line)
+    flush()
+    return passages
+
+
+def default_sources(root: Path = ROOT_DIR) -> List[Path]:
+    """Guides et FAQ Markdown du dépôt et exemples d'entraînement"""
+    sources = [path for path in sorted(root.glob('*.md')) if not path.name.startswith(EXCLUDED_DOCUMENTS)]
+    if TRAINING_EXAMPLES_PATH.exists():
+        sources.append(TRAINING_EXAMPLES_PATH)
+    return sources
+
+
+def load_passages(sources: Iterable[Path]) -> List[Passage]:
+    passages = []
+    for path in sources:
+        try:
+            text = path.read_text(encoding='utf-8')
+        except OSError as e:
+            logger.warning("Source ignorée %s: %s", path, e)
+            continue
+        if path.suffix == '.json':
+            for example in json.loads(text):
+                passages.append(Passage(path.name, example.get('input', ''), example.get('output', '')))
+        else:
+            passages.extend(chunk_markdown(text, path.name))
+    return passages
+
+
+def sources_signature(sources: Sequence[Path]) -> str:
+    """Empreinte des sources (chemin, taille, date) et des paramètres d'indexation"""
+    digest = hashlib.sha1(f'{INDEX_VERSION}:{BM25_K1}:{BM25_B}:{MAX_CHUNK_WORDS}'.encode())
+    for path in sources:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        digest.update(f'{path.name}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+class DocumentIndex:
+    """
+    Index BM25 au format colonne creuse: pour le terme t, indices[indptr[t]:indptr[t+1]] sont
+    les passages qui le contiennent et data les poids BM25 correspondants (idf compris)
+    """
+
+    def __init__(self, passages: List[Passage], vocabulary: Dict[str, int], indptr: np.ndarray,
+                 indices: np.ndarray, data: np.ndarray, signature: str = ''):
+        self.passages = passages
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.signature = signature
+        # idf de chaque terme (celui d'un terme absent pour les mots inconnus de la question)
+        count = len(passages)
+        document_frequency = np.diff(indptr)
+        self.idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        self.unknown_idf = float(np.log1p((count + 0.5) / 0.5))
+
+    @classmethod
+    def build(cls, passages: List[Passage], signature: str = '') -> 'DocumentIndex':
+        vocabulary: Dict[str, int] = {}
+        rows, columns, frequencies = [], [], []
+        lengths = np.zeros(len(passages), dtype=np.float64)
+        for row, passage in enumerate(passages):
+            # Le titre compte double: il résume la question d'une FAQ
+            tokens = tokenize(passage.title) * 2 + tokenize(passage.text)
+            lengths[row] = len(tokens)
+            for term, count in Counter(tokens).items():
+                rows.append(row)
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+                frequencies.append(count)
+
+        rows_array = np.asarray(rows, dtype=np.int32)
+        columns_array = np.asarray(columns, dtype=np.int32)
+        tf = np.asarray(frequencies, dtype=np.float64)
+        document_frequency = np.bincount(columns_array, minlength=len(vocabulary))
+        count = len(passages)
+        idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if count else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows_array] / average_length)
+        weights = idf[columns_array] * tf * (BM25_K1 + 1) / (tf + norm)
+
+        order = np.argsort(columns_array, kind='stable')
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=indptr[1:])
+        return cls(passages, vocabulary, indptr, rows_array[order], weights[order].astype(np.float32), signature)
+
+    def search(self, query: str, top_k: int = 3) -> List[SearchHit]:
+        """Passages les mieux notés pour la question (score BM25 décroissant)"""
+        terms = set(tokenize(query))
+        columns = [self.vocabulary[term] for term in terms if term in self.vocabulary]
+        if not columns or not self.passages:
+            return []
+        spans = [(self.indptr[column], self.indptr[column + 1]) for column in columns]
+        rows = np.concatenate([self.indices[start:end] for start, end in spans])
+        weights = np.concatenate([self.data[start:end] for start, end in spans])
+        scores = np.bincount(rows, weights=weights, minlength=len(self.passages))
+        matched = np.bincount(rows, weights=np.repeat(self.idf[columns], [end - start for start, end in spans]),
+                              minlength=len(self.passages))
+        # Un terme de poids idf apporte au plus idf * (k1 + 1) au score BM25
+        total_idf = float(self.idf[columns].sum()) + self.unknown_idf * (len(terms) - len(columns))
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [SearchHit(float(scores[row]), float(scores[row]) / (total_idf * (BM25_K1 + 1)),
+                          float(matched[row]) / total_idf, self.passages[row])
+                for row in best if scores[row] > 0]
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        partial = path.with_name(path.name + '.part.npz')
+        np.savez_compressed(
+            partial, indptr=self.indptr, indices=self.indices, data=self.data,
+            terms=np.array(terms, dtype=str),
+            sources=np.array([passage.source for passage in self.passages], dtype=str),
+            titles=np.array([passage.title for passage in self.passages], dtype=str),
+            texts=np.array([passage.text for passage in self.passages], dtype=str),
+            signature=np.array(self.signature),
+        )
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'DocumentIndex':
+        with np.load(path, allow_pickle=False) as archive:
+            passages = [Passage(str(source), str(title), str(text))
+                        for source, title, text in zip(archive['sources'], archive['titles'], archive['texts'])]
+            vocabulary = {str(term): column for column, term in enumerate(archive['terms'])}
+            return cls(passages, vocabulary, archive['indptr'], archive['indices'], archive['data'],
+                       str(archive['signature']))
+
+
+def load_index(index_path: Optional[Path] = DEFAULT_INDEX_PATH,
+               sources: Optional[Sequence[Path]] = None) -> DocumentIndex:
+    """Index persisté s'il correspond aux sources, sinon reconstruit (et réécrit si index_path)"""
+    sources = list(sources) if sources is not None else default_sources()
+    signature = sources_signature(sources)
+    if index_path is not None and Path(index_path).exists():
+        try:
+            index = DocumentIndex.load(index_path)
+            if index.signature == signature:
+                return index
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Index de recherche illisible, reconstruction: %s", e)
+    index = DocumentIndex.build(load_passages(sources), signature)
+    if index_path is not None:
+        try:
+            index.save(index_path)
+        except OSError as e:
+            logger.warning("Index de recherche non persisté: %s", e)
+    return index
+
+
+def format_answer(results: List[SearchHit], max_chars: int = 1500) -> Optional[str]:
+    """Réponse fondée sur le meilleur passage, avec ses sources; None si rien n'est pertinent"""
+    relevant = [hit.passage for hit in results if hit.relevant]
+    if not relevant:
+        return None
+    best = relevant[0]
+    text = best.text if len(best.text) <= max_chars else best.text[:max_chars].rsplit(' ', 1)[0] + ' …'
+    # Dernier titre seulement: le chemin complet reste dans les sources
+    heading = f"**{best.title.split(' › ')[-1]}**\n\n" if best.title else ''
+    sources = '\n'.join(f"- {passage.source}" + (f" › {passage.title}" if passage.title else '')
+                        for passage in relevant)
+    return f"{heading}{text}\n\n📚 Sources :\n{sources}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recherche dans la documentation FormBuilder Pro")
+    parser.add_argument('query', nargs='*', help="Question (vide: reconstruit seulement l'index)")
+    parser.add_argument('--index', type=Path, default=DEFAULT_INDEX_PATH)
+    parser.add_argument('--top', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = load_index(args.index)
+    print(f"📚 {len(index.passages)} passages, {len(index.vocabulary)} termes "
+          f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    if args.query:
+        start = time.perf_counter()
+        results = index.search(' '.join(args.query), args.top)
+        elapsed = (time.perf_counter() - start) * 1000
+        for hit in results:
+            marker = '' if hit.relevant else ' (non pertinent)'
+            print(f"\n[{hit.score:.2f} | relatif {hit.relevance:.2f} | couverture {hit.coverage:.2f}]{marker} "
+                  f"{hit.passage.source} › {hit.passage.title}\n{hit.passage.text[:400]}")
+        print(f"\n⏱️ {elapsed:.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
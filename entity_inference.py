@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Inférence d'entités par similarité de noms pour FormBuilder Pro
+Rapproche les noms et libellés des composants DFM des entités MfactModels
+via un index de n-grammes de caractères et un scoring vectorisé NumPy
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+MFACT_MODELS_DIR = Path(__file__).parent / 'MfactModels'
+GRAPHQL_SCHEMA_PATH = MFACT_MODELS_DIR / 'schema.graphql'
+
+# Conversion des types C# vers les DataType du JSON de formulaire
+CSHARP_DATA_TYPES = {
+    'string': 'STRING',
+    'char': 'STRING',
+    'decimal': 'NUMERIC',
+    'double': 'NUMERIC',
+    'float': 'NUMERIC',
+    'int': 'NUMERIC',
+    'long': 'NUMERIC',
+    'short': 'NUMERIC',
+    'byte': 'NUMERIC',
+    'DateTime': 'DATE',
+    'bool': 'BOOL'
+}
+
+# Préfixes et suffixes usuels des noms de contrôles Delphi (edFund, Fndlkup1, cbBrokerCombo...)
+CONTROL_PREFIXES = ('dbl', 'dbe', 'cbo', 'chk', 'btn', 'lbl', 'grd', 'pnl', 'dtp', 'lkp', 'ed', 'cb', 'rg', 'dt', 'gb', 'mm', 'sp')
+CONTROL_SUFFIXES = ('lookup', 'combo', 'lkup', 'grid', 'edit', 'lkp', 'cbo', 'id')
+
+_PROPERTY_PATTERN = re.compile(r'public\s+([\w<>\[\]]+)(\??)\s+(\w+)\s*\{\s*get', re.IGNORECASE)
+_CLASS_PATTERN = re.compile(r'public\s+class\s+(\w+)')
+_GRAPHQL_TYPE_PATTERN = re.compile(r'^type\s+(\w+)\s*\{(.*?)^\}', re.MULTILINE | re.DOTALL)
+_GRAPHQL_FIELD_PATTERN = re.compile(r'^\s*(\w+)\s*(?:\([^)]*\))?\s*:\s*(\[?\w+!?\]?!?)', re.MULTILINE)
+_CAMEL_SPLIT_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+# Pondérations du scoring
+START_GRAM_WEIGHT = 2.0
+KEY_COLUMN_FACTOR = 0.95
+OTHER_COLUMN_FACTOR = 0.6
+# Origines d'une correspondance acceptable sans revue (form_engine): pas une colonne secondaire seule
+AUTO_ACCEPT_ORIGINS = ('name', 'key')
+ENDPOINT_BONUS = 0.03
+COLUMN_MIN_SIMILARITY = 0.3
+QUERY_CACHE_SIZE = 50000
+
+
+@dataclass
+class EntityDefinition:
+    """Description d'une entité MfactModels"""
+    name: str
+    key_field: str
+    columns: List[str]
+    data_types: Dict[str, str] = field(default_factory=dict)
+    endpoint: Optional[str] = None
+    aliases: List[str] = field(default_factory=list)
+
+    @property
+    def description_field(self) -> Optional[str]:
+        """Première colonne descriptive (nom, libellé) après la clé"""
+        for column in self.columns:
+            lowered = column.lower()
+            if lowered != self.key_field.lower() and ('desc' in lowered or 'nam' in lowered):
+                return column
+        return None
+
+
+@dataclass
+class EntityMatch:
+    """Résultat classé de l'inférence d'entité"""
+    entity: str
+    confidence: float
+    key_field: str
+    endpoint: Optional[str] = None
+    matched_on: str = 'name'
+
+
+def parse_graphql_schema(schema_path: Path) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+    """Extrait les types GraphQL (champs) et les requêtes de liste All* -> type retourné"""
+    if not schema_path.exists():
+        return {}, {}
+
+    content = schema_path.read_text(encoding='utf-8')
+    types = {}
+    for match in _GRAPHQL_TYPE_PATTERN.finditer(content):
+        types[match.group(1)] = {
+            name: gql_type for name, gql_type in _GRAPHQL_FIELD_PATTERN.findall(match.group(2))
+        }
+
+    list_queries = {}
+    for query_name, gql_type in types.pop('Queries', {}).items():
+        return_type = gql_type.strip('[]!')
+        if gql_type.startswith('[') and return_type in types:
+            list_queries[return_type] = query_name
+    types.pop('Mutations', None)
+    return types, list_queries
+
+
+def _parse_entity_file(path: Path) -> Optional[EntityDefinition]:
+    """Parse une classe C# MfactModels en définition d'entité"""
+    content = path.read_text(encoding='utf-8-sig')
+    class_match = _CLASS_PATTERN.search(content)
+    if not class_match:
+        return None
+
+    columns = []
+    data_types = {}
+    key_field = None
+    for cs_type, nullable, prop_name in _PROPERTY_PATTERN.findall(content):
+        column = prop_name.lower()
+        columns.append(column)
+        data_types[column] = CSHARP_DATA_TYPES.get(cs_type, 'STRING')
+        if key_field is None and not nullable:
+            key_field = column
+
+    if not columns:
+        return None
+
+    return EntityDefinition(
+        name=class_match.group(1),
+        key_field=key_field or columns[0],
+        columns=columns,
+        data_types=data_types
+    )
+
+
+@lru_cache(maxsize=4)
+def load_entity_catalog(models_dir: Path = MFACT_MODELS_DIR, schema_path: Path = GRAPHQL_SCHEMA_PATH) -> Tuple[EntityDefinition, ...]:
+    """Charge les entités MfactModels, alignées sur les noms de colonnes et endpoints GraphQL"""
+    entities = []
+    for path in sorted(Path(models_dir).glob('*.cs')):
+        entity = _parse_entity_file(path)
+        if entity:
+            entities.append(entity)
+
+    graphql_types, list_queries = parse_graphql_schema(Path(schema_path))
+
+    # Alignement type GraphQL -> entité par recouvrement des noms de champs (Fund -> Fndmas, Source -> Psrc)
+    for type_name, type_fields in graphql_types.items():
+        gql_columns = {name.lower(): name for name in type_fields}
+        best_entity, best_overlap = None, 0.0
+        for entity in entities:
+            entity_columns = set(entity.columns)
+            overlap = len(entity_columns & gql_columns.keys()) / len(entity_columns | gql_columns.keys())
+            if entity.name.lower() == type_name.lower():
+                overlap += 1.0
+            if overlap > best_overlap:
+                best_entity, best_overlap = entity, overlap
+        if best_entity is None or best_overlap < 0.5:
+            continue
+
+        # Les colonnes prennent la casse exposée par GraphQL (tkr_desc -> tkr_DESC)
+        renamed = {column: gql_columns.get(column, column) for column in best_entity.columns}
+        best_entity.columns = [renamed[column] for column in best_entity.columns]
+        best_entity.data_types = {renamed[column]: dtype for column, dtype in best_entity.data_types.items()}
+        best_entity.key_field = renamed[best_entity.key_field]
+        if type_name in list_queries and best_entity.endpoint is None:
+            best_entity.endpoint = list_queries[type_name]
+        if type_name.lower() != best_entity.name.lower():
+            best_entity.aliases.append(type_name)
+
+    return tuple(entities)
+
+
+@lru_cache(maxsize=65536)
+def normalize_control_name(name: str) -> str:
+    """Réduit un nom de contrôle Delphi à sa racine métier (Fndlkup1 -> fnd, edFundID -> fund)"""
+    tokens = [token.lower() for token in _CAMEL_SPLIT_PATTERN.findall(name) if not token.isdigit()]
+    if len(tokens) > 1 and tokens[0] in CONTROL_PREFIXES:
+        tokens = tokens[1:]
+    if len(tokens) > 1 and tokens[-1] in CONTROL_SUFFIXES:
+        tokens = tokens[:-1]
+
+    stem = ''.join(tokens)
+    for suffix in CONTROL_SUFFIXES:
+        if stem.endswith(suffix) and len(stem) > len(suffix) + 1:
+            stem = stem[:-len(suffix)]
+            break
+    return stem
+
+
+def _char_ngrams(text: str) -> List[str]:
+    """Trigrammes de caractères bornés par ^ et $, plus le bigramme initial"""
+    padded = f'^{text}$'
+    grams = [padded[:2]]
+    grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class EntityInferenceIndex:
+    """Index précalculé de n-grammes sur les noms d'entités et de colonnes"""
+
+    def __init__(self, entities: Optional[Sequence[EntityDefinition]] = None):
+        self.entities = list(entities if entities is not None else load_entity_catalog())
+        self.entity_position = {entity.name.lower(): i for i, entity in enumerate(self.entities)}
+
+        # Documents: noms d'entités (et alias GraphQL) puis noms de colonnes dédupliqués
+        documents, name_owners = [], []
+        for position, entity in enumerate(self.entities):
+            for name in [entity.name] + entity.aliases:
+                documents.append(name.lower())
+                name_owners.append(position)
+        self.name_documents = np.arange(len(documents), dtype=np.int64)
+        self.name_starts = np.searchsorted(np.asarray(name_owners), np.arange(len(self.entities)))
+        column_document = {}
+        for entity in self.entities:
+            for column in entity.columns:
+                lowered = column.lower()
+                if lowered not in column_document:
+                    column_document[lowered] = len(documents)
+                    documents.append(lowered)
+
+        self.vocabulary = {}
+        doc_ids, gram_ids = [], []
+        for doc_id, document in enumerate(documents):
+            for gram in set(_char_ngrams(document)):
+                gram_ids.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        gram_ids = np.asarray(gram_ids, dtype=np.int32)
+        self.n_documents = len(documents)
+
+        # Pondération TF-IDF, renforcée sur les n-grammes de début de mot
+        document_frequency = np.bincount(gram_ids, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + self.n_documents) / (1 + document_frequency)).astype(np.float32) + 1.0
+        self.max_idf = float(np.log(1 + self.n_documents)) + 1.0
+        start_weight = np.array(
+            [START_GRAM_WEIGHT if gram.startswith('^') else 1.0 for gram in self.vocabulary],
+            dtype=np.float32
+        )
+        self.gram_weight = self.idf * start_weight
+
+        weights = self.gram_weight[gram_ids]
+        doc_norms = np.sqrt(np.bincount(doc_ids, weights=weights ** 2, minlength=self.n_documents))
+        weights = weights / doc_norms[doc_ids]
+
+        # Listes de postings triées par n-gramme (équivalent CSC)
+        order = np.argsort(gram_ids, kind='stable')
+        self.posting_docs = doc_ids[order]
+        self.posting_weights = weights[order].astype(np.float32)
+        self.posting_offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(self.vocabulary)), out=self.posting_offsets[1:])
+
+        # Correspondances entité -> documents colonnes (clé et autres), groupées par entité
+        pair_entities, pair_docs, key_docs = [], [], []
+        for position, entity in enumerate(self.entities):
+            key_docs.append(column_document[entity.key_field.lower()])
+            for column in entity.columns:
+                pair_entities.append(position)
+                pair_docs.append(column_document[column.lower()])
+        self.key_documents = np.asarray(key_docs, dtype=np.int64)
+
+        # Colonne -> entités qui la portent (format CSR)
+        self.first_column_document = len(self.name_documents)
+        pair_docs = np.asarray(pair_docs, dtype=np.int64) - self.first_column_document
+        order = np.argsort(pair_docs, kind='stable')
+        self.column_entities = np.asarray(pair_entities, dtype=np.int64)[order]
+        self.column_entity_offsets = np.zeros(len(column_document) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_docs, minlength=len(column_document)), out=self.column_entity_offsets[1:])
+        self.endpoint_bonus = np.array(
+            [ENDPOINT_BONUS if entity.endpoint else 0.0 for entity in self.entities],
+            dtype=np.float32
+        )
+        self._query_cache = {}
+
+    def _query_grams(self, text: str) -> Tuple[np.ndarray, np.ndarray, float]:
+        """N-grammes connus d'un texte, leurs poids et la norme de la requête"""
+        cached = self._query_cache.get(text)
+        if cached is None:
+            grams = set(_char_ngrams(text))
+            known = np.array([self.vocabulary[gram] for gram in grams if gram in self.vocabulary], dtype=np.int64)
+            weights = self.gram_weight[known]
+            # Les n-grammes inconnus comptent dans la norme avec le poids IDF maximal
+            unknown = len(grams) - len(known)
+            norm = float(np.sqrt(np.sum(weights ** 2) + unknown * self.max_idf ** 2)) or 1.0
+            cached = (known, weights / norm, norm)
+            if len(self._query_cache) >= QUERY_CACHE_SIZE:
+                self._query_cache.clear()
+            self._query_cache[text] = cached
+        return cached
+
+    def _score_documents(self, texts: Sequence[str]) -> np.ndarray:
+        """Similarité cosinus de tous les documents contre chaque texte (matrice documents x textes)"""
+        per_text = [self._query_grams(text) for text in texts]
+        lengths_per_text = np.fromiter((len(known) for known, _, _ in per_text), dtype=np.int64, count=len(texts))
+        scores = np.zeros(self.n_documents * len(texts), dtype=np.float64)
+        if not lengths_per_text.sum():
+            return scores.reshape(self.n_documents, len(texts))
+
+        query_rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths_per_text)
+        query_grams = np.concatenate([known for known, _, _ in per_text])
+        query_weights = np.concatenate([weights for _, weights, _ in per_text])
+
+        # Expansion vectorisée des postings de chaque (texte, n-gramme)
+        starts = self.posting_offsets[query_grams]
+        lengths = self.posting_offsets[query_grams + 1] - starts
+        total = int(lengths.sum())
+        if total:
+            group_starts = np.cumsum(lengths) - lengths
+            positions = np.arange(total) + np.repeat(starts - group_starts, lengths)
+            contributions = np.repeat(query_weights, lengths) * self.posting_weights[positions]
+            flat_index = self.posting_docs[positions].astype(np.int64) * len(texts) + np.repeat(query_rows, lengths)
+            scores = np.bincount(flat_index, weights=contributions, minlength=scores.size)
+        return scores.reshape(self.n_documents, len(texts))
+
+    def score_entities(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Score de chaque entité contre chaque texte (entités x textes), avec l'origine du meilleur score"""
+        document_scores = self._score_documents(texts)
+        # Les alias (type GraphQL) partagent la ligne de leur entité
+        name_scores = np.maximum.reduceat(document_scores[self.name_documents], self.name_starts, axis=0)
+        key_scores = document_scores[self.key_documents] * KEY_COLUMN_FACTOR
+
+        # Colonnes: seules les similarités utiles sont diffusées vers leurs entités (liste creuse)
+        column_block = document_scores[self.first_column_document:]
+        column_rows, text_columns = np.nonzero(column_block >= COLUMN_MIN_SIMILARITY)
+        column_values = column_block[column_rows, text_columns] * OTHER_COLUMN_FACTOR
+        starts = self.column_entity_offsets[column_rows]
+        counts = self.column_entity_offsets[column_rows + 1] - starts
+        group_starts = np.cumsum(counts) - counts
+        positions = np.arange(int(counts.sum())) + np.repeat(starts - group_starts, counts)
+        column_scores = np.zeros_like(key_scores)
+        np.maximum.at(
+            column_scores,
+            (self.column_entities[positions], np.repeat(text_columns, counts)),
+            np.repeat(column_values, counts)
+        )
+
+        combined = np.maximum(np.maximum(name_scores, key_scores), column_scores)
+        origins = np.where(combined == name_scores, 0, np.where(combined == key_scores, 1, 2))
+        combined += self.endpoint_bonus[:, None]
+        return np.clip(combined, 0.0, 1.0), origins
+
+    def infer_batch(self, controls: Sequence[Tuple[str, Optional[str]]], top_k: int = 3) -> List[List[EntityMatch]]:
+        """Classe les entités candidates pour une série de (nom du composant, libellé)"""
+        # Déduplication des textes: les racines (fund, tkr, qty...) se répètent d'un formulaire à l'autre
+        text_positions = {}
+        variants = np.full((2, len(controls)), -1, dtype=np.int64)
+        for control_index, (name, caption) in enumerate(controls):
+            for variant, raw in enumerate((name, caption)):
+                text = normalize_control_name(raw or '')
+                if text:
+                    variants[variant, control_index] = text_positions.setdefault(text, len(text_positions))
+
+        results = [[] for _ in controls]
+        if not text_positions:
+            return results
+
+        combined, origins = self.score_entities(list(text_positions))
+        # Colonne supplémentaire à score nul pour les variantes absentes
+        combined = np.concatenate([combined, np.full((len(self.entities), 1), -1.0)], axis=1)
+        origins = np.concatenate([origins, np.zeros((len(self.entities), 1), dtype=origins.dtype)], axis=1)
+
+        name_scores, caption_scores = combined[:, variants[0]], combined[:, variants[1]]
+        use_caption = caption_scores > name_scores
+        control_scores = np.where(use_caption, caption_scores, name_scores).T
+        control_origins = np.where(use_caption, origins[:, variants[1]], origins[:, variants[0]]).T
+
+        k = min(top_k, len(self.entities))
+        candidates = np.argpartition(-control_scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(control_scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        candidate_origins = np.take_along_axis(control_origins, candidates, axis=1)
+
+        origin_labels = ('name', 'key', 'column')
+        for control_index in np.flatnonzero(variants.max(axis=0) >= 0):
+            for position, score, origin in zip(candidates[control_index], candidate_scores[control_index], candidate_origins[control_index]):
+                entity = self.entities[position]
+                results[control_index].append(EntityMatch(
+                    entity=entity.name,
+                    confidence=round(float(score), 4),
+                    key_field=entity.key_field,
+                    endpoint=entity.endpoint,
+                    matched_on=origin_labels[origin]
+                ))
+        return results
+
+    def infer(self, name: str, caption: Optional[str] = None, top_k: int = 3) -> List[EntityMatch]:
+        """Classe les entités candidates pour un composant"""
+        return self.infer_batch([(name, caption)], top_k=top_k)[0]
+
+    def entity_info(self, match: EntityMatch) -> Dict[str, Any]:
+        """Construit une information d'entité au format de parse_info_content"""
+        entity = self.entities[self.entity_position[match.entity.lower()]]
+        columns = [entity.key_field]
+        if entity.description_field:
+            columns.append(entity.description_field)
+        return {
+            'name': entity.name,
+            'key_field': entity.key_field,
+            'endpoint': entity.endpoint,
+            'columns': columns,
+            'confidence': match.confidence
+        }
+
+
+@lru_cache(maxsize=1)
+def get_default_index() -> EntityInferenceIndex:
+    """Index partagé construit sur le catalogue MfactModels du dépôt"""
+    return EntityInferenceIndex()
@@ -0,0 +1 @@
+"""Évaluation de la précision et de la latence des modes de conversion sur un corpus de référence"""
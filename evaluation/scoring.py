@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Score d'un formulaire généré par rapport au formulaire de référence
+Champs (F1 sur les Id), types et entités des champs appariés, validations (F1 sur
+les conditions); les deux formulaires sont d'abord ramenés au dialecte canonique
+(form_normalizer), quel que soit leur dialecte d'origine (Fields/fields, Id/id...)
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
+
+from form_normalizer import canonical
+
+# Synonymes rencontrés dans les templates et les réponses des modèles
+TYPE_ALIASES = {
+    'DATEPKR': 'DATEPICKER',
+    'RADIO': 'RADIOGRP',
+    'RADIOGROUP': 'RADIOGRP',
+    'NUMBER': 'NUMERIC',
+    'CHECKBOXGRP': 'CHECKBOX',
+}
+OPERATOR_ALIASES = {
+    'NE': 'NEQ',
+    'GE': 'GTE',
+    'LE': 'LTE',
+}
+
+
+def iter_fields(fields: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Parcourt les champs à plat, enfants des GROUP compris"""
+    for item in fields or ():
+        if not isinstance(item, dict):
+            continue
+        yield item
+        yield from iter_fields(item.get('ChildFields'))
+
+
+def field_index(form: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Champs par Id normalisé (minuscules) d'un formulaire canonique; le premier champ d'un Id dupliqué l'emporte"""
+    index = {}
+    for item in iter_fields(form.get('Fields')):
+        field_id = item.get('Id')
+        if field_id and str(field_id).lower() not in index:
+            index[str(field_id).lower()] = item
+    return index
+
+
+def normalize_type(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = str(value).upper()
+    return TYPE_ALIASES.get(value, value)
+
+
+def validation_signatures(form: Dict[str, Any]) -> Set[Tuple[Tuple[str, str], ...]]:
+    """Une validation = ensemble trié de ses conditions (champ, opérateur normalisé)"""
+    signatures = set()
+    for validation in form.get('Validations') or ():
+        expression = validation.get('CondExpression') or {}
+        conditions = []
+        for condition in expression.get('Conditions') or ():
+            right = condition.get('RightField')
+            operator = str(condition.get('Operator', '')).upper()
+            if right:
+                conditions.append((str(right).lower(), OPERATOR_ALIASES.get(operator, operator)))
+        if conditions:
+            signatures.add(tuple(sorted(conditions)))
+    return signatures
+
+
+def _f1(expected: Set[Any], actual: Set[Any]) -> Tuple[float, float, float]:
+    if not expected and not actual:
+        return 1.0, 1.0, 1.0
+    matched = len(expected & actual)
+    precision = matched / len(actual) if actual else 0.0
+    recall = matched / len(expected) if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+@dataclass
+class FormScore:
+    """Scores d'un formulaire (0 à 1) et détail des écarts"""
+    field_precision: float
+    field_recall: float
+    field_f1: float
+    type_accuracy: float
+    entity_accuracy: float
+    validation_f1: float
+    missing_fields: List[str] = field(default_factory=list)
+    extra_fields: List[str] = field(default_factory=list)
+    type_mismatches: List[str] = field(default_factory=list)
+    entity_mismatches: List[str] = field(default_factory=list)
+
+    @property
+    def overall(self) -> float:
+        return (self.field_f1 + self.type_accuracy + self.entity_accuracy + self.validation_f1) / 4
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'overall': round(self.overall, 4),
+            'field_precision': round(self.field_precision, 4),
+            'field_recall': round(self.field_recall, 4),
+            'field_f1': round(self.field_f1, 4),
+            'type_accuracy': round(self.type_accuracy, 4),
+            'entity_accuracy': round(self.entity_accuracy, 4),
+            'validation_f1': round(self.validation_f1, 4),
+            'missing_fields': self.missing_fields,
+            'extra_fields': self.extra_fields,
+            'type_mismatches': self.type_mismatches,
+            'entity_mismatches': self.entity_mismatches,
+        }
+
+
+def score_form(expected: Dict[str, Any], actual: Dict[str, Any]) -> FormScore:
+    """Compare un formulaire généré à sa référence"""
+    # Les Id dupliqués sont gardés tels quels: seul le premier compte (field_index)
+    expected, actual = canonical(expected, repair_ids=False), canonical(actual, repair_ids=False)
+    expected_fields, actual_fields = field_index(expected), field_index(actual)
+    precision, recall, f1 = _f1(set(expected_fields), set(actual_fields))
+    matched = sorted(set(expected_fields) & set(actual_fields))
+
+    type_mismatches = [
+        f"{field_id}: {actual_fields[field_id].get('type')} != {expected_fields[field_id].get('type')}"
+        for field_id in matched
+        if normalize_type(expected_fields[field_id].get('type'))
+        != normalize_type(actual_fields[field_id].get('type'))
+    ]
+    # Les types sont jugés sur les champs appariés; un champ manquant est déjà pénalisé par le F1
+    type_accuracy = 1 - len(type_mismatches) / len(matched) if matched else (1.0 if not expected_fields else 0.0)
+
+    # Entités: tous les champs attendus avec une entité (un champ manquant compte comme erreur)
+    with_entity = [field_id for field_id, item in expected_fields.items() if item.get('Entity')]
+    entity_mismatches = []
+    for field_id in with_entity:
+        expected_entity = str(expected_fields[field_id].get('Entity')).lower()
+        actual_entity = actual_fields.get(field_id, {}).get('Entity')
+        if not actual_entity or str(actual_entity).lower() != expected_entity:
+            entity_mismatches.append(f"{field_id}: {actual_entity} != {expected_fields[field_id].get('Entity')}")
+    entity_accuracy = 1 - len(entity_mismatches) / len(with_entity) if with_entity else 1.0
+
+    _, _, validation_f1 = _f1(validation_signatures(expected), validation_signatures(actual))
+
+    return FormScore(
+        precision, recall, f1, type_accuracy, entity_accuracy, validation_f1,
+        missing_fields=sorted(expected_fields[field_id]['Id'] for field_id in set(expected_fields) - set(actual_fields)),
+        extra_fields=sorted(actual_fields[field_id]['Id'] for field_id in set(actual_fields) - set(expected_fields)),
+        type_mismatches=type_mismatches,
+        entity_mismatches=entity_mismatches,
+    )
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Sélection d'exemples few-shot par similarité pour les conversions par modèle (FormBuilder Pro)
+Plutôt que d'insérer des templates entiers dans le prompt, le DFM à convertir est résumé en
+une empreinte (multiset des types de composants, entités pressenties, structure) et comparé
+par produit scalaire à un index précalculé de formulaires déjà convertis; les k plus proches
+entrent dans le prompt tant que le budget de tokens le permet
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional, Sequence
+
+import numpy as np
+
+from conversion_metrics import ConversionMetrics
+from form_engine import FormGeneratorAI
+from form_normalizer import canonical, iter_form_files
+from llm_conversion import CHARS_PER_TOKEN
+from program_templates import PROGRAM_TEMPLATES_DIR
+
+# Budget des exemples après le plus proche, toujours retenu même s'il le dépasse (ACCADJ ~1 100
+# tokens): un second exemple de taille courante (225 à 375 tokens sur le corpus de référence) au plus
+DEFAULT_TOP_K = 2
+DEFAULT_TOKEN_BUDGET = 600
+# Index construit par 'build' pour les conversions du service (templates de programmes à défaut)
+DEFAULT_INDEX_PATH = os.getenv('FORMBUILDER_FEWSHOT_INDEX')
+# Similarité cosinus en dessous de laquelle un exemple induit plus en erreur qu'il n'aide
+MIN_SIMILARITY = 0.35
+
+# Blocs de l'empreinte et leur poids dans la similarité
+FIELD_TYPES = ('GRIDLKP', 'LSTLKP', 'SELECT', 'DATEPICKER', 'CHECKBOX', 'RADIOGRP', 'GROUP',
+               'TEXT', 'TEXTAREA', 'NUMERIC', 'OTHER')
+TYPE_ALIASES = {'DATEPKR': 'DATEPICKER', 'RADIO': 'RADIOGRP', 'RADIOGROUP': 'RADIOGRP', 'NUMBER': 'NUMERIC'}
+ENTITY_BUCKETS = 32
+STRUCTURE_FEATURES = ('fields', 'validations', 'required_ratio', 'groups', 'depth')
+BLOCK_WEIGHTS = {'types': 0.5, 'entities': 0.35, 'structure': 0.15}
+DIMENSIONS = len(FIELD_TYPES) + ENTITY_BUCKETS + len(STRUCTURE_FEATURES)
+
+_TYPE_COLUMN = {field_type: column for column, field_type in enumerate(FIELD_TYPES)}
+
+logger = logging.getLogger(__name__)
+
+
+def _normalized(block: np.ndarray, weight: float) -> np.ndarray:
+    norm = np.linalg.norm(block)
+    return block * (weight / norm) if norm else block
+
+
+def fingerprint_form(form: Dict[str, Any]) -> np.ndarray:
+    """Empreinte (vecteur unitaire) d'un formulaire JSON, quel que soit son dialecte"""
+    form = canonical(form, repair_ids=False)
+    types = np.zeros(len(FIELD_TYPES), dtype=np.float32)
+    entities = np.zeros(ENTITY_BUCKETS, dtype=np.float32)
+    fields = required = groups = depth = 0
+
+    pending = [(item, 1) for item in form.get('Fields') or ()]
+    while pending:
+        item, level = pending.pop()
+        if not isinstance(item, dict):
+            continue
+        fields += 1
+        depth = max(depth, level)
+        field_type = str(item.get('type') or '').upper()
+        field_type = TYPE_ALIASES.get(field_type, field_type)
+        types[_TYPE_COLUMN.get(field_type, _TYPE_COLUMN['OTHER'])] += 1
+        if item.get('required'):
+            required += 1
+        if item.get('Entity'):
+            entities[zlib.crc32(str(item['Entity']).lower().encode()) % ENTITY_BUCKETS] += 1
+        children = item.get('ChildFields') or ()
+        if children:
+            groups += 1
+            pending.extend((child, level + 1) for child in children)
+
+    structure = np.array([
+        np.log1p(fields), np.log1p(len(form.get('Validations') or ())),
+        required / fields if fields else 0.0, np.log1p(groups), depth,
+    ], dtype=np.float32)
+    vector = np.concatenate([
+        _normalized(np.log1p(types), BLOCK_WEIGHTS['types']),
+        _normalized(np.log1p(entities), BLOCK_WEIGHTS['entities']),
+        _normalized(structure, BLOCK_WEIGHTS['structure']),
+    ])
+    return _normalized(vector, 1.0)
+
+
+def fingerprint_dfm(dfm_content: Optional[str], info_content: Optional[str], form_id: str,
+                    generator: Optional[FormGeneratorAI] = None) -> np.ndarray:
+    """
+    Empreinte d'un DFM à convertir: ses composants passent par la génération déterministe
+    (types JSON, entités du fichier Info et de l'index d'inférence) avant d'être résumés
+    """
+    generator = generator or FormGeneratorAI(ConversionMetrics())
+    dfm_data = generator.parse_dfm_content(dfm_content) if dfm_content else None
+    info_data = generator.parse_info_content(info_content) if info_content else {}
+    return fingerprint_form(generator.generate_form_json(dfm_data, info_data, form_id))
+
+
+def compact_example(form: Dict[str, Any]) -> str:
+    """Formulaire sérialisé sans espaces, tel qu'inséré dans le prompt"""
+    return json.dumps(form, separators=(',', ':'), ensure_ascii=False)
+
+
+@dataclass
+class FewShotExample:
+    """Exemple retenu pour un prompt"""
+    menu_id: str
+    similarity: float
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return len(self.text) // CHARS_PER_TOKEN
+
+
+class FewShotIndex:
+    """Empreintes des formulaires déjà convertis (une ligne par formulaire) et leur JSON compact"""
+
+    def __init__(self, menu_ids: List[str], texts: List[str], matrix: np.ndarray):
+        self.menu_ids = menu_ids
+        self.texts = texts
+        self.matrix = matrix.reshape(len(menu_ids), DIMENSIONS).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.menu_ids)
+
+    @classmethod
+    def from_forms(cls, forms: Iterable[Dict[str, Any]]) -> 'FewShotIndex':
+        menu_ids, texts, vectors = [], [], []
+        for form in forms:
+            form = canonical(form, repair_ids=False)
+            menu_ids.append(str(form.get('MenuID') or f'FORM{len(menu_ids) + 1}'))
+            texts.append(compact_example(form))
+            vectors.append(fingerprint_form(form))
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, DIMENSIONS), dtype=np.float32)
+        return cls(menu_ids, texts, matrix)
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Path]) -> 'FewShotIndex':
+        """Formulaires *.json de fichiers ou répertoires (sorties de batch, templates...)"""
+        def forms():
+            for source in paths:
+                for path in iter_form_files(Path(source)):
+                    try:
+                        form = json.loads(path.read_text(encoding='utf-8'))
+                    except (OSError, ValueError) as e:
+                        logger.warning("Exemple ignoré %s: %s", path, e)
+                        continue
+                    if isinstance(form, dict):
+                        yield form
+        return cls.from_forms(forms())
+
+    def save(self, path: Path):
+        """Écrit l'index sous ce nom exact (np.savez ajoute .npz à un chemin, pas à un fichier ouvert)"""
+        path = Path(path)
+        partial = path.with_name(path.name + '.part')
+        with open(partial, 'wb') as handle:
+            np.savez_compressed(handle, menu_ids=np.array(self.menu_ids, dtype=str),
+                                texts=np.array(self.texts, dtype=str), matrix=self.matrix)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'FewShotIndex':
+        with np.load(path, allow_pickle=False) as archive:
+            return cls([str(value) for value in archive['menu_ids']], [str(value) for value in archive['texts']],
+                       archive['matrix'])
+
+    def select(self, fingerprint: np.ndarray, top_k: int = DEFAULT_TOP_K, token_budget: int = DEFAULT_TOKEN_BUDGET,
+               exclude: Sequence[str] = (), min_similarity: float = MIN_SIMILARITY) -> List[FewShotExample]:
+        """
+        Les top_k formulaires les plus proches, par similarité décroissante. Le plus proche est
+        toujours retenu; les suivants le sont si le total tient dans token_budget (un exemple trop
+        long est sauté au profit du suivant)
+        """
+        if not len(self):
+            return []
+        similarities = self.matrix @ fingerprint.astype(np.float32)
+        excluded = {menu_id.upper() for menu_id in exclude}
+        selected: List[FewShotExample] = []
+        budget = token_budget
+        for row in np.argsort(-similarities):
+            similarity = float(similarities[row])
+            if similarity < min_similarity or len(selected) >= top_k:
+                break
+            if self.menu_ids[row].upper() in excluded:
+                continue
+            example = FewShotExample(self.menu_ids[row], similarity, self.texts[row])
+            if not selected or example.tokens <= budget:
+                selected.append(example)
+                budget -= example.tokens
+        return selected
+
+
+class FewShotSelector:
+    """Empreinte du DFM puis sélection dans l'index; utilisé par LLMConverter(selector=...)"""
+
+    def __init__(self, index: FewShotIndex, top_k: int = DEFAULT_TOP_K, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.index = index
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.generator = FormGeneratorAI(ConversionMetrics())
+
+    def select(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str,
+               exclude: Sequence[str] = ()) -> List[FewShotExample]:
+        fingerprint = fingerprint_dfm(dfm_content, info_content, form_id, self.generator)
+        # Le formulaire lui-même (déjà converti une fois) n'est pas son propre exemple
+        return self.index.select(fingerprint, self.top_k, self.token_budget, exclude=(form_id, *exclude))
+
+    def context(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str) -> str:
+        """Section du prompt de conversion (vide si aucun exemple assez proche)"""
+        return format_examples(self.select(dfm_content, info_content, form_id))
+
+
+def format_examples(examples: Sequence[FewShotExample]) -> str:
+    """Section de prompt listant les exemples retenus"""
+    if not examples:
+        return ''
+    blocks = [f'Example {number} (MenuID {example.menu_id}, similarity {example.similarity:.2f}):\n{example.text}'
+              for number, example in enumerate(examples, 1)]
+    return 'Converted forms similar to this one, for reference:\n\n' + '\n\n'.join(blocks)
+
+
+def default_index() -> FewShotIndex:
+    """Index des templates de programmes (à défaut d'un index construit sur un corpus)"""
+    return FewShotIndex.from_paths([PROGRAM_TEMPLATES_DIR])
+
+
+@lru_cache(maxsize=1)
+def get_default_index() -> FewShotIndex:
+    """Index partagé des conversions du service: FORMBUILDER_FEWSHOT_INDEX, sinon les templates"""
+    if DEFAULT_INDEX_PATH:
+        try:
+            return FewShotIndex.load(Path(DEFAULT_INDEX_PATH))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Index few-shot illisible %s, templates utilisés: %s", DEFAULT_INDEX_PATH, e)
+    return default_index()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Index few-shot des formulaires convertis")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Construit l'index à partir de formulaires JSON")
+    build.add_argument('sources', nargs='+', type=Path)
+    build.add_argument('-o', '--output', type=Path, required=True)
+    select = commands.add_parser('select', help="Exemples retenus pour un DFM")
+    select.add_argument('dfm', type=Path)
+    select.add_argument('--info', type=Path)
+    select.add_argument('--index', type=Path, help="Index .npz (templates de programmes par défaut)")
+    select.add_argument('--top', type=int, default=DEFAULT_TOP_K)
+    select.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        index = FewShotIndex.from_paths(args.sources)
+        index.save(args.output)
+        print(f"✅ {len(index)} formulaire(s) indexé(s) dans {args.output}", file=sys.stderr)
+        return 0
+
+    index = FewShotIndex.load(args.index) if args.index else get_default_index()
+    selector = FewShotSelector(index, args.top, args.token_budget)
+    form_id = args.dfm.stem.upper()
+    info = args.info.read_text(encoding='utf-8') if args.info else None
+    for example in selector.select(args.dfm.read_text(encoding='utf-8'), info, form_id):
+        print(f"{example.menu_id}\tsimilarité {example.similarity:.3f}\t~{example.tokens} tokens")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Archive compacte et indexée de formulaires JSON FormBuilder Pro
+Un fichier .fbar remplace des milliers de JSON indentés: chaque formulaire est un
+enregistrement binaire où les clés sont des numéros du dictionnaire de clés et les chaînes
+des numéros de la table de chaînes (stockées une seule fois). Un index par MenuID, entité et
+type de composant donne le numéro d'enregistrement; la lecture passe par mmap et ne décode
+que l'enregistrement demandé et les chaînes qu'il référence
+
+Organisation du fichier:
+    en-tête     MAGIC, version
+    enregistrements (écrits au fil de l'eau)
+    table des enregistrements (offset u64, longueur u32) par numéro
+    dictionnaire de clés, table de chaînes (offsets u32 puis UTF-8), index JSON
+    pied de page fixe: offsets des sections et nombre d'enregistrements
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from form_normalizer import canonical, is_form, iter_form_files
+
+MAGIC = b'FBAR'
+VERSION = 1
+_HEADER = struct.Struct('<4sH2x')
+# magic, version, table des enregistrements, clés, chaînes, index, nombre d'enregistrements
+_FOOTER = struct.Struct('<4sHQQQQI')
+_RECORD_ENTRY = struct.Struct('<QI')
+_OFFSET = struct.Struct('<I')
+_FLOAT = struct.Struct('<d')
+
+# Étiquettes des valeurs encodées
+_NULL, _FALSE, _TRUE, _INT, _FLOAT_TAG, _STRING, _LIST, _OBJECT = range(8)
+
+
+class ArchiveError(ValueError):
+    """Fichier d'archive invalide ou formulaire inconnu"""
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: Any, position: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _form_facets(form: Dict[str, Any]) -> Tuple[set, set]:
+    """Entités et types de composants d'un formulaire canonique (groupes compris)"""
+    entities, types = set(), set()
+    pending = list(form.get('Fields') or ())
+    while pending:
+        item = pending.pop()
+        if not isinstance(item, dict):
+            continue
+        if item.get('Entity'):
+            entities.add(str(item['Entity']))
+        if item.get('type'):
+            types.add(str(item['type']))
+        pending.extend(item.get('ChildFields') or ())
+    return entities, types
+
+
+class ArchiveWriter:
+    """
+    Écriture d'une archive; les enregistrements partent sur disque au fil des add(),
+    dictionnaires et index sont écrits à la fermeture.
+        with ArchiveWriter('corpus.fbar') as archive:
+            for form in forms: archive.add(form)
+    """
+
+    def __init__(self, path: Path, normalize: bool = True):
+        self.path = Path(path)
+        self.normalize = normalize
+        self._partial = self.path.with_name(self.path.name + '.part')
+        self._stream = open(self._partial, 'wb')
+        self._stream.write(_HEADER.pack(MAGIC, VERSION))
+        self._keys: Dict[str, int] = {}
+        self._strings: Dict[str, int] = {}
+        self._records: List[Tuple[int, int]] = []
+        self._menu_index: Dict[str, int] = {}
+        self._entity_index: Dict[str, List[int]] = {}
+        self._type_index: Dict[str, List[int]] = {}
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self._stream.close()
+            self._partial.unlink(missing_ok=True)
+
+    def _encode(self, value: Any, buffer: bytearray):
+        if value is None:
+            buffer.append(_NULL)
+        elif value is True:
+            buffer.append(_TRUE)
+        elif value is False:
+            buffer.append(_FALSE)
+        elif isinstance(value, int):
+            buffer.append(_INT)
+            _write_varint(buffer, value * 2 if value >= 0 else -value * 2 - 1)  # Zigzag
+        elif isinstance(value, float):
+            buffer.append(_FLOAT_TAG)
+            buffer += _FLOAT.pack(value)
+        elif isinstance(value, str):
+            buffer.append(_STRING)
+            _write_varint(buffer, self._strings.setdefault(value, len(self._strings)))
+        elif isinstance(value, (list, tuple)):
+            buffer.append(_LIST)
+            _write_varint(buffer, len(value))
+            for item in value:
+                self._encode(item, buffer)
+        elif isinstance(value, dict):
+            buffer.append(_OBJECT)
+            _write_varint(buffer, len(value))
+            for key, item in value.items():
+                _write_varint(buffer, self._keys.setdefault(str(key), len(self._keys)))
+                self._encode(item, buffer)
+        else:
+            raise TypeError(f"Valeur non sérialisable dans une archive: {type(value).__name__}")
+
+    def add(self, form: Dict[str, Any]) -> int:
+        """Ajoute un formulaire; renvoie son numéro d'enregistrement (un MenuID déjà présent est remplacé dans l'index)"""
+        if self.normalize:
+            form = canonical(form)
+        buffer = bytearray()
+        self._encode(form, buffer)
+        number = len(self._records)
+        self._records.append((self._stream.tell(), len(buffer)))
+        self._stream.write(buffer)
+
+        menu_id = form.get('MenuID')
+        if menu_id:
+            self._menu_index[str(menu_id)] = number
+        entities, types = _form_facets(form)
+        for entity in entities:
+            self._entity_index.setdefault(entity, []).append(number)
+        for component_type in types:
+            self._type_index.setdefault(component_type, []).append(number)
+        return number
+
+    def _write_strings(self, strings: Dict[str, int]):
+        encoded = [text.encode('utf-8') for text in strings]  # Ordre d'insertion = numéro
+        self._stream.write(_OFFSET.pack(len(encoded)))
+        offset = 0
+        offsets = bytearray()
+        for data in encoded:
+            offsets += _OFFSET.pack(offset)
+            offset += len(data)
+        offsets += _OFFSET.pack(offset)
+        self._stream.write(offsets)
+        for data in encoded:
+            self._stream.write(data)
+
+    def close(self):
+        if self._stream.closed:
+            return
+        table_offset = self._stream.tell()
+        for offset, length in self._records:
+            self._stream.write(_RECORD_ENTRY.pack(offset, length))
+        keys_offset = self._stream.tell()
+        self._write_strings(self._keys)
+        strings_offset = self._stream.tell()
+        self._write_strings(self._strings)
+        index_offset = self._stream.tell()
+        index = {'menu': self._menu_index, 'entity': self._entity_index, 'type': self._type_index}
+        self._stream.write(json.dumps(index, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+        self._stream.write(_FOOTER.pack(MAGIC, VERSION, table_offset, keys_offset, strings_offset,
+                                        index_offset, len(self._records)))
+        self._stream.close()
+        os.replace(self._partial, self.path)
+
+
+class FormArchive:
+    """
+    Lecture d'une archive par mmap: ouverture en O(taille de l'index), chaque formulaire
+    décodé à la demande (get, record) sans parcourir les autres
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size + _FOOTER.size or self._map[:4] != MAGIC:
+            self._map.close()
+            raise ArchiveError(f"Archive de formulaires invalide: {self.path}")
+        magic, version, self._table_offset, keys_offset, self._strings_offset, index_offset, self._count = \
+            _FOOTER.unpack_from(self._map, len(self._map) - _FOOTER.size)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ArchiveError(f"Version d'archive non prise en charge: {version}")
+        self._keys = [self._map[start:end].decode('utf-8') for start, end in self._string_spans(keys_offset)]
+        self._strings_count = _OFFSET.unpack_from(self._map, self._strings_offset)[0]
+        self._strings_data = self._strings_offset + _OFFSET.size * (self._strings_count + 2)
+        self._string_cache: Dict[int, str] = {}
+        index = json.loads(self._map[index_offset:len(self._map) - _FOOTER.size].decode('utf-8'))
+        self.menu_index: Dict[str, int] = index['menu']
+        self.entity_index: Dict[str, List[int]] = index['entity']
+        self.type_index: Dict[str, List[int]] = index['type']
+        self._menu_by_number = {number: menu_id for menu_id, number in self.menu_index.items()}
+
+    def __enter__(self) -> 'FormArchive':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, menu_id: str) -> bool:
+        return menu_id in self.menu_index
+
+    def _string_spans(self, section: int) -> Iterator[Tuple[int, int]]:
+        count = _OFFSET.unpack_from(self._map, section)[0]
+        data = section + _OFFSET.size * (count + 2)
+        for number in range(count):
+            start, end = struct.unpack_from('<II', self._map, section + _OFFSET.size * (number + 1))
+            yield data + start, data + end
+
+    def _string(self, number: int) -> str:
+        text = self._string_cache.get(number)
+        if text is None:
+            start, end = struct.unpack_from('<II', self._map, self._strings_offset + _OFFSET.size * (number + 1))
+            text = self._map[self._strings_data + start:self._strings_data + end].decode('utf-8')
+            self._string_cache[number] = text
+        return text
+
+    def _decode(self, data: memoryview, position: int) -> Tuple[Any, int]:
+        tag = data[position]
+        position += 1
+        if tag == _STRING:
+            number, position = _read_varint(data, position)
+            return self._string(number), position
+        if tag == _OBJECT:
+            count, position = _read_varint(data, position)
+            result = {}
+            for _ in range(count):
+                key, position = _read_varint(data, position)
+                result[self._keys[key]], position = self._decode(data, position)
+            return result, position
+        if tag == _LIST:
+            count, position = _read_varint(data, position)
+            items = []
+            for _ in range(count):
+                item, position = self._decode(data, position)
+                items.append(item)
+            return items, position
+        if tag == _NULL:
+            return None, position
+        if tag == _TRUE:
+            return True, position
+        if tag == _FALSE:
+            return False, position
+        if tag == _INT:
+            encoded, position = _read_varint(data, position)
+            return (encoded >> 1) ^ -(encoded & 1), position
+        if tag == _FLOAT_TAG:
+            return _FLOAT.unpack_from(data, position)[0], position + _FLOAT.size
+        raise ArchiveError(f"Étiquette de valeur inconnue: {tag}")
+
+    def record(self, number: int) -> Dict[str, Any]:
+        """Formulaire par numéro d'enregistrement"""
+        if not 0 <= number < self._count:
+            raise ArchiveError(f"Enregistrement hors de l'archive: {number}")
+        offset, length = _RECORD_ENTRY.unpack_from(self._map, self._table_offset + _RECORD_ENTRY.size * number)
+        with memoryview(self._map) as view:
+            with view[offset:offset + length] as data:
+                return self._decode(data, 0)[0]
+
+    def get(self, menu_id: str) -> Dict[str, Any]:
+        """Formulaire par MenuID; ArchiveError si absent"""
+        number = self.menu_index.get(menu_id)
+        if number is None:
+            raise ArchiveError(f"Formulaire absent de l'archive: {menu_id}")
+        return self.record(number)
+
+    def menu_ids(self) -> List[str]:
+        return sorted(self.menu_index)
+
+    def by_entity(self, entity: str) -> List[str]:
+        """MenuID des formulaires dont un champ utilise l'entité"""
+        return self._menu_ids(self.entity_index.get(entity, ()))
+
+    def by_type(self, component_type: str) -> List[str]:
+        """MenuID des formulaires contenant un composant du type (GRIDLKP, DATEPICKER...)"""
+        return self._menu_ids(self.type_index.get(component_type, ()))
+
+    def _menu_ids(self, numbers: Any) -> List[str]:
+        return sorted({self._menu_by_number[number] for number in numbers if number in self._menu_by_number})
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for number in range(self._count):
+            yield self.record(number)
+
+
+def build_archive(sources: List[Path], output: Path, normalize: bool = True) -> Dict[str, Any]:
+    """
+    Archive les *.json de fichiers ou répertoires; renvoie les tailles avant/après. Les documents
+    JSON qui ne sont pas des formulaires (package.json, tsconfig.json...) sont écartés ('reason')
+    """
+    source_bytes = forms = 0
+    skipped = []
+    with ArchiveWriter(output, normalize) as archive:
+        for source in sources:
+            for path in iter_form_files(source):
+                try:
+                    data = path.read_bytes()
+                    form = json.loads(data)
+                except (OSError, ValueError) as e:
+                    skipped.append({'source': str(path), 'error': str(e)})
+                    continue
+                if not is_form(form):
+                    skipped.append({'source': str(path), 'reason': "Document JSON qui n'est pas un formulaire"})
+                    continue
+                archive.add(form)
+                source_bytes += len(data)
+                forms += 1
+    archive_bytes = output.stat().st_size
+    return {'forms': forms, 'source_bytes': source_bytes, 'archive_bytes': archive_bytes,
+            'ratio': round(source_bytes / archive_bytes, 2) if archive_bytes else None, 'skipped': skipped}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Archive compacte et indexée de formulaires JSON")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Construit une archive à partir de fichiers JSON")
+    build.add_argument('sources', nargs='+', type=Path)
+    build.add_argument('-o', '--output', type=Path, required=True)
+    build.add_argument('--keep-keys', action='store_true', help="N'applique pas form_normalizer aux clés")
+    get = commands.add_parser('get', help="Extrait un formulaire par MenuID")
+    get.add_argument('archive', type=Path)
+    get.add_argument('menu_id')
+    listing = commands.add_parser('list', help="Liste les MenuID (filtrables par entité ou type)")
+    listing.add_argument('archive', type=Path)
+    listing.add_argument('--entity')
+    listing.add_argument('--type')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        summary = build_archive(args.sources, args.output, normalize=not args.keep_keys)
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        return 1 if any('error' in entry for entry in summary['skipped']) else 0
+
+    try:
+        with FormArchive(args.archive) as archive:
+            if args.command == 'get':
+                print(json.dumps(archive.get(args.menu_id), indent=2, ensure_ascii=False))
+            elif args.entity:
+                print('\n'.join(archive.by_entity(args.entity)))
+            elif args.type:
+                print('\n'.join(archive.by_type(args.type)))
+            else:
+                print('\n'.join(archive.menu_ids()))
+    except ArchiveError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Différences structurelles entre deux versions d'un formulaire JSON FormBuilder Pro
+Les tableaux d'objets identifiés (Fields, Validations, Actions, ChildFields des groupes...)
+sont appariés par Id via un index, jamais par comparaison deux à deux: le diff de deux
+formulaires de 2000 champs reste linéaire. Deux formats de sortie:
+- JSON Patch RFC 6902 (diff_forms / apply_patch), compris par les clients standard;
+- delta compact (form_delta / apply_delta), indexé par Id plutôt que par position
+"""
+
+import argparse
+import copy
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+# Clés d'identité reconnues, par ordre de préférence ("ID" pour les Actions)
+IDENTITY_KEYS = ('Id', 'ID', 'id')
+
+
+class PatchError(ValueError):
+    """Patch ou delta inapplicable au document"""
+
+
+def _identity_key(items: List[Any]) -> Optional[str]:
+    """Clé d'identité commune et unique des éléments d'un tableau, sinon None"""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for key in IDENTITY_KEYS:
+        if all(key in item for item in items):
+            values = [item[key] for item in items]
+            if all(isinstance(value, (str, int)) for value in values) and len(set(values)) == len(values):
+                return key
+    return None
+
+
+def _list_key(old: List[Any], new: List[Any]) -> Optional[str]:
+    """Clé d'appariement de deux versions d'un tableau (la même des deux côtés)"""
+    if old and new:
+        key = _identity_key(old)
+        return key if key is not None and _identity_key(new) == key else None
+    return _identity_key(old or new)
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _stable_positions(sequence: List[int]) -> set:
+    """Indices d'une plus longue sous-suite croissante (éléments laissés en place lors d'un réordonnancement)"""
+    tails: List[int] = []  # Indice (dans sequence) de la fin de chaque sous-suite de longueur i+1
+    previous = [-1] * len(sequence)
+    for index, value in enumerate(sequence):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if sequence[tails[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        previous[index] = tails[low - 1] if low else -1
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+    stable = set()
+    index = tails[-1] if tails else -1
+    while index != -1:
+        stable.add(index)
+        index = previous[index]
+    return stable
+
+
+# --- JSON Patch (RFC 6902) ---
+
+def _diff_value(old: Any, new: Any, path: str, operations: List[Dict[str, Any]]):
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                operations.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        for key, value in new.items():
+            if key not in old:
+                operations.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+            else:
+                _diff_value(old[key], value, f'{path}/{_escape(key)}', operations)
+        return
+    if isinstance(old, list) and isinstance(new, list):
+        key = _list_key(old, new)
+        if key is not None:
+            _diff_keyed_list(old, new, key, path, operations)
+            return
+        if len(old) == len(new):
+            for index, (old_item, new_item) in enumerate(zip(old, new)):
+                _diff_value(old_item, new_item, f'{path}/{index}', operations)
+            return
+    operations.append({'op': 'replace', 'path': path, 'value': new})
+
+
+class _LivePositions:
+    """
+    Indices courants des éléments d'un tableau en cours de réordonnancement (arbre de Fenwick sur
+    des emplacements ordonnés une fois pour toutes): chaque requête et mise à jour en O(log n)
+    """
+
+    def __init__(self, size: int):
+        self._tree = [0] * (size + 1)
+
+    def toggle(self, slot: int, delta: int):
+        slot += 1
+        while slot < len(self._tree):
+            self._tree[slot] += delta
+            slot += slot & -slot
+
+    def before(self, slot: int) -> int:
+        """Nombre d'éléments présents avant l'emplacement"""
+        count = 0
+        while slot > 0:
+            count += self._tree[slot]
+            slot -= slot & -slot
+        return count
+
+
+def _diff_keyed_list(old: List[Dict[str, Any]], new: List[Dict[str, Any]], key: str, path: str,
+                     operations: List[Dict[str, Any]]):
+    """
+    Tableau apparié par identité: suppressions (indices décroissants), puis insertions et
+    déplacements dans l'ordre cible, chaque élément étant placé juste après son prédécesseur;
+    les éléments d'une plus longue sous-suite croissante ne bougent pas. Enfin le diff des
+    éléments communs, à leur position finale.
+    Les positions ne sont pas suivies dans une liste de travail (index et insert sont linéaires):
+    chaque placement crée un emplacement chaîné juste après celui du prédécesseur, l'ancien devenant
+    vide. L'ordre de la chaîne ne change jamais, et les indices se lisent sur un arbre de Fenwick
+    """
+    old_by_id = {item[key]: item for item in old}
+    new_ids = [item[key] for item in new]
+    new_set = set(new_ids)
+
+    old_ids = [item[key] for item in old]
+    for index in range(len(old_ids) - 1, -1, -1):
+        if old_ids[index] not in new_set:
+            operations.append({'op': 'remove', 'path': f'{path}/{index}'})
+    working = [identity for identity in old_ids if identity in new_set]
+
+    old_position = {identity: index for index, identity in enumerate(working)}
+    kept = [identity for identity in new_ids if identity in old_position]
+    stable_indices = _stable_positions([old_position[identity] for identity in kept])
+    stable = {kept[index] for index in stable_indices}
+
+    # Chaîne des emplacements: les éléments restants (0..n-1), puis un par placement, inséré
+    # juste après l'emplacement courant du prédécesseur dans l'ordre cible (-1: tête du tableau)
+    following: Dict[int, Optional[int]] = {-1: 0 if working else None}
+    following.update({slot: slot + 1 for slot in range(len(working) - 1)})
+    if working:
+        following[len(working) - 1] = None
+    slot_of = dict(old_position)
+    placements = []
+    for target, identity in enumerate(new_ids):
+        if identity in stable:
+            continue
+        after = slot_of[new_ids[target - 1]] if target else -1
+        slot = len(following) - 1
+        following[slot], following[after] = following[after], slot
+        placements.append((target, slot_of.get(identity), slot))
+        slot_of[identity] = slot
+
+    rank = {}
+    slot = following[-1]
+    while slot is not None:
+        rank[slot] = len(rank)
+        slot = following[slot]
+
+    live = _LivePositions(len(rank))
+    for slot in range(len(working)):
+        live.toggle(rank[slot], 1)
+    for target, previous, slot in placements:
+        if previous is None:
+            operations.append({'op': 'add', 'path': f'{path}/{live.before(rank[slot])}', 'value': new[target]})
+        else:
+            current = live.before(rank[previous])
+            live.toggle(rank[previous], -1)
+            destination = live.before(rank[slot])
+            if current != destination:
+                operations.append({'op': 'move', 'from': f'{path}/{current}', 'path': f'{path}/{destination}'})
+        live.toggle(rank[slot], 1)
+
+    for index, item in enumerate(new):
+        previous = old_by_id.get(item[key])
+        if previous is not None:
+            _diff_value(previous, item, f'{path}/{index}', operations)
+
+
+def diff_forms(old: Any, new: Any) -> List[Dict[str, Any]]:
+    """JSON Patch (RFC 6902) transformant old en new"""
+    operations: List[Dict[str, Any]] = []
+    _diff_value(old, new, '', operations)
+    return operations
+
+
+def _parse_pointer(pointer: str) -> List[str]:
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise PatchError(f"Pointeur JSON invalide: {pointer!r}")
+    return [_unescape(token) for token in pointer[1:].split('/')]
+
+
+def _index(container: List[Any], token: str, allow_end: bool = False) -> int:
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise PatchError(f"Indice de tableau invalide: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Indice hors du tableau: {index}")
+    return index
+
+
+def _resolve(document: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise PatchError(f"Membre absent: {token!r}")
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_index(document, token)]
+        else:
+            raise PatchError(f"Chemin traversant une valeur scalaire: {token!r}")
+    return document
+
+
+def _add(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, allow_end=True), value)
+    else:
+        raise PatchError(f"Ajout dans une valeur scalaire: {token!r}")
+    return document
+
+
+def _remove(document: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise PatchError("Suppression de la racine")
+    parent = _resolve(document, tokens[:-1])
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise PatchError(f"Membre absent: {token!r}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token))
+    raise PatchError(f"Suppression dans une valeur scalaire: {token!r}")
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]], in_place: bool = False) -> Any:
+    """Applique un JSON Patch (add, remove, replace, move, copy, test); renvoie le document patché"""
+    if not in_place:
+        document = copy.deepcopy(document)
+    for operation in patch:
+        op = operation.get('op')
+        try:
+            tokens = _parse_pointer(operation['path'])
+            if op == 'add':
+                document = _add(document, tokens, copy.deepcopy(operation['value']))
+            elif op == 'remove':
+                _remove(document, tokens)
+            elif op == 'replace':
+                if tokens:
+                    _remove(document, tokens)
+                document = _add(document, tokens, copy.deepcopy(operation['value']))
+            elif op in ('move', 'copy'):
+                source = _parse_pointer(operation['from'])
+                if op == 'move':
+                    if tokens[:len(source)] == source and tokens != source:
+                        raise PatchError("Déplacement d'une valeur dans l'un de ses descendants")
+                    value = _remove(document, source)
+                else:
+                    value = copy.deepcopy(_resolve(document, source))
+                document = _add(document, tokens, value)
+            elif op == 'test':
+                if _resolve(document, tokens) != operation['value']:
+                    raise PatchError(f"Test échoué sur {operation['path']}")
+            else:
+                raise PatchError(f"Opération inconnue: {op!r}")
+        except KeyError as e:
+            raise PatchError(f"Membre {e} manquant dans l'opération {operation!r}") from None
+    return document
+
+
+# --- Delta compact ---
+# Objet: {"set": {clé: valeur}, "unset": [clés], "nested": {clé: delta}}
+# Tableau apparié: {"key": "Id", "remove": [ids], "upsert": [éléments ajoutés], "nested": {id: delta},
+#                   "order": [ids]}; "order" n'est présent que si l'ordre final n'est pas
+#                   (anciens éléments conservés) + (nouveaux éléments)
+# Les autres valeurs modifiées sont remplacées entières via "set" du parent
+
+def _object_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    delta: Dict[str, Any] = {}
+    unset = [key for key in old if key not in new]
+    changed: Dict[str, Any] = {}
+    nested: Dict[str, Any] = {}
+    for key, value in new.items():
+        if key not in old:
+            changed[key] = value
+        elif old[key] != value:
+            child = _value_delta(old[key], value)
+            if child is None:
+                changed[key] = value
+            else:
+                nested[key] = child
+    if changed:
+        delta['set'] = changed
+    if unset:
+        delta['unset'] = unset
+    if nested:
+        delta['nested'] = nested
+    return delta
+
+
+def _value_delta(old: Any, new: Any) -> Optional[Dict[str, Any]]:
+    """Delta d'une valeur modifiée, ou None si elle doit être remplacée entière"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        return _object_delta(old, new)
+    if isinstance(old, list) and isinstance(new, list):
+        key = _list_key(old, new)
+        if key is not None:
+            return _keyed_list_delta(old, new, key)
+    return None
+
+
+def _keyed_list_delta(old: List[Dict[str, Any]], new: List[Dict[str, Any]], key: str) -> Dict[str, Any]:
+    old_by_id = {item[key]: item for item in old}
+    new_ids = [item[key] for item in new]
+    new_set = set(new_ids)
+    delta: Dict[str, Any] = {'key': key}
+    removed = [item[key] for item in old if item[key] not in new_set]
+    added = [item for item in new if item[key] not in old_by_id]
+    nested = {}
+    for item in new:
+        previous = old_by_id.get(item[key])
+        if previous is not None and previous != item:
+            child = _value_delta(previous, item)
+            # Élément remplacé entier (ex. n'est plus un objet): repris dans upsert
+            if child is None:
+                added.append(item)
+            else:
+                nested[str(item[key])] = child
+    if removed:
+        delta['remove'] = removed
+    if added:
+        delta['upsert'] = added
+    if nested:
+        delta['nested'] = nested
+    natural = [item[key] for item in old if item[key] in new_set] + \
+              [identity for identity in new_ids if identity not in old_by_id]
+    if natural != new_ids:
+        delta['order'] = new_ids
+    return delta
+
+
+def form_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Delta compact transformant le formulaire old en new ({} si identiques)"""
+    return _object_delta(old, new)
+
+
+def _apply_object_delta(document: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(document, dict):
+        raise PatchError("Delta d'objet appliqué à une valeur non objet")
+    for key in delta.get('unset', []):
+        document.pop(key, None)
+    for key, value in delta.get('set', {}).items():
+        document[key] = copy.deepcopy(value)
+    for key, child in delta.get('nested', {}).items():
+        if key not in document:
+            raise PatchError(f"Membre absent: {key!r}")
+        document[key] = _apply_value_delta(document[key], child)
+    return document
+
+
+def _apply_value_delta(document: Any, delta: Dict[str, Any]) -> Any:
+    if 'key' in delta:
+        return _apply_keyed_list_delta(document, delta)
+    return _apply_object_delta(document, delta)
+
+
+def _apply_keyed_list_delta(document: List[Dict[str, Any]], delta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if not isinstance(document, list):
+        raise PatchError("Delta de tableau appliqué à une valeur non tableau")
+    key = delta['key']
+    removed = set(delta.get('remove', []))
+    items = [item for item in document if item.get(key) not in removed]
+    position = {item[key]: index for index, item in enumerate(items)}
+    for item in delta.get('upsert', []):
+        identity = item[key]
+        if identity in position:
+            items[position[identity]] = copy.deepcopy(item)
+        else:
+            position[identity] = len(items)
+            items.append(copy.deepcopy(item))
+    by_text = {str(identity): index for identity, index in position.items()}
+    for identity, child in delta.get('nested', {}).items():
+        if identity not in by_text:
+            raise PatchError(f"Élément {key}={identity!r} absent")
+        items[by_text[identity]] = _apply_value_delta(items[by_text[identity]], child)
+    if 'order' in delta:
+        try:
+            items = [items[position[identity]] for identity in delta['order']]
+        except KeyError as e:
+            raise PatchError(f"Élément {key}={e} absent de l'ordre final") from None
+    return items
+
+
+def apply_delta(document: Dict[str, Any], delta: Dict[str, Any], in_place: bool = False) -> Dict[str, Any]:
+    """Applique un delta compact produit par form_delta"""
+    if not in_place:
+        document = copy.deepcopy(document)
+    return _apply_object_delta(document, delta)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Différences entre deux versions d'un formulaire JSON")
+    parser.add_argument('old', type=Path, help="Version de référence")
+    parser.add_argument('new', type=Path, help="Nouvelle version, ou patch/delta avec --apply")
+    parser.add_argument('--compact', action='store_true', help="Delta compact au lieu d'un JSON Patch")
+    parser.add_argument('--apply', action='store_true', help="Applique le patch (ou delta) 'new' à 'old'")
+    args = parser.parse_args(argv)
+
+    old = json.loads(args.old.read_text(encoding='utf-8'))
+    other = json.loads(args.new.read_text(encoding='utf-8'))
+    try:
+        if args.apply:
+            result = apply_delta(old, other) if args.compact else apply_patch(old, other)
+        else:
+            result = form_delta(old, other) if args.compact else diff_forms(old, other)
+    except PatchError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Moteur de conversion DFM/Info -> JSON pour FormBuilder Pro
+Indépendant de Streamlit: utilisé par l'interface, le service HTTP et la CLI batch
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from conversion_metrics import ConversionMetrics, get_default_metrics
+from dfm_parser import parse_dfm, parse_dfm_subtree
+from entity_inference import AUTO_ACCEPT_ORIGINS, get_default_index, normalize_control_name
+from form_fingerprint import fingerprint as structural_fingerprint
+from form_writer import JsonStreamWriter, WriteStats, write_form
+from form_model import (
+    ALWAYS_FALSE_CONDITIONS, Condition, DfmComponent, FormAction, FormField, FormModel, InfoEntity,
+    InfoField, InfoValidation, ParsedDfm, ValidationRule, intern_short,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversionResult:
+    """Résultat d'une conversion complète (formulaire, JSON sérialisé et erreurs rencontrées)"""
+    form_id: str
+    form_json: Dict[str, Any]
+    json_text: str
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class StreamedConversion:
+    """Bilan d'une conversion écrite en flux (le JSON n'est pas conservé)"""
+    form_id: str
+    fields: int
+    validations: int
+    bytes_written: int
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+
+class FormGeneratorAI:
+    """Intelligence artificielle pour la génération de formulaires"""
+    
+    def __init__(self, metrics: Optional[ConversionMetrics] = None):
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.metrics.register_cache('control_name_normalization', lambda: normalize_control_name.cache_info()[:2])
+        # Erreurs de parsing depuis le dernier appel à pop_errors()
+        self.errors: List[str] = []
+        
+        self.component_mappings = {
+            'TDBEdit': 'TEXT',
+            'TDBComboBox': 'SELECT',
+            'TDBDateTimePicker': 'DATEPICKER',
+            'TDBCheckBox': 'CHECKBOX',
+            'TDBRadioGroup': 'RADIO',
+            'TDBMemo': 'TEXTAREA',
+            'TDBSpinEdit': 'NUMERIC',
+            'TDBLookupComboBox': 'LSTLKP',
+            'TDBGrid': 'GRIDLKP',
+            'TPanel': 'GROUP',
+            'TGroupBox': 'GROUP',
+            'TButton': 'BUTTON',
+            'TLabel': 'LABEL'
+        }
+        
+        self.validation_operators = {
+            'required': 'ISNN',
+            'not_null': 'ISNN',
+            'is_null': 'ISN',
+            'equal': 'EQ',
+            'not_equal': 'NE',
+            'greater_than': 'GT',
+            'less_than': 'LT',
+            'greater_equal': 'GE',
+            'less_equal': 'LE'
+        }
+
+        # Seuil de confiance pour l'inférence d'entité par similarité de noms
+        self.entity_inference_threshold = 0.6
+
+    def _report_error(self, stage: str, message: str, error: Exception):
+        """Journalise, compte et conserve une erreur interceptée"""
+        logger.exception("%s", message)
+        self.metrics.record_error(stage, error)
+        self.errors.append(f"{message}: {error}")
+
+    def pop_errors(self) -> List[str]:
+        """Renvoie puis efface les erreurs accumulées"""
+        errors, self.errors = self.errors, []
+        return errors
+
+    def parse_dfm_content(self, content: str) -> ParsedDfm:
+        """Parse le contenu d'un fichier DFM et extrait les composants (lisible aussi comme un dict)"""
+        with self.metrics.stage('parse_dfm'):
+            self.metrics.observe_input('dfm', len(content))
+            dfm_data = self._parse_dfm_content(content)
+        self.metrics.count_elements('component', len(dfm_data.components))
+        return dfm_data
+
+    def parse_dfm_subtree(self, content: str, first_line: int, parent: Optional[str]) -> Optional[List[DfmComponent]]:
+        """Reparse d'un bloc object ... end modifié (dfm_parser.parse_dfm_subtree)"""
+        with self.metrics.stage('parse_dfm'):
+            self.metrics.observe_input('dfm', len(content))
+            return parse_dfm_subtree(content, first_line, parent, self._map_component_type)
+
+    def fingerprint(self, dfm_data: Any) -> Any:
+        """Empreinte MinHash des composants du DFM parsé (form_fingerprint, quasi-doublons)"""
+        with self.metrics.stage('fingerprint'):
+            return structural_fingerprint(dfm_data)
+
+    def _parse_dfm_content(self, content: str) -> ParsedDfm:
+        try:
+            return parse_dfm(content, self._map_component_type)
+        except Exception as e:
+            self._report_error('parse_dfm', "Erreur lors du parsing DFM", e)
+            return ParsedDfm()
+
+    def _map_component_type(self, delphi_type: str) -> str:
+        return self.component_mappings.get(delphi_type, 'TEXT')
+
+    def parse_info_content(self, content: str) -> Dict[str, Any]:
+        """Parse le contenu du fichier Info pour extraire les métadonnées"""
+        with self.metrics.stage('parse_info'):
+            self.metrics.observe_input('info', len(content))
+            return self._parse_info_content(content)
+
+    def _parse_info_content(self, content: str) -> Dict[str, Any]:
+        try:
+            info_data = {
+                'fields': [],
+                'validations': [],
+                'entities': [],
+                'endpoints': []
+            }
+            
+            lines = content.split('\n')
+            current_section = None
+            
+            for line in lines:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                # Détection des sections
+                if line.startswith('[') and line.endswith(']'):
+                    current_section = line[1:-1].lower()
+                    continue
+                
+                # Parse selon la section
+                if current_section == 'fields':
+                    field_info = self._parse_field_info(line)
+                    if field_info:
+                        info_data['fields'].append(field_info)
+                        
+                elif current_section == 'validations':
+                    validation_info = self._parse_validation_info(line)
+                    if validation_info:
+                        info_data['validations'].append(validation_info)
+                        
+                elif current_section == 'entities':
+                    entity_info = self._parse_entity_info(line)
+                    if entity_info:
+                        info_data['entities'].append(entity_info)
+            
+            return info_data
+            
+        except Exception as e:
+            self._report_error('parse_info', "Erreur lors du parsing Info", e)
+            return {'fields': [], 'validations': [], 'entities': [], 'endpoints': []}
+
+    def _parse_field_info(self, line: str) -> Optional[InfoField]:
+        """Parse une ligne d'information de champ"""
+        try:
+            # Format: FieldName|Type|Required|Entity|Description
+            parts = line.split('|')
+            if len(parts) >= 3:
+                return InfoField(
+                    parts[0].strip(),
+                    parts[1].strip(),
+                    parts[2].strip().lower() == 'true',
+                    parts[3].strip() if len(parts) > 3 else None,
+                    parts[4].strip() if len(parts) > 4 else None
+                )
+        except:
+            pass
+        return None
+
+    def _parse_validation_info(self, line: str) -> Optional[InfoValidation]:
+        """Parse une ligne d'information de validation"""
+        try:
+            # Format: FieldName|Operator|Value|Message|Type
+            parts = line.split('|')
+            if len(parts) >= 4:
+                return InfoValidation(
+                    parts[0].strip(),
+                    parts[1].strip(),
+                    parts[2].strip(),
+                    parts[3].strip(),
+                    parts[4].strip() if len(parts) > 4 else 'ERROR'
+                )
+        except:
+            pass
+        return None
+
+    def _parse_entity_info(self, line: str) -> Optional[InfoEntity]:
+        """Parse une ligne d'information d'entité"""
+        try:
+            # Format: EntityName|KeyField|Endpoint|Columns
+            parts = line.split('|')
+            if len(parts) >= 2:
+                return InfoEntity(
+                    parts[0].strip(),
+                    parts[1].strip(),
+                    parts[2].strip() if len(parts) > 2 else None,
+                    parts[3].strip().split(',') if len(parts) > 3 else []
+                )
+        except:
+            pass
+        return None
+
+    def generate_form_json(self, dfm_data: Dict[str, Any], info_data: Dict[str, Any], form_id: str) -> Dict[str, Any]:
+        """Génère la configuration JSON finale du formulaire"""
+        return self.build_form(dfm_data, info_data, form_id).to_dict()
+
+    def build_form(self, dfm_data: Any, info_data: Dict[str, Any], form_id: str) -> FormModel:
+        """Génère le formulaire en modèle compact (to_dict() pour la structure JSON)"""
+        with self.metrics.stage('generate_json'):
+            form = self._build_form(dfm_data, info_data, form_id)
+        self.metrics.count_elements('field', len(form.fields))
+        self.metrics.count_elements('validation', len(form.validations))
+        return form
+
+    def _components(self, dfm_data: Any) -> List[DfmComponent]:
+        """Composants du DFM; accepte aussi l'ancienne forme dict (name, delphi_type, json_type, properties)"""
+        components = dfm_data.get('components', []) if dfm_data else []
+        return [
+            component if isinstance(component, DfmComponent) else DfmComponent(
+                component['name'], component.get('delphi_type', ''), component.get('json_type', 'TEXT'),
+                component.get('properties', {}), component.get('parent'))
+            for component in components
+        ]
+
+    def form_header(self, dfm_data: Any, form_id: str) -> FormModel:
+        """Structure de base du formulaire (libellé, largeur, action), sans champs ni validations"""
+        form_props = dfm_data.get('form_properties', {}) if dfm_data else {}
+        form = FormModel(form_id.upper(), form_props.get('caption', form_id.upper()), form_props.get('width', '700px'))
+        form.actions.append(FormAction("PROCESS", "PROCESS", f"Execute{form_id.title()}"))
+        return form
+
+    def build_fields(self, components: List[DfmComponent], info_data: Dict[str, Any],
+                     rules: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Optional[FormField]]:
+        """
+        Champ de chaque composant, aligné sur components (None pour les libellés et boutons):
+        regénération des seuls composants modifiés (dfm_incremental)
+        """
+        info_data = info_data or {}
+        declared_entities = self._index_entities(info_data)
+        with self.metrics.stage('entity_inference'):
+            inferred_entities = self._infer_missing_entities(components, declared_entities)
+        return [
+            None if component.json_type in ['LABEL', 'BUTTON'] else self._build_field(
+                component, info_data, declared_entities, inferred_entities,
+                rules.get(component.name.lower()) if rules else None)
+            for component in components
+        ]
+
+    def build_validations(self, components: List[DfmComponent], info_data: Dict[str, Any]) -> List[ValidationRule]:
+        return list(self._iter_validations(components, info_data or {}))
+
+    def _prepare_form(self, dfm_data: Any, info_data: Dict[str, Any], form_id: str):
+        """En-tête du formulaire, composants et entités résolues, préalables à la génération des champs"""
+        form = self.form_header(dfm_data, form_id)
+        components = self._components(dfm_data)
+        info_data = info_data or {}
+        
+        # Entités déclarées dans le fichier Info, puis inférence groupée des autres lookups
+        declared_entities = self._index_entities(info_data)
+        with self.metrics.stage('entity_inference'):
+            inferred_entities = self._infer_missing_entities(components, declared_entities)
+        return form, components, info_data, declared_entities, inferred_entities
+
+    def _event_rules(self, dfm_data: Any) -> Dict[str, Dict[str, Any]]:
+        """EnabledWhen/VisibleWhen déduits des gestionnaires Pascal (pascal_events), par composant"""
+        return dfm_data.rules if isinstance(dfm_data, ParsedDfm) else {}
+
+    def _iter_fields(self, components: List[DfmComponent], info_data: Dict[str, Any],
+                     declared_entities: Dict[str, Dict[str, Any]],
+                     inferred_entities: Dict[str, Dict[str, Any]],
+                     rules: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[FormField]:
+        for component in components:
+            if component.json_type in ['LABEL', 'BUTTON']:
+                continue  # Skip les labels et boutons pour les champs
+                
+            field = self._build_field(component, info_data, declared_entities, inferred_entities,
+                                      rules.get(component.name.lower()) if rules else None)
+            if field:
+                yield field
+
+    def _build_form(self, dfm_data: Any, info_data: Dict[str, Any], form_id: str) -> FormModel:
+        form, components, info_data, declared_entities, inferred_entities = self._prepare_form(dfm_data, info_data, form_id)
+        form.fields = list(self._iter_fields(components, info_data, declared_entities, inferred_entities,
+                                             self._event_rules(dfm_data)))
+        form.validations = list(self._iter_validations(components, info_data))
+        return form
+
+    def _counted(self, items: Iterator[Any], kind: str) -> Iterator[Any]:
+        count = 0
+        for item in items:
+            count += 1
+            yield item
+        self.metrics.count_elements(kind, count)
+
+    def iter_form(self, dfm_data: Any, info_data: Dict[str, Any],
+                  form_id: str) -> Tuple[FormModel, Iterator[FormField], Iterator[ValidationRule]]:
+        """
+        En-tête du formulaire (sans champs ni validations) et générateurs paresseux des champs
+        et des validations, pour une écriture en flux (form_writer.write_form)
+        """
+        form, components, info_data, declared_entities, inferred_entities = self._prepare_form(dfm_data, info_data, form_id)
+        fields = self._counted(self._iter_fields(components, info_data, declared_entities, inferred_entities,
+                                                 self._event_rules(dfm_data)), 'field')
+        validations = self._counted(self._iter_validations(components, info_data), 'validation')
+        return form, fields, validations
+
+    def _build_field(self, component: DfmComponent, info_data: Dict[str, Any],
+                     declared_entities: Dict[str, Dict[str, Any]],
+                     inferred_entities: Optional[Dict[str, Dict[str, Any]]] = None,
+                     event_rules: Optional[Dict[str, Any]] = None) -> FormField:
+        """Génère la configuration d'un champ"""
+        properties = component.properties
+        field = FormField(component.name, str(properties.get('Caption', component.name)).upper(),
+                          component.json_type, properties.get('Required', False))
+        
+        # Ajout de propriétés spécifiques selon le type
+        if component.json_type in ['GRIDLKP', 'LSTLKP']:
+            entity_info = declared_entities.get(component.name.lower())
+            if not entity_info and inferred_entities:
+                entity_info = inferred_entities.get(component.name)
+            if entity_info:
+                field.entity_key_field = entity_info['key_field']
+                field.entity = entity_info['name']
+                field.endpoint = entity_info.get('endpoint')
+                field.column_definitions = self._generate_column_definitions(entity_info)
+        
+        elif component.json_type == 'SELECT':
+            # Recherche des options dans info_data
+            options = self._find_field_options(component.name, info_data)
+            if options:
+                field.options = options
+        
+        elif component.json_type == 'NUMERIC':
+            field.data_type = "NUMERIC"
+        
+        elif component.json_type == 'DATEPICKER':
+            field.data_type = "DATE"
+        
+        # Propriétés de visibilité et activation
+        if not properties.get('Enabled', True):
+            field.enabled_when = ALWAYS_FALSE_CONDITIONS
+        
+        if not properties.get('Visible', True):
+            field.visible_when = ALWAYS_FALSE_CONDITIONS
+        
+        # Règles des gestionnaires d'événements: l'état dynamique prime sur l'état initial du DFM
+        if event_rules:
+            field.enabled_when = event_rules.get('EnabledWhen', field.enabled_when)
+            field.visible_when = event_rules.get('VisibleWhen', field.visible_when)
+        
+        return field
+
+    def _index_entities(self, info_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Entité déclarée dans le fichier Info, par nom de champ en minuscules (première déclaration)"""
+        entities = {}
+        for entity in info_data.get('entities', []):
+            entities.setdefault(entity['name'].lower(), entity)
+        by_field = {}
+        for field_info in info_data.get('fields', []):
+            entity = entities.get(field_info['entity'].lower()) if field_info.get('entity') else None
+            if entity is not None:
+                by_field.setdefault(field_info['name'].lower(), entity)
+        return by_field
+
+    def _infer_missing_entities(self, components: List[DfmComponent],
+                                declared_entities: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Infère par similarité de noms l'entité des lookups absents du fichier Info"""
+        lookups = [
+            component for component in components
+            if component.json_type in ['GRIDLKP', 'LSTLKP'] and component.name.lower() not in declared_entities
+        ]
+        if not lookups:
+            return {}
+        
+        index = get_default_index()
+        controls = []
+        for component in lookups:
+            # Caption = 12, True ou (...) est décodé en nombre, booléen ou liste: pas un libellé
+            caption = component.properties.get('Caption')
+            controls.append((component.name, caption if isinstance(caption, str) else None))
+        matches = index.infer_batch(controls, top_k=1)
+        
+        inferred = {}
+        for component, candidates in zip(lookups, matches):
+            # Une correspondance sur une colonne secondaire seule (plafonnée à OTHER_COLUMN_FACTOR)
+            # n'est jamais résolue automatiquement: il faut le nom de l'entité ou sa colonne clé
+            if candidates and candidates[0].matched_on in AUTO_ACCEPT_ORIGINS \
+                    and candidates[0].confidence >= self.entity_inference_threshold:
+                inferred[component.name] = index.entity_info(candidates[0])
+        return inferred
+
+    def _generate_column_definitions(self, entity_info: Dict[str, Any]) -> Tuple[Tuple[str, str, str], ...]:
+        """Génère les définitions de colonnes (DataField, Caption, DataType) d'une entité"""
+        return tuple(
+            (intern_short(col.strip()), intern_short(col.strip().replace('_', ' ').title()), "STRING")
+            for col in entity_info.get('columns', [])
+        )
+
+    def _find_field_options(self, field_name: str, info_data: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
+        """Trouve les options pour un champ SELECT"""
+        # Cette méthode peut être étendue pour parser des options spécifiques
+        return None
+
+    def _iter_validations(self, components: List[DfmComponent], info_data: Dict[str, Any]) -> Iterator[ValidationRule]:
+        """Génère les validations du formulaire"""
+        validation_id = 1
+        
+        # Validations basées sur les propriétés des composants
+        for component in components:
+            if component.properties.get('Required', False):
+                yield ValidationRule(
+                    str(validation_id), "ERROR",
+                    f"{component.properties.get('Caption', component.name)} is required",
+                    [Condition(component.name, "ISN")]
+                )
+                validation_id += 1
+        
+        # Validations basées sur les informations du fichier Info
+        for validation_info in info_data.get('validations', []):
+            yield ValidationRule(
+                str(validation_id), validation_info.get('type', 'ERROR'), validation_info['message'],
+                [Condition(
+                    validation_info['field'],
+                    self.validation_operators.get(validation_info['operator'], validation_info['operator']),
+                    validation_info['value'] if validation_info['value'] != 'NULL' else None,
+                    self._detect_value_type(validation_info['value'])
+                )]
+            )
+            validation_id += 1
+
+    def _detect_value_type(self, value: str) -> str:
+        """Détecte le type de valeur pour les validations"""
+        if value.upper() in ['TRUE', 'FALSE']:
+            return "BOOL"
+        elif value.replace('.', '').replace('-', '').isdigit():
+            return "NUMERIC"
+        elif value.upper() in ['SYSDATE', 'NOW()']:
+            return "DATE"
+        else:
+            return "STRING"
+
+    def serialize_form(self, form_json: Dict[str, Any], indent: Optional[int] = 2) -> str:
+        """Sérialise le formulaire en JSON (étape chronométrée)"""
+        with self.metrics.stage('serialize'):
+            json_text = json.dumps(form_json, indent=indent, ensure_ascii=False)
+        self.metrics.observe_output(len(json_text))
+        return json_text
+
+    def convert(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str) -> ConversionResult:
+        """Pipeline complet: parsing DFM et Info, génération puis sérialisation"""
+        self.pop_errors()
+        try:
+            with self.metrics.stage('total'):
+                dfm_data = self.parse_dfm_content(dfm_content) if dfm_content else ParsedDfm()
+                info_data = self.parse_info_content(info_content) if info_content else {}
+                form_json = self.build_form(dfm_data, info_data, form_id).to_dict()
+                json_text = self.serialize_form(form_json)
+        except Exception:
+            self.metrics.record_conversion('error')
+            raise
+        
+        result = ConversionResult(form_id, form_json, json_text, self.pop_errors())
+        self.metrics.record_conversion('success' if result.success else 'partial')
+        return result
+
+    def write_form(self, dfm_data: Any, info_data: Dict[str, Any], form_id: str, writer: JsonStreamWriter) -> WriteStats:
+        """Génère et écrit le formulaire en flux, champ par champ (étape chronométrée 'stream_write')"""
+        with self.metrics.stage('stream_write'):
+            form, fields, validations = self.iter_form(dfm_data, info_data, form_id)
+            stats = write_form(writer, form, fields, validations)
+        self.metrics.observe_output(stats.bytes_written)
+        return stats
+
+    def convert_to_stream(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str,
+                          stream: Any, indent: Optional[int] = 2, backend: str = 'auto') -> StreamedConversion:
+        """
+        Comme convert(), le JSON étant écrit dans stream (fichier, socket) au lieu d'être gardé en
+        mémoire. stream peut être un JsonStreamWriter déjà positionné (formulaire dans une enveloppe)
+        """
+        self.pop_errors()
+        writer = stream if isinstance(stream, JsonStreamWriter) else JsonStreamWriter(stream, indent=indent, backend=backend)
+        try:
+            with self.metrics.stage('total'):
+                dfm_data = self.parse_dfm_content(dfm_content) if dfm_content else ParsedDfm()
+                info_data = self.parse_info_content(info_content) if info_content else {}
+                stats = self.write_form(dfm_data, info_data, form_id, writer)
+                writer.flush()
+        except Exception:
+            self.metrics.record_conversion('error')
+            raise
+        
+        result = StreamedConversion(form_id, stats.fields, stats.validations, stats.bytes_written, self.pop_errors())
+        self.metrics.record_conversion('success' if result.success else 'partial')
+        return result
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Empreinte structurelle des DFM et détection des quasi-doublons (FormBuilder Pro)
+Les applications Delphi regorgent d'écrans copiés-collés à une case à cocher près. Chaque DFM
+parsé est réduit à un MinHash sur ses bardeaux (type Delphi, racine du nom, racine du parent);
+les signatures sont rangées dans un index LSH par bandes, dont la recherche reste en temps
+quasi constant sur des dizaines de milliers de formulaires. Un formulaire proche d'une
+conversion déjà stockée est produit en appliquant à celle-ci le delta entre les deux
+générations déterministes, ce qui conserve les corrections manuelles et évite l'appel au modèle
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from entity_inference import normalize_control_name
+from form_diff import apply_delta, form_delta
+from form_normalizer import canonical
+
+NUM_PERMUTATIONS = 128
+BANDS = 16  # 16 bandes de 8 lignes: seuil LSH effectif ~ (1/16)^(1/8) ≈ 0.71
+DEFAULT_THRESHOLD = 0.8
+SEED = 0x5EED
+
+_rng = np.random.default_rng(SEED)
+# Hachage multiplicatif (a*x + b mod 2^64) >> 32, a impair: une permutation par ligne
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64)
+_EMPTY_SIGNATURE = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def _stem(name: Optional[str]) -> str:
+    return normalize_control_name(name) if name else ''
+
+
+def component_shingles(dfm_data: Any) -> List[str]:
+    """
+    Bardeaux (type, racine du nom, racine du parent) des composants; les répétitions sont
+    numérotées pour que dix TLabel d'un même panneau pèsent plus qu'un seul
+    """
+    components = dfm_data.get('components', []) if dfm_data else []
+    seen: Counter = Counter()
+    shingles = []
+    for component in components:
+        shingle = f"{component['delphi_type']}|{_stem(component['name'])}|{_stem(component['parent'])}"
+        seen[shingle] += 1
+        shingles.append(f'{shingle}#{seen[shingle]}')
+    return shingles
+
+
+def minhash(shingles: Iterable[str]) -> np.ndarray:
+    """Signature MinHash (NUM_PERMUTATIONS entiers 32 bits) d'un ensemble de bardeaux"""
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+                          for shingle in shingles), dtype=np.uint64)
+    if not hashes.size:
+        return _EMPTY_SIGNATURE.copy()
+    # Débordement modulo 2^64 voulu
+    with np.errstate(over='ignore'):
+        permuted = (np.outer(_MULTIPLIERS, hashes) + _OFFSETS[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def fingerprint(dfm_data: Any) -> np.ndarray:
+    return minhash(component_shingles(dfm_data))
+
+
+def similarity(left: np.ndarray, right: np.ndarray) -> float:
+    """Estimation de la similarité de Jaccard entre deux signatures"""
+    return float(np.mean(left == right))
+
+
+class NearDuplicateIndex:
+    """Index LSH: une table par bande (octets de la bande -> positions des signatures)"""
+
+    def __init__(self, bands: int = BANDS):
+        if NUM_PERMUTATIONS % bands:
+            raise ValueError(f"{NUM_PERMUTATIONS} permutations non divisibles en {bands} bandes")
+        self.bands = bands
+        self.rows = NUM_PERMUTATIONS // bands
+        self.keys: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._signatures = np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+        self._size = 0
+        self._tables: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.positions
+
+    @property
+    def signatures(self) -> np.ndarray:
+        return self._signatures[:self._size]
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, key: str, signature: np.ndarray):
+        """Ajoute (ou remplace) la signature d'un formulaire"""
+        if key in self.positions:
+            self.remove(key)
+        if self._size == len(self._signatures):
+            grown = np.zeros((max(64, self._size * 2), NUM_PERMUTATIONS), dtype=np.uint32)
+            grown[:self._size] = self._signatures[:self._size]
+            self._signatures = grown
+        position = self._size
+        self._signatures[position] = signature
+        self._size += 1
+        self.positions[key] = position
+        self.keys.append(key)
+        for table, band_key in zip(self._tables, self._band_keys(signature)):
+            table.setdefault(band_key, []).append(position)
+
+    def remove(self, key: str):
+        """Retire un formulaire des tables (sa ligne de signatures reste, inaccessible)"""
+        position = self.positions.pop(key)
+        for table, band_key in zip(self._tables, self._band_keys(self._signatures[position])):
+            bucket = table[band_key]
+            bucket.remove(position)
+            if not bucket:
+                del table[band_key]
+        self.keys[position] = ''
+
+    def query(self, signature: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+              limit: int = 5) -> List[Tuple[str, float]]:
+        """Formulaires indexés d'une similarité estimée >= threshold, du plus proche au moins proche"""
+        candidates = set()
+        for table, band_key in zip(self._tables, self._band_keys(signature)):
+            candidates.update(table.get(band_key, ()))
+        if not candidates:
+            return []
+        rows = np.fromiter(candidates, dtype=np.int64)
+        scores = (self._signatures[rows] == signature).mean(axis=1)
+        order = np.argsort(-scores)
+        return [(self.keys[rows[index]], float(scores[index])) for index in order[:limit]
+                if scores[index] >= threshold]
+
+    def save(self, path: Path):
+        live = list(self.positions.values())
+        np.savez_compressed(path, keys=np.array([self.keys[position] for position in live], dtype=str),
+                            signatures=self._signatures[live], bands=self.bands)
+
+    @classmethod
+    def load(cls, path: Path) -> 'NearDuplicateIndex':
+        with np.load(path, allow_pickle=False) as archive:
+            index = cls(int(archive['bands']))
+            for key, signature in zip(archive['keys'], archive['signatures']):
+                index.add(str(key), signature)
+        return index
+
+
+@dataclass
+class ReuseResult:
+    """Conversion produite par réutilisation (source = formulaire patché) ou convertie"""
+    form_id: str
+    form_json: Dict[str, Any]
+    source: Optional[str] = None
+    similarity: float = 0.0
+
+    @property
+    def reused(self) -> bool:
+        return self.source is not None
+
+
+class ConversionReuseStore:
+    """
+    Conversions stockées dans un répertoire: index.npz (signatures) et un FORM.json par
+    formulaire contenant la génération déterministe de référence et le résultat retenu
+    """
+
+    def __init__(self, directory: Path, generator: Any, threshold: float = DEFAULT_THRESHOLD):
+        self.directory = Path(directory)
+        self.generator = generator
+        self.threshold = threshold
+        self.index_path = self.directory / 'index.npz'
+        self.index = NearDuplicateIndex.load(self.index_path) if self.index_path.exists() else NearDuplicateIndex()
+
+    def _entry_path(self, form_id: str) -> Path:
+        return self.directory / f'{form_id.upper()}.json'
+
+    def _write(self, path: Path, payload: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + '.part')
+        with open(partial, 'w', encoding='utf-8') as handle:
+            json.dump(payload, handle, ensure_ascii=False, separators=(',', ':'))
+        os.replace(partial, path)
+
+    def remember(self, form_id: str, signature: np.ndarray, baseline: Dict[str, Any], result: Dict[str, Any]):
+        """Stocke une conversion (le résultat peut différer de la génération: corrections, modèle)"""
+        self._write(self._entry_path(form_id), {'baseline': baseline, 'result': result})
+        self.index.add(form_id.upper(), signature)
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial = self.index_path.with_name('index.part.npz')
+        self.index.save(partial)
+        os.replace(partial, self.index_path)
+
+    def _patched(self, source: str, baseline: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(source), 'r', encoding='utf-8') as handle:
+                stored = json.load(handle)
+            return apply_delta(canonical(stored['result'], repair_ids=False),
+                               form_delta(canonical(stored['baseline'], repair_ids=False), baseline))
+        except (OSError, ValueError, KeyError) as e:
+            # PatchError dérive de ValueError: résultat stocké trop éloigné de sa génération
+            self.generator.metrics.record_error('reuse_patch', e)
+            return None
+
+    def convert(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str,
+                converter: Optional[Callable[[Optional[str], Optional[str], str], Dict[str, Any]]] = None,
+                remember: bool = True) -> ReuseResult:
+        """
+        Réutilise la conversion stockée la plus proche si elle dépasse le seuil, sinon appelle
+        converter (génération déterministe par défaut); le résultat est mémorisé
+        """
+        generator = self.generator
+        dfm_data = generator.parse_dfm_content(dfm_content) if dfm_content else None
+        info_data = generator.parse_info_content(info_content) if info_content else {}
+        signature = generator.fingerprint(dfm_data)
+        baseline = generator.generate_form_json(dfm_data, info_data, form_id)
+
+        result = None
+        for source, score in self.index.query(signature, self.threshold):
+            if source == form_id.upper():
+                continue
+            form_json = self._patched(source, baseline)
+            if form_json is not None:
+                result = ReuseResult(form_id, form_json, source, score)
+                break
+        if result is None:
+            form_json = converter(dfm_content, info_content, form_id) if converter is not None else baseline
+            result = ReuseResult(form_id, form_json)
+        generator.metrics.record_cache('conversion_reuse', result.reused)
+        if remember:
+            self.remember(form_id, signature, baseline, result.form_json)
+        return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # Imports locaux: form_engine importe ce module
+    from batch_convert import pair_input_files, read_text
+    from form_engine import FormGeneratorAI
+
+    parser = argparse.ArgumentParser(description="Quasi-doublons de DFM et réutilisation des conversions")
+    parser.add_argument('inputs', nargs='+', type=Path, help="Fichiers ou répertoires DFM/Info")
+    parser.add_argument('--store', type=Path, required=True, help="Répertoire des conversions stockées")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('-o', '--output-dir', type=Path, help="Écrit les formulaires produits")
+    parser.add_argument('--dry-run', action='store_true', help="Signale les quasi-doublons sans rien stocker")
+    args = parser.parse_args(argv)
+
+    store = ConversionReuseStore(args.store, FormGeneratorAI(), args.threshold)
+    reused = 0
+    pairs, rejected = pair_input_files(args.inputs)
+    for entry in rejected:
+        print(f"❌ {entry['form_id']}: {entry['errors'][0]}", file=sys.stderr)
+    for form_id, (dfm_path, info_path) in pairs.items():
+        result = store.convert(read_text(dfm_path) if dfm_path else None, read_text(info_path) if info_path else None,
+                               form_id, remember=not args.dry_run)
+        if result.reused:
+            reused += 1
+            print(f"{form_id}\t≈ {result.source}\t{result.similarity:.2f}")
+        if args.output_dir is not None:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+            (args.output_dir / f'{form_id.lower()}_form.json').write_text(
+                json.dumps(result.form_json, indent=2, ensure_ascii=False), encoding='utf-8')
+    if not args.dry_run:
+        store.save()
+    print(f"✅ {reused} formulaire(s) produit(s) par réutilisation, index de {len(store.index)} formulaire(s)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
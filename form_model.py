@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Modèle interne compact du moteur de conversion FormBuilder Pro
+Composants DFM, champs, validations et formulaires en classes à __slots__ (pas de __dict__
+par objet), noms de types et de propriétés internés. Le parser et le générateur travaillent
+sur ces objets; la forme dict publique (JSON) n'est produite que par to_dict() à la sérialisation
+"""
+
+import sys
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, List, Any, Iterator, Optional, Sequence, Tuple
+
+intern = sys.intern
+
+# Les chaînes courtes (libellés, noms de champs) se répètent d'un formulaire à l'autre
+MAX_INTERNED_STRING = 64
+
+# Dispositions de clés en cache: les formes courantes (Left, Top, Caption...) sont partagées, et un
+# DFM aux propriétés arbitraires ne fait pas grossir le cache (les sacs existants gardent la leur)
+MAX_LAYOUTS = 4096
+
+def intern_short(value: str) -> str:
+    return intern(value) if len(value) <= MAX_INTERNED_STRING else value
+
+
+@lru_cache(maxsize=MAX_LAYOUTS)
+def _layout(keys: Tuple[str, ...]) -> Dict[str, int]:
+    """Disposition partagée par toutes les propriétés de même forme"""
+    return {intern(key): position for position, key in enumerate(keys)}
+
+
+# Condition toujours vraie des champs désactivés ou masqués dans le DFM
+ALWAYS_FALSE = 'AlwaysFalse'
+
+
+class PropertyBag(Mapping):
+    """
+    Propriétés figées d'un composant: un tuple de valeurs et une disposition des clés partagée
+    entre composants (un dict par forme de propriétés, pas un dict par composant)
+    """
+
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, properties: Optional[Dict[str, Any]] = None):
+        properties = properties or {}
+        self._layout = _layout(tuple(properties))
+        self._values = tuple(properties.values())
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._layout[key]]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        position = self._layout.get(key)
+        return default if position is None else self._values[position]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._layout
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f'PropertyBag({dict(self)!r})'
+
+
+EMPTY_PROPERTIES = PropertyBag()
+
+
+class DfmComponent:
+    """
+    Objet d'un DFM: nom, type Delphi, type JSON, propriétés propres, parent, plage de lignes et
+    mot-clé de déclaration ('object', 'inherited' pour un composant hérité, 'inline' pour un frame)
+    """
+
+    __slots__ = ('name', 'delphi_type', 'json_type', 'properties', 'parent', 'start_line', 'end_line', 'kind')
+
+    # Clés de l'ancienne représentation dict, toujours lisibles par component['name']...
+    _KEYS = ('name', 'delphi_type', 'json_type', 'properties', 'parent')
+
+    def __init__(self, name: str, delphi_type: str, json_type: str = 'TEXT',
+                 properties: Optional[Dict[str, Any]] = None, parent: Optional[str] = None,
+                 start_line: int = 0, end_line: int = 0, kind: str = 'object'):
+        self.name = intern(name)
+        self.delphi_type = intern(delphi_type)
+        self.json_type = intern(json_type)
+        # dict pendant le parsing, PropertyBag une fois l'objet fermé (freeze)
+        self.properties: Mapping = properties if properties is not None else {}
+        self.parent = parent
+        self.start_line = start_line
+        self.end_line = end_line
+        self.kind = intern(kind)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._KEYS else default
+
+    def freeze(self):
+        if isinstance(self.properties, dict):
+            self.properties = PropertyBag(self.properties) if self.properties else EMPTY_PROPERTIES
+
+    def __repr__(self) -> str:
+        return f'DfmComponent({self.name!r}, {self.delphi_type!r}, {self.json_type!r}, lignes {self.start_line}-{self.end_line})'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'delphi_type': self.delphi_type,
+            'json_type': self.json_type,
+            'properties': dict(self.properties),
+            'parent': self.parent,
+        }
+
+
+class ParsedDfm:
+    """
+    Résultat du parsing d'un DFM: formulaire racine et composants dans l'ordre du fichier;
+    form_kind vaut 'inherited' pour un formulaire hérité (seules les différences sont listées).
+    rules associe au nom de composant (minuscules) les EnabledWhen/VisibleWhen déduits des
+    gestionnaires d'événements Pascal (pascal_events)
+    """
+
+    __slots__ = ('form_name', 'form_type', 'properties', 'components', 'end_line', 'form_kind', 'rules')
+
+    _KEYS = ('form_properties', 'components')
+
+    def __init__(self, form_name: Optional[str] = None, form_type: Optional[str] = None,
+                 properties: Optional[Dict[str, Any]] = None, components: Optional[List[DfmComponent]] = None,
+                 end_line: int = 0, form_kind: str = 'object',
+                 rules: Optional[Dict[str, Dict[str, Sequence['Condition']]]] = None):
+        self.form_name = form_name
+        self.form_type = form_type
+        self.properties = properties if properties is not None else {}
+        self.components = components if components is not None else []
+        self.end_line = end_line
+        self.form_kind = form_kind
+        self.rules = rules if rules is not None else {}
+
+    @property
+    def form_properties(self) -> Dict[str, Any]:
+        """Propriétés du formulaire au format historique (name, caption, width)"""
+        form_properties = {}
+        if self.form_name:
+            form_properties['name'] = self.form_name
+        caption = self.properties.get('Caption')
+        if isinstance(caption, str) and caption:
+            form_properties['caption'] = caption
+        width = self.properties.get('Width')
+        if isinstance(width, int) and not isinstance(width, bool):
+            form_properties['width'] = f"{width}px"
+        return form_properties
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._KEYS else default
+
+    def children(self, parent: Optional[str]) -> Iterator[DfmComponent]:
+        """Composants directement contenus par parent (nom du formulaire pour le premier niveau)"""
+        return (component for component in self.components if component.parent == parent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'form_properties': self.form_properties,
+            'components': [component.to_dict() for component in self.components],
+        }
+
+
+class InfoRecord:
+    """Ligne du fichier Info; lisible comme l'ancien dict (record['name'], record.get('entity'))"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class InfoField(InfoRecord):
+    """FieldName|Type|Required|Entity|Description"""
+
+    __slots__ = ('name', 'type', 'required', 'entity', 'description')
+
+    def __init__(self, name: str, field_type: str, required: bool, entity: Optional[str] = None,
+                 description: Optional[str] = None):
+        self.name = intern_short(name)
+        self.type = intern_short(field_type)
+        self.required = required
+        self.entity = intern_short(entity) if entity else entity
+        self.description = description
+
+
+class InfoValidation(InfoRecord):
+    """FieldName|Operator|Value|Message|Type"""
+
+    __slots__ = ('field', 'operator', 'value', 'message', 'type')
+
+    def __init__(self, field_name: str, operator: str, value: str, message: str, rule_type: str = 'ERROR'):
+        self.field = intern_short(field_name)
+        self.operator = intern_short(operator)
+        self.value = intern_short(value)
+        self.message = message
+        self.type = intern_short(rule_type)
+
+
+class InfoEntity(InfoRecord):
+    """EntityName|KeyField|Endpoint|Columns"""
+
+    __slots__ = ('name', 'key_field', 'endpoint', 'columns')
+
+    def __init__(self, name: str, key_field: str, endpoint: Optional[str] = None,
+                 columns: Sequence[str] = ()):
+        self.name = intern_short(name)
+        self.key_field = intern_short(key_field)
+        self.endpoint = intern_short(endpoint) if endpoint else endpoint
+        self.columns = [intern_short(column) for column in columns]
+
+
+class Condition:
+    """Condition d'expression (RightField, Operator[, Value, ValueType])"""
+
+    __slots__ = ('right_field', 'operator', 'value', 'value_type')
+
+    def __init__(self, right_field: str, operator: str, value: Any = None, value_type: Optional[str] = None):
+        self.right_field = right_field
+        self.operator = intern(operator)
+        self.value = value
+        # Sans value_type, la condition ne porte ni Value ni ValueType (ISN, IST...)
+        self.value_type = intern(value_type) if value_type else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        condition = {"RightField": self.right_field, "Operator": self.operator}
+        if self.value_type is not None:
+            condition["Value"] = self.value
+            condition["ValueType"] = self.value_type
+        return condition
+
+
+ALWAYS_FALSE_CONDITIONS = (Condition(ALWAYS_FALSE, 'IST'),)
+
+
+class CondExpression:
+    """
+    Conditions combinées par un même opérateur logique (AND, OR); se parcourt comme une séquence
+    de Condition. LogicalOperator n'est émis qu'à partir de deux conditions
+    """
+
+    __slots__ = ('conditions', 'logical_operator')
+
+    def __init__(self, conditions: Sequence[Condition], logical_operator: str = 'AND'):
+        self.conditions = tuple(conditions)
+        self.logical_operator = intern(logical_operator)
+
+    def __iter__(self) -> Iterator[Condition]:
+        return iter(self.conditions)
+
+    def __len__(self) -> int:
+        return len(self.conditions)
+
+
+def expression_dict(conditions: Sequence[Condition]) -> Dict[str, Any]:
+    """Forme JSON {"Conditions": [...], "LogicalOperator": ...} d'une suite de conditions"""
+    expression: Dict[str, Any] = {"Conditions": [condition.to_dict() for condition in conditions]}
+    if isinstance(conditions, CondExpression) and len(conditions) > 1:
+        expression["LogicalOperator"] = conditions.logical_operator
+    return expression
+
+
+class FormField:
+    """Champ généré; les attributs optionnels à None sont absents du JSON"""
+
+    __slots__ = ('id', 'label', 'type', 'required', 'entity', 'entity_key_field', 'endpoint',
+                 'column_definitions', 'options', 'data_type', 'enabled_when', 'visible_when')
+
+    def __init__(self, field_id: str, label: str, field_type: str, required: bool = False):
+        self.id = field_id
+        self.label = intern_short(label)
+        self.type = intern(field_type)
+        self.required = required
+        self.entity: Optional[str] = None
+        self.entity_key_field: Optional[str] = None
+        self.endpoint: Optional[str] = None
+        # (DataField, Caption, DataType) par colonne
+        self.column_definitions: Optional[Tuple[Tuple[str, str, str], ...]] = None
+        self.options: Optional[List[Dict[str, str]]] = None
+        self.data_type: Optional[str] = None
+        # Suite de Condition (implicitement AND) ou CondExpression
+        self.enabled_when: Optional[Sequence[Condition]] = None
+        self.visible_when: Optional[Sequence[Condition]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        field = {
+            "Id": self.id,
+            "label": self.label,
+            "type": self.type,
+            "required": self.required,
+        }
+        if self.entity is not None:
+            field["EntitykeyField"] = self.entity_key_field
+            field["Entity"] = self.entity
+            field["endpoint"] = self.endpoint
+            field["ColumnDefinitions"] = [
+                {"DataField": data_field, "Caption": caption, "DataType": data_type}
+                for data_field, caption, data_type in self.column_definitions or ()
+            ]
+        if self.options is not None:
+            field["Options"] = self.options
+        if self.data_type is not None:
+            field["DataType"] = self.data_type
+        if self.enabled_when is not None:
+            field["EnabledWhen"] = expression_dict(self.enabled_when)
+        if self.visible_when is not None:
+            field["VisibleWhen"] = expression_dict(self.visible_when)
+        return field
+
+
+class ValidationRule:
+    """Validation du formulaire (Id, Type, Message, CondExpression)"""
+
+    __slots__ = ('id', 'type', 'message', 'conditions')
+
+    def __init__(self, rule_id: str, rule_type: str, message: str, conditions: Sequence[Condition]):
+        self.id = rule_id
+        self.type = intern(rule_type)
+        self.message = message
+        self.conditions = tuple(conditions)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "Id": self.id,
+            "Type": self.type,
+            "Message": self.message,
+            "CondExpression": {"Conditions": [condition.to_dict() for condition in self.conditions]},
+        }
+
+
+class FormAction:
+    __slots__ = ('id', 'label', 'method')
+
+    def __init__(self, action_id: str, label: str, method: str):
+        self.id = action_id
+        self.label = label
+        self.method = method
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ID": self.id, "Label": self.label, "MethodToInvoke": self.method}
+
+
+class FormModel:
+    """Formulaire généré; to_dict() produit la structure JSON publique (MenuID, Fields...)"""
+
+    __slots__ = ('menu_id', 'label', 'form_width', 'layout', 'fields', 'actions', 'validations')
+
+    def __init__(self, menu_id: str, label: str, form_width: str = '700px', layout: str = 'PROCESS'):
+        self.menu_id = menu_id
+        self.label = label
+        self.form_width = form_width
+        self.layout = intern(layout)
+        self.fields: List[FormField] = []
+        self.actions: List[FormAction] = []
+        self.validations: List[ValidationRule] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "MenuID": self.menu_id,
+            "Label": self.label,
+            "FormWidth": self.form_width,
+            "Layout": self.layout,
+            "Fields": [field.to_dict() for field in self.fields],
+            "Actions": [action.to_dict() for action in self.actions],
+            "Validations": [validation.to_dict() for validation in self.validations],
+        }
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Normalisation des formulaires JSON FormBuilder Pro vers le dialecte canonique
+Deux dialectes coexistent: celui du moteur (MenuID, Fields, Id, label, type...) et celui de
+l'éditeur (menuId, fields, Label, Type, formMetadata...). Le normaliseur réécrit les clés en
+une seule passe via une table de traduction précalculée par contexte (formulaire, champ,
+action, validation, condition...), répare les Id dupliqués et migre des répertoires entiers
+en parallèle, chaque fichier étant relu puis écrit en flux
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from form_writer import JsonStreamWriter, write_form
+
+# Clés canoniques par contexte: celles émises par form_engine, complétées par les templates
+CANONICAL_KEYS: Dict[str, Tuple[str, ...]] = {
+    'form': ('MenuID', 'Label', 'FormWidth', 'Layout', 'Fields', 'Actions', 'Validations',
+             'Variables', 'LoadDataDetails'),
+    'field': ('Id', 'label', 'type', 'required', 'EntitykeyField', 'Entity', 'endpoint',
+              'ColumnDefinitions', 'Options', 'DataType', 'EnabledWhen', 'VisibleWhen',
+              'ChildFields', 'DataField', 'Width', 'Spacing', 'Inline', 'Outlined', 'Value',
+              'CheckboxValue', 'KeyColumn', 'OptionValues', 'ItemInfo', 'LoadDataInfo', 'Events',
+              'RecordActions', 'Validations', 'EndpointOnchange', 'UserIntKey', 'showAliasBox',
+              'isGroup', 'format'),
+    'action': ('ID', 'Label', 'MethodToInvoke', 'UpdateVarValues'),
+    'validation': ('Id', 'Type', 'Message', 'CondExpression'),
+    'expression': ('Conditions', 'LogicalOperator'),
+    'condition': ('RightField', 'Operator', 'Value', 'ValueType', 'VariableId', 'NestedCondExp'),
+    'column': ('DataField', 'Caption', 'DataType', 'Visible', 'ExcludeFromGrid'),
+}
+
+# Synonymes qui ne se déduisent pas de la casse
+KEY_ALIASES: Dict[str, Dict[str, str]] = {
+    'field': {'children': 'ChildFields', 'columnsdefinition': 'ColumnDefinitions'},
+    'validation': {'conditionexpression': 'CondExpression'},
+}
+
+# (contexte, clé canonique) -> contexte des valeurs (objet ou éléments du tableau)
+CHILD_CONTEXTS: Dict[Tuple[str, str], str] = {
+    ('form', 'Fields'): 'field',
+    ('form', 'Actions'): 'action',
+    ('form', 'Validations'): 'validation',
+    ('field', 'ChildFields'): 'field',
+    ('field', 'Validations'): 'validation',
+    ('field', 'EnabledWhen'): 'expression',
+    ('field', 'VisibleWhen'): 'expression',
+    ('field', 'ColumnDefinitions'): 'column',
+    ('validation', 'CondExpression'): 'expression',
+    ('expression', 'Conditions'): 'condition',
+    ('condition', 'NestedCondExp'): 'expression',
+}
+
+# Métadonnées de l'export de l'éditeur remontées au niveau du formulaire
+METADATA_KEY = 'formMetadata'
+
+
+def _build_translation() -> Dict[str, Dict[str, str]]:
+    """Table précalculée: contexte -> {clé en minuscules: clé canonique}"""
+    translation = {}
+    for context, keys in CANONICAL_KEYS.items():
+        table = {key.lower(): key for key in keys}
+        table.update(KEY_ALIASES.get(context, {}))
+        translation[context] = table
+    return translation
+
+
+TRANSLATION = _build_translation()
+
+
+@dataclass
+class NormalizationReport:
+    """Modifications apportées à un formulaire"""
+    renamed_keys: int = 0
+    conflicts: List[str] = field(default_factory=list)  # Clés en double après traduction
+    repaired_ids: List[Tuple[str, str]] = field(default_factory=list)  # (Id d'origine, nouvel Id)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.renamed_keys or self.conflicts or self.repaired_ids)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'renamed_keys': self.renamed_keys, 'conflicts': self.conflicts,
+                'repaired_ids': [list(pair) for pair in self.repaired_ids]}
+
+
+class _IdRegistry:
+    """Id déjà vus dans un espace (champs, validations, actions); les doublons sont suffixés"""
+
+    def __init__(self, report: NormalizationReport):
+        self.seen = set()
+        self.report = report
+
+    def claim(self, identity: Any) -> Any:
+        if not isinstance(identity, (str, int)) or isinstance(identity, bool):
+            return identity
+        if identity not in self.seen:
+            self.seen.add(identity)
+            return identity
+        # Le premier porteur garde l'Id (les conditions RightField le désignent déjà)
+        suffix = 2
+        while f'{identity}_{suffix}' in self.seen:
+            suffix += 1
+        repaired = f'{identity}_{suffix}'
+        self.seen.add(repaired)
+        self.report.repaired_ids.append((str(identity), repaired))
+        return repaired
+
+
+class FormNormalizer:
+    """Normalisation d'un formulaire; une instance par formulaire (registres d'Id)"""
+
+    def __init__(self, repair_ids: bool = True):
+        self.repair_ids = repair_ids
+        self.report = NormalizationReport()
+        self._ids = {'field': _IdRegistry(self.report), 'validation': _IdRegistry(self.report),
+                     'action': _IdRegistry(self.report)}
+
+    def _object(self, value: Dict[str, Any], context: str) -> Dict[str, Any]:
+        table = TRANSLATION[context]
+        result: Dict[str, Any] = {}
+        exact = set()  # Clés déjà écrites sous leur forme canonique
+        for key, item in value.items():
+            canonical = table.get(key) or table.get(key.lower(), key)
+            if canonical != key:
+                self.report.renamed_keys += 1
+            if canonical in result:
+                # Les deux dialectes dans le même objet: la clé déjà canonique l'emporte
+                self.report.conflicts.append(f"{context}.{canonical}")
+                if canonical in exact or key != canonical:
+                    continue
+            if key == canonical:
+                exact.add(canonical)
+            child_context = CHILD_CONTEXTS.get((context, canonical))
+            result[canonical] = self._value(item, child_context) if child_context else item
+        identity_key = 'ID' if context == 'action' else 'Id'
+        if self.repair_ids and context in self._ids and identity_key in result:
+            result[identity_key] = self._ids[context].claim(result[identity_key])
+        return result
+
+    def _value(self, value: Any, context: str) -> Any:
+        if isinstance(value, dict):
+            return self._object(value, context)
+        if isinstance(value, list):
+            return [self._object(item, context) if isinstance(item, dict) else item for item in value]
+        return value
+
+    def normalize(self, form: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = form.get(METADATA_KEY)
+        if isinstance(metadata, dict):
+            # Export de l'éditeur: menuId, label... sous formMetadata
+            form = dict(form)
+            del form[METADATA_KEY]
+            table = TRANSLATION['form']
+            leftover = {}
+            for key, item in metadata.items():
+                canonical = table.get(key.lower())
+                if canonical is None:
+                    leftover[key] = item
+                elif canonical not in form and key not in form:
+                    form[key] = item
+            if leftover:
+                form[METADATA_KEY] = leftover
+        return self._object(form, 'form')
+
+
+def normalize_form(form: Dict[str, Any], repair_ids: bool = True) -> Tuple[Dict[str, Any], NormalizationReport]:
+    """Formulaire au dialecte canonique (nouvel objet; les sous-arbres inconnus sont partagés)"""
+    normalizer = FormNormalizer(repair_ids)
+    return normalizer.normalize(form), normalizer.report
+
+
+def canonical(form: Dict[str, Any], repair_ids: bool = True) -> Dict[str, Any]:
+    """normalize_form sans le rapport, pour les consommateurs qui lisent un seul dialecte"""
+    return FormNormalizer(repair_ids).normalize(form)
+
+
+def is_form(document: Any) -> bool:
+    """Document au format formulaire (l'un ou l'autre dialecte), pas package.json ou tsconfig.json"""
+    if not isinstance(document, dict):
+        return False
+    if isinstance(document.get(METADATA_KEY), dict):
+        return True
+    table = TRANSLATION['form']
+    return any(table.get(key.lower()) in ('MenuID', 'Fields') for key in document)
+
+
+def normalize_file(source: Path, destination: Path, check: bool = False) -> Dict[str, Any]:
+    """
+    Normalise un fichier JSON; écriture en flux dans un fichier temporaire renommé une fois complet.
+    Un document qui n'est pas un formulaire est ignoré, un formulaire déjà canonique n'est pas
+    réécrit sur place (il est seulement copié vers une autre destination)
+    """
+    entry: Dict[str, Any] = {'source': str(source)}
+    try:
+        with open(source, 'rb') as handle:
+            form = json.load(handle)
+        if not is_form(form):
+            entry['status'] = 'skipped'
+            return entry
+        normalized, report = normalize_form(form)
+    except (OSError, ValueError) as e:
+        entry.update(status='error', error=str(e))
+        return entry
+
+    entry.update(status='changed' if report.changed else 'unchanged', **report.to_dict())
+    if check:
+        return entry
+    if not report.changed:
+        if destination.resolve() != source.resolve():
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, destination)
+            entry['output'] = str(destination)
+        return entry
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + '.part')
+    with open(partial, 'wb') as stream:
+        writer = JsonStreamWriter(stream)
+        write_form(writer, normalized)
+        writer.flush()
+    os.replace(partial, destination)
+    entry['output'] = str(destination)
+    return entry
+
+
+def _normalize_task(task: Tuple[Path, Path, bool]) -> Dict[str, Any]:
+    return normalize_file(*task)
+
+
+def iter_form_files(source: Path) -> Iterator[Path]:
+    if source.is_file():
+        yield source
+        return
+    for path in sorted(source.rglob('*.json')):
+        if path.is_file():
+            yield path
+
+
+def migrate_directory(source: Path, destination: Optional[Path] = None, workers: Optional[int] = None,
+                      check: bool = False) -> List[Dict[str, Any]]:
+    """
+    Normalise tous les *.json de source vers destination (même arborescence), ou sur place
+    sans destination; les fichiers sont répartis sur un pool de processus
+    """
+    def target(path: Path) -> Path:
+        if destination is None:
+            return path
+        relative = path.relative_to(source) if source.is_dir() else Path(path.name)
+        return destination / relative
+
+    tasks = ((path, target(path), check) for path in iter_form_files(source))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [_normalize_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_normalize_task, tasks, chunksize=16))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Normalise des formulaires JSON vers le dialecte canonique")
+    parser.add_argument('source', type=Path, help="Fichier ou répertoire de formulaires JSON")
+    parser.add_argument('-o', '--output', type=Path, help="Répertoire (ou fichier) de sortie; sur place par défaut")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de travail")
+    parser.add_argument('--check', action='store_true', help="Signale les fichiers non canoniques sans les réécrire")
+    parser.add_argument('--report-json', type=Path, help="Écrit le rapport par fichier")
+    args = parser.parse_args(argv)
+
+    if args.source.is_file() and args.output is not None and args.output.suffix == '.json':
+        report = [normalize_file(args.source, args.output, args.check)]
+    else:
+        report = migrate_directory(args.source, args.output, args.workers, args.check)
+
+    changed = [entry for entry in report if entry['status'] == 'changed']
+    errors = [entry for entry in report if entry['status'] == 'error']
+    skipped = sum(entry['status'] == 'skipped' for entry in report)
+    repaired = sum(len(entry.get('repaired_ids', [])) for entry in report)
+    print(f"✅ {len(report) - skipped} formulaire(s): {len(changed)} normalisé(s), {repaired} Id réparé(s), "
+          f"{len(errors)} erreur(s), {skipped} document(s) JSON ignoré(s)", file=sys.stderr)
+    for entry in errors:
+        print(f"❌ {entry['source']}: {entry['error']}", file=sys.stderr)
+    if args.report_json is not None:
+        args.report_json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    return 1 if errors or (args.check and changed) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
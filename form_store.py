@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Base SQLite des formulaires convertis (FormBuilder Pro)
+Chaque conversion est conservée avec ses champs, ses validations et la provenance de ses
+sources (fichiers, empreinte du contenu, types Delphi des composants). Des index secondaires
+par MenuID, entité, type JSON, type Delphi et empreinte répondent en quelques millisecondes
+à « quels formulaires utilisent l'entité Secrty » ou « lesquels contiennent un
+TDBLookupComboBox », sans relire ni reparser le corpus. La base est en mode WAL: les
+lectures ne bloquent pas l'écriture d'un batch, et les insertions sont groupées par
+transaction (milliers de formulaires par seconde)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from dfm_parser import component_types
+from form_normalizer import canonical, iter_form_files
+
+# Formulaires accumulés avant l'écriture d'une transaction
+BATCH_SIZE = int(os.getenv('FORMBUILDER_STORE_BATCH', '500'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    id INTEGER PRIMARY KEY,
+    menu_id TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    label TEXT,
+    layout TEXT,
+    status TEXT,
+    content_hash TEXT,
+    dfm_source TEXT,
+    info_source TEXT,
+    field_count INTEGER,
+    validation_count INTEGER,
+    converted_at REAL,
+    form_json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    form_id INTEGER NOT NULL REFERENCES forms(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    field_id TEXT COLLATE NOCASE,
+    parent_id TEXT,
+    label TEXT,
+    json_type TEXT COLLATE NOCASE,
+    delphi_type TEXT COLLATE NOCASE,
+    entity TEXT COLLATE NOCASE,
+    data_type TEXT,
+    required INTEGER
+);
+CREATE TABLE IF NOT EXISTS validations (
+    form_id INTEGER NOT NULL REFERENCES forms(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    validation_id TEXT,
+    type TEXT,
+    message TEXT,
+    field_id TEXT COLLATE NOCASE,
+    operator TEXT
+);
+CREATE INDEX IF NOT EXISTS forms_content_hash ON forms(content_hash);
+CREATE INDEX IF NOT EXISTS fields_form ON fields(form_id);
+CREATE INDEX IF NOT EXISTS fields_entity ON fields(entity, form_id);
+CREATE INDEX IF NOT EXISTS fields_json_type ON fields(json_type, form_id);
+CREATE INDEX IF NOT EXISTS fields_delphi_type ON fields(delphi_type, form_id);
+CREATE INDEX IF NOT EXISTS validations_form ON validations(form_id);
+CREATE INDEX IF NOT EXISTS validations_field ON validations(field_id);
+"""
+
+# Critère de recherche -> colonne indexée de la table fields
+FIELD_FILTERS = {'entity': 'entity', 'json_type': 'json_type', 'delphi_type': 'delphi_type'}
+
+
+class StoreError(ValueError):
+    """Formulaire absent de la base ou enregistrement invalide"""
+
+
+def content_hash(dfm_content: Optional[str], info_content: Optional[str]) -> str:
+    """Empreinte des sources (DFM puis Info): formulaires identiques d'un corpus à l'autre"""
+    digest = hashlib.blake2b(digest_size=16)
+    for content in (dfm_content, info_content):
+        digest.update(b'\x00' if content is None else b'\x01' + content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def source_metadata(dfm_content: Optional[str], info_content: Optional[str],
+                    dfm_source: Optional[str] = None, info_source: Optional[str] = None) -> Dict[str, Any]:
+    """Provenance enregistrée avec le formulaire: sources, empreinte et types Delphi par composant"""
+    return {'dfm_source': dfm_source, 'info_source': info_source,
+            'content_hash': content_hash(dfm_content, info_content),
+            'delphi_types': component_types(dfm_content) if dfm_content else {}}
+
+
+def _iter_fields(fields: Any, parent: Optional[str] = None) -> Iterator[Tuple[Optional[str], Dict[str, Any]]]:
+    """(Id du groupe parent, champ) en profondeur, groupes (ChildFields) compris"""
+    for item in fields or ():
+        if isinstance(item, dict):
+            yield parent, item
+            yield from _iter_fields(item.get('ChildFields'), item.get('Id'))
+
+
+def _first_condition(validation: Dict[str, Any]) -> Dict[str, Any]:
+    conditions = (validation.get('CondExpression') or {}).get('Conditions') or []
+    return conditions[0] if conditions and isinstance(conditions[0], dict) else {}
+
+
+class FormStore:
+    """
+    Base des conversions; add() accumule, flush() écrit un lot dans une transaction.
+        with FormStore(Path('forms.db')) as store:
+            store.add(form_json, source_metadata(dfm, info, 'ACCADJ.dfm'))
+        FormStore(Path('forms.db')).find(entity='Secrty')
+    """
+
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL garde la base cohérente après une coupure (seule la dernière transaction peut manquer)
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(SCHEMA)
+        self._pending: List[Tuple[Dict[str, Any], Dict[str, Any], str]] = []
+
+    def __enter__(self) -> 'FormStore':
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.flush()
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, form: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None, status: str = 'success'):
+        """Ajoute (ou remplace, par MenuID) un formulaire; écrit dès que le lot est plein"""
+        if not isinstance(form, dict) or not form.get('MenuID'):
+            raise StoreError("Formulaire sans MenuID")
+        self._pending.append((form, metadata or {}, status))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Écrit les formulaires en attente dans une seule transaction; renvoie leur nombre"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        now = time.time()
+        with self.connection:
+            # Le dernier ajout d'un MenuID l'emporte, y compris à l'intérieur du lot
+            latest = {str(form['MenuID']).upper(): (form, metadata, status) for form, metadata, status in pending}
+            self.connection.executemany('DELETE FROM forms WHERE menu_id = ?', [(menu_id,) for menu_id in latest])
+            field_rows, validation_rows = [], []
+            for form, metadata, status in latest.values():
+                fields = form.get('Fields') or []
+                validations = form.get('Validations') or []
+                cursor = self.connection.execute(
+                    'INSERT INTO forms (menu_id, label, layout, status, content_hash, dfm_source, info_source, '
+                    'field_count, validation_count, converted_at, form_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (form['MenuID'], form.get('Label'), form.get('Layout'), status, metadata.get('content_hash'),
+                     metadata.get('dfm_source'), metadata.get('info_source'), len(fields), len(validations), now,
+                     json.dumps(form, ensure_ascii=False, separators=(',', ':'))))
+                form_id = cursor.lastrowid
+                delphi_types = metadata.get('delphi_types') or {}
+                for position, (parent, field) in enumerate(_iter_fields(fields)):
+                    field_id = field.get('Id')
+                    field_rows.append((form_id, position, field_id, parent, field.get('label'), field.get('type'),
+                                       delphi_types.get(str(field_id).lower()), field.get('Entity'),
+                                       field.get('DataType'), int(bool(field.get('required')))))
+                for position, validation in enumerate(validations):
+                    condition = _first_condition(validation)
+                    validation_rows.append((form_id, position, validation.get('Id'), validation.get('Type'),
+                                            validation.get('Message'), condition.get('RightField'),
+                                            condition.get('Operator')))
+            self.connection.executemany('INSERT INTO fields VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', field_rows)
+            self.connection.executemany('INSERT INTO validations VALUES (?, ?, ?, ?, ?, ?, ?)', validation_rows)
+        return len(latest)
+
+    # Lecture
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM forms').fetchone()[0]
+
+    def __contains__(self, menu_id: str) -> bool:
+        return self.connection.execute('SELECT 1 FROM forms WHERE menu_id = ?', (menu_id,)).fetchone() is not None
+
+    def get(self, menu_id: str) -> Dict[str, Any]:
+        row = self.connection.execute('SELECT form_json FROM forms WHERE menu_id = ?', (menu_id,)).fetchone()
+        if row is None:
+            raise StoreError(f"Formulaire absent de la base: {menu_id}")
+        return json.loads(row[0])
+
+    def source(self, menu_id: str) -> Dict[str, Any]:
+        """Provenance et statut de la dernière conversion d'un formulaire"""
+        row = self.connection.execute(
+            'SELECT menu_id, status, content_hash, dfm_source, info_source, field_count, validation_count, '
+            'converted_at FROM forms WHERE menu_id = ?', (menu_id,)).fetchone()
+        if row is None:
+            raise StoreError(f"Formulaire absent de la base: {menu_id}")
+        keys = ('menu_id', 'status', 'content_hash', 'dfm_source', 'info_source', 'fields', 'validations',
+                'converted_at')
+        return dict(zip(keys, row))
+
+    def menu_ids(self) -> List[str]:
+        return [row[0] for row in self.connection.execute('SELECT menu_id FROM forms ORDER BY menu_id')]
+
+    def find(self, entity: Optional[str] = None, json_type: Optional[str] = None, delphi_type: Optional[str] = None,
+             content_hash: Optional[str] = None) -> List[str]:
+        """MenuID des formulaires qui remplissent tous les critères (casse ignorée), par index"""
+        clauses, parameters = [], []
+        for name, value in (('entity', entity), ('json_type', json_type), ('delphi_type', delphi_type)):
+            if value is not None:
+                clauses.append(f'forms.id IN (SELECT form_id FROM fields WHERE {FIELD_FILTERS[name]} = ?)')
+                parameters.append(value)
+        if content_hash is not None:
+            clauses.append('forms.content_hash = ?')
+            parameters.append(content_hash)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return [row[0] for row in self.connection.execute(
+            f'SELECT menu_id FROM forms{where} ORDER BY menu_id', parameters)]
+
+    def fields(self, entity: Optional[str] = None, json_type: Optional[str] = None,
+               delphi_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Champs du corpus qui remplissent tous les critères, avec leur formulaire"""
+        clauses, parameters = [], []
+        for name, value in (('entity', entity), ('json_type', json_type), ('delphi_type', delphi_type)):
+            if value is not None:
+                clauses.append(f'fields.{FIELD_FILTERS[name]} = ?')
+                parameters.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        keys = ('menu_id', 'field_id', 'parent_id', 'label', 'json_type', 'delphi_type', 'entity', 'required')
+        rows = self.connection.execute(
+            'SELECT forms.menu_id, field_id, parent_id, fields.label, json_type, delphi_type, entity, required '
+            f'FROM fields JOIN forms ON forms.id = fields.form_id{where} ORDER BY forms.menu_id, position', parameters)
+        return [dict(zip(keys, row)) for row in rows]
+
+    def counts(self, column: str) -> Dict[str, int]:
+        """Nombre de formulaires par entité, type JSON ou type Delphi"""
+        if column not in FIELD_FILTERS:
+            raise StoreError(f"Critère inconnu: {column}")
+        column = FIELD_FILTERS[column]
+        rows = self.connection.execute(
+            f'SELECT {column}, COUNT(DISTINCT form_id) FROM fields WHERE {column} IS NOT NULL '
+            f'GROUP BY {column} ORDER BY 2 DESC, 1')
+        return dict(rows.fetchall())
+
+
+def import_forms(sources: List[Path], store: FormStore) -> Dict[str, Any]:
+    """Importe des *.json déjà générés (fichiers ou répertoires), sans provenance DFM"""
+    forms = 0
+    skipped = []
+    for source in sources:
+        for path in iter_form_files(source):
+            try:
+                form = json.loads(path.read_bytes())
+                # Les deux dialectes (MenuID/Fields ou menuId/fields) sont stockés au format canonique
+                store.add(canonical(form) if isinstance(form, dict) else form)
+            except (OSError, ValueError) as e:
+                skipped.append({'source': str(path), 'error': str(e)})
+                continue
+            forms += 1
+    store.flush()
+    return {'forms': forms, 'skipped': skipped}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Base SQLite indexée des formulaires convertis")
+    commands = parser.add_subparsers(dest='command', required=True)
+    importing = commands.add_parser('import', help="Importe des formulaires JSON déjà générés")
+    importing.add_argument('database', type=Path)
+    importing.add_argument('sources', nargs='+', type=Path)
+    get = commands.add_parser('get', help="Extrait un formulaire par MenuID")
+    get.add_argument('database', type=Path)
+    get.add_argument('menu_id')
+    get.add_argument('--source', action='store_true', help="Provenance au lieu du formulaire")
+    listing = commands.add_parser('list', help="MenuID filtrés par entité, type JSON, type Delphi ou empreinte")
+    listing.add_argument('database', type=Path)
+    listing.add_argument('--entity')
+    listing.add_argument('--type', dest='json_type')
+    listing.add_argument('--delphi-type')
+    listing.add_argument('--hash', dest='content_hash')
+    listing.add_argument('--fields', action='store_true', help="Champs correspondants plutôt que formulaires")
+    counting = commands.add_parser('counts', help="Formulaires par entité, type JSON ou type Delphi")
+    counting.add_argument('database', type=Path)
+    counting.add_argument('column', choices=sorted(FIELD_FILTERS))
+    args = parser.parse_args(argv)
+
+    if args.command != 'import' and not args.database.exists():
+        print(f"❌ Base introuvable: {args.database}", file=sys.stderr)
+        return 1
+    with FormStore(args.database) as store:
+        try:
+            if args.command == 'import':
+                summary = import_forms(args.sources, store)
+                print(json.dumps(summary, indent=2, ensure_ascii=False))
+                return 1 if summary['skipped'] else 0
+            if args.command == 'get':
+                result = store.source(args.menu_id) if args.source else store.get(args.menu_id)
+                print(json.dumps(result, indent=2, ensure_ascii=False))
+            elif args.command == 'counts':
+                for value, forms in store.counts(args.column).items():
+                    print(f"{forms}\t{value}")
+            elif args.fields:
+                print(json.dumps(store.fields(args.entity, args.json_type, args.delphi_type), indent=2,
+                                 ensure_ascii=False))
+            else:
+                print('\n'.join(store.find(args.entity, args.json_type, args.delphi_type, args.content_hash)))
+        except StoreError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Écriture JSON en flux des formulaires FormBuilder Pro
+Les champs et validations sont sérialisés un par un depuis des générateurs vers un fichier,
+un socket ou une réponse HTTP: la mémoire reste celle d'un élément, pas du formulaire entier.
+Modes compact et indenté (sortie identique à json.dumps(indent=2, ensure_ascii=False));
+orjson est utilisé s'il est installé
+"""
+
+import io
+import json
+from dataclasses import dataclass
+from typing import List, Any, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle
+    orjson = None
+
+# Taille du tampon avant écriture sur le flux (petite: le client HTTP reçoit tôt les premiers octets)
+FLUSH_BYTES = 16 * 1024
+
+
+@dataclass
+class WriteStats:
+    """Bilan d'une écriture en flux"""
+    fields: int = 0
+    validations: int = 0
+    bytes_written: int = 0
+
+
+class JsonStreamWriter:
+    """
+    Écrivain JSON incrémental: objets et tableaux ouverts puis complétés membre par membre.
+        writer.begin_object(); writer.key('Fields'); writer.begin_array()
+        for field in fields: writer.item(field)
+        writer.end_array(); writer.end_object(); writer.flush()
+    Les valeurs dotées de to_dict() (modèle compact) sont converties à l'écriture
+    """
+
+    def __init__(self, stream: Any, indent: Optional[int] = 2, backend: str = 'auto', flush_bytes: int = FLUSH_BYTES):
+        if backend not in ('auto', 'orjson', 'json'):
+            raise ValueError(f"Backend JSON inconnu: {backend}")
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError("Le paquet 'orjson' n'est pas installé")
+        # orjson ne sait indenter que de 2 espaces
+        self.use_orjson = orjson is not None and backend != 'json' and indent in (None, 2)
+        self.stream = stream
+        self.binary = not isinstance(stream, io.TextIOBase)
+        self.indent = indent
+        self.flush_bytes = flush_bytes
+        self.bytes_written = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        # Conteneurs ouverts: [type ('{' ou '['), nombre de membres]
+        self._stack: List[List[Any]] = []
+        self._after_key = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._stack)
+
+    @property
+    def position(self) -> int:
+        """Octets produits, tampon compris"""
+        return self.bytes_written + self._buffered
+
+    def _write(self, data: bytes):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.flush_bytes:
+            self._drain()
+
+    def _drain(self):
+        if not self._buffer:
+            return
+        data = b''.join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        self.stream.write(data if self.binary else data.decode('utf-8'))
+        self.bytes_written += len(data)
+
+    def flush(self):
+        self._drain()
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def _dumps(self, value: Any) -> bytes:
+        if hasattr(value, 'to_dict'):
+            value = value.to_dict()
+        elif isinstance(value, list) and value and hasattr(value[0], 'to_dict'):
+            value = [item.to_dict() for item in value]
+        if self.use_orjson:
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2 if self.indent else 0)
+        if self.indent:
+            return json.dumps(value, indent=self.indent, ensure_ascii=False).encode('utf-8')
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    def _newline(self, depth: int) -> bytes:
+        return b'\n' + b' ' * (self.indent * depth) if self.indent else b''
+
+    def _begin_member(self):
+        """Séparateur et indentation avant un nouvel élément du conteneur courant"""
+        if self._after_key:
+            self._after_key = False
+            return
+        if self._stack:
+            container = self._stack[-1]
+            if container[0] == '{':
+                raise ValueError("key() attendu avant une valeur d'objet")
+            self._write((b',' if container[1] else b'') + self._newline(len(self._stack)))
+            container[1] += 1
+
+    def key(self, name: str):
+        if not self._stack or self._stack[-1][0] != '{':
+            raise ValueError("key() hors d'un objet")
+        container = self._stack[-1]
+        separator = b': ' if self.indent else b':'
+        self._write((b',' if container[1] else b'') + self._newline(len(self._stack))
+                    + json.dumps(name, ensure_ascii=False).encode('utf-8') + separator)
+        container[1] += 1
+        self._after_key = True
+
+    def value(self, value: Any):
+        """Valeur complète (membre d'objet après key() ou élément de tableau)"""
+        self._begin_member()
+        data = self._dumps(value)
+        if self.indent and self._stack and b'\n' in data:
+            data = data.replace(b'\n', self._newline(len(self._stack)))
+        self._write(data)
+
+    item = value
+
+    def _begin(self, kind: str, opening: bytes):
+        self._begin_member()
+        self._write(opening)
+        self._stack.append([kind, 0])
+
+    def _end(self, kind: str, closing: bytes):
+        if not self._stack or self._stack[-1][0] != kind:
+            raise ValueError(f"Fermeture '{closing.decode()}' sans ouverture correspondante")
+        _, count = self._stack.pop()
+        self._write((self._newline(len(self._stack)) if count else b'') + closing)
+
+    def begin_object(self):
+        self._begin('{', b'{')
+
+    def end_object(self):
+        self._end('{', b'}')
+
+    def begin_array(self):
+        self._begin('[', b'[')
+
+    def end_array(self):
+        self._end('[', b']')
+
+    def items(self, values: Iterable[Any]) -> int:
+        """Écrit chaque élément d'un itérable dans le tableau courant; renvoie leur nombre"""
+        count = 0
+        for value in values:
+            self.item(value)
+            count += 1
+        return count
+
+    def close_all(self, depth: int = 0):
+        """Ferme les conteneurs ouverts au-delà de depth (fin anticipée après une erreur)"""
+        if self._after_key and len(self._stack) >= depth:
+            self.value(None)
+        while len(self._stack) > depth:
+            if self._stack[-1][0] == '{':
+                self.end_object()
+            else:
+                self.end_array()
+
+
+def write_form(writer: JsonStreamWriter, form: Any, fields: Optional[Iterable[Any]] = None,
+               validations: Optional[Iterable[Any]] = None) -> WriteStats:
+    """
+    Écrit un formulaire (FormModel ou dict) à la position courante du writer. fields et
+    validations remplacent ceux du formulaire, typiquement par les générateurs de iter_form()
+    """
+    if isinstance(form, dict):
+        header = form
+        fields = form.get("Fields", []) if fields is None else fields
+        validations = form.get("Validations", []) if validations is None else validations
+    else:
+        header = {"MenuID": form.menu_id, "Label": form.label, "FormWidth": form.form_width, "Layout": form.layout,
+                  "Fields": None, "Actions": form.actions, "Validations": None}
+        fields = form.fields if fields is None else fields
+        validations = form.validations if validations is None else validations
+
+    stats = WriteStats()
+    start = writer.position
+    writer.begin_object()
+    for name, value in header.items():
+        writer.key(name)
+        if name == "Fields":
+            writer.begin_array()
+            stats.fields = writer.items(fields)
+            writer.end_array()
+        elif name == "Validations":
+            writer.begin_array()
+            stats.validations = writer.items(validations)
+            writer.end_array()
+        else:
+            writer.value(value)
+    writer.end_object()
+    stats.bytes_written = writer.position - start
+    return stats
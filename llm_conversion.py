@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Conversion DFM/Info -> JSON assistée par un modèle de langage pour FormBuilder Pro
+Modes LLM (conversion complète par le modèle) et hybride (conversion déterministe,
+le modèle ne résout que les lookups sans entité). Le client Anthropic est optionnel;
+ReplayClient rejoue des réponses enregistrées pour les tests et l'évaluation hors ligne
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Optional
+
+from conversion_metrics import ConversionMetrics, get_default_metrics
+from form_engine import ConversionResult, FormGeneratorAI
+
+# Même modèle par défaut que server/anthropic.ts
+DEFAULT_MODEL = os.getenv('FORMBUILDER_LLM_MODEL', 'claude-sonnet-4-20250514')
+DEFAULT_MAX_TOKENS = 4000
+
+# Prix en dollars par million de tokens (entrée, sortie)
+MODEL_PRICING = {
+    'claude-sonnet-4-20250514': (3.0, 15.0),
+    'claude-3-7-sonnet-20250219': (3.0, 15.0),
+    'claude-3-5-haiku-20241022': (0.8, 4.0),
+}
+# Estimation grossière pour les réponses simulées (pas de comptage réel)
+CHARS_PER_TOKEN = 4
+
+CONVERSION_SYSTEM_PROMPT = """You convert Delphi forms (DFM) and their Info files into FormBuilder program JSON.
+Return only the JSON object, no markdown and no explanation, using exactly this structure:
+{"MenuID": "...", "Label": "...", "FormWidth": "700px", "Layout": "PROCESS",
+ "Fields": [{"Id": "...", "label": "...", "type": "...", "required": false,
+             "Entity": "...", "EntitykeyField": "...", "ColumnDefinitions": [...]}],
+ "Actions": [...], "Validations": [{"Id": "1", "Type": "ERROR", "Message": "...",
+             "CondExpression": {"Conditions": [{"RightField": "...", "Operator": "ISN"}]}}]}
+Field types: GRIDLKP, LSTLKP, SELECT, DATEPICKER, CHECKBOX, RADIOGRP, GROUP, TEXT, TEXTAREA, NUMERIC.
+Entities: Fndmas (funds), Secrty (securities), Seccat, Secgrp, Ae (brokers), Reason, Exchng, Psrc, Custod.
+Operators: IST, ISF, ISN, ISNN, EQ, NEQ, GT, LT, GTE, LTE."""
+
+ENTITY_SYSTEM_PROMPT = """You map Delphi lookup controls to Mfact entities.
+Return only a JSON object {"<control name>": {"Entity": "...", "EntitykeyField": "..."}} for the controls
+you can resolve. Entities: Fndmas/fund, Secrty/tkr, Seccat/seccat, Secgrp/secgrp, Ae/broker,
+Reason/reason, Exchng/exch, Psrc/pSource, Custod/entity."""
+
+_JSON_FENCE = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL)
+
+
+@dataclass
+class LLMResponse:
+    """Réponse d'un modèle et consommation de tokens"""
+    text: str
+    input_tokens: int
+    output_tokens: int
+    model: str
+    estimated: bool = False
+    simulated: bool = False  # Réponse fabriquée hors modèle (rejeu sans enregistrement réel)
+
+    @property
+    def cost(self) -> float:
+        """Coût en dollars selon MODEL_PRICING (0 si le modèle est inconnu)"""
+        input_price, output_price = MODEL_PRICING.get(self.model, (0.0, 0.0))
+        return (self.input_tokens * input_price + self.output_tokens * output_price) / 1e6
+
+
+def prompt_key(system: str, prompt: str) -> str:
+    """Clé d'enregistrement d'un échange (système + message)"""
+    return hashlib.sha256(f'{system}\x00{prompt}'.encode('utf-8')).hexdigest()
+
+
+def extract_json(text: str) -> Any:
+    """Extrait l'objet JSON d'une réponse (bloc ```json``` éventuel ou premier objet du texte)"""
+    fenced = _JSON_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find('{')
+    if start == -1:
+        raise ValueError("Aucun objet JSON dans la réponse du modèle")
+    value, _ = json.JSONDecoder().raw_decode(text, start)
+    return value
+
+
+class AnthropicClient:
+    """Client Anthropic (paquet anthropic et ANTHROPIC_API_KEY requis)"""
+
+    def __init__(self, model: str = DEFAULT_MODEL, max_tokens: int = DEFAULT_MAX_TOKENS, api_key: Optional[str] = None):
+        try:
+            import anthropic
+        except ImportError as e:
+            raise RuntimeError("Le paquet 'anthropic' n'est pas installé (pip install anthropic)") from e
+        api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        if not api_key:
+            raise RuntimeError("ANTHROPIC_API_KEY n'est pas configurée")
+        self.client = anthropic.Anthropic(api_key=api_key)
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def complete(self, system: str, prompt: str) -> LLMResponse:
+        message = self.client.messages.create(
+            model=self.model, max_tokens=self.max_tokens, system=system,
+            messages=[{'role': 'user', 'content': prompt}],
+        )
+        text = ''.join(block.text for block in message.content if getattr(block, 'type', '') == 'text')
+        return LLMResponse(text, message.usage.input_tokens, message.usage.output_tokens, self.model)
+
+
+class ReplayClient:
+    """
+    Rejoue des réponses enregistrées (clé = prompt_key). Sans enregistrement, la
+    fonction fallback peut simuler une réponse; la latence simulée suit le nombre de tokens
+    """
+
+    def __init__(self, recordings: Optional[Dict[str, Dict[str, Any]]] = None, model: str = DEFAULT_MODEL,
+                 fallback: Optional[Callable[[str, str], str]] = None, seconds_per_output_token: float = 0.0):
+        self.recordings = dict(recordings or {})
+        self.model = model
+        self.fallback = fallback
+        self.seconds_per_output_token = seconds_per_output_token
+        self.calls = 0
+
+    @classmethod
+    def from_directory(cls, directory: Path, **kwargs) -> 'ReplayClient':
+        """Charge les enregistrements *.json écrits par RecordingClient"""
+        recordings = {}
+        for path in sorted(Path(directory).glob('*.json')):
+            with open(path, 'r', encoding='utf-8') as handle:
+                recording = json.load(handle)
+            recordings[recording['key']] = recording
+        return cls(recordings, **kwargs)
+
+    def record(self, system: str, prompt: str, text: str, input_tokens: Optional[int] = None,
+               output_tokens: Optional[int] = None, simulated: bool = False):
+        """Ajoute une réponse; les tokens absents sont estimés"""
+        self.recordings[prompt_key(system, prompt)] = {
+            'text': text,
+            'input_tokens': input_tokens, 'output_tokens': output_tokens,
+            'simulated': simulated,
+        }
+
+    def complete(self, system: str, prompt: str) -> LLMResponse:
+        self.calls += 1
+        recording = self.recordings.get(prompt_key(system, prompt))
+        if recording is None:
+            if self.fallback is None:
+                raise KeyError("Aucune réponse enregistrée pour ce prompt")
+            recording = {'text': self.fallback(system, prompt), 'simulated': True}
+
+        text = recording['text']
+        estimated = recording.get('input_tokens') is None or recording.get('output_tokens') is None
+        input_tokens = recording.get('input_tokens') or (len(system) + len(prompt)) // CHARS_PER_TOKEN
+        output_tokens = recording.get('output_tokens') or len(text) // CHARS_PER_TOKEN
+        if self.seconds_per_output_token:
+            time.sleep(output_tokens * self.seconds_per_output_token)
+        return LLMResponse(text, input_tokens, output_tokens, recording.get('model', self.model), estimated,
+                           recording.get('simulated', False))
+
+
+class RecordingClient:
+    """Enveloppe un client réel et enregistre chaque échange pour ReplayClient.from_directory"""
+
+    def __init__(self, inner: Any, directory: Path):
+        self.inner = inner
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def complete(self, system: str, prompt: str) -> LLMResponse:
+        response = self.inner.complete(system, prompt)
+        key = prompt_key(system, prompt)
+        with open(self.directory / f'{key[:16]}.json', 'w', encoding='utf-8') as handle:
+            json.dump({'key': key, 'model': response.model, 'text': response.text,
+                       'input_tokens': response.input_tokens, 'output_tokens': response.output_tokens},
+                      handle, indent=2, ensure_ascii=False)
+        return response
+
+
+def build_conversion_prompt(dfm_content: Optional[str], info_content: Optional[str], form_id: str,
+                            examples: str = '') -> str:
+    """
+    Message de conversion complète (même contenu que convertDFMToJSON côté serveur), précédé
+    le cas échéant des exemples few-shot (fewshot_selector.FewShotSelector.context)
+    """
+    parts = [examples] if examples else []
+    parts.append(f'MenuID: {form_id.upper()}')
+    if info_content:
+        parts.append(f'Info file content:\n{info_content}')
+    parts.append(f'DFM content:\n{dfm_content or ""}')
+    return '\n\n'.join(parts)
+
+
+def build_entity_prompt(lookups: List[Dict[str, Any]]) -> str:
+    """Message de résolution d'entités: un contrôle par ligne (nom | libellé)"""
+    return '\n'.join(f"{field['Id']} | {field.get('label', '')}" for field in lookups)
+
+
+@dataclass
+class LLMConversionResult(ConversionResult):
+    """Résultat de conversion complété de la consommation du modèle"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+    model_calls: int = 0
+    simulated: bool = False
+
+
+class LLMConverter:
+    """Conversions 'llm' (tout par le modèle) et 'hybrid' (déterministe + lookups non résolus)"""
+
+    def __init__(self, client: Any, metrics: Optional[ConversionMetrics] = None, selector: Any = None):
+        self.client = client
+        self.metrics = metrics if metrics is not None else get_default_metrics()
+        self.selector = selector  # FewShotSelector optionnel (exemples similaires dans le prompt)
+
+    def _complete(self, system: str, prompt: str) -> LLMResponse:
+        with self.metrics.stage('model_call'):
+            return self.client.complete(system, prompt)
+
+    def conversion_prompt(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str) -> str:
+        examples = ''
+        if self.selector is not None:
+            with self.metrics.stage('fewshot_select'):
+                examples = self.selector.context(dfm_content, info_content, form_id)
+        return build_conversion_prompt(dfm_content, info_content, form_id, examples)
+
+    def convert_llm(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str) -> LLMConversionResult:
+        """Le modèle produit tout le formulaire"""
+        response = self._complete(CONVERSION_SYSTEM_PROMPT, self.conversion_prompt(dfm_content, info_content, form_id))
+        errors = []
+        try:
+            with self.metrics.stage('parse_model_output'):
+                form_json = extract_json(response.text)
+        except ValueError as e:
+            self.metrics.record_error('parse_model_output', e)
+            errors.append(f"Réponse du modèle illisible: {e}")
+            form_json = {'MenuID': form_id.upper(), 'Fields': [], 'Validations': []}
+        self.metrics.record_conversion('success' if not errors else 'partial')
+        return LLMConversionResult(form_id, form_json, json.dumps(form_json, indent=2, ensure_ascii=False), errors,
+                                   response.input_tokens, response.output_tokens, response.cost, 1,
+                                   response.simulated)
+
+    def convert_hybrid(self, dfm_content: Optional[str], info_content: Optional[str], form_id: str,
+                       generator: Optional[FormGeneratorAI] = None) -> LLMConversionResult:
+        """Conversion déterministe; seuls les lookups restés sans entité sont soumis au modèle"""
+        generator = generator or FormGeneratorAI(self.metrics)
+        result = generator.convert(dfm_content, info_content, form_id)
+        form_json, errors = result.form_json, list(result.errors)
+
+        unresolved = [field for field in form_json['Fields']
+                      if field.get('type') in ('GRIDLKP', 'LSTLKP') and not field.get('Entity')]
+        if not unresolved:
+            return LLMConversionResult(form_id, form_json, result.json_text, errors)
+
+        response = self._complete(ENTITY_SYSTEM_PROMPT, build_entity_prompt(unresolved))
+        try:
+            mapping = extract_json(response.text)
+        except ValueError as e:
+            self.metrics.record_error('parse_model_output', e)
+            errors.append(f"Réponse du modèle illisible: {e}")
+            mapping = {}
+        for field in unresolved:
+            resolved = mapping.get(field['Id'])
+            if isinstance(resolved, dict) and resolved.get('Entity'):
+                field['Entity'] = resolved['Entity']
+                field['EntitykeyField'] = resolved.get('EntitykeyField', field.get('EntitykeyField'))
+        json_text = generator.serialize_form(form_json)
+        return LLMConversionResult(form_id, form_json, json_text, errors,
+                                   response.input_tokens, response.output_tokens, response.cost, 1,
+                                   response.simulated)
+
+
+def default_client() -> Any:
+    """Client Anthropic si configuré, sinon rejeu des enregistrements de FORMBUILDER_LLM_REPLAY_DIR"""
+    replay_dir = os.getenv('FORMBUILDER_LLM_REPLAY_DIR')
+    if replay_dir:
+        return ReplayClient.from_directory(Path(replay_dir))
+    return AnthropicClient()
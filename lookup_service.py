@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Service d'aperçu des lookups pour FormBuilder Pro
+Charge les lignes d'entités (JSON, CSV ou SQLite locaux) dans des index colonnaires
+triés et sert une recherche par préfixe paginée sur les colonnes clé et description
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from entity_inference import load_entity_catalog
+
+# Largeur (octets UTF-8) des clés d'index: les préfixes plus longs sont vérifiés après coup
+INDEX_KEY_BYTES = 24
+# Au-delà, le total est une borne haute (les doublons clé/description ne sont pas décomptés)
+EXACT_TOTAL_LIMIT = 100000
+DEFAULT_PAGE_SIZE = 20
+
+# Colonnes de lookup usuelles, prioritaires sur celles déduites du catalogue MfactModels
+DEFAULT_LOOKUP_COLUMNS = {
+    'fndmas': ('fund', 'acnam1'),
+    'secrty': ('tkr', 'tkr_DESC'),
+    'broker': ('broker', 'name'),
+    'reason': ('reason', 'descr'),
+    'exchng': ('exch', 'exchange')
+}
+
+
+@dataclass
+class LookupDefinition:
+    """Colonnes clé et description servies par un lookup"""
+    entity: str
+    key_field: str
+    description_field: Optional[str] = None
+
+
+def resolve_lookup_definition(entity: str) -> LookupDefinition:
+    """Détermine les colonnes clé/description d'une entité (défauts connus puis catalogue MfactModels)"""
+    lowered = entity.lower()
+    if lowered in DEFAULT_LOOKUP_COLUMNS:
+        key_field, description_field = DEFAULT_LOOKUP_COLUMNS[lowered]
+        return LookupDefinition(entity, key_field, description_field)
+
+    for definition in load_entity_catalog():
+        names = [definition.name.lower()] + [alias.lower() for alias in definition.aliases]
+        if lowered in names:
+            return LookupDefinition(entity, definition.key_field, definition.description_field)
+
+    raise KeyError(f"Entité inconnue: {entity}")
+
+
+class PrefixIndex:
+    """Index trié d'une colonne texte, interrogeable par préfixe insensible à la casse"""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        keys = np.array(
+            [str(value).lower().encode('utf-8')[:INDEX_KEY_BYTES] for value in values],
+            dtype=f'S{INDEX_KEY_BYTES}'
+        )
+        self.order = np.argsort(keys, kind='stable').astype(np.int64)
+        self.sorted_keys = keys[self.order]
+        # Rang de chaque ligne dans l'ordre trié (détection des doublons entre index)
+        self.rank = np.empty_like(self.order)
+        self.rank[self.order] = np.arange(len(self.order))
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Bornes [début, fin) dans l'ordre trié des valeurs commençant par le préfixe"""
+        encoded = prefix.lower().encode('utf-8')[:INDEX_KEY_BYTES - 1]
+        if not encoded:
+            return 0, len(self.sorted_keys)
+        low = int(np.searchsorted(self.sorted_keys, np.bytes_(encoded), side='left'))
+        # 0xFF n'apparaît jamais en UTF-8: borne supérieure de tous les prolongements du préfixe
+        high = int(np.searchsorted(self.sorted_keys, np.bytes_(encoded + b'\xff'), side='left'))
+        return low, high
+
+    def matching_rows(self, prefix: str, start: int, stop: int) -> np.ndarray:
+        """Lignes de la tranche triée [start, stop), filtrées sur le préfixe complet si tronqué"""
+        rows = self.order[start:stop]
+        if len(prefix.encode('utf-8')) >= INDEX_KEY_BYTES - 1 and len(rows):
+            lowered = np.char.lower(self.values[rows].astype(str))
+            rows = rows[np.char.startswith(lowered, prefix.lower())]
+        return rows
+
+
+class EntityLookupIndex:
+    """Lignes d'une entité stockées en colonnes, avec index de préfixe clé et description"""
+
+    def __init__(self, definition: LookupDefinition, columns: Dict[str, np.ndarray]):
+        self.definition = definition
+        self.columns = columns
+        self.row_count = len(columns[definition.key_field]) if columns else 0
+        self.key_index = PrefixIndex(columns[definition.key_field])
+        self.description_index = None
+        if definition.description_field and definition.description_field in columns:
+            self.description_index = PrefixIndex(columns[definition.description_field])
+
+    @classmethod
+    def from_rows(cls, definition: LookupDefinition, rows: Sequence[Dict[str, Any]],
+                  columns: Optional[Sequence[str]] = None) -> 'EntityLookupIndex':
+        """Construit l'index à partir de lignes dict (réponse GraphQL, JSON local)"""
+        wanted = list(columns or [])
+        for required in (definition.key_field, definition.description_field):
+            if required and required not in wanted:
+                wanted.append(required)
+        if not wanted and rows:
+            wanted = list(rows[0].keys())
+
+        data = {}
+        for column in wanted:
+            data[column] = np.array(['' if row.get(column) is None else str(row.get(column)) for row in rows], dtype=str)
+        return cls(definition, data)
+
+    def _unique_description_rows(self, key_range: Tuple[int, int], description_rows: np.ndarray,
+                                 key_rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Retire des correspondances description les lignes déjà trouvées par la clé"""
+        if key_rows is not None:
+            return description_rows[~np.isin(description_rows, key_rows)]
+        ranks = self.key_index.rank[description_rows]
+        return description_rows[(ranks < key_range[0]) | (ranks >= key_range[1])]
+
+    def search(self, query: str, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> Tuple[np.ndarray, int, bool]:
+        """Lignes correspondant au préfixe (clé puis description), paginées, avec le total"""
+        key_range = self.key_index.prefix_range(query)
+        key_rows = None
+        if len(query.encode('utf-8')) >= INDEX_KEY_BYTES - 1:
+            # Préfixe plus long que les clés d'index: plage étroite, filtrée entièrement
+            key_rows = self.key_index.matching_rows(query, *key_range)
+        key_count = len(key_rows) if key_rows is not None else key_range[1] - key_range[0]
+
+        description_range = (0, 0)
+        if self.description_index is not None and query:
+            description_range = self.description_index.prefix_range(query)
+        description_count = description_range[1] - description_range[0]
+
+        # Total exact tant que la plage description reste raisonnable
+        total_exact = description_count <= EXACT_TOTAL_LIMIT
+        if description_count and total_exact:
+            description_rows = self.description_index.matching_rows(query, *description_range)
+            description_count = len(self._unique_description_rows(key_range, description_rows, key_rows))
+
+        rows = []
+        needed = offset + limit
+        if offset < key_count:
+            if key_rows is not None:
+                rows.append(key_rows[offset:needed])
+            else:
+                rows.append(self.key_index.order[key_range[0] + offset:key_range[0] + min(key_count, needed)])
+
+        remaining = limit - sum(len(part) for part in rows)
+        if remaining > 0 and description_range[1] > description_range[0]:
+            # Parcours par blocs de la plage description en sautant les doublons
+            skip = max(0, offset - key_count)
+            cursor = description_range[0]
+            chunk = max(4 * (skip + remaining), 256)
+            while remaining > 0 and cursor < description_range[1]:
+                stop = min(cursor + chunk, description_range[1])
+                candidates = self.description_index.matching_rows(query, cursor, stop)
+                candidates = self._unique_description_rows(key_range, candidates, key_rows)
+                if skip:
+                    dropped = min(skip, len(candidates))
+                    candidates = candidates[dropped:]
+                    skip -= dropped
+                rows.append(candidates[:remaining])
+                remaining -= len(rows[-1])
+                cursor = stop
+
+        page_rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        return page_rows, key_count + description_count, total_exact
+
+    def materialize(self, rows: np.ndarray, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Convertit des numéros de lignes en dicts pour la réponse"""
+        names = [column for column in (columns or self.columns.keys()) if column in self.columns]
+        projected = [self.columns[name][rows].tolist() for name in names]
+        return [dict(zip(names, values)) for values in zip(*projected)]
+
+
+class LookupPreviewService:
+    """Registre des index de lookup et recherche paginée pour l'aperçu des formulaires"""
+
+    def __init__(self):
+        self.indexes: Dict[str, EntityLookupIndex] = {}
+
+    def register_rows(self, entity: str, rows: Sequence[Dict[str, Any]], columns: Optional[Sequence[str]] = None,
+                      definition: Optional[LookupDefinition] = None) -> EntityLookupIndex:
+        """Indexe des lignes déjà chargées pour une entité"""
+        definition = definition or resolve_lookup_definition(entity)
+        index = EntityLookupIndex.from_rows(definition, rows, columns)
+        self.indexes[entity.lower()] = index
+        return index
+
+    def load_json(self, entity: str, path: str, columns: Optional[Sequence[str]] = None) -> EntityLookupIndex:
+        """Charge un fichier JSON: liste de lignes ou réponse GraphQL {"data": {"AllTickers": [...]}}"""
+        with open(path, 'r', encoding='utf-8') as handle:
+            payload = json.load(handle)
+        if isinstance(payload, dict):
+            payload = payload.get('data', payload)
+            payload = next((value for value in payload.values() if isinstance(value, list)), [])
+        return self.register_rows(entity, payload, columns)
+
+    def load_csv(self, entity: str, path: str, columns: Optional[Sequence[str]] = None) -> EntityLookupIndex:
+        """Charge un fichier CSV avec en-tête"""
+        with open(path, 'r', encoding='utf-8', newline='') as handle:
+            rows = list(csv.DictReader(handle))
+        return self.register_rows(entity, rows, columns)
+
+    def load_sqlite(self, entity: str, database: str, table: Optional[str] = None,
+                    columns: Optional[Sequence[str]] = None) -> EntityLookupIndex:
+        """Charge une table SQLite colonne par colonne (table = nom de l'entité par défaut)"""
+        definition = resolve_lookup_definition(entity)
+        wanted = list(columns or [])
+        for required in (definition.key_field, definition.description_field):
+            if required and required not in wanted:
+                wanted.append(required)
+
+        connection = sqlite3.connect(database)
+        try:
+            available = {row[1].lower(): row[1] for row in connection.execute(f'PRAGMA table_info("{table or entity}")')}
+            selected = [available[column.lower()] for column in wanted if column.lower() in available]
+            if definition.key_field.lower() not in available:
+                raise KeyError(f"Colonne clé {definition.key_field} absente de la table {table or entity}")
+            quoted = ', '.join(f'"{column}"' for column in selected)
+            records = connection.execute(f'SELECT {quoted} FROM "{table or entity}"').fetchall()
+        finally:
+            connection.close()
+
+        data = {}
+        for position, column in enumerate(selected):
+            canonical = next(name for name in wanted if name.lower() == column.lower())
+            data[canonical] = np.array(['' if record[position] is None else str(record[position]) for record in records], dtype=str)
+        index = EntityLookupIndex(definition, data)
+        self.indexes[entity.lower()] = index
+        return index
+
+    def load_directory(self, directory: str) -> List[str]:
+        """Charge tous les fichiers <Entité>.json / <Entité>.csv et les tables d'une base lookups.sqlite"""
+        loaded = []
+        for path in sorted(Path(directory).iterdir()):
+            loader = {'.json': self.load_json, '.csv': self.load_csv}.get(path.suffix.lower())
+            try:
+                if loader:
+                    loader(path.stem, str(path))
+                    loaded.append(path.stem)
+                elif path.suffix.lower() in ('.sqlite', '.db'):
+                    connection = sqlite3.connect(str(path))
+                    tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+                    connection.close()
+                    for table in tables:
+                        self.load_sqlite(table, str(path), table)
+                        loaded.append(table)
+            except KeyError:
+                continue  # Fichier sans entité ou colonne clé reconnue
+        return loaded
+
+    def search(self, entity: str, query: str, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE,
+               columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Recherche type-ahead paginée sur la clé puis la description d'une entité"""
+        index = self.indexes.get(entity.lower())
+        if index is None:
+            raise KeyError(f"Aucune donnée de lookup chargée pour {entity}")
+
+        rows, total, total_exact = index.search(query, offset=page * page_size, limit=page_size)
+        return {
+            'entity': entity,
+            'query': query,
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'total_exact': total_exact,
+            'rows': index.materialize(rows, columns)
+        }
+
+
+def get_lookup_service_from_env() -> Optional[LookupPreviewService]:
+    """Service chargé depuis le dossier FORMBUILDER_LOOKUP_DATA s'il est configuré"""
+    directory = os.getenv('FORMBUILDER_LOOKUP_DATA')
+    if not directory or not os.path.isdir(directory):
+        return None
+    service = LookupPreviewService()
+    service.load_directory(directory)
+    return service
@@ -0,0 +1,896 @@
+#!/usr/bin/env python3
+"""
+Règles EnabledWhen/VisibleWhen déduites des gestionnaires d'événements Pascal (FormBuilder Pro)
+Le comportement dynamique des écrans Delphi vit dans les .pas (cbReportOnly.OnClick qui fait
+edDate.Enabled := not cbReportOnly.Checked). Un lexer Pascal minimal indexe les méthodes de
+toutes les unités du projet (classe, nom -> plage de tokens); seuls les gestionnaires liés dans
+le DFM (OnClick = cbReportOnlyClick) sont ensuite analysés. Les affectations à Enabled, Visible
+et ReadOnly dont l'expression est une combinaison simple (un seul AND ou OR) de Checked, Text,
+ItemIndex ou Value comparés à des littéraux deviennent des CondExpression; les gestionnaires
+trop complexes sont listés, avec leur source, pour une conversion par modèle
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+from form_model import CondExpression, Condition, ParsedDfm
+
+# Propriété d'état affectée -> clé du champ JSON (ReadOnly: EnabledWhen inversé)
+STATE_PROPERTIES = {'enabled': 'EnabledWhen', 'visible': 'VisibleWhen', 'readonly': 'EnabledWhen'}
+PROPERTY_NAMES = {'enabled': 'Enabled', 'visible': 'Visible', 'readonly': 'ReadOnly'}
+# Profondeur d'appels de méthodes suivie depuis un gestionnaire (UpdateControls; ...)
+MAX_CALL_DEPTH = 4
+
+ROUTINE_KEYWORDS = frozenset(('procedure', 'function', 'constructor', 'destructor'))
+# Mots-clés fermés par 'end'
+BLOCK_OPENERS = frozenset(('begin', 'case', 'try', 'asm', 'record'))
+# Fin d'une expression (ou d'une instruction) au niveau de parenthèses 0
+EXPRESSION_STOPS = frozenset(('else', 'end', 'until', 'finally', 'except', 'then', 'do', 'of'))
+
+RELATION_OPERATORS = {'=': 'EQ', '<>': 'NEQ', '>': 'GT', '<': 'LT', '>=': 'GE', '<=': 'LE'}
+# 0 < edQty.Value  ->  edQty.Value > 0
+MIRRORED_RELATIONS = {'=': '=', '<>': '<>', '<': '>', '>': '<', '<=': '>=', '>=': '<='}
+NEGATED_OPERATORS = {'IST': 'ISF', 'ISF': 'IST', 'EQ': 'NEQ', 'NEQ': 'EQ', 'ISN': 'ISNN', 'ISNN': 'ISN',
+                     'GT': 'LE', 'LE': 'GT', 'LT': 'GE', 'GE': 'LT'}
+# Propriétés de contrôle comparables à un littéral (valeur saisie)
+VALUE_PROPERTIES = frozenset(('text', 'value', 'keyvalue', 'date', 'position', 'intvalue'))
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|\{[^}]*\}|\(\*.*?\*\))
+  | (?P<str>(?:'[^'\n]*'|\#\$?[0-9A-Fa-f]+)+)
+  | (?P<num>\$[0-9A-Fa-f]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<id>&?[A-Za-z_]\w*)
+  | (?P<sym>:=|<>|<=|>=|\.\.|\S)
+""", re.DOTALL | re.VERBOSE)
+# Indexation sur la source en minuscules: en-têtes de méthodes qualifiées, 'TX = class(TBase)',
+# et commentaires ou chaînes où ces motifs sont ignorés
+_METHOD_HEADER = re.compile(r'\b(?:procedure|function|constructor|destructor)\s+(\w+(?:\s*\.\s*\w+)+)')
+_CLASS_BASE = re.compile(r'=\s*class\s*\(\s*([\w.]+)')
+_CLASS_NAME = re.compile(r'(\w+)\s*$')
+_COMMENT_OR_STRING = re.compile(r"\{[^}]*\}|\(\*.*?\*\)|//[^\n]*|'[^'\n]*'", re.DOTALL)
+_STRING_PART = re.compile(r"'[^'\n]*'|#\$?[0-9A-Fa-f]+")
+_IDENTIFIER = re.compile(r'^[A-Za-z_]\w*$')
+
+logger = logging.getLogger(__name__)
+
+# (nature: id, str, num, sym; valeur, identifiants en minuscules; position dans la source)
+Token = Tuple[str, Any, int]
+
+
+class UnsupportedExpression(ValueError):
+    """Expression hors du sous-ensemble traduisible en CondExpression"""
+
+
+def _decode_string(text: str) -> str:
+    """'l''été' et #13#10 -> texte; deux parties entre apostrophes accolées encadrent une apostrophe"""
+    chunks = []
+    previous_quoted = False
+    for part in _STRING_PART.findall(text):
+        if part[0] == "'":
+            if previous_quoted:
+                chunks.append("'")
+            chunks.append(part[1:-1])
+            previous_quoted = True
+        else:
+            chunks.append(chr(int(part[2:], 16) if part[1] == '$' else int(part[1:])))
+            previous_quoted = False
+    return ''.join(chunks)
+
+
+def _number(text: str) -> Any:
+    if text.startswith('$'):
+        return int(text[1:], 16)
+    return float(text) if any(char in text for char in '.eE') else int(text)
+
+
+def tokenize(source: str) -> List[Token]:
+    """Tokens d'une source Pascal, commentaires et directives {$...} écartés"""
+    tokens: List[Token] = []
+    append = tokens.append
+    for match in _TOKEN.finditer(source):
+        kind = match.lastgroup
+        if kind == 'space' or kind == 'comment':
+            continue
+        text = match.group()
+        if kind == 'id':
+            append(('id', text.lstrip('&').lower(), match.start()))
+        elif kind == 'str':
+            append(('str', _decode_string(text), match.start()))
+        elif kind == 'num':
+            append(('num', _number(text), match.start()))
+        else:
+            append(('sym', text, match.start()))
+    return tokens
+
+
+def _block_end(tokens: List[Token], start: int) -> int:
+    """Index du 'end' fermant le bloc ouvert en start (begin, case, try, asm, record)"""
+    depth = 0
+    for index in range(start, len(tokens)):
+        kind, value, _ = tokens[index]
+        if kind != 'id':
+            continue
+        if value in BLOCK_OPENERS:
+            depth += 1
+        elif value == 'end':
+            depth -= 1
+            if depth == 0:
+                return index
+    return len(tokens) - 1
+
+
+def _routine_body(tokens: List[Token], index: int) -> Optional[Tuple[int, int]]:
+    """
+    (begin, end) du corps d'une routine dont l'en-tête commence en index (après le nom):
+    paramètres, directives et déclarations locales, routines imbriquées comprises, sont sautés
+    """
+    count = len(tokens)
+    depth = 0
+    while index < count:
+        value = tokens[index][1]
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        elif value == ';' and depth == 0:
+            break
+        index += 1
+    index += 1
+    while index < count:
+        kind, value, _ = tokens[index]
+        if kind == 'id':
+            if value == 'begin' or value == 'asm':
+                return index, _block_end(tokens, index)
+            if value in ROUTINE_KEYWORDS:
+                nested = _routine_body(tokens, index + 2)
+                if nested is None:
+                    return None
+                index = nested[1] + 1
+                continue
+            if value == 'record':
+                index = _block_end(tokens, index) + 1
+                continue
+            if value in ('implementation', 'initialization', 'finalization', 'end'):
+                return None  # Déclaration forward ou externe, sans corps
+        index += 1
+    return None
+
+
+class PascalUnit:
+    """Source d'une unité; les tokens ne sont produits que méthode par méthode, à l'analyse"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self._newlines: Optional[List[int]] = None
+
+    def line(self, offset: int) -> int:
+        """Numéro de ligne (1..n) d'une position dans la source"""
+        if self._newlines is None:
+            self._newlines = [match.start() for match in re.finditer('\n', self.source)]
+        return bisect.bisect_right(self._newlines, offset) + 1
+
+
+class PascalMethod:
+    """
+    Implémentation d'une méthode: la source s'étend de son en-tête au suivant. Elle n'est
+    découpée en tokens (et son corps begin..end délimité) qu'au premier accès
+    """
+
+    def __init__(self, unit: PascalUnit, class_name: str, name: str, start: int, stop: int, name_parts: int):
+        self.unit = unit
+        self.class_name = class_name
+        self.name = name
+        self.start = start
+        self.stop = stop
+        self._name_parts = name_parts
+        self._tokens: Optional[List[Token]] = None
+        self._body: Optional[Tuple[int, int]] = None
+
+    @property
+    def qualified_name(self) -> str:
+        return f'{self.class_name}.{self.name}'
+
+    def _tokenize(self):
+        self._tokens = tokenize(self.unit.source[self.start:self.stop])
+        # procedure TA.TB.Methode: mot-clé puis nom et points
+        self._body = _routine_body(self._tokens, 2 * self._name_parts)
+
+    @property
+    def tokens(self) -> List[Token]:
+        if self._tokens is None:
+            self._tokenize()
+        return self._tokens
+
+    @property
+    def body(self) -> Optional[Tuple[int, int]]:
+        """(begin, end) en index de tokens; None pour une déclaration sans corps"""
+        if self._tokens is None:
+            self._tokenize()
+        return self._body
+
+    @property
+    def line(self) -> int:
+        return self.unit.line(self.start)
+
+    @property
+    def source(self) -> str:
+        body = self.body
+        return self.text(0, body[1]) if body is not None else self.unit.source[self.start:self.stop]
+
+    def statements(self) -> List[Tuple]:
+        """Instructions du corps (voir _StatementParser)"""
+        begin, end = self.body
+        return _StatementParser(self.tokens).block(begin + 1, end)
+
+    def text(self, first: int, last: int) -> str:
+        """Source couverte par les tokens first..last (inclus)"""
+        tokens = self.tokens
+        end_token = tokens[last]
+        end = end_token[2] + (len(end_token[1]) if end_token[0] == 'id' else 1)
+        return self.unit.source[self.start + tokens[first][2]:self.start + end]
+
+
+class PascalIndex:
+    """
+    Méthodes implémentées dans les unités du projet, par (classe, méthode) en minuscules, et
+    graphe d'héritage des classes ('TX = class(TBase)'): un gestionnaire hérité d'une fiche de
+    base est retrouvé en remontant ce graphe. L'indexation ne repère que les en-têtes, par
+    expressions régulières hors commentaires et chaînes; seuls les gestionnaires analysés sont
+    découpés en tokens
+    """
+
+    def __init__(self):
+        self.units: List[PascalUnit] = []
+        self.methods: Dict[Tuple[str, str], PascalMethod] = {}
+        self.bases: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.methods)
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Path]) -> 'PascalIndex':
+        """Unités .pas de fichiers ou répertoires (parcourus récursivement)"""
+        # Import local: batch_convert importe le moteur complet
+        from batch_convert import read_text
+
+        index = cls()
+        for source in paths:
+            source = Path(source)
+            files = sorted(source.rglob('*.pas')) if source.is_dir() else [source]
+            for path in files:
+                try:
+                    index.add_unit(path.stem, read_text(path))
+                except OSError as e:
+                    logger.warning("Unité ignorée %s: %s", path, e)
+        return index
+
+    def add_unit(self, name: str, source: str) -> PascalUnit:
+        unit = PascalUnit(name, source)
+        self.units.append(unit)
+        lower = source.lower()
+        hidden_starts, hidden_ends = [], []
+        for match in _COMMENT_OR_STRING.finditer(lower):
+            hidden_starts.append(match.start())
+            hidden_ends.append(match.end())
+
+        def visible(position: int) -> bool:
+            span = bisect.bisect_right(hidden_starts, position) - 1
+            return span < 0 or position >= hidden_ends[span]
+
+        # procedure TForm1.cbReportOnlyClick (classes imbriquées: TA.TB.M)
+        headers = [(match.start(), [part.strip() for part in match.group(1).split('.')])
+                   for match in _METHOD_HEADER.finditer(lower) if visible(match.start())]
+        for match in _CLASS_BASE.finditer(lower):
+            name = _CLASS_NAME.search(lower, max(0, match.start() - 128), match.start())
+            if name and visible(match.start()):
+                self.bases[name.group(1)] = match.group(1).split('.')[-1]
+        for position, (start, parts) in enumerate(headers):
+            stop = headers[position + 1][0] if position + 1 < len(headers) else len(source)
+            method = PascalMethod(unit, parts[-2], parts[-1], start, stop, len(parts))
+            self.methods.setdefault((method.class_name, method.name), method)
+        return unit
+
+    def find_method(self, class_name: Optional[str], name: str) -> Optional[PascalMethod]:
+        """Méthode de la classe ou de la plus proche de ses bases qui l'implémente"""
+        key = (class_name or '').lower()
+        name = name.lower()
+        seen: Set[str] = set()
+        while key and key not in seen:
+            method = self.methods.get((key, name))
+            if method is not None and method.body is not None:
+                return method
+            seen.add(key)
+            key = self.bases.get(key, '')
+        return None
+
+
+class _StatementParser:
+    """
+    Instructions d'un corps de méthode, réduites à ce que l'analyse exploite:
+    ('block', [...]), ('assign', désignateur, (début, fin)), ('if', (début, fin), alors, sinon),
+    ('call', désignateur) et ('opaque', début, fin) pour case/while/for/with/repeat/except
+    """
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+
+    def block(self, index: int, end: int) -> List[Tuple]:
+        statements = []
+        while index < end:
+            node, index = self.statement(index, end)
+            if node is not None:
+                statements.append(node)
+        return statements
+
+    def _is(self, index: int, keyword: str) -> bool:
+        token = self.tokens[index]
+        return token[0] == 'id' and token[1] == keyword
+
+    def _expression_end(self, index: int, end: int) -> int:
+        depth = 0
+        tokens = self.tokens
+        while index < end:
+            kind, value, _ = tokens[index]
+            if kind == 'sym':
+                if value in '([':
+                    depth += 1
+                elif value in ')]':
+                    depth -= 1
+                elif value == ';' and depth <= 0:
+                    return index
+            elif kind == 'id' and depth <= 0 and value in EXPRESSION_STOPS:
+                return index
+            index += 1
+        return end
+
+    def _designator(self, index: int, end: int) -> Tuple[List[str], int]:
+        """edDate.Enabled, Self.edDate.Enabled, Trim(edName.Text)... -> parties, index suivant"""
+        tokens = self.tokens
+        parts = [tokens[index][1]]
+        index += 1
+        while index < end:
+            value = tokens[index][1]
+            if value == '.' and index + 1 < end and tokens[index + 1][0] == 'id':
+                parts.append(tokens[index + 1][1])
+                index += 2
+            elif value in ('(', '['):
+                close = ')' if value == '(' else ']'
+                depth = 0
+                while index < end:
+                    if tokens[index][1] == value:
+                        depth += 1
+                    elif tokens[index][1] == close:
+                        depth -= 1
+                        if depth == 0:
+                            break
+                    index += 1
+                parts.append(value + close)
+                index += 1
+            elif value == '^':
+                index += 1
+            else:
+                break
+        return parts, index
+
+    def statement(self, index: int, end: int) -> Tuple[Optional[Tuple], int]:
+        tokens = self.tokens
+        kind, value, _ = tokens[index]
+        if kind != 'id':
+            return None, index + 1
+        if value == 'begin':
+            close = _block_end(tokens, index)
+            return ('block', self.block(index + 1, close)), close + 1
+        if value == 'if':
+            then_at = self._expression_end(index + 1, end)
+            if then_at >= end or not self._is(then_at, 'then'):
+                return ('opaque', index, then_at), then_at
+            then_node, after = self.statement(then_at + 1, end) if then_at + 1 < end else (None, end)
+            else_node = None
+            if after < end and self._is(after, 'else'):
+                else_node, after = self.statement(after + 1, end)
+            return ('if', (index + 1, then_at), then_node, else_node), after
+        if value == 'try':
+            close = _block_end(tokens, index)
+            depth = 0
+            for split in range(index + 1, close):
+                token = tokens[split]
+                if token[0] != 'id':
+                    continue
+                if token[1] in BLOCK_OPENERS:
+                    depth += 1
+                elif token[1] == 'end':
+                    depth -= 1
+                elif depth == 0 and token[1] in ('finally', 'except'):
+                    body = self.block(index + 1, split)
+                    if token[1] == 'finally':
+                        return ('block', body + self.block(split + 1, close)), close + 1
+                    # Les gestionnaires d'exception ne décrivent pas l'état nominal de l'écran
+                    return ('block', body), close + 1
+            return ('block', self.block(index + 1, close)), close + 1
+        if value == 'case':
+            close = _block_end(tokens, index)
+            return ('opaque', index, close), close + 1
+        if value == 'repeat':
+            depth = 0
+            after = index
+            while after < end:
+                if self._is(after, 'repeat'):
+                    depth += 1
+                elif self._is(after, 'until'):
+                    depth -= 1
+                    if depth == 0:
+                        break
+                after += 1
+            after = self._expression_end(after + 1, end)
+            return ('opaque', index, after), after
+        if value in ('while', 'for', 'with'):
+            do_at = self._expression_end(index + 1, end)
+            while do_at < end and not self._is(do_at, 'do'):
+                do_at = self._expression_end(do_at + 1, end)
+            _, after = self.statement(do_at + 1, end) if do_at + 1 < end else (None, end)
+            return ('opaque', index, after), after
+        if value in EXPRESSION_STOPS or value in ('raise', 'exit', 'inherited', 'goto'):
+            return None, self._expression_end(index + 1, end) if value not in EXPRESSION_STOPS else index + 1
+        parts, after = self._designator(index, end)
+        if after < end and tokens[after][1] == ':=':
+            expression_end = self._expression_end(after + 1, end)
+            return ('assign', parts, (after + 1, expression_end)), expression_end
+        return ('call', parts), self._expression_end(after, end)
+
+
+class _ExpressionParser:
+    """
+    Expression booléenne Pascal (priorités: not > and > or > relations) en arbre:
+    ('or'|'and', [...]), ('not', x), ('rel', op, gauche, droite), ('ref', parties),
+    ('call', nom, [arguments]), ('lit', valeur, ValueType)
+    """
+
+    def __init__(self, tokens: List[Token], start: int, end: int):
+        self.tokens = tokens
+        self.index = start
+        self.end = end
+
+    def parse(self) -> Tuple:
+        node = self.relation()
+        if self.index != self.end:
+            raise UnsupportedExpression(f"élément inattendu '{self._peek()}'")
+        return node
+
+    def _peek(self) -> Any:
+        return self.tokens[self.index][1] if self.index < self.end else None
+
+    def _take(self) -> Token:
+        if self.index >= self.end:
+            raise UnsupportedExpression("expression incomplète")
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def relation(self) -> Tuple:
+        left = self.simple()
+        operator = self._peek()
+        if operator in RELATION_OPERATORS and self.tokens[self.index][0] == 'sym':
+            self.index += 1
+            return ('rel', operator, left, self.simple())
+        return left
+
+    def _chain(self, keyword: str, operand, rejected: Tuple[str, ...]) -> Tuple:
+        nodes = [operand()]
+        while True:
+            value = self._peek()
+            if value == keyword:
+                self.index += 1
+                nodes.append(operand())
+            elif value in rejected:
+                raise UnsupportedExpression(f"opérateur '{value}'")
+            else:
+                break
+        return nodes[0] if len(nodes) == 1 else (keyword, nodes)
+
+    def simple(self) -> Tuple:
+        return self._chain('or', self.term, ('xor', '+', '-'))
+
+    def term(self) -> Tuple:
+        return self._chain('and', self.factor, ('*', '/', 'div', 'mod', 'shl', 'shr'))
+
+    def factor(self) -> Tuple:
+        kind, value, _ = self._take()
+        if kind == 'str':
+            return ('lit', value, 'STRING')
+        if kind == 'num':
+            return ('lit', value, 'NUMERIC')
+        if kind == 'sym':
+            if value == '(':
+                node = self.relation()
+                if self._take()[1] != ')':
+                    raise UnsupportedExpression("parenthèse non fermée")
+                return node
+            if value == '-' and self._peek() is not None and self.tokens[self.index][0] == 'num':
+                return ('lit', -self._take()[1], 'NUMERIC')
+            raise UnsupportedExpression(f"symbole '{value}'")
+        if value == 'not':
+            return ('not', self.factor())
+        if value in ('true', 'false'):
+            return ('lit', value == 'true', 'BOOL')
+        parts = [value]
+        while self._peek() == '.' and self.index + 1 < self.end and self.tokens[self.index + 1][0] == 'id':
+            parts.append(self.tokens[self.index + 1][1])
+            self.index += 2
+        if self._peek() == '(':
+            self.index += 1
+            arguments = [self.relation()]
+            while self._peek() == ',':
+                self.index += 1
+                arguments.append(self.relation())
+            if self._take()[1] != ')':
+                raise UnsupportedExpression("appel non fermé")
+            return ('call', '.'.join(parts), arguments)
+        return ('ref', parts)
+
+
+def parse_expression(tokens: List[Token], start: int, end: int) -> Tuple:
+    return _ExpressionParser(tokens, start, end).parse()
+
+
+def _negated(condition: Condition) -> Condition:
+    return Condition(condition.right_field, NEGATED_OPERATORS[condition.operator], condition.value,
+                     condition.value_type)
+
+
+class _ConditionBuilder:
+    """Traduction d'un arbre d'expression en CondExpression, sur les composants d'un formulaire"""
+
+    def __init__(self, components: Dict[str, Any]):
+        self.components = components  # nom en minuscules -> DfmComponent
+
+    def control(self, parts: List[str]) -> Tuple[Any, str]:
+        """(composant, propriété) d'un désignateur cbX.Checked"""
+        if len(parts) == 3 and parts[0] == 'self':
+            parts = parts[1:]
+        if len(parts) != 2 or parts[0] not in self.components:
+            raise UnsupportedExpression(f"référence '{'.'.join(parts)}'")
+        return self.components[parts[0]], parts[1]
+
+    def expression(self, node: Tuple, negate: bool = False) -> CondExpression:
+        if node[0] == 'not':
+            return self.expression(node[1], not negate)
+        if node[0] in ('and', 'or'):
+            # De Morgan: not (a and b) = not a or not b
+            operator = {'and': 'or', 'or': 'and'}[node[0]] if negate else node[0]
+            conditions: List[Condition] = []
+            for child in node[1]:
+                expression = self.expression(child, negate)
+                if len(expression) > 1 and expression.logical_operator != operator.upper():
+                    raise UnsupportedExpression("AND et OR mêlés")
+                conditions.extend(expression)
+            return CondExpression(conditions, operator.upper())
+        condition = self.atom(node)
+        return CondExpression((_negated(condition) if negate else condition,))
+
+    def atom(self, node: Tuple) -> Condition:
+        if node[0] == 'ref':
+            component, prop = self.control(node[1])
+            if prop != 'checked':
+                raise UnsupportedExpression(f"propriété booléenne '{prop}'")
+            return Condition(component.name, 'IST')
+        if node[0] != 'rel':
+            raise UnsupportedExpression(f"terme '{node[0]}'")
+        _, operator, left, right = node
+        if left[0] == 'lit':
+            operator, left, right = MIRRORED_RELATIONS[operator], right, left
+        if right[0] != 'lit':
+            raise UnsupportedExpression("comparaison entre deux contrôles")
+        if left[0] == 'call' and left[1] in ('trim', 'trimleft', 'trimright') and len(left[2]) == 1:
+            left = left[2][0]
+        if left[0] != 'ref':
+            raise UnsupportedExpression("comparaison d'une expression calculée")
+        component, prop = self.control(left[1])
+        _, value, value_type = right
+
+        if prop == 'checked':
+            if value_type != 'BOOL' or operator not in ('=', '<>'):
+                raise UnsupportedExpression("Checked comparé à une valeur non booléenne")
+            return Condition(component.name, 'IST' if value == (operator == '=') else 'ISF')
+        if prop == 'itemindex' and value_type == 'NUMERIC':
+            if value == -1 and operator in ('=', '<>'):
+                return Condition(component.name, 'ISN' if operator == '=' else 'ISNN')
+            items = component.properties.get('Items.Strings')
+            if operator in ('=', '<>') and isinstance(items, list) and 0 <= value < len(items):
+                # Valeur de l'option plutôt que sa position
+                return Condition(component.name, RELATION_OPERATORS[operator], str(items[value]), 'STRING')
+            return Condition(component.name, RELATION_OPERATORS[operator], value, value_type)
+        if prop in VALUE_PROPERTIES:
+            if value == '' and operator in ('=', '<>'):
+                return Condition(component.name, 'ISN' if operator == '=' else 'ISNN')
+            return Condition(component.name, RELATION_OPERATORS[operator], value, value_type)
+        raise UnsupportedExpression(f"propriété '{prop}'")
+
+
+@dataclass
+class _Effect:
+    """Dernière valeur affectée à une propriété d'état: arbre d'expression, ou motif d'échec"""
+    node: Optional[Tuple] = None
+    reason: Optional[str] = None
+
+    @property
+    def literal(self) -> Optional[bool]:
+        if self.node is not None and self.node[0] == 'lit' and self.node[2] == 'BOOL':
+            return self.node[1]
+        return None
+
+
+@dataclass
+class EventRule:
+    """Règle déduite pour un champ (EnabledWhen ou VisibleWhen) et les gestionnaires qui la portent"""
+    control: str
+    key: str
+    expression: CondExpression
+    handlers: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'control': self.control, 'key': self.key, 'handlers': self.handlers,
+                'expression': {'Conditions': [condition.to_dict() for condition in self.expression],
+                               'LogicalOperator': self.expression.logical_operator}}
+
+
+@dataclass
+class UnresolvedHandler:
+    """Gestionnaire dont une affectation d'état n'a pas pu être traduite (à confier au modèle)"""
+    handler: str
+    unit: str
+    line: int
+    reasons: List[str]
+    source: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'handler': self.handler, 'unit': self.unit, 'line': self.line, 'reasons': self.reasons,
+                'source': self.source}
+
+
+@dataclass
+class FormEvents:
+    """Bilan de l'analyse des gestionnaires d'un formulaire"""
+    rules: List[EventRule] = field(default_factory=list)
+    unresolved: List[UnresolvedHandler] = field(default_factory=list)
+    handlers: int = 0  # Gestionnaires liés dans le DFM et trouvés dans les unités
+    missing: List[str] = field(default_factory=list)  # Gestionnaires liés introuvables
+
+    def as_rules(self) -> Dict[str, Dict[str, CondExpression]]:
+        """Forme attendue par ParsedDfm.rules (composant en minuscules -> clé -> expression)"""
+        rules: Dict[str, Dict[str, CondExpression]] = {}
+        for rule in self.rules:
+            rules.setdefault(rule.control.lower(), {})[rule.key] = rule.expression
+        return rules
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'handlers': self.handlers, 'rules': [rule.to_dict() for rule in self.rules],
+                'unresolved': [handler.to_dict() for handler in self.unresolved], 'missing': self.missing}
+
+
+def event_bindings(parsed: ParsedDfm) -> Dict[str, List[str]]:
+    """Gestionnaire (tel qu'écrit dans le DFM) -> 'composant.Événement' qui le lient (OnClick = cbReportOnlyClick)"""
+    bindings: Dict[str, List[str]] = {}
+    owners = [(parsed.form_name or 'Self', parsed.properties)]
+    owners.extend((component.name, component.properties) for component in parsed.components)
+    for owner, properties in owners:
+        for name, value in properties.items():
+            if name.startswith('On') and isinstance(value, str) and _IDENTIFIER.match(value):
+                bindings.setdefault(value, []).append(f'{owner}.{name}')
+    return bindings
+
+
+class _FormAnalysis:
+    """Analyse des gestionnaires liés d'un formulaire: effets par (composant, propriété d'état)"""
+
+    def __init__(self, parsed: ParsedDfm, index: PascalIndex):
+        self.parsed = parsed
+        self.index = index
+        self.class_name = (parsed.form_type or '').lower()
+        self.form_name = (parsed.form_name or '').lower()
+        self.components = {component.name.lower(): component for component in parsed.components}
+        self.builder = _ConditionBuilder(self.components)
+
+    def target(self, parts: List[str]) -> Optional[Tuple[str, str]]:
+        """(composant, propriété) si le désignateur affecte Enabled/Visible/ReadOnly d'un contrôle"""
+        if len(parts) == 3 and parts[0] in ('self', self.form_name):
+            parts = parts[1:]
+        if len(parts) == 2 and parts[0] in self.components and parts[1] in STATE_PROPERTIES:
+            return parts[0], parts[1]
+        return None
+
+    def label(self, target: Tuple[str, str]) -> str:
+        return f'{self.components[target[0]].name}.{PROPERTY_NAMES[target[1]]}'
+
+    def _opaque_targets(self, tokens: List[Token], start: int, end: int) -> Set[Tuple[str, str]]:
+        targets = set()
+        for position in range(start + 2, min(end, len(tokens) - 1)):
+            if (tokens[position][1] in STATE_PROPERTIES and tokens[position + 1][1] == ':='
+                    and tokens[position - 1][1] == '.' and tokens[position - 2][0] == 'id'):
+                target = self.target([tokens[position - 2][1], tokens[position][1]])
+                if target is not None:
+                    targets.add(target)
+        return targets
+
+    def method_effects(self, method: PascalMethod, depth: int = 0,
+                       visiting: Optional[Set[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], _Effect]:
+        visiting = (visiting or set()) | {(method.class_name, method.name)}
+        return self._sequence(method.statements(), method, {}, depth, visiting)
+
+    def _sequence(self, statements: List[Tuple], method: PascalMethod, state: Dict[Tuple[str, str], _Effect],
+                  depth: int, visiting: Set[Tuple[str, str]]) -> Dict[Tuple[str, str], _Effect]:
+        """Effets d'une suite d'instructions, la dernière affectation l'emportant"""
+        tokens = method.tokens
+        for node in statements:
+            kind = node[0]
+            if kind == 'block':
+                self._sequence(node[1], method, state, depth, visiting)
+            elif kind == 'assign':
+                target = self.target(node[1])
+                if target is not None:
+                    start, end = node[2]
+                    try:
+                        state[target] = _Effect(parse_expression(tokens, start, end))
+                    except UnsupportedExpression as e:
+                        state[target] = _Effect(reason=f"{method.text(start, end - 1)}: {e}")
+            elif kind == 'call':
+                parts = node[1][1:] if node[1][0] == 'self' else node[1]
+                if len(parts) == 1 or (len(parts) == 2 and parts[1] == '()'):
+                    called = self.index.find_method(self.class_name, parts[0])
+                    key = (called.class_name, called.name) if called is not None else None
+                    if called is not None and key not in visiting and depth < MAX_CALL_DEPTH:
+                        self._sequence(called.statements(), called, state, depth + 1, visiting | {key})
+            elif kind == 'opaque':
+                for target in self._opaque_targets(tokens, node[1], node[2]):
+                    state[target] = _Effect(reason=f"{self.label(target)} affecté dans '{tokens[node[1]][1]}'")
+            elif kind == 'if':
+                self._branches(node, method, state, depth, visiting)
+        return state
+
+    def _branches(self, node: Tuple, method: PascalMethod, state: Dict[Tuple[str, str], _Effect],
+                  depth: int, visiting: Set[Tuple[str, str]]):
+        """
+        if C then X.P := b else X.P := not b  ->  X.P := C (ou not C). Sans else, la valeur
+        affectée plus haut dans la séquence tient lieu de branche sinon
+        """
+        _, (start, end), then_node, else_node = node
+        branches = []
+        for branch in (then_node, else_node):
+            branch_state: Dict[Tuple[str, str], _Effect] = {}
+            if branch is not None:
+                self._sequence([branch], method, branch_state, depth, visiting)
+            branches.append(branch_state)
+        targets = set(branches[0]) | set(branches[1])
+        if not targets:
+            return
+        tokens = method.tokens
+        try:
+            condition = parse_expression(tokens, start, end)
+        except UnsupportedExpression as e:
+            condition, reason = None, f"condition '{method.text(start, end - 1)}': {e}"
+        for target in targets:
+            then_effect = branches[0].get(target) or state.get(target)
+            else_effect = branches[1].get(target) or state.get(target)
+            then_value = then_effect.literal if then_effect is not None else None
+            else_value = else_effect.literal if else_effect is not None else None
+            if then_value is not None and then_value == else_value:
+                state[target] = then_effect
+            elif then_value is None or else_value is None:
+                state[target] = _Effect(reason=f"{self.label(target)} affecté dans une seule branche")
+            elif condition is None:
+                state[target] = _Effect(reason=reason)
+            else:
+                state[target] = _Effect(condition if then_value else ('not', condition))
+
+    def run(self) -> FormEvents:
+        events = FormEvents()
+        # (composant, clé JSON) -> [(expression, dict de comparaison, gestionnaire)]
+        derived: Dict[Tuple[str, str], List[Tuple[CondExpression, Any, str]]] = {}
+        failures: Dict[str, List[str]] = {}
+        methods: Dict[str, PascalMethod] = {}
+        for binding in event_bindings(self.parsed):
+            method = self.index.find_method(self.class_name, binding)
+            if method is None:
+                events.missing.append(binding)
+                continue
+            events.handlers += 1
+            handler = f'{self.parsed.form_type}.{binding}'
+            if handler in methods:
+                continue
+            methods[handler] = method
+            effects = self.method_effects(method)
+            readonly = {name for name, prop in effects if prop == 'readonly'}
+            for (name, prop), effect in sorted(effects.items()):
+                if effect.reason is not None:
+                    failures.setdefault(handler, []).append(effect.reason)
+                    continue
+                if effect.literal is not None:
+                    continue  # Affectation constante: action ponctuelle, pas une règle d'état
+                if prop == 'enabled' and name in readonly:
+                    failures.setdefault(handler, []).append(
+                        f"{self.components[name].name}: Enabled et ReadOnly affectés ensemble")
+                    continue
+                try:
+                    expression = self.builder.expression(effect.node, negate=prop == 'readonly')
+                except UnsupportedExpression as e:
+                    failures.setdefault(handler, []).append(f"{self.label((name, prop))}: {e}")
+                    continue
+                comparable = [(c.right_field, c.operator, c.value, c.value_type) for c in expression]
+                derived.setdefault((name, STATE_PROPERTIES[prop]), []).append(
+                    (expression, (comparable, expression.logical_operator), handler))
+
+        for (name, key), candidates in sorted(derived.items()):
+            handlers = sorted({handler for _, _, handler in candidates})
+            if len({repr(comparable) for _, comparable, _ in candidates}) > 1:
+                for handler in handlers:
+                    failures.setdefault(handler, []).append(
+                        f"règles contradictoires pour {self.components[name].name} ({key})")
+                continue
+            events.rules.append(EventRule(self.components[name].name, key, candidates[0][0], handlers))
+
+        for handler, reasons in sorted(failures.items()):
+            method = methods[handler]
+            events.unresolved.append(UnresolvedHandler(handler, method.unit.name, method.line, reasons, method.source))
+        return events
+
+
+def scan_form(parsed: ParsedDfm, index: PascalIndex) -> FormEvents:
+    """Règles et gestionnaires non traduits d'un formulaire parsé (ou résolu par delphi_project)"""
+    return _FormAnalysis(parsed, index).run()
+
+
+def apply_event_rules(parsed: ParsedDfm, index: PascalIndex) -> FormEvents:
+    """scan_form, puis attache les règles au formulaire pour la génération (ParsedDfm.rules)"""
+    events = scan_form(parsed, index)
+    parsed.rules = events.as_rules()
+    return events
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # Import local: batch_convert importe le moteur complet
+    from batch_convert import read_text
+    from form_engine import FormGeneratorAI
+
+    parser = argparse.ArgumentParser(description="Règles EnabledWhen/VisibleWhen des gestionnaires Pascal")
+    parser.add_argument('inputs', nargs='+', type=Path, help="Fichiers DFM ou répertoires de projet")
+    parser.add_argument('--pas', type=Path, action='append',
+                        help="Unités .pas ou répertoires (par défaut: les entrées elles-mêmes)")
+    parser.add_argument('--report-json', type=Path, help="Écrit règles et gestionnaires non traduits")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    index = PascalIndex.from_paths(args.pas or [path if path.is_dir() else path.parent for path in args.inputs])
+    indexed = time.perf_counter() - started
+    generator = FormGeneratorAI()
+    report = {}
+    for source in args.inputs:
+        for dfm_path in sorted(source.rglob('*.dfm')) if source.is_dir() else [source]:
+            parsed = generator.parse_dfm_content(read_text(dfm_path))
+            report[str(dfm_path)] = scan_form(parsed, index).to_dict()
+    rules = sum(len(entry['rules']) for entry in report.values())
+    unresolved = sum(len(entry['unresolved']) for entry in report.values())
+    print(f"✅ {len(index.units)} unité(s), {len(index)} méthode(s) indexée(s) en {indexed:.2f}s; "
+          f"{rules} règle(s) déduite(s), {unresolved} gestionnaire(s) à confier au modèle "
+          f"({time.perf_counter() - started:.2f}s)", file=sys.stderr)
+    for dfm_path, entry in report.items():
+        for rule in entry['rules']:
+            conditions = ' '.join(f"{c['RightField']} {c['Operator']}" + (f" {c['Value']!r}" if 'Value' in c else '')
+                                  for c in rule['expression']['Conditions'])
+            print(f"{Path(dfm_path).stem}\t{rule['control']}.{rule['key']}\t{conditions}"
+                  f"\t{rule['expression']['LogicalOperator']}")
+    if args.report_json is not None:
+        args.report_json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
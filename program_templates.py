@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Registre des templates de programmes standards pour FormBuilder Pro
+Les templates ACCADJ, BUYTYP, PRIMNT et SRCMNT sont chargés une seule fois en
+structures immuables; les variantes partagent tout ce qu'elles ne modifient pas
+"""
+
+import json
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Mapping, Optional, Sequence
+
+from form_normalizer import canonical
+
+PROGRAM_TEMPLATES_DIR = Path(__file__).resolve().parent / 'program_templates'
+
+
+class FrozenDict(dict):
+    """Dictionnaire en lecture seule, sérialisable tel quel par json.dumps"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Les templates de programmes sont immuables: utilisez instantiate() ou thaw()")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def replace(self, **changes: Any) -> 'FrozenDict':
+        """Copie superficielle avec quelques clés remplacées (les autres valeurs sont partagées)"""
+        updated = dict(self)
+        updated.update((key, freeze(value)) for key, value in changes.items())
+        return FrozenDict(updated)
+
+
+def freeze(value: Any) -> Any:
+    """Convertit récursivement dicts et listes en FrozenDict et tuples"""
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, Mapping):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Copie modifiable (dicts et listes) d'une structure figée"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _replace_by_id(items: Sequence[FrozenDict], overrides: Mapping[str, Optional[Mapping[str, Any]]],
+                   id_key: str) -> tuple:
+    """Applique des surcharges par Id: None supprime, un dict fusionne, un Id inconnu est ajouté"""
+    remaining = dict(overrides)
+    result = []
+    for item in items:
+        item_id = str(item.get(id_key))
+        if item_id not in remaining:
+            result.append(item)  # Élément partagé avec le template
+            continue
+        override = remaining.pop(item_id)
+        if override is not None:
+            result.append(item.replace(**override))
+    for item_id, override in remaining.items():
+        if override is not None:
+            result.append(freeze({id_key: item_id, **override}))
+    return tuple(result)
+
+
+class ProgramTemplateRegistry:
+    """Templates de programmes standards, chargés paresseusement depuis un répertoire de fichiers JSON"""
+
+    def __init__(self, templates_dir: Path = PROGRAM_TEMPLATES_DIR):
+        self.templates_dir = Path(templates_dir)
+        self._templates: Dict[str, FrozenDict] = {}
+        self._lock = threading.Lock()
+
+    def programs(self) -> List[str]:
+        """Programmes disponibles (noms de fichiers sans extension)"""
+        return sorted(path.stem.upper() for path in self.templates_dir.glob('*.json'))
+
+    def register(self, program: str, template: Mapping[str, Any]) -> FrozenDict:
+        """Enregistre (ou remplace) un template à partir d'une structure quelconque, ramenée au dialecte canonique"""
+        frozen = freeze(canonical(thaw(template)))
+        with self._lock:
+            self._templates[program.upper()] = frozen
+        return frozen
+
+    def get(self, program: str) -> FrozenDict:
+        """Template figé d'un programme; KeyError si inconnu"""
+        name = program.upper()
+        template = self._templates.get(name)
+        if template is not None:
+            return template
+
+        path = self.templates_dir / f'{name}.json'
+        if not path.exists():
+            raise KeyError(f"Template de programme inconnu: {program}")
+        with open(path, 'r', encoding='utf-8') as handle:
+            return self.register(name, json.load(handle))
+
+    def __contains__(self, program: str) -> bool:
+        return program.upper() in self._templates or (self.templates_dir / f'{program.upper()}.json').exists()
+
+    def instantiate(self, program: str, menu_id: Optional[str] = None, label: Optional[str] = None,
+                    extra_fields: Iterable[Mapping[str, Any]] = (),
+                    field_overrides: Optional[Mapping[str, Optional[Mapping[str, Any]]]] = None,
+                    validation_overrides: Optional[Mapping[str, Optional[Mapping[str, Any]]]] = None,
+                    **properties: Any) -> FrozenDict:
+        """
+        Variante d'un template sans copie profonde: seuls les nœuds modifiés sont recréés.
+        field_overrides / validation_overrides sont indexés par Id (None supprime l'élément),
+        les autres arguments nommés remplacent des propriétés de premier niveau (FormWidth, Layout...)
+        """
+        template = self.get(program)
+        changes: Dict[str, Any] = dict(properties)
+        if menu_id is not None:
+            changes['MenuID'] = menu_id
+            if label is None and template.get('Label') == template.get('MenuID'):
+                changes['Label'] = menu_id
+        if label is not None:
+            changes['Label'] = label
+
+        extra_fields = tuple(freeze(field) for field in extra_fields)
+        if field_overrides or extra_fields:
+            fields = template.get('Fields', ())
+            if field_overrides:
+                fields = _replace_by_id(fields, field_overrides, 'Id')
+            changes['Fields'] = fields + extra_fields
+        if validation_overrides:
+            changes['Validations'] = _replace_by_id(template.get('Validations', ()), validation_overrides, 'Id')
+
+        return template.replace(**changes) if changes else template
+
+
+@lru_cache(maxsize=1)
+def get_default_registry() -> ProgramTemplateRegistry:
+    """Registre partagé basé sur le répertoire program_templates/"""
+    return ProgramTemplateRegistry()
@@ -20,6 +20,48 @@ const anthropic = new Anthropic({
   apiKey: process.env.ANTHROPIC_API_KEY,
 });
 
+// Service Python de conversion (conversion_service.py): exemples few-shot ciblés pour les prompts
+const CONVERSION_SERVICE_URL = process.env.FORMBUILDER_SERVICE_URL || 'http://localhost:8502';
+// Budget d'exemples d'un prompt, aligné sur DEFAULT_TOKEN_BUDGET de fewshot_selector.py
+const FEWSHOT_TOKEN_BUDGET = 600;
+const CHARS_PER_TOKEN = 4;
+
+async function fetchFewShotContext(dfmContent: string, infoContent?: string): Promise<string> {
+  try {
+    const response = await fetch(`${CONVERSION_SERVICE_URL}/api/fewshot`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ dfm_content: dfmContent, info_content: infoContent }),
+      signal: AbortSignal.timeout(2000),
+    });
+    if (!response.ok) return '';
+    const result = await response.json();
+    return typeof result.context === 'string' ? result.context : '';
+  } catch {
+    // Service indisponible: le prompt part sans exemples
+    return '';
+  }
+}
+
+// Templates compactés (sans indentation). Les templates demandés sont toujours inclus; les autres
+// s'ajoutent du plus court au plus long tant que le budget le permet, et au moins un est présent
+function budgetedTemplates(templates: Record<string, string>, requested: string[] = [],
+                           budget: number = FEWSHOT_TOKEN_BUDGET): string {
+  const compact = Object.entries(templates)
+    .map(([name, template]) => [name, JSON.stringify(JSON.parse(template))] as const)
+    .sort((a, b) => a[1].length - b[1].length);
+  const blocks: string[] = compact
+    .filter(([name]) => requested.includes(name))
+    .map(([name, text]) => `For ${name}: ${text}`);
+  let remaining = budget * CHARS_PER_TOKEN;
+  for (const [name, text] of compact) {
+    if (requested.includes(name) || (blocks.length && text.length > remaining)) continue;
+    blocks.push(`For ${name}: ${text}`);
+    remaining -= text.length;
+  }
+  return blocks.join('\n\n');
+}
+
 export interface AIResponse {
   response: string;
   usage?: {
@@ -336,9 +378,13 @@ ${code}
   }
 
   async convertDFMToJSON(dfmContent: string, infoContent?: string): Promise<AIResponse> {
+    // Formulaires déjà convertis les plus proches de ce DFM, choisis par le service Python
+    const examples = await fetchFewShotContext(dfmContent, infoContent);
     const prompt = `Convert this Delphi Form (DFM) content to a modern JSON form configuration.
 
-${infoContent ? `Info file content:
+${examples ? `${examples}
+
+` : ''}${infoContent ? `Info file content:
 ${infoContent}
 
 ` : ''}DFM content:
@@ -1244,26 +1290,27 @@ Return only the JSON configuration, formatted and ready to use.`;
   ]
 }`;
 
+    const templates: Record<string, string> = {
+      ACCADJ: realAccadjTemplate, BUYTYP: realBuytypTemplate, PRIMNT: realPrimntTemplate, SRCMNT: realSrcmntTemplate,
+    };
+    // Le template nommé par le type ou les spécifications est inclus hors budget
+    const request = `${formType} ${specifications ?? ''}`.toUpperCase();
+    const requestedTemplates = Object.keys(templates).filter((name) => request.includes(name));
+
     const prompt = `Generate a complete ${formType} program in JSON format using the EXACT structure and patterns from real financial systems.
 
 ${specifications ? `Specifications: ${specifications}` : ''}
 
 **CRITICAL: Generate PRODUCTION-READY JSON following these EXACT template structures:**
 
-For ACCADJ: ${realAccadjTemplate}
-
-For BUYTYP: ${realBuytypTemplate}
-
-For PRIMNT: ${realPrimntTemplate}
-
-For SRCMNT: ${realSrcmntTemplate}
+${budgetedTemplates(templates, requestedTemplates)}
 
 **AUTOMATICALLY USE THE RIGHT TEMPLATE** based on the requested program type.
 
 **PROGRAM SPECIFICATIONS BY TYPE:**
 
 **ACCADJ** (Account Adjustments):
-- Use ACCADJ template above EXACTLY
+- Use the ACCADJ template EXACTLY (shown above when ACCADJ is requested)
 - Fields: Fund lookups, Security tickers, Categories, Process dates, Rate updates
 - Focus: Accrual processing, fund adjustments, security management
 
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Data-loader GetSpecificValues pour FormBuilder Pro
+Regroupe les appels EndpointOnchange émis dans une courte fenêtre en une seule
+requête GraphQL aliasée, déduplique les demandes identiques et garde un cache TTL
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+
+import requests
+
+DEFAULT_BATCH_WINDOW_MS = 10
+DEFAULT_MAX_BATCH_SIZE = 50
+DEFAULT_CACHE_TTL_SECONDS = 30.0
+DEFAULT_CACHE_SIZE = 512
+
+# Une entrée de cache par (programme, valeurs des champs)
+CacheKey = Tuple[str, str]
+
+
+class GraphQLError(Exception):
+    """Erreur renvoyée par le serveur GraphQL pour une requête du lot"""
+
+
+def _cache_key(prog_name: str, fields_values: Dict[str, Any]) -> CacheKey:
+    """Clé canonique: les valeurs sont sérialisées avec des clés triées"""
+    return prog_name, json.dumps(fields_values, sort_keys=True, default=str, separators=(',', ':'))
+
+
+class HttpGraphQLTransport:
+    """Transport HTTP vers le serveur GraphQL Mfact"""
+
+    def __init__(self, endpoint: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.timeout = timeout
+
+    def __call__(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.post(self.endpoint, json={'query': query, 'variables': variables}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class LocalGraphQLStub:
+    """Serveur GraphQL local pour les tests: exécute les requêtes aliasées et compte les appels"""
+
+    _FIELD_PATTERN = re.compile(
+        r'(\w+)\s*:\s*GetSpecificValues\(\s*fieldsValues:\s*\$(\w+)\s+requestedFields:\s*\$(\w+)\s+progName:\s*\$(\w+)\s*\)'
+    )
+
+    def __init__(self, resolver: Callable[[Dict[str, Any], List[str], str], Dict[str, Any]], latency: float = 0.0):
+        self.resolver = resolver
+        self.latency = latency
+        self.call_count = 0
+        self.resolver_calls = 0
+        self.queries: List[str] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.call_count += 1
+            self.queries.append(query)
+        if self.latency:
+            time.sleep(self.latency)
+
+        data, errors = {}, []
+        for alias, values_var, fields_var, prog_var in self._FIELD_PATTERN.findall(query):
+            try:
+                with self._lock:
+                    self.resolver_calls += 1
+                data[alias] = {'values': self.resolver(variables[values_var], variables[fields_var], variables[prog_var])}
+            except Exception as e:
+                data[alias] = None
+                errors.append({'message': str(e), 'path': [alias]})
+
+        payload = {'data': data}
+        if errors:
+            payload['errors'] = errors
+        return payload
+
+
+@dataclass
+class _PendingRequest:
+    """Demande en attente dans le lot courant (partagée par les appels identiques)"""
+    prog_name: str
+    fields_values: Dict[str, Any]
+    requested_fields: List[str]
+    futures: List[Tuple[Future, List[str]]] = field(default_factory=list)
+
+
+class TTLCache:
+    """Cache LRU borné dont les entrées expirent après un délai"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS, max_size: int = DEFAULT_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: 'OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey, requested_fields: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """Valeurs en cache si elles couvrent tous les champs demandés"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            values = entry[1]
+            if any(name not in values for name in requested_fields):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, key: CacheKey, values: Dict[str, Any]):
+        """Enregistre (ou complète) les valeurs d'une clé"""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None and previous[0] >= time.monotonic():
+                values = {**previous[1], **values}
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, values)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SpecificValuesLoader:
+    """Regroupe les appels GetSpecificValues concurrents en requêtes GraphQL groupées"""
+
+    def __init__(self, transport: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 cache: Optional[TTLCache] = None):
+        self.transport = transport
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.cache = cache if cache is not None else TTLCache()
+        self._pending: 'OrderedDict[CacheKey, _PendingRequest]' = OrderedDict()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.batches_sent = 0
+
+    def load(self, prog_name: str, fields_values: Dict[str, Any], requested_fields: Sequence[str]) -> Future:
+        """Planifie un appel GetSpecificValues; la Future reçoit le dict des valeurs demandées"""
+        requested = list(requested_fields)
+        future: Future = Future()
+        key = _cache_key(prog_name, fields_values)
+
+        cached = self.cache.get(key, requested)
+        if cached is not None:
+            future.set_result({name: cached.get(name) for name in requested})
+            return future
+
+        flush_now = False
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = _PendingRequest(prog_name, dict(fields_values), [])
+                self._pending[key] = pending
+            # Les demandes identiques partagent un seul appel (union des champs demandés)
+            for name in requested:
+                if name not in pending.requested_fields:
+                    pending.requested_fields.append(name)
+            pending.futures.append((future, requested))
+
+            if len(self._pending) >= self.max_batch_size:
+                flush_now = True
+            elif self._timer is None:
+                self._timer = threading.Timer(self.batch_window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if flush_now:
+            self.flush()
+        return future
+
+    def get(self, prog_name: str, fields_values: Dict[str, Any], requested_fields: Sequence[str],
+            timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Version bloquante de load()"""
+        return self.load(prog_name, fields_values, requested_fields).result(timeout)
+
+    def load_many(self, calls: Sequence[Tuple[str, Dict[str, Any], Sequence[str]]]) -> List[Future]:
+        """Planifie plusieurs appels dans la même fenêtre"""
+        return [self.load(prog_name, fields_values, requested) for prog_name, fields_values, requested in calls]
+
+    def flush(self):
+        """Envoie immédiatement le lot en attente"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch = list(self._pending.items())
+            self._pending.clear()
+
+        if batch:
+            self._dispatch(batch)
+
+    @staticmethod
+    def build_query(batch: Sequence[Tuple[CacheKey, _PendingRequest]]) -> Tuple[str, Dict[str, Any]]:
+        """Construit le document GraphQL aliasé (r0, r1, ...) et ses variables"""
+        declarations, selections, variables = [], [], {}
+        for position, (_, pending) in enumerate(batch):
+            declarations.append(f'$fv{position}: Any! $rf{position}: [String]! $pn{position}: String!')
+            selections.append(
+                f'  r{position}: GetSpecificValues(fieldsValues: $fv{position} '
+                f'requestedFields: $rf{position} progName: $pn{position}) {{ values }}'
+            )
+            variables[f'fv{position}'] = pending.fields_values
+            variables[f'rf{position}'] = pending.requested_fields
+            variables[f'pn{position}'] = pending.prog_name
+        query = 'query BatchedSpecificValues(' + ' '.join(declarations) + ') {\n' + '\n'.join(selections) + '\n}'
+        return query, variables
+
+    def _dispatch(self, batch: Sequence[Tuple[CacheKey, _PendingRequest]]):
+        """Exécute un lot et répartit les résultats (ou erreurs) entre les Futures"""
+        query, variables = self.build_query(batch)
+        self.batches_sent += 1
+        try:
+            payload = self.transport(query, variables)
+        except Exception as e:
+            for _, pending in batch:
+                for future, _ in pending.futures:
+                    future.set_exception(e)
+            return
+
+        data = payload.get('data') or {}
+        errors_by_alias = {}
+        for error in payload.get('errors') or []:
+            path = error.get('path') or []
+            errors_by_alias.setdefault(path[0] if path else None, []).append(error.get('message', 'GraphQL error'))
+
+        for position, (key, pending) in enumerate(batch):
+            alias = f'r{position}'
+            result = data.get(alias)
+            messages = errors_by_alias.get(alias) or (errors_by_alias.get(None) if result is None else None)
+            if result is None or messages:
+                error = GraphQLError('; '.join(messages or ['Réponse vide pour GetSpecificValues']))
+                for future, _ in pending.futures:
+                    future.set_exception(error)
+                continue
+
+            values = result.get('values') or {}
+            self.cache.put(key, values)
+            for future, requested in pending.futures:
+                future.set_result({name: values.get(name) for name in requested})
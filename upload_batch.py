@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Conversion en arrière-plan des lots uploadés dans l'interface Streamlit (FormBuilder Pro)
+Les fichiers (ou dossiers) uploadés sont associés par nom (ACCADJ.dfm + ACCADJ.info), les
+archives ZIP lues membre à membre (zip_ingest), puis le tout est converti par le pool borné
+de bounded_conversion depuis un thread de fond: le script Streamlit ne fait que lire
+l'avancement et les lignes déjà terminées, la page reste donc réactive pendant la
+conversion de centaines de fichiers
+"""
+
+import io
+import json
+import logging
+import threading
+import time
+import zipfile
+from itertools import chain
+from pathlib import PurePath
+from typing import Dict, List, Any, BinaryIO, Iterable, Optional, Sequence, Tuple
+
+from batch_convert import DFM_SUFFIXES, INFO_SUFFIXES, decode_source, group_by_stem
+from bounded_conversion import BoundedConverter, BoundedResult, DEFAULT_MEMORY_BUDGET_MB, DEFAULT_TIME_BUDGET
+from zip_ingest import ZIP_SUFFIXES, iter_zip_tasks, pair_zip_members
+
+logger = logging.getLogger(__name__)
+
+# form_id -> (contenu DFM, contenu Info)
+UploadPairs = Dict[str, Tuple[Optional[str], Optional[str]]]
+
+
+def is_archive(name: str) -> bool:
+    return PurePath(name).suffix.lower() in ZIP_SUFFIXES
+
+
+def pair_uploads(files: Iterable[Tuple[str, bytes]]) -> Tuple[UploadPairs, List[Tuple[str, str]]]:
+    """
+    Associe des fichiers (nom éventuellement relatif au dossier uploadé, contenu) par nom de
+    base insensible à la casse, selon la règle de batch_convert.group_by_stem; renvoie les paires
+    et les (nom, raison) des fichiers ignorés: extension inconnue, .txt sans DFM de même nom,
+    nom de base déjà pris par un fichier d'un autre dossier (le premier uploadé est gardé).
+    Les archives ZIP sont à passer à UploadBatchJob(archives=...)
+    """
+    files = list(files)
+    pairs = {}
+    reasons: Dict[int, str] = {}  # Position du fichier -> raison de l'écarter ('' s'il est retenu)
+    for form_id, (dfms, infos) in group_by_stem((name, position)
+                                                for position, (name, _) in enumerate(files)).items():
+        for group in (dfms, infos):
+            for position in group[1:]:
+                reasons[position] = f"même nom que {files[group[0]][0]}"
+            if group:
+                reasons[group[0]] = ''
+        pairs[form_id] = tuple(decode_source(files[group[0]][1]) if group else None for group in (dfms, infos))
+    ignored = []
+    for position, (name, _) in enumerate(files):
+        reason = reasons.get(position)
+        if reason is None:
+            path = PurePath(name)
+            if path.suffix.lower() not in DFM_SUFFIXES + INFO_SUFFIXES:
+                reason = "extension non reconnue"
+            else:  # .txt non retenu
+                reason = "Info déjà fournie par un .info" if path.stem.upper() in pairs else "sans DFM de même nom"
+        if reason:
+            ignored.append((name, reason))
+    return pairs, ignored
+
+
+class UploadBatchJob:
+    """
+    Lot converti dans un thread de fond. Les lectures (progress, rows, archive) sont sûres
+    pendant la conversion et ne renvoient que des copies
+    """
+
+    def __init__(self, pairs: UploadPairs, workers: Optional[int] = None, time_budget: float = DEFAULT_TIME_BUDGET,
+                 memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB, archives: Sequence[BinaryIO] = ()):
+        self.pairs = pairs
+        # Répertoire central lu tout de suite: total connu avant la première conversion
+        self._archives = []
+        for archive_file in archives:
+            archive = zipfile.ZipFile(archive_file)
+            archive_pairs, rejected = pair_zip_members(archive)
+            self._archives.append((archive, archive_pairs, rejected))
+        self.workers = workers
+        self.time_budget = time_budget
+        self.memory_budget_mb = memory_budget_mb
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.failure: Optional[str] = None  # Échec du pool lui-même (pas d'un formulaire)
+        self._rows: List[Dict[str, Any]] = []
+        self._outputs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='formbuilder-upload-batch', daemon=True)
+
+    @property
+    def total(self) -> int:
+        return len(self.pairs) + sum(len(pairs) + len(skipped) for _, pairs, skipped in self._archives)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def start(self) -> 'UploadBatchJob':
+        self.started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Arrête la distribution; les conversions en cours sont abandonnées avec le pool"""
+        self._cancelled.set()
+
+    def _record(self, result: BoundedResult):
+        row = {
+            'Formulaire': result.form_id,
+            'Composants': result.components,
+            'Champs': result.fields,
+            'Validations': result.validations,
+            'Temps (ms)': round(result.elapsed * 1000, 1),
+            'Statut': result.status,
+            'Erreurs': '; '.join(result.errors),
+        }
+        with self._lock:
+            self._rows.append(row)
+            if result.json_text is not None:
+                self._outputs[result.form_id] = result.json_text
+
+    def _record_skipped(self, entries: Iterable[Dict[str, Any]]):
+        """Membres d'archive écartés (taille) ou illisibles, sans conversion"""
+        for entry in entries:
+            self._record(BoundedResult(entry['form_id'], entry['status'], 0.0, errors=entry['errors']))
+
+    def _run(self):
+        unreadable: List[Dict[str, Any]] = []
+        tasks = chain(((form_id, dfm, info) for form_id, (dfm, info) in self.pairs.items()),
+                      *(iter_zip_tasks(archive, pairs, unreadable) for archive, pairs, _ in self._archives))
+        try:
+            for _, _, skipped in self._archives:
+                self._record_skipped(skipped)
+            with BoundedConverter(self.workers, self.time_budget, self.memory_budget_mb) as converter:
+                for result in converter.run(tasks):
+                    self._record(result)
+                    if self._cancelled.is_set():
+                        break
+            self._record_skipped(unreadable)
+        except Exception as e:
+            logger.exception("Échec du lot uploadé")
+            self.failure = f"{type(e).__name__}: {e}"
+        finally:
+            for archive, _, _ in self._archives:
+                archive.close()
+            self.finished_at = time.monotonic()
+
+    def progress(self) -> Tuple[int, int]:
+        """(formulaires terminés, total)"""
+        with self._lock:
+            return len(self._rows), self.total
+
+    def rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._rows)
+
+    def archive(self) -> bytes:
+        """ZIP des JSON produits jusqu'ici et du rapport par formulaire"""
+        with self._lock:
+            outputs, rows = dict(self._outputs), list(self._rows)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for form_id, json_text in sorted(outputs.items()):
+                archive.writestr(f'{form_id.lower()}_form.json', json_text)
+            archive.writestr('rapport.json', json.dumps(sorted(rows, key=lambda row: row['Formulaire']),
+                                                        indent=2, ensure_ascii=False))
+        return buffer.getvalue()
@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+"""
+Mode surveillance: reconversion incrémentale guidée par les dépendances (FormBuilder Pro)
+Chaque formulaire (DFM de l'arborescence surveillée) dépend de son fichier Info, des unités de
+ses fiches de base et de ses frames (delphi_project), des types Delphi qu'il contient (fichier
+de correspondances) et, s'il a des lookups, du catalogue MfactModels. Les modifications de
+fichiers sont regroupées sur une courte fenêtre (rafales d'enregistrements), puis seuls les
+formulaires atteints par le graphe inverse sont reconvertis. Les sorties sont publiées sur
+disque et aux clients connectés (flux Server-Sent Events)
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Iterable, Optional, Set, Tuple
+
+from batch_convert import DFM_SUFFIXES, INFO_SUFFIXES, read_text
+from delphi_project import ProjectError, ProjectResolver, ProjectUnit
+from entity_inference import MFACT_MODELS_DIR, get_default_index, load_entity_catalog
+from form_engine import FormGeneratorAI
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Dépendance optionnelle: scrutation périodique à défaut
+    FileSystemEventHandler = object
+    Observer = None
+
+# Fenêtre de regroupement des modifications, et attente maximale pendant une rafale continue
+DEBOUNCE_SECONDS = int(os.getenv('FORMBUILDER_WATCH_DEBOUNCE_MS', '250')) / 1000
+MAX_DEBOUNCE_SECONDS = 2.0
+POLL_INTERVAL = 0.5
+# Clients SSE lents: mises à jour en attente au-delà desquelles le client est déconnecté
+CLIENT_QUEUE_SIZE = 1024
+
+PAS_SUFFIXES = ('.pas',)
+CATALOG_SUFFIXES = ('.cs', '.graphql')
+LOOKUP_TYPES = ('GRIDLKP', 'LSTLKP')
+
+# Dépendances qui ne sont pas des fichiers de formulaire
+CATALOG_KEY = 'catalog'
+
+logger = logging.getLogger(__name__)
+
+
+def _path_key(path: Any) -> str:
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def _unit_key(path: Path) -> Tuple[str, str]:
+    """DFM, Info et .pas d'une même unité: même répertoire, même nom (casse ignorée)"""
+    return _path_key(path.parent), path.stem.lower()
+
+
+def _unit_dependency(path: Path) -> str:
+    directory, stem = _unit_key(path)
+    return f'unit:{directory}{os.sep}{stem}'
+
+
+def _type_key(delphi_type: str) -> str:
+    return f'type:{delphi_type.lower()}'
+
+
+def catalog_version(models_dir: Path = MFACT_MODELS_DIR) -> str:
+    """Empreinte (noms, tailles, dates) des fichiers du catalogue MfactModels"""
+    digest = hashlib.blake2b(digest_size=8)
+    if models_dir.is_dir():
+        for path in sorted(models_dir.iterdir()):
+            if path.suffix.lower() in CATALOG_SUFFIXES:
+                stat = path.stat()
+                digest.update(f'{path.name}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()
+
+
+def load_mapping(path: Optional[Path]) -> Dict[str, str]:
+    """Correspondances type Delphi -> type JSON ajoutées à celles du moteur ({"TcxDBTextEdit": "TEXT"})"""
+    if path is None or not path.exists():
+        return {}
+    mapping = json.loads(read_text(path))
+    if not isinstance(mapping, dict):
+        raise ValueError(f"{path}: objet JSON attendu")
+    return {str(delphi_type): str(json_type) for delphi_type, json_type in mapping.items()}
+
+
+@dataclass
+class WatchUpdate:
+    """Formulaire reconverti (ou retiré) après une modification"""
+    form_id: str
+    status: str  # success, partial, error, removed
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    output: Optional[str] = None
+    form_json: Optional[Dict[str, Any]] = None
+
+    def to_dict(self, with_form: bool = False) -> Dict[str, Any]:
+        payload = {'form_id': self.form_id, 'status': self.status, 'elapsed_ms': round(self.elapsed * 1000, 2),
+                   'errors': self.errors, 'output': self.output}
+        if with_form:
+            payload['form'] = self.form_json
+        return payload
+
+
+class UpdatePublisher:
+    """Diffusion des mises à jour aux clients abonnés (une file bornée par client)"""
+
+    def __init__(self):
+        self._clients: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self.latest: Dict[str, WatchUpdate] = {}
+
+    def subscribe(self) -> queue.Queue:
+        client: queue.Queue = queue.Queue(CLIENT_QUEUE_SIZE)
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def unsubscribe(self, client: queue.Queue):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def publish(self, updates: Iterable[WatchUpdate]):
+        updates = list(updates)
+        with self._lock:
+            for update in updates:
+                if update.status == 'removed':
+                    self.latest.pop(update.form_id, None)
+                else:
+                    self.latest[update.form_id] = update
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                for update in updates:
+                    client.put_nowait(update)
+            except queue.Full:
+                logger.warning("Client de surveillance trop lent: déconnecté")
+                self.unsubscribe(client)
+                with client.mutex:
+                    client.queue.clear()
+                client.put_nowait(None)  # Termine le flux du client
+
+
+class WatchSession:
+    """
+    Formulaires d'une arborescence, graphe de dépendances inverse et reconversion ciblée.
+        session = WatchSession([Path('legacy')], Path('forms'))
+        session.build()
+        session.apply_changes({Path('legacy/ACCADJ.dfm')})
+    """
+
+    def __init__(self, roots: List[Path], output_dir: Optional[Path] = None, mapping_path: Optional[Path] = None,
+                 models_dir: Path = MFACT_MODELS_DIR, generator: Optional[FormGeneratorAI] = None,
+                 publisher: Optional[UpdatePublisher] = None):
+        self.roots = [Path(root).resolve() for root in roots]
+        self.output_dir = Path(output_dir).resolve() if output_dir is not None else None
+        self.mapping_path = Path(mapping_path).resolve() if mapping_path is not None else None
+        self.models_dir = Path(models_dir).resolve()
+        self.generator = generator or FormGeneratorAI()
+        self.publisher = publisher
+        self._default_mappings = dict(self.generator.component_mappings)
+        self.mapping = load_mapping(self.mapping_path)
+        self.generator.component_mappings.update(self.mapping)
+        self.catalog = catalog_version(self.models_dir)
+
+        self.units: Dict[Tuple[str, str], ProjectUnit] = {}  # Par (répertoire, nom) de l'unité
+        self.forms: Dict[str, ProjectUnit] = {}  # form_id -> unité
+        self.info_paths: Dict[Tuple[str, str], Path] = {}
+        self.resolver = ProjectResolver([], self.generator)
+        self.dependents: Dict[str, Set[str]] = {}  # Clé de dépendance -> form_id
+        self._dependencies: Dict[str, Set[str]] = {}  # form_id -> clés de dépendance
+        self._orphans: Set[str] = set()  # Fiches héritées dont la base est absente de l'arborescence
+
+    # Arborescence
+
+    def _walk(self) -> Iterable[Path]:
+        for root in self.roots:
+            for directory, subdirectories, files in os.walk(root):
+                if self.output_dir is not None:
+                    subdirectories[:] = [name for name in subdirectories
+                                         if _path_key(Path(directory) / name) != _path_key(self.output_dir)]
+                for name in files:
+                    yield Path(directory) / name
+
+    def _form_id(self, unit: ProjectUnit) -> str:
+        return unit.name.upper()
+
+    def _add_unit(self, dfm_path: Path) -> Optional[ProjectUnit]:
+        key = _unit_key(dfm_path)
+        if key in self.units:
+            return self.units[key]
+        unit = ProjectUnit(dfm_path.stem, dfm_path.with_suffix('.pas'))
+        form_id = self._form_id(unit)
+        known = self.forms.get(form_id)
+        if known is not None and _unit_key(known.path) != key:
+            logger.warning("%s ignoré: formulaire %s déjà fourni par %s", dfm_path, form_id, known.dfm_path)
+            return None
+        self.units[key] = unit
+        self.forms[form_id] = unit
+        self.resolver.units.append(unit)
+        return unit
+
+    def _remove_unit(self, key: Tuple[str, str]) -> Optional[ProjectUnit]:
+        unit = self.units.pop(key, None)
+        if unit is not None:
+            self.forms.pop(self._form_id(unit), None)
+            self.resolver.units.remove(unit)
+        return unit
+
+    # Dépendances
+
+    def _dependency_keys(self, unit: ProjectUnit) -> Set[str]:
+        """Unités résolues (DFM et .pas), types Delphi et catalogue si le formulaire a des lookups"""
+        keys = set()
+        units = self.resolver.dependencies(unit)
+        for dependency in units:
+            keys.add(_unit_dependency(dependency.path))
+            for component in self.resolver.parsed(dependency).components:
+                keys.add(_type_key(component.delphi_type))
+                if component.json_type in LOOKUP_TYPES:
+                    keys.add(CATALOG_KEY)
+        form_id = self._form_id(unit)
+        if self.resolver.parsed(unit).form_kind == 'inherited' and self.resolver.base_unit(unit) is None:
+            self._orphans.add(form_id)
+        else:
+            self._orphans.discard(form_id)
+        return keys
+
+    def _record_dependencies(self, form_id: str, keys: Set[str]):
+        for key in self._dependencies.pop(form_id, ()):
+            forms = self.dependents.get(key)
+            if forms is not None:
+                forms.discard(form_id)
+                if not forms:
+                    del self.dependents[key]
+        self._dependencies[form_id] = keys
+        for key in keys:
+            self.dependents.setdefault(key, set()).add(form_id)
+
+    def _forget(self, form_id: str):
+        self._record_dependencies(form_id, set())
+        self._dependencies.pop(form_id, None)
+        self._orphans.discard(form_id)
+
+    # Conversion
+
+    def _output_path(self, form_id: str) -> Optional[Path]:
+        return self.output_dir / f'{form_id.lower()}_form.json' if self.output_dir is not None else None
+
+    def convert(self, form_id: str) -> WatchUpdate:
+        unit = self.forms[form_id]
+        started = time.perf_counter()
+        generator = self.generator
+        generator.pop_errors()
+        try:
+            parsed = self.resolver.resolve(unit)
+            info_path = self.info_paths.get(_unit_key(unit.path))
+            info_data = generator.parse_info_content(read_text(info_path)) if info_path else {}
+            form_json = generator.generate_form_json(parsed, info_data, form_id)
+            json_text = generator.serialize_form(form_json)
+            self._record_dependencies(form_id, self._dependency_keys(unit))
+        except (OSError, ProjectError, ValueError) as e:
+            logger.warning("Échec de la conversion de %s: %s", form_id, e)
+            return WatchUpdate(form_id, 'error', time.perf_counter() - started, [str(e)])
+        errors = generator.pop_errors()
+        update = WatchUpdate(form_id, 'partial' if errors else 'success', 0.0, errors, form_json=form_json)
+        output_path = self._output_path(form_id)
+        if output_path is not None:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = output_path.with_name(output_path.name + '.part')
+            partial.write_text(json_text, encoding='utf-8')
+            os.replace(partial, output_path)
+            update.output = str(output_path)
+        update.elapsed = time.perf_counter() - started
+        return update
+
+    def _is_current(self, form_id: str, keys: Set[str]) -> bool:
+        """Sortie plus récente que tous les fichiers dont dépend le formulaire"""
+        output_path = self._output_path(form_id)
+        if output_path is None or not output_path.exists():
+            return False
+        produced = output_path.stat().st_mtime_ns
+        files = []
+        for key in keys:
+            if key.startswith('unit:'):
+                directory, _, stem = key[len('unit:'):].rpartition(os.sep)
+                unit = self.units.get((directory, stem))
+                if unit is not None:
+                    files.extend((unit.dfm_path, unit.path))
+        unit = self.forms[form_id]
+        info_path = self.info_paths.get(_unit_key(unit.path))
+        if info_path is not None:
+            files.append(str(info_path))
+        if self.mapping_path is not None and self.mapping_path.exists():
+            files.append(str(self.mapping_path))
+        for path in files:
+            if path is None:
+                continue
+            try:
+                if os.stat(path).st_mtime_ns > produced:
+                    return False
+            except FileNotFoundError:
+                continue
+        return True
+
+    def build(self, force: bool = False) -> List[WatchUpdate]:
+        """
+        Inventaire de l'arborescence et graphe de dépendances; convertit les formulaires dont la
+        sortie manque ou est plus ancienne qu'une dépendance (tous avec force)
+        """
+        for path in self._walk():
+            suffix = path.suffix.lower()
+            if suffix in DFM_SUFFIXES:
+                self._add_unit(path)
+            elif suffix in INFO_SUFFIXES:
+                self.info_paths[_unit_key(path)] = path
+        updates = []
+        for form_id, unit in sorted(self.forms.items()):
+            try:
+                keys = self._dependency_keys(unit)
+            except (OSError, ProjectError) as e:
+                updates.append(WatchUpdate(form_id, 'error', errors=[str(e)]))
+                continue
+            if not force and self._is_current(form_id, keys):
+                self._record_dependencies(form_id, keys)
+            else:
+                updates.append(self.convert(form_id))
+        self._publish(updates)
+        return updates
+
+    def _publish(self, updates: List[WatchUpdate]):
+        if self.publisher is not None and updates:
+            self.publisher.publish(updates)
+
+    # Modifications
+
+    def _reload_mapping(self) -> Set[str]:
+        """Types Delphi dont la correspondance a changé"""
+        try:
+            mapping = load_mapping(self.mapping_path)
+        except ValueError as e:
+            logger.warning("Fichier de correspondances ignoré: %s", e)
+            return set()
+        previous = {**self._default_mappings, **self.mapping}
+        current = {**self._default_mappings, **mapping}
+        self.mapping = mapping
+        self.generator.component_mappings = current
+        return {delphi_type for delphi_type in previous.keys() | current.keys()
+                if previous.get(delphi_type) != current.get(delphi_type)}
+
+    def affected_forms(self, paths: Iterable[Path]) -> Tuple[Set[str], List[WatchUpdate]]:
+        """Formulaires à reconvertir après modification des chemins donnés, et formulaires retirés"""
+        affected: Set[str] = set()
+        removed: List[WatchUpdate] = []
+        invalidated: List[ProjectUnit] = []
+        catalog_changed = mapping_changed = False
+        for path in paths:
+            path = Path(path)
+            key = _path_key(path)
+            suffix = path.suffix.lower()
+            if self.mapping_path is not None and key == _path_key(self.mapping_path):
+                mapping_changed = True
+            elif _path_key(path.parent) == _path_key(self.models_dir) and suffix in CATALOG_SUFFIXES:
+                catalog_changed = True
+            elif suffix in INFO_SUFFIXES:
+                unit_key = _unit_key(path)
+                if path.exists():
+                    self.info_paths[unit_key] = path
+                else:
+                    self.info_paths.pop(unit_key, None)
+                unit = self.units.get(unit_key)
+                if unit is not None:
+                    affected.add(self._form_id(unit))
+            elif suffix in DFM_SUFFIXES or suffix in PAS_SUFFIXES:
+                unit_key = _unit_key(path)
+                unit = self.units.get(unit_key)
+                if suffix in DFM_SUFFIXES and not path.exists():
+                    unit = self._remove_unit(unit_key)
+                    if unit is not None:
+                        form_id = self._form_id(unit)
+                        invalidated.append(unit)
+                        affected |= self.dependents.get(_unit_dependency(path), set())
+                        affected.discard(form_id)
+                        self._forget(form_id)
+                        removed.append(WatchUpdate(form_id, 'removed'))
+                    continue
+                if unit is None and suffix in DFM_SUFFIXES:
+                    unit = self._add_unit(path)
+                    if unit is None:
+                        continue
+                    # Une nouvelle fiche peut être la base attendue par des fiches héritées orphelines
+                    affected |= self._orphans
+                if unit is not None:
+                    invalidated.append(unit)
+                    affected.add(self._form_id(unit))
+                    affected |= self.dependents.get(_unit_dependency(path), set())
+
+        if mapping_changed:
+            retyped: Set[str] = set()
+            for delphi_type in self._reload_mapping():
+                retyped |= self.dependents.get(_type_key(delphi_type), set())
+            # Le type JSON est fixé au parsing: les DFM qui contiennent ces types sont reparsés
+            invalidated.extend(self.forms[form_id] for form_id in retyped if form_id in self.forms)
+            affected |= retyped
+        if catalog_changed:
+            version = catalog_version(self.models_dir)
+            if version != self.catalog:
+                self.catalog = version
+                load_entity_catalog.cache_clear()
+                get_default_index.cache_clear()
+                affected |= self.dependents.get(CATALOG_KEY, set())
+        if invalidated:
+            self.resolver.invalidate(invalidated)
+        return {form_id for form_id in affected if form_id in self.forms}, removed
+
+    def apply_changes(self, paths: Iterable[Path]) -> List[WatchUpdate]:
+        """Reconvertit les formulaires atteints par les modifications et publie les mises à jour"""
+        affected, updates = self.affected_forms(paths)
+        for update in updates:
+            output_path = self._output_path(update.form_id)
+            if output_path is not None and output_path.exists():
+                output_path.unlink()
+        updates.extend(self.convert(form_id) for form_id in sorted(affected))
+        self._publish(updates)
+        return updates
+
+    def is_relevant(self, path: Path) -> bool:
+        key = _path_key(path)
+        if self.output_dir is not None and key.startswith(_path_key(self.output_dir) + os.sep):
+            return False
+        if self.mapping_path is not None and key == _path_key(self.mapping_path):
+            return True
+        suffix = path.suffix.lower()
+        if _path_key(path.parent) == _path_key(self.models_dir):
+            return suffix in CATALOG_SUFFIXES
+        return suffix in DFM_SUFFIXES or suffix in INFO_SUFFIXES or suffix in PAS_SUFFIXES
+
+    def watched_directories(self) -> List[Path]:
+        directories = list(self.roots)
+        if self.models_dir.is_dir():
+            directories.append(self.models_dir)
+        if self.mapping_path is not None:
+            directories.append(self.mapping_path.parent)
+        # Un répertoire contenu dans un autre est déjà surveillé
+        return [directory for directory in directories
+                if not any(other != directory and other in directory.parents for other in directories)]
+
+
+class _ChangeCollector(FileSystemEventHandler):
+    """Chemins modifiés depuis le dernier lot (watchdog ou scrutation)"""
+
+    def __init__(self, session: WatchSession):
+        self.session = session
+        self.paths: Set[Path] = set()
+        self.last_change = 0.0
+        self.first_change = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, path: Any):
+        path = Path(os.fsdecode(path))
+        if not self.session.is_relevant(path):
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not self.paths:
+                self.first_change = now
+            self.paths.add(path)
+            self.last_change = now
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type in ('opened', 'closed_no_write'):
+            return
+        self.add(event.src_path)
+        if getattr(event, 'dest_path', None):
+            self.add(event.dest_path)
+
+    def take(self) -> Set[Path]:
+        """Lot prêt: calme depuis DEBOUNCE_SECONDS, ou rafale plus longue que MAX_DEBOUNCE_SECONDS"""
+        with self.lock:
+            if not self.paths:
+                return set()
+            now = time.monotonic()
+            if now - self.last_change < DEBOUNCE_SECONDS and now - self.first_change < MAX_DEBOUNCE_SECONDS:
+                return set()
+            paths, self.paths = self.paths, set()
+            return paths
+
+
+def _snapshot(directories: List[Path], session: WatchSession) -> Dict[Path, Tuple[int, int]]:
+    """(date, taille) des fichiers pertinents, pour la scrutation sans watchdog"""
+    snapshot = {}
+    for root in directories:
+        for directory, _, files in os.walk(root):
+            for name in files:
+                path = Path(directory) / name
+                if session.is_relevant(path):
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def watch(session: WatchSession, stop: threading.Event,
+          on_updates: Optional[Callable[[List[WatchUpdate]], None]] = None, polling: bool = False):
+    """Boucle de surveillance jusqu'à stop.set(): lots de modifications -> apply_changes"""
+    collector = _ChangeCollector(session)
+    directories = session.watched_directories()
+    observer = None
+    snapshot = None
+    if Observer is not None and not polling:
+        observer = Observer()
+        for directory in directories:
+            observer.schedule(collector, str(directory), recursive=True)
+        observer.start()
+    else:
+        snapshot = _snapshot(directories, session)
+    last_poll = time.monotonic()
+    try:
+        while not stop.wait(min(DEBOUNCE_SECONDS / 2, POLL_INTERVAL)):
+            if snapshot is not None and time.monotonic() - last_poll >= POLL_INTERVAL:
+                last_poll = time.monotonic()
+                current = _snapshot(directories, session)
+                for path in current.keys() | snapshot.keys():
+                    if current.get(path) != snapshot.get(path):
+                        collector.add(path)
+                snapshot = current
+            paths = collector.take()
+            if not paths:
+                continue
+            updates = session.apply_changes(paths)
+            if on_updates is not None and updates:
+                on_updates(updates)
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+class WatchRequestHandler(BaseHTTPRequestHandler):
+    """GET /events (Server-Sent Events), GET /forms/<ID> (dernier JSON publié depuis le démarrage), GET /health"""
+
+    server_version = 'FormBuilderWatch/1.0'
+    publisher: UpdatePublisher = None
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/events':
+            self._stream_events()
+        elif path.startswith('/forms/'):
+            update = self.publisher.latest.get(path[len('/forms/'):].upper())
+            if update is None:
+                self._send_json(404, {'success': False, 'error': "Formulaire inconnu"})
+            else:
+                self._send_json(200, update.form_json)
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok', 'forms': len(self.publisher.latest)})
+        else:
+            self._send_json(404, {'success': False, 'error': f"Route inconnue: {path}"})
+
+    def _stream_events(self):
+        client = self.publisher.subscribe()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    update = client.get(timeout=15)
+                except queue.Empty:
+                    self.wfile.write(b': keep-alive\n\n')  # Détecte les clients partis
+                    self.wfile.flush()
+                    continue
+                if update is None:
+                    break
+                data = json.dumps(update.to_dict(with_form=True), ensure_ascii=False)
+                self.wfile.write(f'event: form\ndata: {data}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+        except OSError:
+            pass  # Client déconnecté
+        finally:
+            self.publisher.unsubscribe(client)
+
+    def log_message(self, format: str, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def create_server(publisher: UpdatePublisher, host: str, port: int) -> ThreadingHTTPServer:
+    handler = type('BoundWatchRequestHandler', (WatchRequestHandler,), {'publisher': publisher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def _print_updates(updates: List[WatchUpdate]):
+    for update in updates:
+        marker = {'success': '✅', 'partial': '⚠️', 'removed': '🗑️'}.get(update.status, '❌')
+        errors = f" ({'; '.join(update.errors)})" if update.errors else ''
+        print(f"{marker} {update.form_id} {update.status} en {update.elapsed * 1000:.1f} ms{errors}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Surveillance et reconversion incrémentale des DFM/Info")
+    parser.add_argument('roots', nargs='+', type=Path, help="Répertoires surveillés")
+    parser.add_argument('-o', '--output-dir', type=Path, help="Répertoire des JSON publiés")
+    parser.add_argument('--mapping', type=Path, help="Correspondances type Delphi -> type JSON (JSON)")
+    parser.add_argument('--models-dir', type=Path, default=MFACT_MODELS_DIR, help="Catalogue MfactModels")
+    parser.add_argument('--force', action='store_true', help="Reconvertit tout au démarrage")
+    parser.add_argument('--polling', action='store_true', help="Scrutation périodique même si watchdog est installé")
+    parser.add_argument('--serve', type=int, metavar='PORT', help="Publie les mises à jour en SSE sur ce port")
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    publisher = UpdatePublisher()
+    session = WatchSession(args.roots, args.output_dir, args.mapping, args.models_dir, publisher=publisher)
+    started = time.perf_counter()
+    updates = session.build(force=args.force)
+    failed = sum(1 for update in updates if update.status == 'error')
+    print(f"✅ {len(session.forms)} formulaire(s) suivi(s), {len(updates)} converti(s) au démarrage "
+          f"({failed} échec(s)) en {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    server = None
+    if args.serve is not None:
+        server = create_server(publisher, args.host, args.serve)
+        threading.Thread(target=server.serve_forever, name='formbuilder-watch-server', daemon=True).start()
+        print(f"📡 Mises à jour en direct: http://{args.host}:{args.serve}/events", file=sys.stderr)
+    print(f"👀 Surveillance de {', '.join(str(root) for root in session.roots)} "
+          f"({'watchdog' if Observer is not None and not args.polling else 'scrutation'})", file=sys.stderr)
+
+    stop = threading.Event()
+    try:
+        watch(session, stop, _print_updates, polling=args.polling)
+    except KeyboardInterrupt:
+        print("\n⏹️  Surveillance arrêtée", file=sys.stderr)
+    finally:
+        stop.set()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Lecture en flux des projets Delphi zippés (FormBuilder Pro)
+Les paires DFM/Info sont établies à partir du seul répertoire central de l'archive: les autres
+membres (.pas, .res, binaires...) ne sont jamais décompressés. Chaque membre retenu est
+décompressé à la demande, au moment où un processus de travail se libère; rien n'est extrait
+sur disque et seule la paire en cours de distribution est en mémoire
+"""
+
+import logging
+import os
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Any, BinaryIO, Iterator, Optional, Tuple, Union
+
+from batch_convert import (_convert_kept, _convert_one, collect_bounded, decode_source, duplicate_error,
+                           group_by_stem, store_form)
+from bounded_conversion import BoundedConverter
+from form_engine import FormGeneratorAI
+from form_store import FormStore, source_metadata
+
+ZIP_SUFFIXES = ('.zip',)
+# Membre décompressé au-delà duquel l'entrée est ignorée (bombe de décompression, DFM binaire géant)
+MAX_MEMBER_BYTES = int(os.getenv('FORMBUILDER_ZIP_MAX_MEMBER_MB', '64')) * 1024 * 1024
+# Métadonnées ajoutées par les outils d'archivage, jamais des sources
+IGNORED_PREFIXES = ('__MACOSX/',)
+
+logger = logging.getLogger(__name__)
+
+# form_id -> (membre DFM, membre Info)
+ZipPairs = Dict[str, Tuple[Optional[zipfile.ZipInfo], Optional[zipfile.ZipInfo]]]
+
+
+def _rejected(form_id: str, error: str) -> Dict[str, Any]:
+    return {'form_id': form_id, 'status': 'error', 'errors': [error]}
+
+
+def pair_zip_members(archive: zipfile.ZipFile) -> Tuple[ZipPairs, List[Dict[str, Any]]]:
+    """
+    Regroupe les membres DFM et Info par nom de base (comme pair_input_files); renvoie les
+    paires et une entrée de rapport (statut 'error') par formulaire écarté: nom de base porté par
+    plusieurs membres (répertoires différents) ou membre au-delà de la taille limite. Un .txt n'est
+    l'Info d'un formulaire que si un DFM porte son nom et qu'aucun .info ne le fait
+    """
+    members = (member for member in archive.infolist()
+               if not member.is_dir() and not member.filename.startswith(IGNORED_PREFIXES))
+    pairs: ZipPairs = {}
+    rejected = []
+    for form_id, (dfms, infos) in group_by_stem((PurePosixPath(member.filename).name, member)
+                                                for member in members).items():
+        error = duplicate_error(form_id, dfms, infos, name=lambda member: member.filename)
+        if error is not None:
+            rejected.append(error)
+            continue
+        oversized = [member for member in dfms + infos if member.file_size > MAX_MEMBER_BYTES]
+        if oversized:
+            rejected.append(_rejected(form_id, '; '.join(
+                f"{member.filename}: membre de {member.file_size} octets au-delà de la limite" for member in oversized)))
+            continue
+        pairs[form_id] = (dfms[0] if dfms else None, infos[0] if infos else None)
+    return pairs, rejected
+
+
+def read_member(archive: zipfile.ZipFile, member: Optional[zipfile.ZipInfo]) -> Optional[str]:
+    """Contenu décodé d'un membre (décompressé en flux par ZipFile.open)"""
+    if member is None:
+        return None
+    with archive.open(member) as stream:
+        return decode_source(stream.read(MAX_MEMBER_BYTES + 1)[:MAX_MEMBER_BYTES])
+
+
+def iter_zip_tasks(archive: zipfile.ZipFile, pairs: ZipPairs,
+                   unreadable: List[Dict[str, Any]]) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Tâches (form_id, DFM, Info) du pool borné, décompressées une à une au fil de la
+    consommation; un membre corrompu est signalé dans unreadable sans interrompre l'archive
+    """
+    for form_id, (dfm_member, info_member) in pairs.items():
+        try:
+            yield form_id, read_member(archive, dfm_member), read_member(archive, info_member)
+        except (zipfile.BadZipFile, OSError, EOFError, NotImplementedError) as e:
+            # NotImplementedError: méthode de compression non prise en charge
+            logger.warning("Membre illisible pour %s: %s", form_id, e)
+            unreadable.append({'form_id': form_id, 'status': 'error', 'errors': [f"{type(e).__name__}: {e}"]})
+
+
+def _sources(label: str, pairs: ZipPairs) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """Provenance des paires pour le rapport: archive.zip:chemin/du/membre"""
+    def source(member: Optional[zipfile.ZipInfo]) -> Optional[str]:
+        return f'{label}:{member.filename}' if member is not None else None
+    return {form_id: (source(dfm), source(info)) for form_id, (dfm, info) in pairs.items()}
+
+
+def convert_archive_bounded(source: Union[Path, BinaryIO], converter: BoundedConverter,
+                            label: Optional[str] = None, store: Optional[FormStore] = None) -> List[Dict[str, Any]]:
+    """
+    Convertit les formulaires d'une archive (chemin ou fichier binaire positionnable) dans le
+    pool borné; rapport au format de batch_convert.convert_pairs_bounded
+    """
+    label = label or str(source)
+    with zipfile.ZipFile(source) as archive:
+        pairs, report = pair_zip_members(archive)
+        collect_bounded(iter_zip_tasks(archive, pairs, report), _sources(label, pairs), converter, report, store)
+    return sorted(report, key=lambda entry: entry['form_id'])
+
+
+def convert_archive(source: Union[Path, BinaryIO], output_dir: Optional[Path], generator: FormGeneratorAI,
+                    label: Optional[str] = None, store: Optional[FormStore] = None) -> List[Dict[str, Any]]:
+    """Variante dans le processus courant (batch_convert --in-process), sans budget"""
+    label = label or str(source)
+    with zipfile.ZipFile(source) as archive:
+        pairs, report = pair_zip_members(archive)
+        sources = _sources(label, pairs)
+        for form_id, dfm_content, info_content in iter_zip_tasks(archive, pairs, report):
+            entry: Dict[str, Any] = {'form_id': form_id, 'dfm': sources[form_id][0], 'info': sources[form_id][1]}
+            output_path = output_dir / f'{form_id.lower()}_form.json' if output_dir is not None else None
+            try:
+                if store is None:
+                    result = _convert_one(generator, form_id, dfm_content, info_content, output_path)
+                else:
+                    result, json_data = _convert_kept(generator, form_id, dfm_content, info_content, output_path)
+                    store_form(store, json_data, source_metadata(dfm_content, info_content, *sources[form_id]),
+                               'success' if result.success else 'partial')
+            except Exception as e:
+                logger.exception("Échec de la conversion de %s", form_id)
+                entry.update(status='error', errors=[str(e)])
+            else:
+                if output_path is not None:
+                    entry['output'] = str(output_path)
+                entry.update(status='success' if result.success else 'partial', errors=result.errors,
+                             fields=result.fields, validations=result.validations)
+            report.append(entry)
+    return sorted(report, key=lambda entry: entry['form_id'])